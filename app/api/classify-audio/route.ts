@@ -1,5 +1,6 @@
 import { NextRequest, NextResponse } from "next/server";
 import OpenAI from "openai";
+import { callClassifierService, getClassifierServiceUrl } from "@/lib/classifier-service";
 
 // OpenRouter client for GPT-4 classification
 function getOpenAIClient() {
@@ -98,6 +99,14 @@ Answer:
 {"rating": "R", "reasons": ["Strong profanity", "Explicit threat of violence"], "scores": {"violence":3,"sexual_content":0,"language":3,"drugs":0,"self_harm":0}}
 `;
 
+// Map rating to risk level
+const riskLevelMap: { [key: string]: string } = {
+  "G": "Low",
+  "PG": "Low",
+  "PG-13": "Medium",
+  "R": "High",
+};
+
 export async function POST(request: NextRequest) {
   try {
     const formData = await request.formData();
@@ -110,6 +119,27 @@ export async function POST(request: NextRequest) {
       );
     }
 
+    const serviceUrl = getClassifierServiceUrl();
+    if (serviceUrl) {
+      // Transcription and classification run in the Python service with warm clients
+      const filename = encodeURIComponent(audioFile.name || "audio.m4a");
+      const service = await callClassifierService(
+        serviceUrl,
+        `/classify-audio?filename=${filename}`,
+        await audioFile.arrayBuffer(),
+        audioFile.type || "application/octet-stream"
+      );
+      if (!service.ok) {
+        return service.response;
+      }
+      return NextResponse.json({
+        ...service.result,
+        riskLevel: riskLevelMap[service.result.rating] || "Medium",
+        model: "hathora-parakeet + gpt-oss-safeguard-20b",
+        timestamp: new Date().toISOString(),
+      });
+    }
+
     if (!process.env.HATHORA_API_KEY) {
       return NextResponse.json(
         { error: "Hathora API key not configured" },
@@ -225,14 +255,6 @@ export async function POST(request: NextRequest) {
       };
     }
 
-    // Map rating to risk level
-    const riskLevelMap: { [key: string]: string } = {
-      "G": "Low",
-      "PG": "Low",
-      "PG-13": "Medium",
-      "R": "High",
-    };
-
     // Return classification result with transcription
     return NextResponse.json({
       ...result,
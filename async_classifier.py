@@ -0,0 +1,239 @@
+"""
+Async Batch Classifier
+Classifies many transcripts concurrently on top of AsyncOpenAI, keeping a
+bounded number of requests in flight while preserving the validation and
+fallback behaviour of openaioss.classify_content for every item.
+"""
+
+import asyncio
+import json
+import os
+from openai import AsyncOpenAI
+from dotenv import load_dotenv
+
+import telemetry
+from openaioss import MODEL, policy, create_fallback_response
+from retry_policy import DEFAULT_RETRY_POLICY, breaker_for
+from verdict_schema import disable_structured_output, parse_verdict, record_attempt, structured_output_kwargs
+
+
+DEFAULT_MAX_CONCURRENCY = 16
+
+
+def initialize_async_client():
+    """Initialize an AsyncOpenAI client pointed at OpenRouter"""
+    load_dotenv()
+    return AsyncOpenAI(
+        base_url="https://openrouter.ai/api/v1",
+        api_key=os.getenv("OPENAI_API_KEY"),
+    )
+
+
+def record_usage(usage: dict, response):
+    """Add the token counts of a chat completion response to a usage dict"""
+    usage["requests"] = usage.get("requests", 0) + 1
+    counts = getattr(response, "usage", None)
+    if counts is None:
+        return
+    for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        usage[field] = usage.get(field, 0) + (getattr(counts, field, 0) or 0)
+
+
+async def classify_content_async(client, content: str, max_retries: int = 3, cache=None,
+                                 usage=None, prefilter=None, retry_policy=None) -> dict:
+    """
+    Classify a single piece of content without blocking the event loop.
+
+    Args:
+        client: Initialized AsyncOpenAI client
+        content: The content to classify
+        max_retries: Maximum number of retry attempts
+        cache: Optional VerdictCache consulted before calling the model
+        usage: Optional dict accumulating request and token counts
+        prefilter: Optional LexicalFilter that may answer obvious cases directly
+        retry_policy: Optional RetryPolicy (defaults to jittered exponential backoff)
+
+    Returns:
+        dict: Classification result with rating, reasons, and scores
+    """
+    if prefilter is not None:
+        verdict = prefilter.classify(content)
+        if verdict is not None:
+            return verdict
+
+    if cache is not None:
+        cached = cache.lookup(content, policy, MODEL)
+        if cached is not None:
+            return cached
+
+    retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+    breaker = breaker_for(client)
+
+    attempt = 0
+    while attempt < max_retries:
+        if not breaker.allow():
+            print(f"⚠ Circuit open for {breaker.name}. Returning fallback classification.")
+            return create_fallback_response(content, error=f"Circuit breaker open for {breaker.name}")
+        record_attempt(breaker.name, attempt)
+        structured = structured_output_kwargs(client)
+
+        try:
+            with telemetry.span("model_call", backend=breaker.name):
+                response = await client.chat.completions.create(
+                    model=MODEL,
+                    messages=[
+                        {"role": "system", "content": policy},
+                        {"role": "user", "content": content}
+                    ],
+                    extra_body={"reasoning": {"enabled": True}},
+                    timeout=30,
+                    **structured
+                )
+            # The backend answered; malformed output is the model's fault, not the transport's
+            breaker.record_success()
+            telemetry.record_tokens(response, breaker.name)
+            if usage is not None:
+                record_usage(usage, response)
+
+            result = parse_verdict(response.choices[0].message.content, breaker.name)
+            if cache is not None:
+                cache.store(content, policy, MODEL, result)
+            return result
+
+        except json.JSONDecodeError as e:
+            print(f"✗ Attempt {attempt + 1}: JSON parsing error: {e}")
+            if attempt == max_retries - 1:
+                print("⚠ Max retries reached. Returning fallback classification.")
+                return create_fallback_response(content, error=str(e))
+            await retry_policy.sleep_async(attempt, e)
+
+        except ValueError as e:
+            print(f"✗ Attempt {attempt + 1}: Validation error: {e}")
+            if attempt == max_retries - 1:
+                print("⚠ Max retries reached. Returning fallback classification.")
+                return create_fallback_response(content, error=str(e))
+            await retry_policy.sleep_async(attempt, e)
+
+        except Exception as e:
+            if disable_structured_output(client, e, bool(structured)):
+                print(f"⚠ {breaker.name} rejected structured output. Retrying with prompt-only JSON.")
+                # The backend's fault, not the model's: resend at once without using up an attempt
+                continue
+            print(f"✗ Attempt {attempt + 1}: Unexpected error: {type(e).__name__}: {e}")
+            if not retry_policy.should_retry(e):
+                print("⚠ Non-retryable error. Returning fallback classification.")
+                return create_fallback_response(content, error=str(e))
+            breaker.record_failure()
+            if attempt == max_retries - 1:
+                print("⚠ Max retries reached. Returning fallback classification.")
+                return create_fallback_response(content, error=str(e))
+            await retry_policy.sleep_async(attempt, e)
+        attempt += 1
+
+    return create_fallback_response(content, error="Max retries exceeded")
+
+
+async def iter_classify(transcripts, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                        client=None, max_retries: int = 3, cache=None, usage=None,
+                        prefilter=None):
+    """
+    Classify transcripts concurrently, yielding results as they complete.
+
+    At most ``max_concurrency`` requests are in flight at any time; a new
+    request starts as soon as one finishes, so the pipe stays full without
+    creating one task per input up front.
+
+    Args:
+        transcripts: Iterable of transcript strings
+        max_concurrency: Maximum number of concurrent model requests
+        client: Optional AsyncOpenAI client (created if omitted)
+        max_retries: Maximum number of retry attempts per item
+        cache: Optional VerdictCache shared by all items
+        usage: Optional dict accumulating request and token counts
+        prefilter: Optional LexicalFilter shared by all items
+
+    Yields:
+        tuple: (index, result) in completion order
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    client = client or initialize_async_client()
+    items = iter(enumerate(transcripts))
+    pending = {}
+
+    def schedule():
+        for index, content in items:
+            task = asyncio.create_task(classify_content_async(
+                client, content, max_retries, cache, usage, prefilter
+            ))
+            pending[task] = index
+            if len(pending) >= max_concurrency:
+                return
+
+    schedule()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield pending.pop(task), task.result()
+            schedule()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def classify_many_async(transcripts, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                              client=None, max_retries: int = 3, cache=None) -> list:
+    """
+    Classify transcripts concurrently and return results in input order.
+
+    Args:
+        transcripts: Iterable of transcript strings
+        max_concurrency: Maximum number of concurrent model requests
+        client: Optional AsyncOpenAI client (created if omitted)
+        max_retries: Maximum number of retry attempts per item
+        cache: Optional VerdictCache shared by all items
+
+    Returns:
+        list: Classification results aligned with the input order
+    """
+    results = {}
+    async for index, result in iter_classify(transcripts, max_concurrency, client, max_retries, cache):
+        results[index] = result
+    return [results[i] for i in range(len(results))]
+
+
+def classify_many(transcripts, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                  max_retries: int = 3, cache=None) -> list:
+    """
+    Synchronous entry point for classifying a batch of transcripts.
+
+    Args:
+        transcripts: Iterable of transcript strings
+        max_concurrency: Maximum number of concurrent model requests
+        max_retries: Maximum number of retry attempts per item
+        cache: Optional VerdictCache shared by all items
+
+    Returns:
+        list: Classification results aligned with the input order
+    """
+    return asyncio.run(classify_many_async(transcripts, max_concurrency, max_retries=max_retries, cache=cache))
+
+
+# Example usage
+if __name__ == "__main__":
+    test_transcripts = [
+        "Thanks for watching, see you next week!",
+        "Let's watch a movie and kiss a bit.",
+        "I'm going to f***ing kill you tonight.",
+    ]
+
+    results = classify_many(test_transcripts, max_concurrency=4)
+
+    for transcript, result in zip(test_transcripts, results):
+        print(f"{result['rating']:>6}  {transcript}")
+
+    fallbacks = sum(1 for r in results if r.get("error"))
+    if fallbacks:
+        print(f"\n⚠ WARNING: {fallbacks} fallback classification(s) were used due to errors")
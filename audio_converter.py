@@ -5,12 +5,16 @@ the content using OpenAI's content classification model.
 """
 
 import os
+import sys
 import json
-import re
 from hathora import Hathora, HathoraError, APIError, AuthenticationError
 from openai import OpenAI
 from dotenv import load_dotenv
 
+import telemetry
+from retry_policy import DEFAULT_RETRY_POLICY, breaker_for
+from verdict_schema import disable_structured_output, parse_verdict, record_attempt, structured_output_kwargs
+
 
 # Initialize clients
 def initialize_clients():
@@ -101,6 +105,9 @@ Where scores mean:
 
 Always choose the HIGHEST severity among categories when deciding the final rating.
 
+Transcripts may be condensed: a word or parenthesized phrase followed by [xN] was
+said N times in a row. "fuck [x5]" is five f-words and counts as frequent.
+
 Examples:
 
 Content: "Let's watch a movie and kiss a bit."
@@ -129,10 +136,12 @@ def transcribe_audio(hathora_client, audio_file_path, model="parakeet"):
         str: Transcribed text
     """
     try:
-        stt_response = hathora_client.speech_to_text.convert(
-            model,
-            audio_file_path
-        )
+        # The SDK uploads and waits in one call, so this span covers both
+        with telemetry.span("stt", model=model):
+            stt_response = hathora_client.speech_to_text.convert(
+                model,
+                audio_file_path
+            )
         return stt_response.text
         
     except AuthenticationError as e:
@@ -145,7 +154,31 @@ def transcribe_audio(hathora_client, audio_file_path, model="parakeet"):
         raise
 
 
-def classify_content(openai_client, content, max_retries=3):
+MODEL = "openai/gpt-oss-safeguard-20b"
+
+
+def classification_request(content, reasoning=None):
+    """
+    Chat-completion arguments that classify ``content`` under POLICY.
+    
+    Args:
+        content: The content to classify
+        reasoning: OpenRouter ``reasoning`` options (defaults to full reasoning, ``{"enabled": True}``)
+        
+    Returns:
+        dict: ``model``, ``messages`` and ``extra_body`` for ``chat.completions.create``
+    """
+    return {
+        "model": MODEL,
+        "messages": [
+            {"role": "system", "content": POLICY},
+            {"role": "user", "content": content}
+        ],
+        "extra_body": {"reasoning": reasoning or {"enabled": True}},
+    }
+
+
+def classify_content(openai_client, content, max_retries=3, cache=None, retry_policy=None, reasoning=None):
     """
     Classify content with guardrails and error handling.
     
@@ -153,94 +186,71 @@ def classify_content(openai_client, content, max_retries=3):
         openai_client: Initialized OpenAI client
         content: The content to classify
         max_retries: Maximum number of retry attempts
+        cache: Optional VerdictCache consulted before calling the model
+        retry_policy: Optional RetryPolicy (defaults to jittered exponential backoff)
+        reasoning: OpenRouter ``reasoning`` options (defaults to full reasoning, ``{"enabled": True}``)
         
     Returns:
         dict: Classification result with rating, reasons, and scores
     """
-    valid_ratings = ["G", "PG", "PG-13", "R"]
-    required_score_keys = ["violence", "sexual_content", "language", "drugs", "self_harm"]
+    model = MODEL
+    if cache is not None:
+        cached = cache.lookup(content, POLICY, model)
+        if cached is not None:
+            return cached
+    
+    retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+    breaker = breaker_for(openai_client)
+    
+    attempt = 0
+    while attempt < max_retries:
+        if not breaker.allow():
+            return create_fallback_response(content, error=f"Circuit breaker open for {breaker.name}")
+        record_attempt(breaker.name, attempt)
+        structured = structured_output_kwargs(openai_client)
     
-    for attempt in range(max_retries):
         try:
             # Make API call
-            response = openai_client.chat.completions.create(
-                model="openai/gpt-oss-safeguard-20b",
-                messages=[
-                    {"role": "system", "content": POLICY},
-                    {"role": "user", "content": content}
-                ],
-                extra_body={"reasoning": {"enabled": True}},
-                timeout=30
-            )
-            
-            raw_content = response.choices[0].message.content
-            
-            if not raw_content:
-                raise ValueError("Empty response from API")
-            
-            # Strip markdown code blocks if present
-            cleaned_content = re.sub(r'^```(?:json)?\s*|\s*```$', '', raw_content.strip(), flags=re.MULTILINE)
-            cleaned_content = cleaned_content.strip()
-            
-            # Parse JSON
-            result = json.loads(cleaned_content)
-            
-            # Validate structure
-            if not isinstance(result, dict):
-                raise ValueError("Response is not a JSON object")
+            with telemetry.span("model_call", backend=breaker.name):
+                response = openai_client.chat.completions.create(
+                    **classification_request(content, reasoning),
+                    timeout=30,
+                    **structured
+                )
+            # The backend answered; malformed output is the model's fault, not the transport's
+            breaker.record_success()
+            telemetry.record_tokens(response, breaker.name)
             
-            # Validate required fields
-            if "rating" not in result:
-                raise ValueError("Missing 'rating' field")
-            if "reasons" not in result:
-                raise ValueError("Missing 'reasons' field")
-            if "scores" not in result:
-                raise ValueError("Missing 'scores' field")
-            
-            # Validate rating value
-            if result["rating"] not in valid_ratings:
-                raise ValueError(f"Invalid rating: {result['rating']}. Must be one of {valid_ratings}")
-            
-            # Validate reasons
-            if not isinstance(result["reasons"], list):
-                raise ValueError("'reasons' must be a list")
-            if len(result["reasons"]) == 0:
-                raise ValueError("'reasons' cannot be empty")
-            
-            # Validate scores
-            if not isinstance(result["scores"], dict):
-                raise ValueError("'scores' must be an object")
-            
-            missing_keys = set(required_score_keys) - set(result["scores"].keys())
-            if missing_keys:
-                raise ValueError(f"Missing score keys: {missing_keys}")
-            
-            # Validate score values
-            for key, value in result["scores"].items():
-                if not isinstance(value, (int, float)):
-                    raise ValueError(f"Score '{key}' must be a number, got {type(value)}")
-                if not (0 <= value <= 3):
-                    raise ValueError(f"Score '{key}' must be between 0 and 3, got {value}")
+            result = parse_verdict(response.choices[0].message.content, breaker.name)
             
             # Success!
+            if cache is not None:
+                cache.store(content, POLICY, model, result)
             return result
             
         except json.JSONDecodeError as e:
             if attempt == max_retries - 1:
                 return create_fallback_response(content, error=str(e))
-            continue
+            retry_policy.sleep(attempt, e)
             
         except ValueError as e:
             if attempt == max_retries - 1:
                 return create_fallback_response(content, error=str(e))
-            continue
+            retry_policy.sleep(attempt, e)
             
         except Exception as e:
+            if disable_structured_output(openai_client, e, bool(structured)):
+                # The backend's fault, not the model's: resend at once without using up an attempt
+                continue
+            if not retry_policy.should_retry(e):
+                return create_fallback_response(content, error=str(e))
+            breaker.record_failure()
             if attempt == max_retries - 1:
                 return create_fallback_response(content, error=str(e))
-            continue
-    
-    # Should never reach here, but just in case
+            retry_policy.sleep(attempt, e)
+        attempt += 1
+
+    # Only reached with max_retries < 1
     return create_fallback_response(content, error="Max retries exceeded")
 
 
@@ -255,6 +265,7 @@ def create_fallback_response(content, error=None):
     Returns:
         dict: Fallback classification (defaults to PG-13 for safety)
     """
+    telemetry.record_fallback(error)
     return {
         "rating": "PG-13",
         "reasons": [
@@ -296,6 +307,7 @@ def main():
         }
         
     except Exception as e:
+        print(f"✗ {type(e).__name__}: {e}", file=sys.stderr)
         return None
 
 
@@ -0,0 +1,291 @@
+"""
+Pipelined Audio Classifier
+Transcribes and classifies many audio files with overlapping stages: a pool
+of STT workers feeds a pool of classification workers through a bounded
+queue. Both network-bound stages stay busy at the same time, so throughput
+approaches the rate of the slower stage instead of the sum of both.
+
+Usage:
+    python audio_pipeline.py recordings/ --output verdicts.jsonl
+    find uploads -name '*.m4a' | python audio_pipeline.py - --stt-workers 8
+"""
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+from dotenv import load_dotenv
+
+import telemetry
+from audio_converter import classify_content, initialize_clients, transcribe_audio
+from reasoning_cascade import add_cascade_arguments, cascade_from_args
+
+
+AUDIO_EXTENSIONS = (".m4a", ".mp3", ".wav", ".flac", ".ogg", ".webm", ".aac")
+
+_DONE = object()
+
+
+class StageStats:
+    """Thread-safe counters and latency totals for one pipeline stage"""
+
+    def __init__(self, name, input_queue=None):
+        self.name = name
+        self.input_queue = input_queue
+        self.completed = 0
+        self.errors = 0
+        self.busy = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self.busy += 1
+        return time.perf_counter()
+
+    def finish(self, started, error=False):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.busy -= 1
+            self.completed += 1
+            self.errors += int(error)
+            self.total_latency += elapsed
+            self.max_latency = max(self.max_latency, elapsed)
+        return elapsed
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "completed": self.completed,
+                "errors": self.errors,
+                "in_flight": self.busy,
+                "queue_depth": self.input_queue.qsize() if self.input_queue is not None else 0,
+                "avg_latency_s": self.total_latency / self.completed if self.completed else 0.0,
+                "max_latency_s": self.max_latency,
+            }
+
+
+class AudioPipeline:
+    """
+    Two-stage transcribe → classify pipeline backed by worker threads.
+
+    Args:
+        hathora_client: Initialized Hathora client
+        openai_client: Initialized OpenAI client
+        stt_workers: Concurrent STT uploads
+        classify_workers: Concurrent classification requests
+        queue_size: Capacity of each inter-stage queue (backpressure bound)
+        stt_model: Hathora transcription model
+        transcribe: Transcription function (hathora_client, path, model) -> str
+        classify: Classification function (openai_client, text, **kwargs) -> dict
+        classify_kwargs: Extra keyword arguments for ``classify`` (e.g. cache)
+    """
+
+    def __init__(self, hathora_client, openai_client, stt_workers=4, classify_workers=8,
+                 queue_size=16, stt_model="parakeet", transcribe=transcribe_audio,
+                 classify=classify_content, classify_kwargs=None):
+        self.hathora_client = hathora_client
+        self.openai_client = openai_client
+        self.stt_workers = stt_workers
+        self.classify_workers = classify_workers
+        self.stt_model = stt_model
+        self.transcribe = transcribe
+        self.classify = classify
+        self.classify_kwargs = classify_kwargs or {}
+
+        self.audio_queue = queue.Queue(maxsize=queue_size)
+        self.transcript_queue = queue.Queue(maxsize=queue_size)
+        self.result_queue = queue.Queue()
+        self.stt_stats = StageStats("stt", self.audio_queue)
+        self.classify_stats = StageStats("classify", self.transcript_queue)
+
+    def stats(self):
+        """Per-stage queue depth, in-flight count and latency"""
+        return {"stt": self.stt_stats.snapshot(), "classify": self.classify_stats.snapshot()}
+
+    def _feed(self, audio_paths):
+        try:
+            for path in audio_paths:
+                self.audio_queue.put(path)
+        finally:
+            for _ in range(self.stt_workers):
+                self.audio_queue.put(_DONE)
+
+    def _stt_worker(self):
+        while True:
+            path = self.audio_queue.get()
+            if path is _DONE:
+                return
+            started = self.stt_stats.start()
+            try:
+                text = self.transcribe(self.hathora_client, path, self.stt_model)
+            except Exception as e:
+                elapsed = self.stt_stats.finish(started, error=True)
+                self.result_queue.put({
+                    "path": path,
+                    "error": f"Transcription failed: {type(e).__name__}: {e}",
+                    "timings": {"stt_s": elapsed},
+                })
+                continue
+            elapsed = self.stt_stats.finish(started)
+            self.transcript_queue.put((path, text, elapsed))
+
+    def _classify_worker(self):
+        while True:
+            item = self.transcript_queue.get()
+            if item is _DONE:
+                self.result_queue.put(_DONE)
+                return
+            path, text, stt_elapsed = item
+            started = self.classify_stats.start()
+            try:
+                classification = self.classify(self.openai_client, text, **self.classify_kwargs)
+                error = None
+            except Exception as e:
+                classification = None
+                error = f"Classification failed: {type(e).__name__}: {e}"
+            elapsed = self.classify_stats.finish(started, error=error is not None)
+            result = {
+                "path": path,
+                "transcription": text,
+                "classification": classification,
+                "timings": {"stt_s": stt_elapsed, "classify_s": elapsed},
+            }
+            if error:
+                result["error"] = error
+            self.result_queue.put(result)
+
+    def run(self, audio_paths):
+        """
+        Process audio files, yielding results in completion order.
+
+        Args:
+            audio_paths: Iterable of audio file paths (consumed lazily)
+
+        Yields:
+            dict: Per-file result with transcription, classification and timings
+        """
+        stt_threads = [threading.Thread(target=self._stt_worker, daemon=True)
+                       for _ in range(self.stt_workers)]
+        classify_threads = [threading.Thread(target=self._classify_worker, daemon=True)
+                            for _ in range(self.classify_workers)]
+
+        def close_classify_stage():
+            for thread in stt_threads:
+                thread.join()
+            for _ in classify_threads:
+                self.transcript_queue.put(_DONE)
+
+        threading.Thread(target=self._feed, args=(audio_paths,), daemon=True).start()
+        for thread in stt_threads + classify_threads:
+            thread.start()
+        threading.Thread(target=close_classify_stage, daemon=True).start()
+
+        remaining = len(classify_threads)
+        while remaining:
+            result = self.result_queue.get()
+            if result is _DONE:
+                remaining -= 1
+                continue
+            yield result
+
+
+def iter_audio_paths(sources):
+    """Expand directories, literal paths and '-' (paths on stdin) lazily"""
+    for source in sources:
+        if source == "-":
+            for line in sys.stdin:
+                line = line.strip()
+                if line:
+                    yield line
+        elif os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                for name in sorted(files):
+                    if name.lower().endswith(AUDIO_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield source
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe and classify audio files in a pipeline.")
+    parser.add_argument("sources", nargs="+", help="Audio files, directories, or '-' to read paths from stdin")
+    parser.add_argument("--output", default="-", help="Output JSONL file (default: stdout)")
+    parser.add_argument("--stt-workers", type=int, default=4)
+    parser.add_argument("--classify-workers", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=16)
+    upload = parser.add_mutually_exclusive_group()
+    upload.add_argument("--segment", action="store_true",
+                        help="Split each file at silences and transcribe the segments concurrently")
+    upload.add_argument("--preprocess", nargs="?", const="opus", default=None, choices=["opus", "flac", "wav"],
+                        help="Upload a 16 kHz mono re-encode instead of the original (default codec: opus)")
+    parser.add_argument("--transcript-cache", nargs="?", const="", default=None, metavar="PATH",
+                        help="Reuse transcripts of acoustically identical audio from a SQLite cache")
+    add_cascade_arguments(parser)
+    parser.add_argument("--stats-interval", type=float, default=10.0, help="Seconds between stage stats")
+    telemetry.add_telemetry_arguments(parser)
+    args = parser.parse_args(argv)
+    telemetry.configure_from_args(args)
+
+    load_dotenv()
+    hathora_client, openai_client = initialize_clients()
+    transcribe = transcribe_audio
+    if args.segment:
+        # Needs NumPy and ffmpeg, so only import when asked for
+        from audio_segmenter import transcribe_audio_segmented
+        transcribe = transcribe_audio_segmented
+    elif args.preprocess:
+        from audio_preprocess import AudioPreprocessor
+        transcribe = AudioPreprocessor(codec=args.preprocess)
+    preprocessor = transcribe if args.preprocess else None
+    transcript_cache = None
+    if args.transcript_cache is not None:
+        from transcript_cache import DEFAULT_DB_PATH, CachingTranscriber, TranscriptCache
+        transcript_cache = TranscriptCache(args.transcript_cache or DEFAULT_DB_PATH)
+        transcribe = CachingTranscriber(transcript_cache, transcribe)
+    cascade = cascade_from_args(args)
+    pipeline = AudioPipeline(
+        hathora_client, openai_client,
+        stt_workers=args.stt_workers,
+        classify_workers=args.classify_workers,
+        queue_size=args.queue_size,
+        transcribe=transcribe,
+        classify=cascade or classify_content,
+    )
+
+    out = sys.stdout if args.output == "-" else open(args.output, "a")
+    started = time.monotonic()
+    last_stats = started
+    count = 0
+    try:
+        for result in pipeline.run(iter_audio_paths(args.sources)):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            count += 1
+            if time.monotonic() - last_stats >= args.stats_interval:
+                print(json.dumps(pipeline.stats()), file=sys.stderr)
+                last_stats = time.monotonic()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.monotonic() - started
+    summary = {"files": count, "elapsed_s": elapsed, **pipeline.stats()}
+    if preprocessor is not None:
+        summary["preprocess"] = preprocessor.stats.summary()
+    if cascade is not None:
+        summary["cascade"] = cascade.summary()
+    if transcript_cache is not None:
+        summary["transcript_cache"] = transcript_cache.summary()
+        transcript_cache.close()
+    print(json.dumps(summary), file=sys.stderr)
+    telemetry.finish_from_args(args)
+
+
+if __name__ == "__main__":
+    main()
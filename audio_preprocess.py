@@ -0,0 +1,264 @@
+"""
+Audio Pre-processing
+Downmixes and resamples recordings to 16 kHz mono before they are uploaded
+for speech-to-text. Parakeet-style STT only uses 16 kHz mono, so stereo
+44.1/48 kHz uploads spend most of their bytes (and upload time) on signal the
+model throws away.
+
+Decoding, downmixing and resampling run in a streaming ffmpeg process; the
+output is read in fixed-size chunks, so neither the original nor the result
+is ever held in memory as a whole. The result is re-encoded to a compact
+codec (Opus by default) or kept as 16-bit PCM WAV in an in-memory buffer.
+If the processed file would not be smaller than the original, the original
+is uploaded unchanged.
+"""
+
+import io
+import os
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+
+import telemetry
+from audio_converter import transcribe_audio
+
+
+SAMPLE_RATE = 16000
+CHUNK_BYTES = 64 * 1024
+
+# codec -> (ffmpeg output arguments, file suffix). At 24 kb/s speech the
+# Opus encoder's default effort (10) barely changes the size but costs ~2x the
+# encode time of level 3.
+CODECS = {
+    "opus": (["-c:a", "libopus", "-b:a", "24k", "-application", "voip", "-compression_level", "3",
+              "-f", "ogg"], ".ogg"),
+    "flac": (["-c:a", "flac", "-f", "flac"], ".flac"),
+    "wav": (["-f", "s16le", "-c:a", "pcm_s16le"], ".wav"),
+}
+
+
+def _ffmpeg_command(audio_file_path, codec, sample_rate):
+    output_args, _ = CODECS[codec]
+    return ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", audio_file_path,
+            "-vn", "-ac", "1", "-ar", str(sample_rate), *output_args, "-"]
+
+
+def stream_preprocessed(audio_file_path, codec="opus", sample_rate=SAMPLE_RATE, chunk_bytes=CHUNK_BYTES):
+    """
+    Decode, downmix and resample with ffmpeg, yielding encoded output chunks.
+
+    For ``codec="wav"`` the chunks are raw little-endian 16-bit PCM.
+
+    Args:
+        audio_file_path: Path to any ffmpeg-readable audio file
+        codec: One of CODECS
+        sample_rate: Output sample rate in Hz
+        chunk_bytes: Size of each read from ffmpeg
+
+    Yields:
+        bytes: Output chunks in order
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec: {codec}. Must be one of {list(CODECS)}")
+    if not os.path.exists(audio_file_path):
+        raise FileNotFoundError(audio_file_path)
+    process = subprocess.Popen(
+        _ffmpeg_command(audio_file_path, codec, sample_rate),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    try:
+        while True:
+            chunk = process.stdout.read(chunk_bytes)
+            if not chunk:
+                break
+            yield chunk
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to pre-process {audio_file_path}: {stderr.decode(errors='replace')}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def _wav_header(data_bytes, sample_rate):
+    """44-byte header of a mono 16-bit PCM WAV file"""
+    return struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + data_bytes, b"WAVE", b"fmt ", 16, 1, 1,
+                       sample_rate, sample_rate * 2, 2, 16, b"data", data_bytes)
+
+
+def _write_preprocessed(f, audio_file_path, codec, sample_rate):
+    """Stream pre-processed audio into a seekable file object; returns bytes written"""
+    start = f.tell()
+    if codec == "wav":
+        # Reserve the header; its sizes are only known once the stream ends
+        f.write(_wav_header(0, sample_rate))
+    for chunk in stream_preprocessed(audio_file_path, codec, sample_rate):
+        f.write(chunk)
+    end = f.tell()
+    if codec == "wav":
+        f.seek(start)
+        f.write(_wav_header(end - start - 44, sample_rate))
+        f.seek(end)
+    return end - start
+
+
+def preprocess_to_file(audio_file_path, output_path, codec="opus", sample_rate=SAMPLE_RATE):
+    """
+    Write the pre-processed audio to ``output_path``.
+
+    Returns:
+        int: Bytes written
+    """
+    with open(output_path, "wb") as f:
+        return _write_preprocessed(f, audio_file_path, codec, sample_rate)
+
+
+def preprocess_to_buffer(audio_file_path, codec="wav", sample_rate=SAMPLE_RATE):
+    """
+    Pre-process into an in-memory file object (for clients that accept file objects).
+
+    The default ``wav`` codec yields 16 kHz mono PCM with a valid WAV header.
+
+    Returns:
+        io.BytesIO: Positioned at the start, with ``name`` set to a matching suffix
+    """
+    buffer = io.BytesIO()
+    _write_preprocessed(buffer, audio_file_path, codec, sample_rate)
+    buffer.name = "audio" + CODECS[codec][1]
+    buffer.seek(0)
+    return buffer
+
+
+class PreprocessStats:
+    """Thread-safe totals of upload bytes and time with and without pre-processing"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.files = 0
+        self.skipped = 0
+        self.failed = 0
+        self.original_bytes = 0
+        self.upload_bytes = 0
+        self.preprocess_s = 0.0
+        self.stt_s = 0.0
+
+    def record(self, original_bytes, upload_bytes, preprocess_s, stt_s, skipped=False, failed=False):
+        with self._lock:
+            self.files += 1
+            self.skipped += skipped
+            self.failed += failed
+            self.original_bytes += original_bytes
+            self.upload_bytes += upload_bytes
+            self.preprocess_s += preprocess_s
+            self.stt_s += stt_s
+
+    def summary(self):
+        """
+        Bytes saved, and the upload time saved estimated from observed STT throughput.
+
+        ``time_saved_s`` is net of the local pre-processing time.
+        """
+        with self._lock:
+            saved = self.original_bytes - self.upload_bytes
+            seconds_per_byte = self.stt_s / self.upload_bytes if self.upload_bytes else 0.0
+            time_saved = saved * seconds_per_byte - self.preprocess_s
+            return {
+                "files": self.files,
+                "skipped": self.skipped,
+                "failed": self.failed,
+                "original_mb": round(self.original_bytes / 1e6, 3),
+                "upload_mb": round(self.upload_bytes / 1e6, 3),
+                "bytes_saved": saved,
+                "saved_pct": round(100.0 * saved / self.original_bytes, 1) if self.original_bytes else 0.0,
+                "preprocess_s": round(self.preprocess_s, 3),
+                "stt_s": round(self.stt_s, 3),
+                "time_saved_s": round(time_saved, 3),
+            }
+
+
+class AudioPreprocessor:
+    """
+    Transcription function that uploads a 16 kHz mono re-encode of each file.
+
+    Has the ``transcribe_audio`` signature, so it drops into AudioPipeline
+    (``transcribe=``) and anywhere else a transcription function is accepted.
+    Files that cannot be pre-processed (no ffmpeg, unreadable container) are
+    uploaded as they are.
+
+    Args:
+        codec: Upload codec, one of CODECS
+        sample_rate: Output sample rate in Hz
+        transcribe: Underlying transcription function (hathora_client, path, model) -> str
+    """
+
+    def __init__(self, codec="opus", sample_rate=SAMPLE_RATE, transcribe=transcribe_audio):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec: {codec}. Must be one of {list(CODECS)}")
+        self.codec = codec
+        self.sample_rate = sample_rate
+        self.transcribe = transcribe
+        self.stats = PreprocessStats()
+        self._warned = False
+
+    def __call__(self, hathora_client, audio_file_path, model="parakeet"):
+        original_bytes = os.path.getsize(audio_file_path)
+        fd, output_path = tempfile.mkstemp(prefix="stt-", suffix=CODECS[self.codec][1])
+        os.close(fd)
+        try:
+            started = time.perf_counter()
+            try:
+                with telemetry.span("preprocess", codec=self.codec) as span:
+                    upload_bytes = preprocess_to_file(audio_file_path, output_path, self.codec, self.sample_rate)
+                    span.set(original_bytes=original_bytes, upload_bytes=upload_bytes)
+                failed = False
+            except (OSError, RuntimeError) as e:
+                if not self._warned:
+                    print(f"⚠ Pre-processing failed, uploading originals ({type(e).__name__}: {e})")
+                    self._warned = True
+                failed = True
+            preprocess_s = time.perf_counter() - started
+
+            skipped = failed or upload_bytes >= original_bytes
+            upload_path = audio_file_path if skipped else output_path
+            if skipped:
+                upload_bytes = original_bytes
+
+            started = time.perf_counter()
+            text = self.transcribe(hathora_client, upload_path, model)
+            stt_s = time.perf_counter() - started
+        finally:
+            os.unlink(output_path)
+
+        self.stats.record(original_bytes, upload_bytes, preprocess_s, stt_s, skipped=skipped, failed=failed)
+        telemetry.count("upload_bytes", upload_bytes, stage="stt")
+        telemetry.count("upload_bytes_saved", original_bytes - upload_bytes, stage="stt")
+        return text
+
+
+# Example usage
+if __name__ == "__main__":
+    import json
+    import sys
+
+    audio_file = sys.argv[1] if len(sys.argv) > 1 else "Recording.mp3"
+    codec = sys.argv[2] if len(sys.argv) > 2 else "opus"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output = os.path.join(tmp_dir, "out" + CODECS[codec][1])
+        started = time.perf_counter()
+        size = preprocess_to_file(audio_file, output, codec)
+        elapsed = time.perf_counter() - started
+    original = os.path.getsize(audio_file)
+    print(json.dumps({
+        "file": audio_file,
+        "codec": codec,
+        "original_bytes": original,
+        "upload_bytes": size,
+        "saved_pct": round(100.0 * (original - size) / original, 1),
+        "preprocess_s": round(elapsed, 3),
+    }, indent=2))
@@ -0,0 +1,201 @@
+"""
+Silence-Based Audio Segmenter
+Decodes an audio file locally, splits it at silences using frame-energy VAD
+and transcribes the segments concurrently with Hathora. Segment transcripts
+are stitched back in order with their timestamps, so long recordings no
+longer ride on a single STT upload and downstream classification can point
+at where in the audio a problem occurs.
+
+Decoding uses the ffmpeg binary, which handles every container the app
+accepts (M4A, MP3, WAV, WebM, ...).
+"""
+
+import io
+import os
+import subprocess
+import tempfile
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import telemetry
+
+
+SAMPLE_RATE = 16000
+
+
+def decode_audio(audio_file_path, sample_rate=SAMPLE_RATE):
+    """
+    Decode any ffmpeg-readable file to mono 16-bit PCM.
+
+    Args:
+        audio_file_path: Path to the audio file
+        sample_rate: Output sample rate in Hz
+
+    Returns:
+        np.ndarray: int16 samples
+    """
+    if not os.path.exists(audio_file_path):
+        raise FileNotFoundError(audio_file_path)
+    process = subprocess.run(
+        ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", audio_file_path,
+         "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(sample_rate), "-"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=False,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to decode {audio_file_path}: {process.stderr.decode(errors='replace')}")
+    return np.frombuffer(process.stdout, dtype=np.int16)
+
+
+def frame_energy_db(samples, sample_rate=SAMPLE_RATE, frame_ms=30):
+    """RMS energy per frame in dBFS"""
+    frame_len = int(sample_rate * frame_ms / 1000)
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return np.zeros(0)
+    frames = samples[:n_frames * frame_len].astype(np.float32).reshape(n_frames, frame_len) / 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20.0 * np.log10(np.maximum(rms, 1e-10))
+
+
+def detect_segments(samples, sample_rate=SAMPLE_RATE, frame_ms=30, min_silence_ms=300,
+                    min_segment_s=5.0, max_segment_s=30.0, threshold_db=None):
+    """
+    Choose segment boundaries at silences.
+
+    Frames quieter than the threshold are silence; the default threshold sits
+    halfway between the noise floor (2nd percentile) and the speech level
+    (90th percentile), floored at -50 dBFS, so it adapts to each recording.
+    Cuts are placed in the middle of silent runs of at least
+    ``min_silence_ms``; if speech runs longer than ``max_segment_s`` without a
+    pause, the quietest frame in the allowed window is used instead.
+
+    Returns:
+        list: (start_sample, end_sample) tuples covering voiced audio
+    """
+    energy = frame_energy_db(samples, sample_rate, frame_ms)
+    frame_len = int(sample_rate * frame_ms / 1000)
+    n_frames = len(energy)
+    if n_frames == 0:
+        return [(0, len(samples))] if len(samples) else []
+
+    if threshold_db is None:
+        floor, speech = np.percentile(energy, [2, 90])
+        threshold_db = max((floor + speech) / 2.0, -50.0)
+    silent = energy < threshold_db
+
+    # Candidate cut points: centres of sufficiently long silent runs
+    min_run = max(1, int(min_silence_ms / frame_ms))
+    padded = np.concatenate(([False], silent, [False]))
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    run_starts, run_ends = edges[::2], edges[1::2]
+    long_runs = (run_ends - run_starts) >= min_run
+    cuts = ((run_starts[long_runs] + run_ends[long_runs]) // 2).tolist()
+
+    min_frames = int(min_segment_s * 1000 / frame_ms)
+    max_frames = int(max_segment_s * 1000 / frame_ms)
+    boundaries = [0]
+    start = 0
+    cut_index = 0
+    while n_frames - start > max_frames:
+        best = None
+        while cut_index < len(cuts) and cuts[cut_index] - start <= max_frames:
+            if cuts[cut_index] - start >= min_frames:
+                best = cuts[cut_index]
+            cut_index += 1
+        if best is None:
+            window = energy[start + min_frames:start + max_frames]
+            best = start + min_frames + int(np.argmin(window))
+        boundaries.append(best)
+        start = best
+    boundaries.append(n_frames)
+
+    segments = []
+    for begin, end in zip(boundaries, boundaries[1:]):
+        if not silent[begin:end].all():
+            end_sample = len(samples) if end == n_frames else end * frame_len
+            segments.append((begin * frame_len, end_sample))
+    return segments
+
+
+def encode_wav(samples, sample_rate=SAMPLE_RATE):
+    """Encode int16 samples as an in-memory WAV file"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def transcribe_segmented(hathora_client, audio_file_path, model="parakeet", max_workers=4,
+                         **segment_kwargs):
+    """
+    Transcribe an audio file as concurrently uploaded silence-delimited segments.
+
+    Args:
+        hathora_client: Initialized Hathora client
+        audio_file_path: Path to audio file
+        model: Model name for transcription (default: "parakeet")
+        max_workers: Concurrent segment uploads
+        **segment_kwargs: Passed to detect_segments
+
+    Returns:
+        dict: ``text`` (stitched transcript) and ``segments`` with
+        ``start``/``end`` in seconds and per-segment ``text``
+    """
+    with telemetry.span("decode"):
+        samples = decode_audio(audio_file_path)
+    with telemetry.span("segment") as span:
+        segments = detect_segments(samples, **segment_kwargs)
+        span.set(segments=len(segments), audio_s=round(len(samples) / SAMPLE_RATE, 3))
+
+    with tempfile.TemporaryDirectory(prefix="segments-") as tmp_dir:
+        paths = []
+        with telemetry.span("encode"):
+            for i, (begin, end) in enumerate(segments):
+                path = os.path.join(tmp_dir, f"segment-{i:05d}.wav")
+                with open(path, "wb") as f:
+                    f.write(encode_wav(samples[begin:end]))
+                paths.append(path)
+
+        def transcribe(path):
+            with telemetry.span("stt", model=model, segmented=True):
+                return hathora_client.speech_to_text.convert(model, path).text.strip()
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            texts = list(executor.map(transcribe, paths))
+
+    stitched = []
+    for (begin, end), text in zip(segments, texts):
+        stitched.append({
+            "start": round(begin / SAMPLE_RATE, 3),
+            "end": round(end / SAMPLE_RATE, 3),
+            "text": text,
+        })
+    return {
+        "text": " ".join(segment["text"] for segment in stitched if segment["text"]),
+        "segments": stitched,
+    }
+
+
+def transcribe_audio_segmented(hathora_client, audio_file_path, model="parakeet"):
+    """Drop-in replacement for audio_converter.transcribe_audio returning only text"""
+    return transcribe_segmented(hathora_client, audio_file_path, model)["text"]
+
+
+# Example usage
+if __name__ == "__main__":
+    import json
+    import sys
+    from dotenv import load_dotenv
+    from hathora import Hathora
+
+    load_dotenv()
+    client = Hathora(api_key=os.getenv("HATHORA_API_KEY"), timeout=30)
+    audio_file = sys.argv[1] if len(sys.argv) > 1 else "Recording.mp3"
+    print(json.dumps(transcribe_segmented(client, audio_file), indent=2))
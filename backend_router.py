@@ -0,0 +1,280 @@
+"""
+Backend Router
+Routes chat-completion requests across several OpenAI-compatible endpoints
+serving the same model (e.g. a local Ollama server and OpenRouter). Each
+backend tracks an EWMA of latency and error rate plus outstanding requests;
+traffic goes to the best healthy backend in the highest-priority tier that
+still has capacity, and fails over to the next backend on transport errors.
+
+The router exposes ``router.chat.completions.create(...)`` so it can be
+passed anywhere an OpenAI client is expected; the ``model`` and provider
+specific ``extra_body`` are replaced with each backend's own values. The
+caller's ``reasoning`` settings (a cascade's cheap tier) are kept: merged into
+the backend's ``extra_body``, or sent as ``reasoning_effort`` to backends
+without one (Ollama).
+"""
+
+import os
+import threading
+import time
+import types
+
+from openai import AsyncOpenAI, OpenAI
+
+from retry_policy import classify_error, get_breaker
+
+
+class Backend:
+    """
+    One OpenAI-compatible endpoint.
+
+    Args:
+        name: Label used in stats
+        base_url: API base URL
+        api_key: API key (Ollama ignores it but the client requires one)
+        model: Model id on this backend
+        priority: Lower tiers are filled first; higher tiers take spill-over
+        weight: Relative capacity within a tier
+        max_outstanding: Concurrent requests before spilling to the next tier
+        extra_body: Provider-specific request fields for this backend
+    """
+
+    def __init__(self, name, base_url, api_key, model, priority=0, weight=1.0,
+                 max_outstanding=None, extra_body=None):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.priority = priority
+        self.weight = weight
+        self.max_outstanding = max_outstanding
+        self.extra_body = extra_body
+        self.breaker = get_breaker(base_url)
+
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.ewma_latency = None
+        self.ewma_error_rate = 0.0
+        self.last_failure_at = 0.0
+        self._client = None
+        self._async_client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            # No SDK retries: the router fails over and callers retry, both within their own time budgets
+            self._client = OpenAI(base_url=self.base_url, api_key=self.api_key, max_retries=0)
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(base_url=self.base_url, api_key=self.api_key, max_retries=0)
+        return self._async_client
+
+    def has_capacity(self):
+        return self.max_outstanding is None or self.outstanding < self.max_outstanding
+
+    def snapshot(self):
+        return {
+            "priority": self.priority,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "ewma_latency_s": self.ewma_latency,
+            "ewma_error_rate": self.ewma_error_rate,
+            "breaker": self.breaker.state,
+        }
+
+
+class BackendRouter:
+    """
+    Latency- and load-aware router with automatic failover.
+
+    Within a tier the backend with the lowest expected wait wins: EWMA latency
+    × (outstanding + 1) / weight, i.e. least-outstanding-requests weighted by
+    how fast and how large each backend is. Backends whose breaker is open or
+    whose EWMA error rate exceeds ``max_error_rate`` are skipped.
+
+    Args:
+        backends: List of Backend
+        asynchronous: Expose an async ``create`` (for AsyncOpenAI call sites)
+        alpha: EWMA smoothing factor
+        max_error_rate: EWMA error rate above which a backend is avoided
+        probe_interval: Seconds after its last failure before an avoided
+            backend is tried again (a success then pulls its error rate down)
+    """
+
+    def __init__(self, backends, asynchronous=False, alpha=0.2, max_error_rate=0.5,
+                 probe_interval=30.0):
+        if not backends:
+            raise ValueError("BackendRouter needs at least one backend")
+        self.backends = list(backends)
+        self.asynchronous = asynchronous
+        self.alpha = alpha
+        self.max_error_rate = max_error_rate
+        self.probe_interval = probe_interval
+        self.base_url = "router:" + ",".join(b.name for b in self.backends)
+        self._lock = threading.Lock()
+        create = self._create_async if asynchronous else self._create
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=create))
+
+    def _healthy(self, backend):
+        if backend.breaker.state == "open":
+            return False
+        return (backend.ewma_error_rate <= self.max_error_rate
+                or time.monotonic() - backend.last_failure_at >= self.probe_interval)
+
+    def _cost(self, backend):
+        # Unmeasured backends look fast so they get probed early
+        latency = backend.ewma_latency if backend.ewma_latency is not None else 0.0
+        return (latency + 1e-3) * (backend.outstanding + 1) / backend.weight
+
+    def choose(self, exclude=()):
+        """
+        Pick and reserve a backend.
+
+        Tries, in order: healthy backends with spare capacity; any healthy
+        backend; any backend whose breaker admits a probe. Each group is walked
+        tier by tier in priority order, cheapest first within a tier, and the
+        first backend whose breaker allows a request wins.
+        """
+        with self._lock:
+            candidates = [b for b in self.backends if b not in exclude]
+            healthy = [b for b in candidates if self._healthy(b)]
+            with_capacity = [b for b in healthy if b.has_capacity()]
+            asked = set()
+            for pool in (with_capacity, healthy, candidates):
+                for backend in sorted(pool, key=lambda b: (b.priority, self._cost(b))):
+                    if id(backend) in asked:
+                        continue
+                    asked.add(id(backend))
+                    if backend.breaker.allow():
+                        backend.outstanding += 1
+                        return backend
+            return None
+
+    def _finish(self, backend, started, error):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            backend.outstanding -= 1
+            backend.requests += 1
+            failed = 1.0 if error else 0.0
+            backend.errors += int(failed)
+            if error:
+                backend.last_failure_at = time.monotonic()
+            backend.ewma_error_rate += self.alpha * (failed - backend.ewma_error_rate)
+            if not error:
+                if backend.ewma_latency is None:
+                    backend.ewma_latency = elapsed
+                else:
+                    backend.ewma_latency += self.alpha * (elapsed - backend.ewma_latency)
+        if error:
+            backend.breaker.record_failure()
+        else:
+            backend.breaker.record_success()
+
+    def _request_kwargs(self, backend, kwargs):
+        kwargs = dict(kwargs)
+        kwargs["model"] = backend.model
+        reasoning = (kwargs.pop("extra_body", None) or {}).get("reasoning")
+        if backend.extra_body is not None:
+            kwargs["extra_body"] = dict(backend.extra_body)
+            if reasoning is not None:
+                kwargs["extra_body"]["reasoning"] = reasoning
+        elif reasoning is not None and (reasoning.get("effort") or reasoning.get("enabled") is False):
+            # gpt-oss cannot turn reasoning off, so "disabled" becomes the lowest effort
+            kwargs["reasoning_effort"] = reasoning.get("effort") or "low"
+        return kwargs
+
+    def _create(self, **kwargs):
+        tried = []
+        last_error = None
+        while True:
+            backend = self.choose(exclude=tried)
+            if backend is None:
+                raise last_error or RuntimeError("No backend available")
+            tried.append(backend)
+            started = time.perf_counter()
+            try:
+                response = backend.client.chat.completions.create(**self._request_kwargs(backend, kwargs))
+            except Exception as e:
+                if classify_error(e) == "client":
+                    self._finish(backend, started, error=False)
+                    raise
+                self._finish(backend, started, error=True)
+                last_error = e
+                continue
+            self._finish(backend, started, error=False)
+            return response
+
+    async def _create_async(self, **kwargs):
+        tried = []
+        last_error = None
+        while True:
+            backend = self.choose(exclude=tried)
+            if backend is None:
+                raise last_error or RuntimeError("No backend available")
+            tried.append(backend)
+            started = time.perf_counter()
+            try:
+                response = await backend.async_client.chat.completions.create(
+                    **self._request_kwargs(backend, kwargs)
+                )
+            except Exception as e:
+                if classify_error(e) == "client":
+                    self._finish(backend, started, error=False)
+                    raise
+                self._finish(backend, started, error=True)
+                last_error = e
+                continue
+            self._finish(backend, started, error=False)
+            return response
+
+    def stats(self):
+        with self._lock:
+            return {backend.name: backend.snapshot() for backend in self.backends}
+
+
+def default_backends():
+    """
+    Local Ollama first, OpenRouter for spill-over, configured from the environment.
+
+    OLLAMA_BASE_URL (default http://localhost:11434/v1) and
+    OLLAMA_MAX_OUTSTANDING (default 4) control the local tier; OpenRouter is
+    added when OPENAI_API_KEY is set.
+    """
+    backends = [
+        Backend(
+            "ollama",
+            os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/v1"),
+            "ollama",
+            "gpt-oss-safeguard:20b",
+            priority=0,
+            max_outstanding=int(os.getenv("OLLAMA_MAX_OUTSTANDING", "4")),
+        )
+    ]
+    if os.getenv("OPENAI_API_KEY"):
+        backends.append(Backend(
+            "openrouter",
+            "https://openrouter.ai/api/v1",
+            os.getenv("OPENAI_API_KEY"),
+            "openai/gpt-oss-safeguard-20b",
+            priority=1,
+            extra_body={"reasoning": {"enabled": True}},
+        ))
+    return backends
+
+
+# Example usage
+if __name__ == "__main__":
+    import json
+    from dotenv import load_dotenv
+    from audio_converter import classify_content
+
+    load_dotenv()
+    router = BackendRouter(default_backends())
+    result = classify_content(router, "Let's go get some pizza after the game.")
+    print(json.dumps(result, indent=2))
+    print(json.dumps(router.stats(), indent=2))
@@ -0,0 +1,399 @@
+"""
+Batch Transcript Classifier
+Streams transcripts from a JSONL or CSV file, classifies them concurrently and
+streams verdicts to an output JSONL file. Memory use is bounded by the
+concurrency window, not the input size, and periodic checkpoints let an
+interrupted run resume where it stopped.
+
+Usage:
+    python batch_classify.py transcripts.jsonl verdicts.jsonl --concurrency 32
+    python batch_classify.py sheet.csv verdicts.jsonl --text-field transcript --id-field handle
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+import telemetry
+from async_classifier import DEFAULT_MAX_CONCURRENCY, classify_content_async, initialize_async_client
+from backend_router import BackendRouter, default_backends
+from chunked_classifier import classify_long_async
+from lexical_filter import LexicalFilter
+from transcript_normalizer import add_normalize_arguments, normalizer_from_args
+from micro_batcher import MicroBatcher
+from retry_policy import retry_metrics
+from verdict_cache import DEFAULT_DB_PATH, VerdictCache
+from verdict_log import DEFAULT_DB_PATH as VERDICT_LOG_PATH, VerdictLog
+from verdict_schema import verdict_metrics
+
+
+CHECKPOINT_SUFFIX = ".checkpoint"
+DISTILLED_MODEL_PATH = ".distilled_model.npz"
+
+
+def count_records(path: str) -> int:
+    """Count newline-terminated records without holding the file in memory"""
+    total = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            total += block.count(b"\n")
+    if path.lower().endswith(".csv"):
+        total -= 1  # header row
+    return max(total, 0)
+
+
+def iter_jsonl(path, text_field, id_field, start_offset=0, start_index=0):
+    """
+    Yield (index, record_id, text, error, end_offset) for each JSONL line.
+
+    ``end_offset`` is the byte position just past the record, which is what a
+    checkpoint needs to seek straight back to the next unprocessed line.
+    """
+    with open(path, "rb") as f:
+        f.seek(start_offset)
+        offset = start_offset
+        index = start_index
+        for line in f:
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                text = record[text_field]
+                if not isinstance(text, str):
+                    raise ValueError(f"'{text_field}' must be a string")
+                yield index, record.get(id_field, index), text, None, offset
+            except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+                yield index, index, None, f"Invalid input record: {e}", offset
+            index += 1
+
+
+def iter_csv(path, text_field, id_field, start_index=0):
+    """
+    Yield (index, record_id, text, error, None) for each CSV row.
+
+    Quoted fields may span lines, so CSV rows are resumed by count rather
+    than by byte offset.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for index, row in enumerate(reader):
+            if index < start_index:
+                continue
+            text = row.get(text_field)
+            if text is None:
+                yield index, index, None, f"Invalid input record: missing '{text_field}' column", None
+                continue
+            yield index, row.get(id_field) or index, text, None, None
+
+
+def load_checkpoint(checkpoint_path, input_path):
+    """Load a checkpoint if it exists and belongs to the same input file"""
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("input") != os.path.abspath(input_path):
+        raise SystemExit(
+            f"Checkpoint {checkpoint_path} was written for {checkpoint.get('input')}, "
+            f"not {os.path.abspath(input_path)}. Remove it or choose another output file."
+        )
+    return checkpoint
+
+
+def write_checkpoint(checkpoint_path, checkpoint):
+    """Atomically replace the checkpoint file"""
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, checkpoint_path)
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    hours, rem = divmod(seconds, 3600)
+    minutes, secs = divmod(rem, 60)
+    return f"{hours:d}:{minutes:02d}:{secs:02d}"
+
+
+class Progress:
+    """Throughput and ETA reporting on stderr"""
+
+    def __init__(self, total, already_done, interval):
+        self.total = total
+        self.start_done = already_done
+        self.interval = interval
+        self.started = time.monotonic()
+        self.last_report = self.started
+
+    def report(self, done, usage, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_report < self.interval:
+            return
+        self.last_report = now
+        elapsed = max(now - self.started, 1e-9)
+        items_per_s = (done - self.start_done) / elapsed
+        tokens_per_s = usage.get("total_tokens", 0) / elapsed
+
+        parts = [f"{done:,} done"]
+        if self.total:
+            parts = [f"{done:,}/{self.total:,} ({done / self.total:.1%})"]
+        parts.append(f"{items_per_s:.1f} items/s")
+        parts.append(f"{tokens_per_s:,.0f} tokens/s")
+        if self.total:
+            remaining = max(self.total - done, 0)
+            parts.append("ETA " + (format_duration(remaining / items_per_s) if items_per_s > 0 else "--:--:--"))
+        line = " | ".join(parts)
+        print(line, file=sys.stderr, flush=True)
+
+
+async def run(args):
+    checkpoint_path = args.output + CHECKPOINT_SUFFIX
+    checkpoint = load_checkpoint(checkpoint_path, args.input)
+    is_csv = args.format == "csv" or (args.format == "auto" and args.input.lower().endswith(".csv"))
+
+    done = 0
+    input_offset = 0
+    output_offset = 0
+    if checkpoint:
+        done = checkpoint["records_done"]
+        input_offset = checkpoint.get("input_offset") or 0
+        output_offset = checkpoint["output_offset"]
+        print(f"↻ Resuming after {done:,} records", file=sys.stderr)
+    elif os.path.exists(args.output) and os.path.getsize(args.output) > 0:
+        raise SystemExit(f"{args.output} already exists and has no checkpoint; refusing to overwrite it.")
+
+    if is_csv:
+        records = iter_csv(args.input, args.text_field, args.id_field, start_index=done)
+    else:
+        records = iter_jsonl(args.input, args.text_field, args.id_field, input_offset, start_index=done)
+
+    total = None if args.no_count else count_records(args.input)
+    progress = Progress(total, done, args.progress_interval)
+    usage = {}
+    cache = VerdictCache(args.cache) if args.cache else None
+    near_duplicates = None
+    if args.near_dup is not None:
+        # Needs NumPy, so only import when asked for
+        from near_duplicate import NearDuplicateIndex
+        cache = near_duplicates = NearDuplicateIndex(threshold=args.near_dup, exact=cache)
+    if args.log_verdicts:
+        cache = VerdictLog(args.log_verdicts, inner=cache)
+    normalizer = normalizer_from_args(args)
+    prefilter = LexicalFilter() if args.prefilter else None
+    distilled = None
+    if args.distilled:
+        # Needs NumPy, so only import when asked for
+        from distilled_classifier import DistilledClassifier
+        from openaioss import MODEL, policy
+
+        prefilter = distilled = DistilledClassifier.load(args.distilled, prefilter=prefilter, policy=policy,
+                                                         model_name=MODEL)
+    if args.router:
+        load_dotenv()
+        client = BackendRouter(default_backends(), asynchronous=True)
+    else:
+        client = initialize_async_client()
+    # With --normalize the pre-filter reads the raw transcript (its word-count and
+    # profanity rules are tuned on raw text) and only the model gets the normalized one
+    model_prefilter = None if normalizer is not None else prefilter
+    batcher = None
+    if args.micro_batch:
+        batcher = MicroBatcher(client, max_items=args.micro_batch, max_wait_ms=args.micro_batch_wait_ms,
+                               max_retries=args.max_retries, cache=cache, usage=usage, prefilter=model_prefilter)
+
+    # Results are written strictly in input order so the checkpoint is a single
+    # watermark. The reorder buffer is capped by ``window`` so a slow item can
+    # only hold back a bounded number of finished ones.
+    window = args.concurrency * 4
+    pending = {}
+    finished = {}
+    next_to_write = done
+    next_to_read = done
+    exhausted = False
+    last_checkpoint = time.monotonic()
+
+    with open(args.output, "ab") as out:
+        out.truncate(output_offset)
+        out.seek(output_offset)
+
+        async def classify(index, record_id, text, error):
+            if error is not None:
+                return {"id": record_id, "line": index, "error": error}
+            if normalizer is not None:
+                verdict = prefilter.classify(text) if prefilter is not None else None
+                if verdict is not None:
+                    return {"id": record_id, "line": index, "classification": verdict}
+                text = normalizer(text) or text
+            if args.chunk_words:
+                verdict = await classify_long_async(
+                    client, text, max_words=args.chunk_words, max_retries=args.max_retries,
+                    cache=cache, usage=usage, prefilter=model_prefilter,
+                )
+            elif batcher is not None:
+                verdict = await batcher.classify(text)
+            else:
+                verdict = await classify_content_async(client, text, args.max_retries, cache, usage, model_prefilter)
+            return {"id": record_id, "line": index, "classification": verdict}
+
+        try:
+            while True:
+                while (not exhausted and len(pending) < args.concurrency
+                       and next_to_read - next_to_write < window):
+                    try:
+                        index, record_id, text, error, end_offset = next(records)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    task = asyncio.create_task(classify(index, record_id, text, error))
+                    pending[task] = (index, end_offset)
+                    next_to_read = index + 1
+
+                if not pending:
+                    break
+
+                completed, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in completed:
+                    index, end_offset = pending.pop(task)
+                    finished[index] = (task.result(), end_offset)
+
+                while next_to_write in finished:
+                    result, end_offset = finished.pop(next_to_write)
+                    out.write(json.dumps(result, ensure_ascii=False).encode("utf-8") + b"\n")
+                    next_to_write += 1
+                    if end_offset is not None:
+                        input_offset = end_offset
+
+                progress.report(next_to_write, usage)
+                if time.monotonic() - last_checkpoint >= args.checkpoint_interval:
+                    out.flush()
+                    os.fsync(out.fileno())
+                    write_checkpoint(checkpoint_path, {
+                        "input": os.path.abspath(args.input),
+                        "records_done": next_to_write,
+                        "input_offset": None if is_csv else input_offset,
+                        "output_offset": out.tell(),
+                    })
+                    last_checkpoint = time.monotonic()
+        finally:
+            for task in pending:
+                task.cancel()
+            out.flush()
+            os.fsync(out.fileno())
+            write_checkpoint(checkpoint_path, {
+                "input": os.path.abspath(args.input),
+                "records_done": next_to_write,
+                "input_offset": None if is_csv else input_offset,
+                "output_offset": out.tell(),
+            })
+            if cache is not None:
+                cache.close()
+
+    progress.report(next_to_write, usage, force=True)
+    print(f"Retries: {json.dumps(retry_metrics())}", file=sys.stderr)
+    print(f"Validation: {json.dumps(verdict_metrics())}", file=sys.stderr)
+    if args.router:
+        print(f"Backends: {json.dumps(client.stats())}", file=sys.stderr)
+    if distilled is not None:
+        stats = distilled.stats
+        print(
+            f"Distilled classifier: {stats['absorbed']:,} absorbed, {stats['lexical']:,} lexical, "
+            f"{stats['forwarded']:,} forwarded ({distilled.short_circuit_rate():.1%} of scanned, "
+            f"{distilled.avg_predict_us():.0f} µs/prediction)",
+            file=sys.stderr,
+        )
+    elif prefilter is not None:
+        stats = prefilter.stats
+        print(
+            f"Lexical pre-filter: {stats['short_circuit_g']:,} G + {stats['short_circuit_r']:,} R "
+            f"short-circuited, {stats['forwarded']:,} forwarded "
+            f"({prefilter.short_circuit_rate():.1%} of scanned)",
+            file=sys.stderr,
+        )
+    if normalizer is not None:
+        stats = normalizer.summary()
+        print(
+            f"Normalization: {stats['tokens_before']:,} → {stats['tokens_after']:,} transcript tokens "
+            f"({stats['token_reduction']:.1%} fewer, {stats['avg_normalize_us']:.0f} µs/transcript)",
+            file=sys.stderr,
+        )
+    if near_duplicates is not None:
+        stats = near_duplicates.summary()
+        print(
+            f"Near-duplicates: {stats['hits']:,} verdicts reused of {stats['hits'] + stats['misses']:,} lookups "
+            f"({stats['hit_rate']:.1%}), {stats['entries']:,} indexed, "
+            f"{stats['avg_lookup_us']:.0f} µs/lookup",
+            file=sys.stderr,
+        )
+    if batcher is not None:
+        stats = batcher.stats
+        print(
+            f"Micro-batching: {stats['batched_items']:,} items in {stats['batches']:,} batch requests, "
+            f"{stats['fallback_items']:,} retried singly, {stats['direct_items']:,} too long to batch "
+            f"({batcher.items_per_request():.1f} verdicts/request)",
+            file=sys.stderr,
+        )
+    if exhausted and not pending:
+        os.remove(checkpoint_path)
+        print(f"✓ Wrote {next_to_write:,} verdicts to {args.output}", file=sys.stderr)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Classify a JSONL or CSV file of transcripts.")
+    parser.add_argument("input", help="Input .jsonl or .csv file")
+    parser.add_argument("output", help="Output .jsonl file (appended to when resuming)")
+    parser.add_argument("--format", choices=["auto", "jsonl", "csv"], default="auto")
+    parser.add_argument("--text-field", default="transcript", help="Field/column holding the transcript")
+    parser.add_argument("--id-field", default="id", help="Field/column copied to the output as 'id'")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--checkpoint-interval", type=float, default=10.0, help="Seconds between checkpoints")
+    parser.add_argument("--progress-interval", type=float, default=5.0, help="Seconds between progress lines")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_DB_PATH, default=None,
+                        help=f"Use a verdict cache (default path: {DEFAULT_DB_PATH})")
+    parser.add_argument("--near-dup", nargs="?", type=float, const=0.8, default=None, metavar="JACCARD",
+                        help="Reuse verdicts of near-duplicate transcripts at this similarity (default 0.8)")
+    parser.add_argument("--prefilter", action="store_true",
+                        help="Answer obviously clean / obviously R transcripts without the model")
+    parser.add_argument("--distilled", nargs="?", const=DISTILLED_MODEL_PATH, default=None, metavar="MODEL",
+                        help="Answer confident transcripts with the distilled classifier (after --prefilter)")
+    parser.add_argument("--log-verdicts", nargs="?", const=VERDICT_LOG_PATH, default=None, metavar="PATH",
+                        help="Log model verdicts with their transcripts for training the distilled classifier")
+    parser.add_argument("--chunk-words", type=int, default=None,
+                        help="Split transcripts longer than this many words and classify the chunks in parallel")
+    parser.add_argument("--micro-batch", type=int, default=None, metavar="N",
+                        help="Pack up to N short transcripts per request (keep --concurrency >= N)")
+    parser.add_argument("--micro-batch-wait-ms", type=float, default=50.0,
+                        help="Longest a transcript waits for its micro-batch to fill")
+    add_normalize_arguments(parser)
+    parser.add_argument("--router", action="store_true",
+                        help="Route across local Ollama and OpenRouter (spill-over and failover)")
+    parser.add_argument("--no-count", action="store_true", help="Skip the initial line count (no ETA)")
+    telemetry.add_telemetry_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.concurrency < 1:
+        raise SystemExit("--concurrency must be at least 1")
+    telemetry.configure_from_args(args)
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("\n⚠ Interrupted. Re-run the same command to resume from the last checkpoint.", file=sys.stderr)
+        sys.exit(130)
+    finally:
+        telemetry.finish_from_args(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Classifier Benchmark
+Drives the classification entry points against the local stub server with a
+realistic mix of transcript lengths and reports latency percentiles,
+throughput, retries and fallbacks as JSON so runs can be compared between
+commits. Runs fully offline; no model, GPU or API key is needed.
+
+Usage:
+    python benchmark.py --scenario all --items 300 --concurrency 16 --output bench.json
+    python benchmark.py --scenario text-async --rate-limit-rate 0.05 --malformed-rate 0.05
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import AsyncOpenAI, OpenAI
+
+import telemetry
+from retry_policy import RetryPolicy, retry_metrics
+from stub_server import StubHathoraClient, add_config_arguments, config_from_args, start_stub_server, write_stub_audio
+from verdict_schema import backend_name, verdict_metrics
+
+
+DEFAULT_MIX = "short=0.7:5-40,medium=0.25:40-300,long=0.05:300-1500"
+
+_WORDS = (
+    "the game was great we should play again tomorrow I think that round was close "
+    "honestly you did really well but the other team kept camping the spawn point "
+    "let's grab some food after this and talk about the strategy for next week"
+).split()
+_SPICY_WORDS = ("damn", "hell", "crap", "fucking", "kill", "shit", "beer")
+
+
+def parse_mix(spec):
+    """Parse ``name=weight:min-max,...`` into (name, weight, min_words, max_words) tuples"""
+    mix = []
+    for part in spec.split(","):
+        name, rest = part.split("=")
+        weight, bounds = rest.split(":")
+        low, high = bounds.split("-")
+        mix.append((name.strip(), float(weight), int(low), int(high)))
+    return mix
+
+
+def generate_transcripts(count, mix, seed=0, spice_rate=0.02):
+    """Synthetic transcripts whose word counts follow ``mix``"""
+    rng = random.Random(seed)
+    weights = [weight for _, weight, _, _ in mix]
+    transcripts = []
+    for _ in range(count):
+        _, _, low, high = rng.choices(mix, weights)[0]
+        words = [rng.choice(_SPICY_WORDS) if rng.random() < spice_rate else rng.choice(_WORDS)
+                 for _ in range(rng.randint(low, high))]
+        transcripts.append(" ".join(words).capitalize() + ".")
+    return transcripts
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _counter_delta(before, after):
+    return {key: value - before.get(key, 0) for key, value in after.items()
+            if isinstance(value, (int, float)) and value != before.get(key, 0)}
+
+
+def _run_threaded(call, items, concurrency):
+    """Run ``call(item)`` on a thread pool; returns [(latency_s, result or exception)]"""
+    def timed(item):
+        started = time.perf_counter()
+        try:
+            result = call(item)
+        except Exception as e:
+            result = e
+        return time.perf_counter() - started, result
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(timed, items))
+
+
+def _run_async(make_call, items, concurrency):
+    """Run ``await call(item)`` with at most ``concurrency`` in flight"""
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+        call = make_call()
+
+        async def timed(item):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    result = await call(item)
+                except Exception as e:
+                    result = e
+                return time.perf_counter() - started, result
+
+        return await asyncio.gather(*(timed(item) for item in items))
+
+    return asyncio.run(main())
+
+
+def scenario_text_sync(base_url, transcripts, args, policy):
+    from audio_converter import classify_content
+
+    client = OpenAI(base_url=base_url + "/v1", api_key="stub", max_retries=0)
+    return client, _run_threaded(
+        lambda text: classify_content(client, text, max_retries=args.max_retries, retry_policy=policy),
+        transcripts, args.concurrency,
+    )
+
+
+def scenario_text_async(base_url, transcripts, args, policy):
+    from async_classifier import classify_content_async
+
+    client = AsyncOpenAI(base_url=base_url + "/v1", api_key="stub", max_retries=0)
+    return client, _run_async(
+        lambda: lambda text: classify_content_async(client, text, args.max_retries, retry_policy=policy),
+        transcripts, args.concurrency,
+    )
+
+
+def scenario_micro_batch(base_url, transcripts, args, policy):
+    from micro_batcher import MicroBatcher
+
+    client = AsyncOpenAI(base_url=base_url + "/v1", api_key="stub", max_retries=0)
+
+    def make_call():
+        # The batcher schedules timers, so it must be built inside the running loop
+        batcher = MicroBatcher(client, max_items=args.micro_batch, max_retries=args.max_retries,
+                               retry_policy=policy)
+        return batcher.classify
+
+    return client, _run_async(make_call, transcripts, args.concurrency)
+
+
+def scenario_streaming(base_url, transcripts, args, policy):
+    from streaming_classifier import classify_content_streaming
+
+    client = OpenAI(base_url=base_url + "/v1", api_key="stub", max_retries=0)
+    return client, _run_threaded(
+        lambda text: classify_content_streaming(client, text, max_retries=args.max_retries, retry_policy=policy),
+        transcripts, args.concurrency,
+    )
+
+
+def scenario_rate_transcript(base_url, transcripts, args, policy):
+    import transcribe
+
+    # rate_transcript talks to the module-level Ollama client
+    transcribe.client = OpenAI(base_url=base_url + "/v1", api_key="stub", max_retries=0)
+    return transcribe.client, _run_threaded(transcribe.rate_transcript, transcripts, args.concurrency)
+
+
+def scenario_audio_pipeline(base_url, transcripts, args, policy):
+    from audio_pipeline import AudioPipeline
+
+    client = OpenAI(base_url=base_url + "/v1", api_key="stub", max_retries=0)
+    with tempfile.TemporaryDirectory(prefix="bench-audio-") as tmp_dir:
+        paths = [write_stub_audio(os.path.join(tmp_dir, f"clip-{i:05d}.wav"), text,
+                                  padding_bytes=32 * len(text.split()))
+                 for i, text in enumerate(transcripts)]
+        pipeline = AudioPipeline(
+            StubHathoraClient(base_url), client,
+            stt_workers=max(1, args.concurrency // 2),
+            classify_workers=args.concurrency,
+            classify_kwargs={"max_retries": args.max_retries, "retry_policy": policy},
+        )
+        outcomes = []
+        for result in pipeline.run(paths):
+            latency = sum(result["timings"].values())
+            outcomes.append((latency, result.get("classification") or RuntimeError(result.get("error"))))
+    return client, outcomes
+
+
+SCENARIOS = {
+    "text-sync": scenario_text_sync,
+    "text-async": scenario_text_async,
+    "micro-batch": scenario_micro_batch,
+    "streaming": scenario_streaming,
+    "rate-transcript": scenario_rate_transcript,
+    "audio-pipeline": scenario_audio_pipeline,
+}
+
+
+def run_scenario(name, transcripts, args, config):
+    """Run one scenario against a fresh stub server and summarize it"""
+    policy = RetryPolicy(base_delay=args.base_delay, max_delay=args.max_delay,
+                         max_retry_after=args.max_retry_after)
+    server = start_stub_server(config)
+    telemetry.reset()
+    retries_before = retry_metrics()
+    started = time.perf_counter()
+    try:
+        client, outcomes = SCENARIOS[name](server.base_url, transcripts, args, policy)
+    finally:
+        elapsed = time.perf_counter() - started
+        server.shutdown()
+        server.server_close()
+
+    latencies = sorted(latency for latency, _ in outcomes)
+    failures = sum(1 for _, result in outcomes if isinstance(result, Exception))
+    fallbacks = sum(1 for _, result in outcomes if isinstance(result, dict) and result.get("error"))
+    retries_after = retry_metrics()
+    backend = backend_name(client)
+    return {
+        "scenario": name,
+        "items": len(outcomes),
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(len(outcomes) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(1000 * percentile(latencies, 50), 1),
+            "p95": round(1000 * percentile(latencies, 95), 1),
+            "p99": round(1000 * percentile(latencies, 99), 1),
+            "mean": round(1000 * sum(latencies) / len(latencies), 1) if latencies else 0.0,
+            "max": round(1000 * latencies[-1], 1) if latencies else 0.0,
+        },
+        "fallbacks": fallbacks,
+        "failures": failures,
+        "server": dict(server.counters),
+        "retries": _counter_delta(retries_before, retries_after),
+        "breaker": retries_after["breakers"].get(backend),
+        "validation": verdict_metrics().get(backend),
+        "stages": telemetry.snapshot()["stages"],
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the classifiers against a local stub server.")
+    parser.add_argument("--scenario", choices=["all"] + list(SCENARIOS), default="all")
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--micro-batch", type=int, default=16, help="Items per request in the micro-batch scenario")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Transcript length mix: name=weight:min-max,...")
+    parser.add_argument("--base-delay", type=float, default=0.5, help="Retry backoff base delay")
+    parser.add_argument("--max-delay", type=float, default=20.0, help="Retry backoff cap")
+    parser.add_argument("--max-retry-after", type=float, default=60.0, help="Longest Retry-After honoured")
+    parser.add_argument("--output", default="-", help="Write the JSON report here (default: stdout)")
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    # openaioss builds its OpenRouter client at import time; it is never used here
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    # Per-stage timings for the report (where the latency goes)
+    telemetry.enable()
+    config = config_from_args(args)
+    mix = parse_mix(args.mix)
+    transcripts = generate_transcripts(args.items, mix, seed=args.seed)
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+
+    results = []
+    # Retry handlers print to stdout; keep it clean for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        for name in names:
+            print(f"→ {name}: {len(transcripts)} transcripts, concurrency {args.concurrency}")
+            results.append(run_scenario(name, transcripts, args, config))
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "stub": config.to_dict(),
+        "mix": args.mix,
+        "words": sum(len(text.split()) for text in transcripts),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"✓ Wrote benchmark report to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Chunked Long-Transcript Classifier
+Splits long transcripts into overlapping windows on sentence boundaries,
+classifies the windows concurrently and reduces them to a single verdict.
+The policy always takes the highest severity across categories, so the
+reduction is a per-category max over scores and a max over ratings.
+"""
+
+import asyncio
+import re
+
+from async_classifier import classify_content_async, initialize_async_client
+from openaioss import create_fallback_response
+from verdict_schema import REQUIRED_SCORE_KEYS, VALID_RATINGS
+
+
+DEFAULT_CHUNK_WORDS = 600
+DEFAULT_OVERLAP_WORDS = 60
+DEFAULT_MAX_CONCURRENCY = 8
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def split_into_chunks(text: str, max_words: int = DEFAULT_CHUNK_WORDS,
+                      overlap_words: int = DEFAULT_OVERLAP_WORDS) -> list:
+    """
+    Split a transcript into windows of roughly ``max_words`` words.
+
+    Windows break on sentence boundaries and repeat the trailing sentences of
+    the previous window (up to ``overlap_words``) so content that straddles a
+    boundary is seen whole by at least one window. When not even the last
+    sentence fits, its last ``overlap_words`` words are carried instead. A
+    single sentence too long for a window (common with unpunctuated STT
+    output) is cut on words, leaving room for the overlap.
+
+    Args:
+        text: The transcript to split
+        max_words: Target window size in words
+        overlap_words: Words of context carried over between windows
+
+    Returns:
+        list: Chunk strings in transcript order
+    """
+    piece_words = max_words - overlap_words if overlap_words < max_words else max_words
+    sentences = []
+    for sentence in _SENTENCE_RE.split(text.strip()):
+        words = sentence.split()
+        for start in range(0, len(words), piece_words):
+            sentences.append(words[start:start + piece_words])
+
+    chunks = []
+    current = []
+    current_words = 0
+    for words in sentences:
+        if current and current_words + len(words) > max_words:
+            chunks.append(" ".join(w for s in current for w in s))
+            # Carry trailing sentences over as overlap
+            carried = []
+            carried_words = 0
+            for previous in reversed(current):
+                if carried_words + len(previous) > overlap_words:
+                    break
+                carried.insert(0, previous)
+                carried_words += len(previous)
+            if not carried and overlap_words > 0:
+                # No whole sentence fits, so carry the trailing words instead
+                carried = [current[-1][-overlap_words:]]
+                carried_words = len(carried[0])
+            current, current_words = carried, carried_words
+        current.append(words)
+        current_words += len(words)
+
+    if current:
+        chunks.append(" ".join(w for s in current for w in s))
+    return chunks
+
+
+def aggregate_verdicts(verdicts: list) -> dict:
+    """
+    Reduce chunk verdicts with the policy's highest-severity rule.
+
+    Args:
+        verdicts: Chunk verdicts in transcript order
+
+    Returns:
+        dict: Verdict with the max rating, per-category max scores and merged
+        reasons. ``"error": True`` is kept if any chunk fell back, so the
+        result is never cached as authoritative.
+    """
+    rating_rank = {rating: i for i, rating in enumerate(VALID_RATINGS)}
+    scores = {key: 0 for key in REQUIRED_SCORE_KEYS}
+    reasons = []
+    rating = VALID_RATINGS[0]
+    failed = 0
+
+    for verdict in verdicts:
+        if verdict.get("error"):
+            failed += 1
+        if rating_rank[verdict["rating"]] > rating_rank[rating]:
+            rating = verdict["rating"]
+        for key in REQUIRED_SCORE_KEYS:
+            scores[key] = max(scores[key], verdict["scores"].get(key, 0))
+        for reason in verdict["reasons"]:
+            if reason not in reasons:
+                reasons.append(reason)
+
+    result = {"rating": rating, "reasons": reasons, "scores": scores, "chunks": len(verdicts)}
+    if failed:
+        result["error"] = True
+        result["failed_chunks"] = failed
+    return result
+
+
+async def classify_long_async(client, content: str, max_words: int = DEFAULT_CHUNK_WORDS,
+                              overlap_words: int = DEFAULT_OVERLAP_WORDS,
+                              max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                              stop_on_r: bool = False, max_retries: int = 3,
+                              **classify_kwargs) -> dict:
+    """
+    Classify a transcript of any length by classifying its chunks in parallel.
+
+    Args:
+        client: Initialized AsyncOpenAI client
+        content: The transcript to classify
+        max_words: Target chunk size in words
+        overlap_words: Words of context carried over between chunks
+        max_concurrency: Maximum chunks classified at once
+        stop_on_r: Cancel outstanding chunks as soon as one is rated R
+        max_retries: Maximum number of retry attempts per chunk
+        **classify_kwargs: Passed through to classify_content_async
+            (cache, usage, prefilter)
+
+    Returns:
+        dict: Aggregated classification result
+    """
+    chunks = split_into_chunks(content, max_words, overlap_words)
+    if len(chunks) <= 1:
+        return await classify_content_async(client, content, max_retries, **classify_kwargs)
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def classify_chunk(chunk):
+        async with semaphore:
+            return await classify_content_async(client, chunk, max_retries, **classify_kwargs)
+
+    tasks = [asyncio.create_task(classify_chunk(chunk)) for chunk in chunks]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            verdict = await next_done
+            if stop_on_r and verdict["rating"] == "R" and not verdict.get("error"):
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    # Keep transcript order for the merged reasons
+    ordered = [task.result() for task in tasks if task.done() and not task.cancelled()]
+    if not ordered:
+        return create_fallback_response(content, error="No chunk could be classified")
+
+    result = aggregate_verdicts(ordered)
+    if len(ordered) < len(chunks):
+        result["stopped_early"] = True
+    result["chunks"] = len(chunks)
+    return result
+
+
+def classify_long_content(content: str, max_words: int = DEFAULT_CHUNK_WORDS,
+                          max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                          stop_on_r: bool = False, **classify_kwargs) -> dict:
+    """
+    Synchronous entry point for classifying a long transcript.
+
+    Args:
+        content: The transcript to classify
+        max_words: Target chunk size in words
+        max_concurrency: Maximum chunks classified at once
+        stop_on_r: Stop as soon as any chunk is rated R
+
+    Returns:
+        dict: Aggregated classification result
+    """
+    async def run():
+        client = initialize_async_client()
+        return await classify_long_async(
+            client, content, max_words=max_words, max_concurrency=max_concurrency,
+            stop_on_r=stop_on_r, **classify_kwargs
+        )
+
+    return asyncio.run(run())
@@ -0,0 +1,510 @@
+"""
+Classification Service
+Long-running HTTP service for text and audio classification. Clients are
+built once at startup and reused, so requests skip interpreter start-up and
+reuse pooled keep-alive connections instead of paying a TLS handshake each.
+Identical transcripts (or identical audio uploads) that are in flight at the
+same time share one model call, and a bounded admission queue answers 503
+with Retry-After instead of letting latency grow without limit on overload.
+
+Endpoints:
+    POST /classify        {"text": "..."}                 -> verdict
+    POST /classify-audio  raw audio body (?filename=x.m4a) -> verdict + transcription
+    GET  /verdicts/<key>                                   -> deferred re-classification (with --deadline)
+    GET  /healthz                                          -> service stats
+    GET  /metrics                                          -> Prometheus text (with telemetry)
+
+Usage:
+    python classify_service.py --port 8765 --cache --prefilter
+    python classify_service.py --deadline 2 --cache   # bounded latency, fallbacks re-classified later
+    python classify_service.py --normalize --prefilter  # strip filler and repetition before classifying
+    curl -s localhost:8765/classify -d '{"text": "we should play again tomorrow"}'
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from dotenv import load_dotenv
+
+import telemetry
+from audio_converter import MODEL, POLICY, classify_content, transcribe_audio
+from deadline_classifier import add_deadline_arguments, deadline_from_args
+from transcript_normalizer import add_normalize_arguments, normalizer_from_args
+from reasoning_cascade import add_cascade_arguments, cascade_from_args
+from verdict_cache import DEFAULT_DB_PATH, cache_key
+
+
+DEFAULT_PORT = 8765
+
+
+class Overloaded(Exception):
+    """Raised when the admission queue is full"""
+
+    def __init__(self, retry_after=1):
+        super().__init__("Service overloaded, retry later")
+        self.retry_after = retry_after
+
+
+class ClassifyService:
+    """
+    Warm clients, single-flight coalescing and admission control.
+
+    At most ``max_concurrency`` classifications run at once and at most
+    ``max_queue`` more wait for a slot (for up to ``queue_timeout`` seconds);
+    anything beyond that is rejected with Overloaded. Requests that coalesce
+    onto an in-flight call do not take a slot.
+
+    Args:
+        openai_client: OpenAI-compatible client (or BackendRouter), reused for every request
+        hathora_client: Hathora client for /classify-audio, or None to disable it
+        cache: Optional VerdictCache
+        prefilter: Optional LexicalFilter answering obvious cases without a model call
+        max_concurrency: Classifications allowed to run at once
+        max_queue: Requests allowed to wait for a slot
+        queue_timeout: Seconds a queued request waits before being rejected
+        max_retries: Retries per classification
+        retry_policy: Optional RetryPolicy
+        stt_model: Hathora speech-to-text model
+        transcribe: Transcription function (hathora_client, path, model) -> str,
+            e.g. an AudioPreprocessor
+        classify: Classification function with the ``classify_content`` signature,
+            e.g. a ReasoningCascade or a DeadlineClassifier
+        normalize: Optional transcript normalizer (text -> text, e.g. a
+            TranscriptNormalizer) applied to what the model sees; the
+            pre-filter still reads the raw transcript
+    """
+
+    def __init__(self, openai_client, hathora_client=None, cache=None, prefilter=None,
+                 max_concurrency=16, max_queue=64, queue_timeout=10.0, max_retries=3,
+                 retry_policy=None, stt_model="parakeet", transcribe=transcribe_audio,
+                 classify=classify_content, normalize=None):
+        self.openai_client = openai_client
+        self.hathora_client = hathora_client
+        self.cache = cache
+        self.prefilter = prefilter
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.retry_policy = retry_policy
+        self.stt_model = stt_model
+        self.transcribe = transcribe
+        self.classify = classify
+        self.normalize = normalize
+        self.started_at = time.time()
+
+        self._slots = threading.Semaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> Future shared by coalesced requests
+        self._admitted = 0   # running + waiting for a slot
+        self.stats = {"requests": 0, "coalesced": 0, "rejected": 0, "prefiltered": 0, "errors": 0}
+
+    def warm_up(self):
+        """Open the model connection before the first request arrives (best effort)"""
+        # A BackendRouter holds one client per backend; warm each of them
+        backends = getattr(self.openai_client, "backends", None)
+        clients = [(b.name, b.client) for b in backends] if backends else [("model", self.openai_client)]
+        for name, client in clients:
+            try:
+                client.models.list()
+                print(f"✓ Warmed up connection to {name}")
+            except Exception as e:
+                print(f"⚠ Warm-up request to {name} failed ({type(e).__name__}); continuing")
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+        telemetry.count(f"service_{name}")
+
+    def _admit(self):
+        with self._lock:
+            if self._admitted >= self.max_concurrency + self.max_queue:
+                self.stats["rejected"] += 1
+                telemetry.count("service_rejected", reason="queue_full")
+                raise Overloaded()
+            self._admitted += 1
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self._admitted -= 1
+                self.stats["rejected"] += 1
+            telemetry.count("service_rejected", reason="queue_timeout")
+            raise Overloaded()
+
+    def _release(self):
+        self._slots.release()
+        with self._lock:
+            self._admitted -= 1
+
+    def _single_flight(self, key, work):
+        """
+        Run ``work()`` once per key; concurrent callers with the same key wait for it.
+
+        Returns:
+            tuple: (result, coalesced)
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            self._count("coalesced")
+            return future.result(), True
+
+        try:
+            self._admit()
+            try:
+                future.set_result(work())
+            finally:
+                self._release()
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+        return future.result(), False
+
+    def _classify(self, text):
+        return self.classify(self.openai_client, text, max_retries=self.max_retries,
+                             cache=self.cache, retry_policy=self.retry_policy)
+
+    def classify_text(self, text: str) -> dict:
+        """
+        Classify a transcript.
+
+        Returns:
+            dict: Verdict plus a ``service`` block (coalesced, source, elapsed_ms)
+        """
+        self._count("requests")
+        started = time.perf_counter()
+        if self.prefilter is not None:
+            # On the raw transcript: the pre-filter's word-count and profanity rules are tuned on it
+            verdict = self.prefilter.classify(text)
+            if verdict is not None:
+                self._count("prefiltered")
+                return {**verdict, "service": _service_info("prefilter", False, started)}
+        if self.normalize is not None:
+            text = self.normalize(text) or text
+
+        verdict, coalesced = self._single_flight(cache_key(text, POLICY, MODEL),
+                                                 lambda: self._classify(text))
+        return {**verdict, "service": _service_info("model", coalesced, started)}
+
+    def classify_audio(self, audio: bytes, filename="audio.m4a") -> dict:
+        """
+        Transcribe and classify an uploaded recording.
+
+        Identical uploads in flight together share one transcription and one
+        classification. The transcript itself is classified without taking a
+        second admission slot.
+
+        Returns:
+            dict: Verdict plus ``transcription`` and a ``service`` block
+        """
+        if self.hathora_client is None:
+            raise RuntimeError("Audio classification is not configured (HATHORA_API_KEY)")
+        self._count("requests")
+        started = time.perf_counter()
+        suffix = os.path.splitext(filename)[1] or ".m4a"
+        key = "audio:" + self.stt_model + ":" + hashlib.sha256(audio).hexdigest()
+
+        def work():
+            with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+                f.write(audio)
+                path = f.name
+            try:
+                transcription = self.transcribe(self.hathora_client, path, self.stt_model)
+            finally:
+                os.unlink(path)
+            if not transcription or not transcription.strip():
+                return {"rating": "G", "reasons": ["No speech detected in audio file"],
+                        "scores": {"violence": 0, "sexual_content": 0, "language": 0,
+                                   "drugs": 0, "self_harm": 0},
+                        "transcription": ""}, "stt"
+            verdict = self.prefilter.classify(transcription) if self.prefilter is not None else None
+            if verdict is not None:
+                self._count("prefiltered")
+                return {**verdict, "transcription": transcription}, "prefilter"
+            content = transcription
+            if self.normalize is not None:
+                content = self.normalize(transcription) or transcription
+            return {**self._classify(content), "transcription": transcription}, "model"
+
+        (result, source), coalesced = self._single_flight(key, work)
+        return {**result, "service": _service_info(source, coalesced, started)}
+
+    def deferred_result(self, key):
+        """State of a deferred re-classification, or None if ``key`` is unknown or deadlines are off"""
+        if not hasattr(self.classify, "result"):
+            return None
+        job = self.classify.result(key)
+        if job is None:
+            return None
+        return {"key": key, "status": job["status"], "attempts": job["attempts"],
+                "verdict": job["result"], "error": job["error"]}
+
+    def health(self) -> dict:
+        with self._lock:
+            snapshot = {
+                **self.stats,
+                "inflight": len(self._inflight),
+                "admitted": self._admitted,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "uptime_s": round(time.time() - self.started_at, 1),
+                "audio": self.hathora_client is not None,
+            }
+        if self.cache is not None:
+            snapshot["cache_hit_rate"] = self.cache.hit_rate()
+        if hasattr(self.prefilter, "avg_predict_us"):
+            snapshot["distilled"] = {**self.prefilter.stats, "absorbed_rate": self.prefilter.short_circuit_rate(),
+                                     "avg_predict_us": round(self.prefilter.avg_predict_us(), 1)}
+        # AudioPreprocessor keeps upload stats, CachingTranscriber wraps a TranscriptCache
+        transcribe = self.transcribe
+        while transcribe is not None:
+            if hasattr(transcribe, "cache"):
+                snapshot["transcript_cache"] = transcribe.cache.summary()
+            elif hasattr(transcribe, "stats"):
+                snapshot["preprocess"] = transcribe.stats.summary()
+            transcribe = getattr(transcribe, "transcribe", None)
+        if hasattr(self.normalize, "summary"):
+            snapshot["normalizer"] = self.normalize.summary()
+        if hasattr(self.classify, "summary"):
+            snapshot["deadline" if hasattr(self.classify, "defer") else "cascade"] = self.classify.summary()
+        stats = getattr(self.openai_client, "stats", None)
+        if callable(stats):
+            snapshot["backends"] = stats()
+        return snapshot
+
+
+def _service_info(source, coalesced, started):
+    return {"source": source, "coalesced": coalesced,
+            "elapsed_ms": round(1000 * (time.perf_counter() - started), 1)}
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive for callers that reuse connections
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self, limit):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > limit:
+            self._send_json(413, {"error": f"Request body larger than {limit} bytes"},
+                            headers={"Connection": "close"})
+            self.close_connection = True
+            return None
+        return self.rfile.read(length)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/healthz":
+            self._send_json(200, self.server.service.health())
+        elif path.startswith("/verdicts/"):
+            result = self.server.service.deferred_result(path[len("/verdicts/"):])
+            if result is None:
+                self._send_json(404, {"error": "No deferred classification with this key"})
+            else:
+                self._send_json(200, result)
+        elif path == "/metrics":
+            body = telemetry.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        service = self.server.service
+        try:
+            if url.path == "/classify":
+                body = self._read_body(self.server.max_text_bytes)
+                if body is None:
+                    return
+                try:
+                    text = json.loads(body or b"{}").get("text")
+                except (ValueError, AttributeError):
+                    text = None
+                if not isinstance(text, str) or not text.strip():
+                    self._send_json(400, {"error": "JSON body with a non-empty 'text' is required"})
+                    return
+                self._send_json(200, service.classify_text(text))
+            elif url.path == "/classify-audio":
+                body = self._read_body(self.server.max_audio_bytes)
+                if body is None:
+                    return
+                if not body:
+                    self._send_json(400, {"error": "Audio body is required"})
+                    return
+                filename = parse_qs(url.query).get("filename", ["audio.m4a"])[0]
+                self._send_json(200, service.classify_audio(body, filename))
+            else:
+                self._send_json(404, {"error": "Not found"})
+        except Overloaded as e:
+            self._send_json(503, {"error": str(e)}, headers={"Retry-After": str(e.retry_after)})
+        except Exception as e:
+            service._count("errors")
+            print(f"✗ {url.path}: {type(e).__name__}: {e}", file=sys.stderr)
+            self._send_json(500, {"error": "Classification failed", "details": str(e)})
+
+
+class ServiceServer(ThreadingHTTPServer):
+    """One thread per connection; admission control lives in ClassifyService"""
+
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, service, max_text_bytes=1 << 20, max_audio_bytes=100 << 20,
+                 verbose=False):
+        super().__init__(address, _ServiceHandler)
+        self.service = service
+        self.max_text_bytes = max_text_bytes
+        self.max_audio_bytes = max_audio_bytes
+        self.verbose = verbose
+
+
+def build_service(args):
+    """Build the warm clients once and wrap them in a ClassifyService"""
+    from openai import OpenAI
+
+    if args.router:
+        from backend_router import BackendRouter, default_backends
+        openai_client = BackendRouter(default_backends())
+    else:
+        # Retries are handled by classify_content; the SDK keeps a keep-alive pool
+        openai_client = OpenAI(
+            base_url=os.getenv("OPENAI_BASE_URL", "https://openrouter.ai/api/v1"),
+            api_key=os.getenv("OPENAI_API_KEY"),
+            max_retries=0,
+        )
+
+    hathora_client = None
+    if os.getenv("HATHORA_API_KEY"):
+        from hathora import Hathora
+        hathora_client = Hathora(api_key=os.getenv("HATHORA_API_KEY"), timeout=30)
+    else:
+        print("⚠ HATHORA_API_KEY not set; /classify-audio is disabled")
+
+    cache = None
+    if args.cache:
+        from verdict_cache import VerdictCache
+        cache = VerdictCache(args.cache)
+    if args.near_dup is not None:
+        from near_duplicate import NearDuplicateIndex
+        cache = NearDuplicateIndex(threshold=args.near_dup, exact=cache)
+    if args.log_verdicts:
+        from verdict_log import DEFAULT_DB_PATH as VERDICT_LOG_PATH, VerdictLog
+        cache = VerdictLog(args.log_verdicts or VERDICT_LOG_PATH, inner=cache)
+    prefilter = None
+    if args.prefilter:
+        from lexical_filter import LexicalFilter
+        prefilter = LexicalFilter()
+    if args.distilled is not None:
+        # Needs NumPy, so only import when asked for
+        from distilled_classifier import DEFAULT_MODEL_PATH, DistilledClassifier
+        prefilter = DistilledClassifier.load(args.distilled or DEFAULT_MODEL_PATH, prefilter=prefilter)
+
+    transcribe = transcribe_audio
+    if args.preprocess:
+        from audio_preprocess import AudioPreprocessor
+        transcribe = AudioPreprocessor(codec=args.preprocess)
+    if args.transcript_cache is not None:
+        from transcript_cache import DEFAULT_DB_PATH as TRANSCRIPT_DB_PATH, CachingTranscriber, TranscriptCache
+        transcribe = CachingTranscriber(TranscriptCache(args.transcript_cache or TRANSCRIPT_DB_PATH), transcribe)
+
+    return ClassifyService(
+        openai_client, hathora_client, cache=cache, prefilter=prefilter,
+        max_concurrency=args.max_concurrency, max_queue=args.max_queue,
+        queue_timeout=args.queue_timeout, max_retries=args.max_retries,
+        transcribe=transcribe, classify=deadline_from_args(args) or cascade_from_args(args) or classify_content,
+        normalize=normalizer_from_args(args),
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve text and audio classification over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-concurrency", type=int, default=16, help="Classifications running at once")
+    parser.add_argument("--max-queue", type=int, default=64, help="Requests waiting for a slot before 503")
+    parser.add_argument("--queue-timeout", type=float, default=10.0, help="Seconds a request may wait for a slot")
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--max-audio-mb", type=float, default=100.0)
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_DB_PATH, default=None,
+                        help="Reuse verdicts from a SQLite cache (default path if no value given)")
+    parser.add_argument("--near-dup", nargs="?", type=float, const=0.8, default=None, metavar="JACCARD",
+                        help="Reuse verdicts of near-duplicate transcripts at this similarity (default 0.8)")
+    parser.add_argument("--prefilter", action="store_true",
+                        help="Answer obvious G / R transcripts with the lexical pre-filter")
+    parser.add_argument("--distilled", nargs="?", const="", default=None, metavar="MODEL",
+                        help="Answer confident transcripts with the distilled classifier (after --prefilter)")
+    parser.add_argument("--log-verdicts", nargs="?", const="", default=None, metavar="PATH",
+                        help="Log model verdicts with their transcripts for training the distilled classifier")
+    parser.add_argument("--router", action="store_true",
+                        help="Route across Ollama and OpenRouter (see backend_router.py)")
+    parser.add_argument("--preprocess", nargs="?", const="opus", default=None, choices=["opus", "flac", "wav"],
+                        help="Upload a 16 kHz mono re-encode of each recording to STT (default codec: opus)")
+    parser.add_argument("--transcript-cache", nargs="?", const="", default=None, metavar="PATH",
+                        help="Reuse transcripts of acoustically identical audio from a SQLite cache")
+    add_cascade_arguments(parser)
+    add_deadline_arguments(parser)
+    add_normalize_arguments(parser)
+    parser.add_argument("--no-warm-up", action="store_true", help="Skip the start-up connection warm-up")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    telemetry.add_telemetry_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.deadline is not None and args.cascade is not None:
+        parser.error("--deadline and --cascade cannot be combined")
+
+    load_dotenv()
+    # /metrics on the service port is only useful with telemetry on
+    telemetry.enable(args.metrics_log)
+    if args.metrics_port is not None:
+        telemetry.serve_metrics(args.metrics_port)
+
+    service = build_service(args)
+    if not args.no_warm_up:
+        service.warm_up()
+    server = ServiceServer((args.host, args.port), service,
+                           max_audio_bytes=int(args.max_audio_mb * (1 << 20)), verbose=args.verbose)
+    print(f"✓ Classification service listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down")
+    finally:
+        server.server_close()
+        if hasattr(service.classify, "close"):
+            service.classify.close()
+        if service.cache is not None:
+            service.cache.close()
+        telemetry.finish_from_args(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+"""
+Deadline-Aware Classifier
+Answers within a fixed latency budget instead of classify_content's
+``max_retries`` x 30 s worst case. Every attempt's timeout is whatever is
+left of the budget. A second (hedged) request goes out when the first is
+slower than recent attempts usually are, and failed attempts are retried
+only while the backoff still fits. At the deadline the caller gets the
+first valid verdict, or the conservative fallback if there is none.
+
+A fallback is not the last word: the transcript is put on a durable
+WorkQueue (a SQLiteWorkQueue file by default) and re-classified there
+without the deadline, by the background workers started here or by any
+``work_queue.py --queue <file> work --follow`` process. Final verdicts land
+in the queue (read them back with ``result(key)``) and the verdict cache,
+and are delivered to ``on_final`` callbacks.
+
+Usage:
+    classify = DeadlineClassifier(deadline_s=2.0, queue=SQLiteWorkQueue(".deferred_queue.sqlite3"))
+    verdict = classify(openai_client, transcript, cache=cache)
+    # verdict["deadline"]["deferred"] is the job key when a fallback was returned
+"""
+
+import collections
+import os
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from openai import OpenAI
+
+import telemetry
+from audio_converter import MODEL, POLICY, classification_request, classify_content, create_fallback_response
+from retry_policy import DEFAULT_RETRY_POLICY, breaker_for, classify_error, get_retry_after
+from verdict_cache import cache_key
+from verdict_schema import disable_structured_output, parse_verdict, record_attempt, structured_output_kwargs
+
+
+DEFAULT_QUEUE_PATH = ".deferred_queue.sqlite3"
+MIN_ATTEMPT_S = 0.1  # attempts with less time than this left are not worth starting
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100.0 * len(ordered)))]
+
+
+class DeadlineClassifier:
+    """
+    Bounded-latency classifier with the ``classify_content`` call signature.
+
+    Drops in wherever a classification function is accepted (ClassifyService
+    ``classify=``, AudioPipeline ``classify=``). ``max_retries`` caps the
+    attempts per call, hedges included.
+
+    Args:
+        deadline_s: Default latency budget per call
+        hedge_after_s: Start a second request when the first has run this long;
+            None hedges at the p95 of recent attempt latencies (``deadline_s / 2``
+            until enough have been seen)
+        queue: WorkQueue for deferred re-classification, or None to only return fallbacks
+        background_workers: Threads re-classifying deferred jobs in this process
+            (0 when separate ``work_queue.py`` workers drain the queue)
+        background_retries: Model attempts per claim for deferred jobs
+        on_final: Called as ``on_final(key, status, verdict)`` when a deferred job
+            is done (``status`` "done") or dead-lettered ("dead", verdict None)
+        poll_s: Seconds between checks of watched deferred jobs
+        reasoning: OpenRouter ``reasoning`` options for every attempt
+        max_inflight: Attempt threads shared by all calls
+    """
+
+    def __init__(self, deadline_s=2.0, hedge_after_s=None, queue=None, background_workers=1,
+                 background_retries=3, on_final=None, poll_s=0.5, reasoning=None, max_inflight=64):
+        self.deadline_s = deadline_s
+        self.hedge_after_s = hedge_after_s
+        self.queue = queue
+        self.background_workers = background_workers
+        self.background_retries = background_retries
+        self.on_final = on_final
+        self.poll_s = poll_s
+        self.reasoning = reasoning
+        self._attempts = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="deadline")
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=500)
+        self._watched = {}  # key -> callbacks
+        self._threads = []
+        self._stopping = threading.Event()
+        self.stats = {
+            "requests": 0,
+            "cache_hits": 0,
+            "answered": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "retried": 0,
+            "fallbacks": 0,
+            "deferred": 0,
+            "deferred_hits": 0,
+            "final": 0,
+            "dead": 0,
+            "elapsed_s": [],
+        }
+
+    # -- the deadline race ------------------------------------------------------
+
+    def hedge_delay(self):
+        """Seconds after which an unanswered first attempt gets a hedge"""
+        if self.hedge_after_s is not None:
+            return self.hedge_after_s
+        with self._lock:
+            latencies = list(self._latencies)
+        if len(latencies) < 20:
+            return self.deadline_s / 2
+        # A hedge must still have time to answer
+        return min(_percentile(latencies, 95), self.deadline_s - MIN_ATTEMPT_S)
+
+    def _attempt(self, openai_client, content, deadline, attempt):
+        remaining = deadline - time.monotonic()
+        if remaining < MIN_ATTEMPT_S:
+            raise TimeoutError("No time left in the deadline for this attempt")
+        breaker = breaker_for(openai_client)
+        if not breaker.allow():
+            raise RuntimeError(f"Circuit breaker open for {breaker.name}")
+        record_attempt(breaker.name, attempt)
+        # The SDK's own retries would run past ``timeout``; the race does the retrying
+        client = openai_client.with_options(max_retries=0) if isinstance(openai_client, OpenAI) else openai_client
+        structured = structured_output_kwargs(openai_client)
+        started = time.monotonic()
+        try:
+            with telemetry.span("model_call", backend=breaker.name):
+                response = client.chat.completions.create(
+                    **classification_request(content, self.reasoning),
+                    timeout=remaining,
+                    **structured
+                )
+        except Exception as e:
+            if disable_structured_output(openai_client, e, bool(structured)):
+                return self._attempt(openai_client, content, deadline, attempt)
+            if classify_error(e) in ("server", "rate_limit"):
+                breaker.record_failure()
+            raise
+        # The backend answered; malformed output is the model's fault, not the transport's
+        breaker.record_success()
+        telemetry.record_tokens(response, breaker.name)
+        verdict = parse_verdict(response.choices[0].message.content, breaker.name)
+        with self._lock:
+            self._latencies.append(time.monotonic() - started)
+        return verdict
+
+    def _race(self, openai_client, content, deadline, max_attempts, retry_policy):
+        """
+        Run attempts until one returns a valid verdict or the deadline passes.
+
+        Returns:
+            tuple: (verdict or None, last error, attempts started, index of the hedge attempt or None,
+            index of the winning attempt or None)
+        """
+        pending = {}
+        launched = 0
+        # None once the hedge has been considered
+        hedge_at = time.monotonic() + min(self.hedge_delay(), max(0.0, deadline - time.monotonic() - MIN_ATTEMPT_S))
+        hedge = None
+        retry_at = None
+        last_error = None
+
+        def launch():
+            nonlocal launched
+            if launched >= max_attempts or deadline - time.monotonic() < MIN_ATTEMPT_S:
+                return None
+            pending[self._attempts.submit(self._attempt, openai_client, content, deadline, launched)] = launched
+            launched += 1
+            return launched - 1
+
+        launch()
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            if retry_at is not None and now >= retry_at:
+                retry_at = None
+                if launch() is not None:
+                    with self._lock:
+                        self.stats["retried"] += 1
+            if hedge_at is not None and now >= hedge_at:
+                hedge_at = None
+                if pending:
+                    hedge = launch()
+                    if hedge is not None:
+                        with self._lock:
+                            self.stats["hedged"] += 1
+                        telemetry.count("deadline_hedges")
+            if not pending and retry_at is None:
+                break
+
+            wake = min(t for t in (deadline, retry_at, hedge_at) if t is not None)
+            done, _ = wait(pending, timeout=max(0.0, wake - time.monotonic()), return_when=FIRST_COMPLETED)
+            for future in done:
+                attempt = pending.pop(future)
+                try:
+                    return future.result(), None, launched, hedge, attempt
+                except Exception as e:
+                    last_error = e
+                if not retry_policy.should_retry(last_error) or retry_at is not None:
+                    continue
+                # Back off as classify_content would, but only if the retry still fits
+                delay = retry_policy.delay(attempt, last_error)
+                retry_after = get_retry_after(last_error)
+                if retry_after is not None and time.monotonic() + retry_after >= deadline:
+                    continue
+                if time.monotonic() + delay + MIN_ATTEMPT_S < deadline:
+                    retry_at = time.monotonic() + delay
+        # Attempts still running were given timeouts within the deadline and finish on their own
+        return None, last_error, launched, hedge, None
+
+    def __call__(self, openai_client, content, max_retries=3, cache=None, retry_policy=None, deadline_s=None):
+        started = time.monotonic()
+        with self._lock:
+            self.stats["requests"] += 1
+        if cache is not None:
+            cached = cache.lookup(content, POLICY, MODEL)
+            if cached is not None:
+                with self._lock:
+                    self.stats["cache_hits"] += 1
+                return cached
+
+        budget = self.deadline_s if deadline_s is None else deadline_s
+        earlier = self.queue.get(cache_key(content, POLICY, MODEL)) if self.queue is not None else None
+        if earlier is not None and earlier["status"] == "done":
+            # Deferred before and finished since (without a cache to find it in)
+            verdict = earlier["result"]
+            info = {"budget_s": budget, "attempts": 0, "hedged": False, "source": "deferred"}
+            with self._lock:
+                self.stats["deferred_hits"] += 1
+        else:
+            verdict, error, attempts, hedge, winner = self._race(
+                openai_client, content, started + budget, max(1, max_retries), retry_policy or DEFAULT_RETRY_POLICY)
+            info = {"budget_s": budget, "attempts": attempts, "hedged": hedge is not None}
+            if verdict is not None:
+                with self._lock:
+                    self.stats["answered"] += 1
+                    self.stats["hedge_wins"] += hedge is not None and winner == hedge
+                if cache is not None:
+                    cache.store(content, POLICY, MODEL, verdict)
+            else:
+                reason = "Deadline exceeded" if error is None else f"{type(error).__name__}: {error}"
+                verdict = create_fallback_response(content, error=reason)
+                with self._lock:
+                    self.stats["fallbacks"] += 1
+                if self.queue is not None:
+                    info["deferred"] = self.defer(content, openai_client, cache)
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self.stats["elapsed_s"].append(elapsed)
+            del self.stats["elapsed_s"][:-1000]
+        info["elapsed_ms"] = round(1000 * elapsed, 1)
+        return {**verdict, "deadline": info}
+
+    # -- deferred re-classification ----------------------------------------------
+
+    def defer(self, content, openai_client=None, cache=None, callback=None):
+        """
+        Queue ``content`` for re-classification without a deadline.
+
+        The first deferral starts the background workers with this client and
+        cache. Returns the job key; a key already in the queue is not added twice.
+        """
+        key = cache_key(content, POLICY, MODEL)
+        added = self.queue.put([{"id": key, "text": content}], keys=[key])
+        if not added and (self.queue.get(key) or {}).get("status") == "dead":
+            # Dead-lettered earlier: give it another round instead of re-reporting the old failure
+            added = self.queue.requeue_dead(keys=[key])
+        with self._lock:
+            self.stats["deferred"] += added
+            self._watched.setdefault(key, [])
+            if callback is not None:
+                self._watched[key].append(callback)
+            start = not self._threads
+        telemetry.count("deadline_deferred", added)
+        if start:
+            self._start(openai_client, cache)
+        return key
+
+    def result(self, key):
+        """Deferred job state: ``status``, ``attempts``, ``result`` (the final verdict once done), ``error``"""
+        return self.queue.get(key) if self.queue is not None else None
+
+    def _start(self, openai_client, cache):
+        threads = [threading.Thread(target=self._watch, daemon=True)]
+        if openai_client is not None:
+            threads += [threading.Thread(target=self._reclassify, args=(openai_client, cache, i), daemon=True)
+                        for i in range(self.background_workers)]
+        with self._lock:
+            self._threads = threads
+        for thread in threads:
+            thread.start()
+
+    def _reclassify(self, openai_client, cache, index):
+        # Same claim → classify → ack/nack loop as work_queue.run_worker, with full retries
+        from work_queue import retry_delay
+
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:deadline-{index}"
+        while not self._stopping.is_set():
+            jobs = self.queue.claim(worker_id)
+            if not jobs:
+                self._stopping.wait(self.poll_s)
+                continue
+            job = jobs[0]
+            try:
+                verdict = classify_content(openai_client, job["payload"].get("text") or "",
+                                           self.background_retries, cache)
+            except Exception as e:
+                verdict = {"error": True, "reasons": [f"Error: {type(e).__name__}: {e}"]}
+            if verdict.get("error"):
+                self.queue.nack(job["id"], worker_id, verdict["reasons"][-1], retry_delay(job["attempts"]))
+            else:
+                self.queue.ack(job["id"], worker_id, verdict)
+
+    def _watch(self):
+        while not self._stopping.is_set():
+            with self._lock:
+                keys = list(self._watched)
+            for key in keys:
+                job = self.queue.get(key)
+                if job is None or job["status"] not in ("done", "dead"):
+                    continue
+                with self._lock:
+                    callbacks = self._watched.pop(key, [])
+                    self.stats["final" if job["status"] == "done" else "dead"] += 1
+                telemetry.count("deadline_final", status=job["status"])
+                for callback in ([self.on_final] if self.on_final else []) + callbacks:
+                    try:
+                        callback(key, job["status"], job["result"])
+                    except Exception as e:
+                        print(f"✗ on_final callback for {key[:12]} failed: {type(e).__name__}: {e}")
+            self._stopping.wait(self.poll_s)
+
+    def close(self, wait_s=0.0):
+        """
+        Stop the background threads, first waiting up to ``wait_s`` for watched jobs to finish.
+
+        Jobs left unfinished stay in the queue for the next run or another worker.
+        """
+        stop_at = time.monotonic() + wait_s
+        while time.monotonic() < stop_at:
+            with self._lock:
+                if not self._watched:
+                    break
+            time.sleep(min(self.poll_s, 0.1))
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join()
+        self._attempts.shutdown(wait=False)
+
+    def summary(self):
+        """Answer/hedge/fallback counts, deferred job outcomes and latency percentiles"""
+        with self._lock:
+            stats = dict(self.stats)
+            elapsed = list(stats.pop("elapsed_s"))
+            watching = len(self._watched)
+        classified = stats["requests"] - stats["cache_hits"]
+        return {
+            **stats,
+            "watching": watching,
+            "fallback_rate": stats["fallbacks"] / classified if classified else 0.0,
+            "hedge_delay_s": round(self.hedge_delay(), 3),
+            "p50_ms": round(1000 * _percentile(elapsed, 50), 1) if elapsed else None,
+            "p99_ms": round(1000 * _percentile(elapsed, 99), 1) if elapsed else None,
+            "max_ms": round(1000 * max(elapsed), 1) if elapsed else None,
+        }
+
+
+def add_deadline_arguments(parser):
+    """Add the ``--deadline`` options to an argparse parser"""
+    parser.add_argument("--deadline", type=float, default=None, metavar="SECONDS",
+                        help="Answer every classification within this budget (hedging slow requests); "
+                             "fallbacks are re-classified in the background")
+    parser.add_argument("--hedge-after", type=float, default=None, metavar="SECONDS",
+                        help="Hedge after this long instead of the p95 of recent latencies")
+    parser.add_argument("--deferred-queue", default=DEFAULT_QUEUE_PATH,
+                        help="SQLite work queue for deferred re-classification")
+    parser.add_argument("--deferred-workers", type=int, default=1,
+                        help="In-process re-classification threads (0 to leave it to work_queue.py workers)")
+
+
+def deadline_from_args(args, on_final=None):
+    """DeadlineClassifier configured by ``add_deadline_arguments``, or None without ``--deadline``"""
+    if args.deadline is None:
+        return None
+    from work_queue import SQLiteWorkQueue
+
+    return DeadlineClassifier(deadline_s=args.deadline, hedge_after_s=args.hedge_after,
+                              queue=SQLiteWorkQueue(args.deferred_queue),
+                              background_workers=args.deferred_workers, on_final=on_final)
+
+
+# Example usage
+if __name__ == "__main__":
+    import json
+    from audio_converter import initialize_clients
+    from work_queue import SQLiteWorkQueue
+
+    _, openai_client = initialize_clients()
+    classifier = DeadlineClassifier(deadline_s=2.0, queue=SQLiteWorkQueue(DEFAULT_QUEUE_PATH),
+                                    on_final=lambda key, status, verdict: print(f"Final {status}: {verdict}"))
+    print(json.dumps(classifier(openai_client, "Damn, that was a hell of a match."), indent=2))
+    classifier.close(wait_s=60)
+    print(json.dumps(classifier.summary(), indent=2))
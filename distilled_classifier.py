@@ -0,0 +1,572 @@
+"""
+Distilled Classifier
+A small CPU-only model trained on logged gpt-oss-safeguard verdicts (see
+verdict_log.py) that answers confident transcripts locally and forwards the
+rest to the model.
+
+Transcripts become signed, hashed word n-gram counts; one softmax head per score category (levels 0-3) plus one for the rating share
+them and are trained with mini-batch Adagrad in NumPy. Each head is
+temperature-calibrated on a held-out split, and the confidence threshold is
+the lowest at which held-out verdicts still agree with the model at the
+target rate (judged by a one-sided 95% lower bound, so a handful of lucky
+calibration examples cannot set it). A prediction is only used if its
+calibrated rating confidence reaches that threshold and its scores imply the
+same rating.
+
+The model file records the policy hash and model it was trained against.
+Loading it under a different POLICY or MODEL disables absorption, since its
+labels no longer describe what the model would answer.
+
+The log is split deterministically by transcript hash: 70% train, 15%
+calibration, 15% test, so ``eval`` on the same log reports on transcripts
+the model has never seen.
+
+Usage:
+    python distilled_classifier.py import transcripts.jsonl verdicts.jsonl
+    python distilled_classifier.py train --target-agreement 0.98
+    python distilled_classifier.py eval
+    python distilled_classifier.py classify "see you all next week"
+"""
+
+import argparse
+import json
+import string
+import sys
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from verdict_log import DEFAULT_DB_PATH as DEFAULT_LOG_PATH, VerdictLog, policy_hash
+from verdict_schema import REQUIRED_SCORE_KEYS, VALID_RATINGS
+
+
+DEFAULT_MODEL_PATH = ".distilled_model.npz"
+LEVELS = 4                          # scores 0-3, and four ratings
+HEADS = REQUIRED_SCORE_KEYS + ["rating"]
+_BIGRAM_MULTIPLIER = np.uint64(0x100000001B3)
+_BIGRAM_OFFSET = np.uint64(0x9E3779B97F4A7C15)
+_MIX = np.uint64(0xD6E8FEB86659FD93)
+# Masking characters stay inside words ("f***", "sh1t", "@ss")
+_SEPARATORS = str.maketrans({c: " " for c in string.punctuation + "“”—–…" if c not in "'*#@$"})
+_Z_95 = 1.645  # one-sided 95% normal quantile
+
+
+def split_of(text):
+    """Deterministic split by transcript hash: "train", "calibration" or "test" """
+    bucket = zlib.crc32(text.encode("utf-8")) % 100
+    return "train" if bucket < 70 else "calibration" if bucket < 85 else "test"
+
+
+def label_of(verdict):
+    """Class index per head: score levels clipped to 0-3, then the rating"""
+    scores = verdict.get("scores") or {}
+    levels = [min(LEVELS - 1, max(0, int(round(scores.get(key, 0) or 0)))) for key in REQUIRED_SCORE_KEYS]
+    return levels + [VALID_RATINGS.index(verdict["rating"])]
+
+
+class FeatureHasher:
+    """
+    Signed hashed word n-gram counts, log-scaled, plus a bias feature.
+
+    Rows are deliberately not length-normalized: the policy turns on how
+    often strong words occur, not on their share of the transcript.
+    Bigrams separate phrases such as "kill you" from "kill time" but add
+    many noisy features, so they only pay off with enough logged verdicts;
+    compare both with ``eval``.
+
+    Args:
+        bits: Hash into 2 ** bits features
+        ngrams: 1 for words, 2 for words and word pairs
+    """
+
+    def __init__(self, bits=18, ngrams=1):
+        self.bits = bits
+        self.ngrams = ngrams
+        self.dim = 1 << bits
+        self.bias_index = self.dim  # one extra column, set for every row
+
+    def transform_one(self, text):
+        """
+        Returns:
+            tuple: (indices int64, values float32) of one transcript
+        """
+        words = text.casefold().translate(_SEPARATORS).encode("utf-8").split()
+        hashes = np.fromiter(map(zlib.crc32, words), dtype=np.uint64, count=len(words))
+        if self.ngrams > 1 and len(hashes) > 1:
+            bigrams = hashes[:-1] * _BIGRAM_MULTIPLIER + hashes[1:] + _BIGRAM_OFFSET
+            hashes = np.concatenate([hashes, bigrams])
+        mixed = hashes * _MIX
+        indices = (mixed >> np.uint64(64 - self.bits)).astype(np.int64)
+        signs = np.where((mixed >> np.uint64(20)) & np.uint64(1), 1.0, -1.0)
+        unique, inverse = np.unique(indices, return_inverse=True)
+        values = np.bincount(inverse, weights=signs, minlength=len(unique))
+        values = np.sign(values) * np.log1p(np.abs(values))
+        return (np.append(unique, self.bias_index),
+                np.append(values, 1.0).astype(np.float32))
+
+    def transform(self, texts):
+        """
+        Returns:
+            tuple: CSR-style (indices, values, row offsets) of all transcripts
+        """
+        rows = [self.transform_one(text) for text in texts]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(indices) for indices, _ in rows], out=offsets[1:])
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32), offsets
+        return (np.concatenate([indices for indices, _ in rows]),
+                np.concatenate([values for _, values in rows]), offsets)
+
+
+def _softmax_heads(logits):
+    """Softmax over each head's LEVELS columns of a (rows, heads * LEVELS) array"""
+    grouped = logits.reshape(len(logits), -1, LEVELS)
+    grouped = grouped - grouped.max(axis=2, keepdims=True)
+    np.exp(grouped, out=grouped)
+    grouped /= grouped.sum(axis=2, keepdims=True)
+    return grouped
+
+
+class DistilledModel:
+    """
+    Shared-feature softmax heads for the score categories and the rating.
+
+    Args:
+        bits: Feature hashing dimension is 2 ** bits
+        ngrams: Longest word n-gram hashed (1 or 2)
+    """
+
+    def __init__(self, bits=18, ngrams=1):
+        self.hasher = FeatureHasher(bits, ngrams)
+        self.weights = np.zeros((self.hasher.dim + 1, len(HEADS) * LEVELS), dtype=np.float32)
+        self.temperatures = np.ones(len(HEADS), dtype=np.float32)
+        self.threshold = float("inf")
+        self.meta = {}
+
+    def logits(self, indices, values, offsets):
+        gathered = self.weights[indices] * values[:, None]
+        return np.add.reduceat(gathered, offsets[:-1], axis=0)
+
+    def probabilities(self, indices, values, offsets, calibrated=True):
+        """
+        Returns:
+            np.ndarray: (rows, heads, LEVELS) class probabilities
+        """
+        logits = self.logits(indices, values, offsets).reshape(len(offsets) - 1, len(HEADS), LEVELS)
+        if calibrated:
+            logits = logits / self.temperatures[None, :, None]
+        return _softmax_heads(logits.reshape(len(offsets) - 1, -1))
+
+    def fit(self, texts, labels, epochs=15, batch_size=512, learning_rate=0.5, l2=1e-6, seed=0, log=None):
+        """
+        Train all heads with mini-batch Adagrad on softmax cross-entropy.
+
+        Args:
+            texts: Transcripts
+            labels: (rows, heads) class indices from ``label_of``
+        """
+        indices, values, offsets = self.hasher.transform(texts)
+        labels = np.asarray(labels, dtype=np.int64)
+        rows = len(labels)
+        targets = np.zeros((rows, len(HEADS) * LEVELS), dtype=np.float32)
+        columns = np.arange(len(HEADS)) * LEVELS
+        targets[np.arange(rows)[:, None], columns[None, :] + labels] = 1.0
+        accumulators = np.full(self.weights.shape, 1e-8, dtype=np.float32)
+        rng = np.random.default_rng(seed)
+        lengths = np.diff(offsets)
+
+        for epoch in range(epochs):
+            order = rng.permutation(rows)
+            loss = 0.0
+            for start in range(0, rows, batch_size):
+                batch = order[start:start + batch_size]
+                # Gather the batch's rows out of the CSR arrays
+                batch_lengths = lengths[batch]
+                batch_offsets = np.zeros(len(batch) + 1, dtype=np.int64)
+                np.cumsum(batch_lengths, out=batch_offsets[1:])
+                positions = np.repeat(offsets[batch] - batch_offsets[:-1], batch_lengths) + np.arange(batch_offsets[-1])
+                batch_indices, batch_values = indices[positions], values[positions]
+
+                probabilities = _softmax_heads(self.logits(batch_indices, batch_values, batch_offsets))
+                batch_targets = targets[batch].reshape(len(batch), len(HEADS), LEVELS)
+                loss -= float(np.log(np.maximum((probabilities * batch_targets).sum(axis=2), 1e-12)).sum())
+                errors = (probabilities - batch_targets).reshape(len(batch), -1) / len(batch)
+
+                # Sparse gradient: only the feature rows present in this batch
+                touched, inverse = np.unique(batch_indices, return_inverse=True)
+                per_entry = errors[np.repeat(np.arange(len(batch)), batch_lengths)] * batch_values[:, None]
+                gradient = np.zeros((len(touched), errors.shape[1]), dtype=np.float32)
+                for column in range(errors.shape[1]):
+                    gradient[:, column] = np.bincount(inverse, weights=per_entry[:, column], minlength=len(touched))
+                gradient += l2 * self.weights[touched]
+                accumulators[touched] += gradient * gradient
+                self.weights[touched] -= learning_rate * gradient / np.sqrt(accumulators[touched])
+            if log is not None:
+                log(f"epoch {epoch + 1}/{epochs}: loss {loss / (rows * len(HEADS)):.4f}")
+
+    def calibrate(self, texts, labels, target_agreement=0.98):
+        """
+        Fit a temperature per head on held-out data, then pick the lowest
+        confidence threshold whose absorbed predictions agree with the
+        labels' ratings at ``target_agreement``.
+        """
+        indices, values, offsets = self.hasher.transform(texts)
+        labels = np.asarray(labels, dtype=np.int64)
+        logits = self.logits(indices, values, offsets).reshape(len(labels), len(HEADS), LEVELS)
+        candidates = np.exp(np.linspace(np.log(0.25), np.log(8.0), 41)).astype(np.float32)
+        for head in range(len(HEADS)):
+            best = None
+            for temperature in candidates:
+                probabilities = _softmax_heads(logits[:, head, :] / temperature)[:, 0, :]
+                nll = -np.log(np.maximum(probabilities[np.arange(len(labels)), labels[:, head]], 1e-12)).mean()
+                if best is None or nll < best[0]:
+                    best = (nll, temperature)
+            self.temperatures[head] = best[1]
+
+        predictions = self.predict_arrays(indices, values, offsets)
+        self.threshold = choose_threshold(predictions, labels, target_agreement)
+        return self.threshold
+
+    def predict_arrays(self, indices, values, offsets):
+        """
+        Returns:
+            dict: ``levels`` (rows, heads) argmax classes, ``confidence`` (rows,)
+            calibrated rating probability and ``consistent`` (rows,) whether
+            the predicted scores imply the predicted rating
+        """
+        probabilities = self.probabilities(indices, values, offsets)
+        levels = probabilities.argmax(axis=2)
+        confidence = probabilities[:, -1, :].max(axis=1)
+        consistent = levels[:, :-1].max(axis=1) == levels[:, -1]
+        return {"levels": levels, "confidence": confidence, "consistent": consistent}
+
+    def save(self, path):
+        # np.savez appends .npz to paths without it
+        with open(path, "wb") as f:
+            np.savez_compressed(f, weights=self.weights, temperatures=self.temperatures,
+                                threshold=np.float32(self.threshold), bits=np.int64(self.hasher.bits),
+                                ngrams=np.int64(self.hasher.ngrams),
+                                meta=np.frombuffer(json.dumps(self.meta).encode("utf-8"), dtype=np.uint8))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            model = cls(bits=int(data["bits"]), ngrams=int(data["ngrams"]))
+            model.weights = data["weights"]
+            model.temperatures = data["temperatures"]
+            model.threshold = float(data["threshold"])
+            model.meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+        return model
+
+
+def agreement_lower_bound(agreeing, total, z=_Z_95):
+    """Wilson score lower bound of the agreement rate ``agreeing / total``"""
+    agreeing = np.asarray(agreeing, dtype=np.float64)
+    total = np.asarray(total, dtype=np.float64)
+    rate = agreeing / total
+    centre = rate + z * z / (2 * total)
+    spread = z * np.sqrt(rate * (1 - rate) / total + z * z / (4 * total * total))
+    return (centre - spread) / (1 + z * z / total)
+
+
+def choose_threshold(predictions, labels, target_agreement, min_absorbed=20):
+    """
+    Lowest confidence at which the consistent predictions above it agree at ``target_agreement``.
+
+    Agreement is judged by its lower confidence bound rather than the
+    calibration rate itself, which overstates what held-out data will show.
+
+    Returns:
+        float: Threshold, or inf if no threshold reaches the target (absorb nothing)
+    """
+    eligible = predictions["consistent"]
+    confidence = predictions["confidence"][eligible]
+    agrees = (predictions["levels"][eligible, -1] == labels[eligible, -1])[np.argsort(-confidence)]
+    confidence = np.sort(confidence)[::-1]
+    if len(confidence) == 0:
+        return float("inf")
+    absorbed = np.arange(1, len(agrees) + 1)
+    agreement = agreement_lower_bound(np.cumsum(agrees), absorbed)
+    ok = np.flatnonzero((agreement >= target_agreement) & (absorbed >= min_absorbed))
+    # The largest prefix that still meets the target
+    return float(confidence[ok[-1]]) if len(ok) else float("inf")
+
+
+class DistilledClassifier:
+    """
+    First-tier classifier with the LexicalFilter ``classify`` interface.
+
+    Anything that accepts ``prefilter=`` (the async and micro-batched
+    classifiers, the batch CLI, the service, the work queue) can use it.
+    Confident predictions come back as verdicts marked ``"source":
+    "distilled"`` with their ``confidence``; everything else returns None so
+    the caller forwards it to the model.
+
+    Args:
+        model: Trained DistilledModel
+        threshold: Override the calibrated confidence threshold
+        prefilter: Optional LexicalFilter consulted first
+        policy: Policy the verdicts are for (default: audio_converter.POLICY)
+        model_name: Model the verdicts are for (default: audio_converter.MODEL)
+    """
+
+    def __init__(self, model, threshold=None, prefilter=None, policy=None, model_name=None):
+        if policy is None or model_name is None:
+            from audio_converter import MODEL, POLICY
+
+            policy = POLICY if policy is None else policy
+            model_name = MODEL if model_name is None else model_name
+        self.model = model
+        self.threshold = model.threshold if threshold is None else threshold
+        self.prefilter = prefilter
+        self.stale = stale_reason(model, policy, model_name)
+        if self.stale:
+            # Labels from another policy or model say nothing about this one's answers
+            print(f"⚠ Distilled model disabled: {self.stale}. Retrain it on the current verdict log.",
+                  file=sys.stderr)
+            self.threshold = float("inf")
+        self._lock = threading.Lock()
+        self.stats = {"scanned": 0, "absorbed": 0, "forwarded": 0, "lexical": 0, "predict_s": 0.0}
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL_PATH, **kwargs):
+        return cls(DistilledModel.load(path), **kwargs)
+
+    def predict(self, text):
+        """
+        Returns:
+            dict: Predicted verdict with ``confidence`` and ``consistent``
+        """
+        indices, values = self.model.hasher.transform_one(text)
+        prediction = self.model.predict_arrays(indices, values, np.array([0, len(indices)]))
+        levels = prediction["levels"][0]
+        return {
+            "rating": VALID_RATINGS[levels[-1]],
+            "scores": {key: int(level) for key, level in zip(REQUIRED_SCORE_KEYS, levels[:-1])},
+            "confidence": float(prediction["confidence"][0]),
+            "consistent": bool(prediction["consistent"][0]),
+        }
+
+    def classify(self, text: str):
+        """
+        Return a verdict for transcripts the model is confident about, or None.
+
+        Returns:
+            dict or None: Verdict in the classify_content shape
+        """
+        if self.prefilter is not None:
+            verdict = self.prefilter.classify(text)
+            if verdict is not None:
+                with self._lock:
+                    self.stats["scanned"] += 1
+                    self.stats["lexical"] += 1
+                return verdict
+        started = time.perf_counter()
+        prediction = self.predict(text)
+        absorbed = prediction["consistent"] and prediction["confidence"] >= self.threshold
+        with self._lock:
+            self.stats["scanned"] += 1
+            self.stats["absorbed" if absorbed else "forwarded"] += 1
+            self.stats["predict_s"] += time.perf_counter() - started
+        if not absorbed:
+            return None
+        return {
+            "rating": prediction["rating"],
+            "reasons": [f"Distilled classifier ({prediction['confidence']:.1%} confidence)"],
+            "scores": prediction["scores"],
+            "source": "distilled",
+            "confidence": round(prediction["confidence"], 4),
+        }
+
+    def short_circuit_rate(self) -> float:
+        scanned = self.stats["scanned"]
+        return (self.stats["absorbed"] + self.stats["lexical"]) / scanned if scanned else 0.0
+
+    def avg_predict_us(self) -> float:
+        predicted = self.stats["absorbed"] + self.stats["forwarded"]
+        return 1e6 * self.stats["predict_s"] / predicted if predicted else 0.0
+
+
+def stale_reason(model, policy, model_name):
+    """Why ``model`` was not trained for ``policy`` and ``model_name``, or None if it was"""
+    trained = model.meta.get("policy")
+    if not trained:
+        return "it does not record the policy it was trained for"
+    trained_model, trained_hash = trained
+    if trained_hash != policy_hash(policy):
+        return f"trained for policy {trained_hash}, current policy is {policy_hash(policy)}"
+    if trained_model != model_name:
+        return f"trained on {trained_model} verdicts, current model is {model_name}"
+    return None
+
+
+def load_split(log, split):
+    """(texts, labels) of one split of the latest policy's verdicts, or of all of them for ``"all"``"""
+    texts, labels = [], []
+    for text, verdict in log.iter_examples():
+        if split == "all" or split_of(text) == split:
+            texts.append(text)
+            labels.append(label_of(verdict))
+    return texts, np.asarray(labels, dtype=np.int64).reshape(-1, len(HEADS))
+
+
+def evaluate(model, texts, labels, threshold=None):
+    """
+    Agreement with the model labels, calibration, and how much traffic is absorbed.
+
+    Returns:
+        dict: Report
+    """
+    threshold = model.threshold if threshold is None else threshold
+    indices, values, offsets = model.hasher.transform(texts)
+    started = time.perf_counter()
+    predictions = model.predict_arrays(indices, values, offsets)
+    batch_us = 1e6 * (time.perf_counter() - started) / max(1, len(texts))
+    levels, confidence = predictions["levels"], predictions["confidence"]
+    rating_agrees = levels[:, -1] == labels[:, -1]
+
+    # Expected calibration error of the rating head, 10 equal-width bins
+    bins = np.minimum((confidence * 10).astype(int), 9)
+    ece = sum(abs(confidence[bins == b].mean() - rating_agrees[bins == b].mean()) * np.mean(bins == b)
+              for b in range(10) if np.any(bins == b))
+
+    absorbed = predictions["consistent"] & (confidence >= threshold)
+    under = levels[:, -1] < labels[:, -1]
+    report = {
+        "examples": len(texts),
+        "rating_agreement": float(rating_agrees.mean()),
+        "score_agreement": {key: float((levels[:, i] == labels[:, i]).mean())
+                            for i, key in enumerate(REQUIRED_SCORE_KEYS)},
+        "rating_ece": float(ece),
+        "threshold": threshold if np.isfinite(threshold) else None,
+        "absorbed_fraction": float(absorbed.mean()),
+        "absorbed_agreement": float(rating_agrees[absorbed].mean()) if absorbed.any() else None,
+        # Under-rating is the costly mistake: content shown to a younger audience than it should be
+        "absorbed_underrated": float(under[absorbed].mean()) if absorbed.any() else None,
+        "batch_predict_us": round(batch_us, 1),
+        "coverage_curve": [],
+    }
+    for target in (0.90, 0.95, 0.98, 0.99):
+        curve_threshold = choose_threshold(predictions, labels, target)
+        covered = predictions["consistent"] & (confidence >= curve_threshold)
+        report["coverage_curve"].append({
+            "target_agreement": target,
+            "threshold": round(curve_threshold, 4) if np.isfinite(curve_threshold) else None,
+            "absorbed_fraction": float(covered.mean()),
+        })
+    return report
+
+
+def import_batch_output(log, input_path, output_path, text_field="transcript", id_field="id", policy=None,
+                        model=None):
+    """
+    Log the verdicts of an earlier batch_classify run by joining its input and output on ``id``.
+
+    ``policy`` and ``model`` default to audio_converter's POLICY and MODEL.
+
+    Returns:
+        int: Verdicts logged
+    """
+    if policy is None:
+        from audio_converter import POLICY as policy
+    if model is None:
+        from audio_converter import MODEL as model
+    verdicts = {}
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            result = json.loads(line)
+            if result.get("classification"):
+                verdicts[str(result.get("id"))] = result["classification"]
+    logged = 0
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            verdict = verdicts.get(str(record.get(id_field)))
+            if verdict is not None and log.log(record.get(text_field) or "", policy, model, verdict):
+                logged += 1
+    return logged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train and evaluate the distilled first-tier classifier.")
+    parser.add_argument("--log", default=DEFAULT_LOG_PATH, help="Verdict log (see verdict_log.py)")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="Model file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("import", help="Log verdicts from a batch_classify input/output pair")
+    command.add_argument("input")
+    command.add_argument("output")
+    command.add_argument("--text-field", default="transcript")
+    command.add_argument("--id-field", default="id")
+
+    command = commands.add_parser("train", help="Train and calibrate on the log")
+    command.add_argument("--bits", type=int, default=18, help="Hash 2**bits features")
+    command.add_argument("--ngrams", type=int, choices=[1, 2], default=1, help="2 adds word-pair features")
+    command.add_argument("--epochs", type=int, default=15)
+    command.add_argument("--target-agreement", type=float, default=0.98,
+                         help="Rating agreement required of absorbed calibration examples")
+    command.add_argument("--min-examples", type=int, default=200)
+
+    command = commands.add_parser("eval", help="Report agreement and absorbable traffic on held-out verdicts")
+    command.add_argument("--split", choices=["test", "calibration", "train", "all"], default="test",
+                         help="'all' for a log the model was not trained on")
+    command.add_argument("--threshold", type=float, default=None, help="Override the calibrated threshold")
+
+    command = commands.add_parser("classify", help="Predict one transcript")
+    command.add_argument("text")
+    args = parser.parse_args(argv)
+
+    if args.command == "classify":
+        classifier = DistilledClassifier.load(args.model)
+        prediction = classifier.predict(args.text)
+        prediction["absorbed"] = prediction["consistent"] and prediction["confidence"] >= classifier.threshold
+        print(json.dumps(prediction, indent=2))
+        return
+
+    log = VerdictLog(args.log)
+    try:
+        if args.command == "import":
+            logged = import_batch_output(log, args.input, args.output, args.text_field, args.id_field)
+            print(f"✓ Logged {logged:,} verdicts ({len(log):,} in {args.log})")
+
+        elif args.command == "train":
+            texts, labels = load_split(log, "train")
+            if len(texts) < args.min_examples:
+                raise SystemExit(f"Only {len(texts):,} training examples in {args.log}; need {args.min_examples:,}.")
+            calibration_texts, calibration_labels = load_split(log, "calibration")
+            model = DistilledModel(bits=args.bits, ngrams=args.ngrams)
+            started = time.perf_counter()
+            model.fit(texts, labels, epochs=args.epochs, log=lambda line: print(line, file=sys.stderr))
+            threshold = model.calibrate(calibration_texts, calibration_labels, args.target_agreement)
+            model.meta = {"examples": len(texts), "target_agreement": args.target_agreement,
+                          "trained_at": time.time(), "policy": log.latest_policy()}
+            model.save(args.model)
+            print(f"✓ Trained on {len(texts):,} verdicts in {time.perf_counter() - started:.1f}s; "
+                  f"threshold {threshold:.3f} for {args.target_agreement:.0%} agreement → {args.model}")
+            if threshold == float("inf"):
+                print(f"⚠ No confidence reaches {args.target_agreement:.0%} agreement on "
+                      f"{len(calibration_texts):,} calibration verdicts, so everything will be forwarded. "
+                      f"Log more verdicts or lower --target-agreement.")
+
+        elif args.command == "eval":
+            model = DistilledModel.load(args.model)
+            texts, labels = load_split(log, args.split)
+            if not texts:
+                raise SystemExit(f"No '{args.split}' examples in {args.log}.")
+            report = evaluate(model, texts, labels, args.threshold)
+            print(json.dumps(report, indent=2))
+            target = model.meta.get("target_agreement")
+            if target and report["absorbed_agreement"] is not None and report["absorbed_agreement"] < target:
+                print(f"⚠ Absorbed verdicts agree {report['absorbed_agreement']:.1%} of the time on '{args.split}', "
+                      f"below the {target:.0%} target. Log more verdicts and retrain, or raise --threshold.",
+                      file=sys.stderr)
+    finally:
+        log.close()
+
+
+if __name__ == "__main__":
+    main()
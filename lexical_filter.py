@@ -0,0 +1,331 @@
+"""
+Lexical Pre-Filter
+Deterministic keyword scan that runs before the model. It produces a
+provisional score vector with the same keys as the model output and
+short-circuits transcripts that are clearly G or clearly R (frequent strong
+profanity), so only the ambiguous middle pays for a full gpt-oss-safeguard
+reasoning call.
+
+"Clearly G" is deliberately narrow: a short transcript with no lexicon hit,
+no word starting with one of the CAUTION_ROOTS and no spelled-out letters.
+The lexicon scores what it knows; the caution roots only send anything that
+might be a threat, self-harm, sex or drugs ("kill him", "a few lines of
+blow") to the model, since a missed phrase would otherwise be rated G.
+"""
+
+import re
+
+from verdict_schema import REQUIRED_SCORE_KEYS
+
+
+# category -> {term: score}. A trailing "*" matches any word starting with the
+# term ("fuck*" matches "fucking", "fucker"); multi-word terms match phrases.
+DEFAULT_LEXICON = {
+    "language": {
+        "crap": 1, "crappy": 1, "damn*": 1, "dammit": 1, "hell": 1, "piss*": 1,
+        "ass": 2, "asshole*": 2, "bitch*": 2, "bastard*": 2, "shit*": 2,
+        "bullshit": 2, "dick": 2, "prick": 2, "fuck*": 3, "motherfuck*": 3,
+        "cunt*": 3,
+        # Slurs: never clean, always left to the model
+        "fag": 3, "fags": 3, "faggot*": 3, "nigger*": 3, "nigga*": 3, "kike": 3, "kikes": 3,
+        "spic": 3, "spics": 3, "chink": 3, "chinks": 3, "tranny": 3, "trannies": 3, "retard*": 2,
+    },
+    "violence": {
+        "punch you": 1, "beat you up": 2, "shoot*": 2, "stab*": 2, "murder*": 2,
+        "kill you": 3, "gonna kill": 3, "going to kill": 3, "blow your head off": 3,
+        "rape you": 3, "gonna rape": 3, "going to rape": 3,
+    },
+    "sexual_content": {
+        "kiss*": 1, "make out": 1, "sexy": 1, "sex": 2, "horny": 2, "boob*": 2,
+        "nude*": 2, "naked": 2, "porn*": 3, "blowjob*": 3, "onlyfans": 2,
+        "rape*": 3, "molest*": 3, "sexual assault": 3, "sexually assault*": 3, "grope*": 2,
+    },
+    "drugs": {
+        "beer*": 1, "wine": 1, "drunk": 1, "vodka": 1, "weed": 2, "stoned": 2,
+        "blunt": 2, "high as": 2, "cocaine": 3, "coke": 2, "meth": 3, "heroin": 3,
+        "molly": 2, "lsd": 2, "snort*": 3,
+    },
+    "self_harm": {
+        "suicid*": 2, "kill myself": 2, "cut myself": 2, "self harm": 2,
+        "want to die": 2, "end it all": 2, "overdose": 2, "kill yourself": 2, "kys": 2,
+        "hang yourself": 2, "hang myself": 2, "end my life": 2, "slit my wrists": 3, "slit your wrists": 3,
+    },
+}
+
+# Word roots that rule out the G short-circuit without scoring anything: any
+# word starting with one goes to the model ("kill" covers "kill him", "killing")
+CAUTION_ROOTS = (
+    # violence
+    "kill", "die", "dying", "dead", "death", "murder", "hurt", "harm", "slit", "shoot", "shot", "bullet",
+    "gun", "knife", "stab", "blood", "throat", "strangl", "chok", "hang", "burn", "bomb", "beat", "punch",
+    "attack", "weapon", "threat", "torture", "hate",
+    # self-harm
+    "suicid", "cut", "overdos", "pill", "wrist",
+    # sexual
+    "rape", "intercourse", "penis", "vagina", "genital", "orgasm", "fondl", "erotic", "sexual",
+    # drugs
+    "drug", "blow", "lines", "dose", "high", "pot", "crack", "smok", "ecstasy", "xanax", "opioid",
+    "fentanyl", "ketamine", "shroom", "acid", "joint", "dealer",
+)
+
+# Terms that count toward the "frequent strong profanity" R rule
+STRONG_PROFANITY = ("fuck*", "motherfuck*", "cunt*")
+
+# Character substitutions used to defeat simple obfuscation ("sh1t", "@ss"). Only
+# applied to words with a letter in them, after edge "!" is stripped, so "2024"
+# stays a number and "you!" stays "you"
+_LEET = str.maketrans({"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "@": "a", "$": "s", "!": "i"})
+_TOKEN_RE = re.compile(r"[a-z0-9@$!*#]+")
+# Letters spelled out one at a time ("F U C K", "k.i.l.l") are read as one word,
+# and never let a transcript short-circuit to G
+_SPACED_MIN_LETTERS = 3
+_SPELLED_RE = re.compile(r"(?<![a-z0-9])[a-z](?:[^a-z0-9\[\]]{1,3}[a-z](?![a-z0-9])){%d,}" % (_SPACED_MIN_LETTERS - 1))
+_MASK_CHARS = "*#"
+# Collapsed repeats written by transcript_normalizer: "fuck [x5]" or "(shut up) [x3]"
+REPEAT_MARK_RE = re.compile(r"(?:\(([^()]*)\)|(\S+)) \[x(\d+)\]")
+
+
+class _TrieNode:
+    __slots__ = ("children", "exact", "prefix")
+
+    def __init__(self):
+        self.children = {}
+        self.exact = None   # (category, term) matched when the word ends here
+        self.prefix = None  # (category, term) matched by any word continuing from here
+
+
+class LexicalFilter:
+    """
+    Multi-pattern matcher over a category lexicon.
+
+    Single words are matched by walking a character trie once per token;
+    phrases are matched on the token stream. Masked words such as ``f***`` or
+    ``sh*t`` are resolved against the lexicon by first letter and shape.
+
+    Args:
+        lexicon: Mapping of score category to {term: score}
+        r_profanity_count: Strong profanity hits needed to short-circuit to R
+        max_clean_words: Longest transcript that may short-circuit to G
+        caution_roots: Word roots that rule out the G short-circuit
+    """
+
+    def __init__(self, lexicon=None, r_profanity_count=3, max_clean_words=40, caution_roots=CAUTION_ROOTS):
+        self.lexicon = lexicon or DEFAULT_LEXICON
+        self.r_profanity_count = r_profanity_count
+        self.max_clean_words = max_clean_words
+        self.stats = {
+            "scanned": 0,
+            "short_circuit_g": 0,
+            "short_circuit_r": 0,
+            "forwarded": 0,
+            "caution": 0,
+            "category_hits": {key: 0 for key in REQUIRED_SCORE_KEYS},
+        }
+
+        self._root = _TrieNode()
+        self._phrases = {}  # first word -> [(tuple of words, category, term)]
+        self._scores = {}
+        for category, terms in self.lexicon.items():
+            for term, score in terms.items():
+                self._scores[(category, term)] = score
+                words = term.split()
+                if len(words) > 1:
+                    self._phrases.setdefault(words[0], []).append((tuple(words), category, term))
+                else:
+                    self._insert(term, category)
+
+        self._caution = _TrieNode()
+        for root in caution_roots:
+            self._insert(root + "*", "caution", self._caution)
+
+        self._masked = {}  # masked word -> (category, term) or None
+
+    def _insert(self, term, category, root=None):
+        is_prefix = term.endswith("*")
+        node = root or self._root
+        for char in term.rstrip("*"):
+            node = node.children.setdefault(char, _TrieNode())
+        if is_prefix:
+            node.prefix = (category, term)
+        else:
+            node.exact = (category, term)
+
+    def _match_word(self, word, root=None):
+        node = root or self._root
+        best = None
+        for char in word:
+            node = node.children.get(char)
+            if node is None:
+                return best
+            if node.prefix is not None:
+                best = node.prefix
+        return node.exact or best
+
+    def _match_masked(self, word):
+        """Resolve an obfuscated word like ``f***ing`` to a lexicon term"""
+        if word not in self._masked:
+            if len(self._masked) >= 4096:
+                self._masked.clear()
+            self._masked[word] = self._resolve_masked(word)
+        return self._masked[word]
+
+    def _resolve_masked(self, word):
+        pattern = re.compile(
+            "".join("[a-z]+" if c in _MASK_CHARS else re.escape(c)
+                    for c in re.sub(r"[*#]+", "*", word)) + "$"
+        )
+        head = word[0]
+        for (category, term) in self._scores:
+            base = term.rstrip("*")
+            if " " in base or not base.startswith(head):
+                continue
+            candidates = (base, base + "ing", base + "er", base + "ed", base + "s")
+            if any(pattern.match(candidate) for candidate in candidates):
+                return (category, term)
+        return None
+
+    def tokenize(self, text):
+        tokens = []
+        spelled = []  # run of single letters, joined when it ends
+        for raw in _TOKEN_RE.findall(text.lower()) + [""]:
+            if len(raw) == 1 and raw.isalpha():
+                spelled.append(raw)
+                continue
+            if len(spelled) >= _SPACED_MIN_LETTERS:
+                tokens.append("".join(spelled))
+            else:
+                tokens += spelled
+            spelled = []
+            # "!" at either edge is punctuation ("kill you!"), inside it is leetspeak ("sh!t")
+            raw = raw.strip("!")
+            if any(c in _MASK_CHARS for c in raw):
+                word = raw.lstrip(_MASK_CHARS)
+                if not word:
+                    continue
+                # Keep the mask inside the word, undo leetspeak around it
+                tokens.append(word.translate(_LEET) if word[0].isalpha() else word)
+            elif any(c.isalpha() for c in raw):
+                tokens.append(raw.translate(_LEET))
+            elif raw:
+                tokens.append(raw)
+        return tokens
+
+    def _weighted_tokens(self, text):
+        """Tokens plus how often each was said, expanding ``REPEAT_MARK_RE`` annotations"""
+        if "[x" not in text:
+            tokens = self.tokenize(text)
+            return tokens, [1] * len(tokens)
+        tokens, weights = [], []
+        position = 0
+        for mark in REPEAT_MARK_RE.finditer(text):
+            before = self.tokenize(text[position:mark.start()])
+            unit = self.tokenize(mark.group(1) or mark.group(2))
+            tokens += before + unit
+            weights += [1] * len(before) + [int(mark.group(3))] * len(unit)
+            position = mark.end()
+        rest = self.tokenize(text[position:])
+        return tokens + rest, weights + [1] * len(rest)
+
+    def scan(self, text: str) -> dict:
+        """
+        Scan a transcript and build a provisional score vector.
+
+        Repeat annotations from transcript_normalizer count as the number of
+        repeats they stand for, so normalized transcripts keep their counts.
+
+        Returns:
+            dict: ``scores`` (same keys as the model output), ``hits`` per
+            category, ``strong_profanity`` count, ``words`` count and
+            ``caution``: words with a caution root, plus "spelled-out letters"
+        """
+        tokens, weights = self._weighted_tokens(text)
+        scores = {key: 0 for key in REQUIRED_SCORE_KEYS}
+        hits = {}
+        strong = 0
+
+        for i, word in enumerate(tokens):
+            for words, category, term in self._phrases.get(word, ()):
+                if tuple(tokens[i:i + len(words)]) == words:
+                    hits.setdefault(category, []).append(term)
+                    scores[category] = max(scores[category], self._scores[(category, term)])
+
+            if any(c in _MASK_CHARS for c in word):
+                match = self._match_masked(word)
+            else:
+                match = self._match_word(word)
+            if match is None:
+                continue
+            category, term = match
+            hits.setdefault(category, []).append(term)
+            scores[category] = max(scores[category], self._scores[match])
+            if term in STRONG_PROFANITY:
+                strong += weights[i]
+
+        if strong >= self.r_profanity_count:
+            scores["language"] = 3
+        elif strong:
+            # A small number of strong words is PG-13 territory, not R
+            scores["language"] = min(scores["language"], 2)
+
+        caution = sorted({word for word in tokens if self._match_word(word, self._caution) is not None})
+        if _SPELLED_RE.search(text.lower()):
+            caution.append("spelled-out letters")
+        return {"scores": scores, "hits": hits, "strong_profanity": strong, "words": sum(weights),
+                "caution": caution}
+
+    def classify(self, text: str):
+        """
+        Return a verdict for obvious transcripts, or None to defer to the model.
+
+        Returns:
+            dict or None: Verdict in the classify_content shape, marked with
+            ``"source": "lexical"``
+        """
+        match = self.scan(text)
+        self.stats["scanned"] += 1
+        for category in match["hits"]:
+            self.stats["category_hits"][category] += 1
+
+        if match["strong_profanity"] >= self.r_profanity_count:
+            self.stats["short_circuit_r"] += 1
+            return {
+                "rating": "R",
+                "reasons": [f"Frequent strong profanity ({match['strong_profanity']} occurrences)"],
+                "scores": match["scores"],
+                "source": "lexical",
+            }
+
+        if match["caution"] and not match["hits"]:
+            self.stats["caution"] += 1
+        elif not match["hits"] and 0 < match["words"] <= self.max_clean_words:
+            self.stats["short_circuit_g"] += 1
+            return {
+                "rating": "G",
+                "reasons": ["No profanity, violence, sexual, drug or self-harm terms detected"],
+                "scores": match["scores"],
+                "source": "lexical",
+            }
+
+        self.stats["forwarded"] += 1
+        return None
+
+    def short_circuit_rate(self) -> float:
+        scanned = self.stats["scanned"]
+        if not scanned:
+            return 0.0
+        return (self.stats["short_circuit_g"] + self.stats["short_circuit_r"]) / scanned
+
+
+# Example usage
+if __name__ == "__main__":
+    lexical_filter = LexicalFilter()
+    samples = [
+        "Thanks for watching, see you next week!",
+        "Oh darn, I forgot the charger.",
+        "This is f***ing crazy, what the fuck, shut the f*** up",
+        "Let's grab some beers after this.",
+    ]
+    for sample in samples:
+        verdict = lexical_filter.classify(sample)
+        print(f"{verdict['rating'] if verdict else '→ LLM':>6}  {sample}")
+    print(lexical_filter.stats)
@@ -0,0 +1,44 @@
+import { NextResponse } from "next/server";
+
+// Base URL of the long-running Python classifier (classify_service.py).
+// When unset the API routes call the model providers directly.
+export function getClassifierServiceUrl(): string | undefined {
+  const url = process.env.CLASSIFIER_SERVICE_URL;
+  return url ? url.replace(/\/+$/, "") : undefined;
+}
+
+export type ServiceResult =
+  | { ok: true; result: any }
+  | { ok: false; response: NextResponse };
+
+// POST to the classifier service. Overload (503 + Retry-After) and other
+// errors are passed through so the caller can return them unchanged.
+export async function callClassifierService(
+  baseUrl: string,
+  path: string,
+  body: BodyInit,
+  contentType: string
+): Promise<ServiceResult> {
+  const serviceResponse = await fetch(`${baseUrl}${path}`, {
+    method: "POST",
+    headers: { "Content-Type": contentType },
+    body,
+  });
+  const payload = await serviceResponse.json().catch(() => ({
+    error: `Classifier service returned ${serviceResponse.status}`,
+  }));
+
+  if (!serviceResponse.ok) {
+    const headers: Record<string, string> = {};
+    const retryAfter = serviceResponse.headers.get("Retry-After");
+    if (retryAfter) {
+      headers["Retry-After"] = retryAfter;
+    }
+    return {
+      ok: false,
+      response: NextResponse.json(payload, { status: serviceResponse.status, headers }),
+    };
+  }
+
+  return { ok: true, result: payload };
+}
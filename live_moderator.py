@@ -0,0 +1,571 @@
+"""
+Live Audio Moderator
+Moderates a live audio stream while it is still going. PCM frames are read
+continuously (from a TCP socket, stdin, a file that is still being written,
+or anything ffmpeg can open). They are transcribed in windows that slide
+forward with the stream and end at pauses, and only the new text of each
+window is classified, prefixed with the last few words before it as context.
+
+The stream's rating is rolling and can only escalate: a quiet minute after
+an R-rated one does not make the stream PG again. Every verdict records how
+far behind live it arrived, measured from the moment the last audio sample
+of its window came in.
+
+Usage:
+    python live_moderator.py tcp://0.0.0.0:9000        # raw s16le 16 kHz mono over TCP
+    ffmpeg -i rtmp://... -f s16le -ac 1 -ar 16000 - | python live_moderator.py -
+    python live_moderator.py recording.wav --follow    # a file still being recorded
+    python live_moderator.py talk.m4a --realtime       # replay a file at live speed
+    python live_moderator.py --stub                    # offline demo against the stub server
+"""
+
+import argparse
+import collections
+import json
+import os
+import queue
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import telemetry
+from audio_converter import classify_content, transcribe_audio
+from audio_segmenter import SAMPLE_RATE, encode_wav, frame_energy_db
+from reasoning_cascade import add_cascade_arguments, cascade_from_args
+from verdict_schema import REQUIRED_SCORE_KEYS, VALID_RATINGS
+
+
+FRAME_MS = 30
+CHUNK_SAMPLES = SAMPLE_RATE // 10  # 100 ms reads
+
+_DONE = object()
+
+
+def _percentile(values, q):
+    return round(float(np.percentile(values, q)), 3) if len(values) else None
+
+
+class LiveModerator:
+    """
+    Incremental transcribe → classify engine for one live stream.
+
+    Feed it int16 samples with ``feed()`` as they arrive. Every ``hop_s``
+    of new audio it looks for the end of a window: the first pause of at
+    least ``min_silence_ms`` after ``min_window_s`` of audio, or the
+    quietest frame once ``max_window_s`` have passed without one. The audio
+    up to that point is transcribed on an STT worker while ingestion goes
+    on. Transcripts are put back in stream order, and each one is
+    classified with the last ``context_words`` words before it.
+
+    Args:
+        hathora_client: Initialized Hathora client
+        openai_client: Initialized OpenAI client
+        sample_rate: Sample rate of the fed audio
+        hop_s: Seconds of new audio between window checks
+        min_window_s: Shortest window (shorter ones would lose context and cost more calls)
+        max_window_s: Longest window, which bounds the latency when nobody pauses
+        min_silence_ms: Pause length that ends a window
+        context_words: Words of the preceding transcript sent along with each new window
+        stt_model: Hathora transcription model
+        stt_workers: Concurrent STT uploads
+        classify_workers: Concurrent classification requests
+        transcribe: Transcription function (hathora_client, path, model) -> str
+        classify: Classification function (openai_client, text, **kwargs) -> dict
+        classify_kwargs: Extra keyword arguments for ``classify`` (e.g. cache)
+        on_event: Called with every event dict (``window``, ``escalation``, ``stt_error``)
+    """
+
+    def __init__(self, hathora_client, openai_client, sample_rate=SAMPLE_RATE, hop_s=1.0,
+                 min_window_s=3.0, max_window_s=10.0, min_silence_ms=300, context_words=20,
+                 stt_model="parakeet", stt_workers=2, classify_workers=4, transcribe=transcribe_audio,
+                 classify=classify_content, classify_kwargs=None, on_event=None):
+        self.hathora_client = hathora_client
+        self.openai_client = openai_client
+        self.sample_rate = sample_rate
+        self.hop = int(hop_s * sample_rate)
+        self.min_window = int(min_window_s * sample_rate)
+        self.max_window = int(max_window_s * sample_rate)
+        self.min_silence_frames = max(1, int(min_silence_ms / FRAME_MS))
+        self.frame_len = int(sample_rate * FRAME_MS / 1000)
+        self.context_words = context_words
+        self.stt_model = stt_model
+        self.transcribe = transcribe
+        self.classify = classify
+        self.classify_kwargs = classify_kwargs or {}
+        self.on_event = on_event
+
+        self._buffer = np.zeros(0, dtype=np.int16)
+        self._buffer_start = 0  # stream sample index of _buffer[0]
+        self._received = 0
+        self._measured = 0  # stream samples whose frame energy is in _energy_history
+        self._next_check = self.hop
+        self._arrivals = collections.deque()  # (end sample, wall time) per fed chunk
+        self._energy_history = collections.deque(maxlen=int(60_000 / FRAME_MS))
+        self._windows = 0
+
+        self._stt = ThreadPoolExecutor(max_workers=stt_workers, thread_name_prefix="live-stt")
+        self._classifier = ThreadPoolExecutor(max_workers=classify_workers, thread_name_prefix="live-classify")
+        self._in_order = queue.Queue()
+        self._tmp_dir = tempfile.TemporaryDirectory(prefix="live-")
+        self._sequencer = threading.Thread(target=self._sequence, daemon=True)
+        self._sequencer.start()
+        self._classifying = []
+
+        self._lock = threading.Lock()
+        self._words = collections.deque(maxlen=max(context_words, 1))
+        self.started_at = time.time()
+        self.rating = None
+        self.max_scores = {key: 0 for key in REQUIRED_SCORE_KEYS}
+        self.escalations = []
+        self.stats = {"windows": 0, "silent_windows": 0, "stt_failures": 0, "classified": 0,
+                      "fallbacks": 0, "words": 0, "stt_s": 0.0, "classify_s": 0.0}
+        self.latencies = []
+
+    # -- ingestion ----------------------------------------------------------
+
+    def feed(self, samples):
+        """Add newly arrived int16 samples (any length) and cut a window if one is ready"""
+        if not len(samples):
+            return
+        self._buffer = np.concatenate((self._buffer, np.asarray(samples, dtype=np.int16)))
+        self._received += len(samples)
+        self._arrivals.append((self._received, time.time()))
+        offset = max(0, self._measured - self._buffer_start)
+        whole = (len(self._buffer) - offset) // self.frame_len * self.frame_len
+        if whole > 0:
+            self._energy_history.extend(frame_energy_db(self._buffer[offset:offset + whole], self.sample_rate,
+                                                        FRAME_MS))
+            self._measured += whole
+        if self._received >= self._next_check:
+            self._next_check = self._received + self.hop
+            self._cut_windows()
+
+    def _cut_windows(self, final=False):
+        while len(self._buffer):
+            energy = frame_energy_db(self._buffer, self.sample_rate, FRAME_MS)
+            end = self._find_cut(energy)
+            if end is None:
+                if not final:
+                    return
+                end = len(self._buffer)
+            self._emit(end, energy)
+
+    def _threshold_db(self):
+        # Same adaptive rule as audio_segmenter.detect_segments, over the last minute
+        if not self._energy_history:
+            return -50.0
+        floor, speech = np.percentile(np.fromiter(self._energy_history, dtype=np.float64), [2, 90])
+        return max((floor + speech) / 2.0, -50.0)
+
+    def _find_cut(self, energy):
+        """Sample offset in the buffer where the current window ends, or None to keep listening"""
+        if len(self._buffer) < self.min_window or not len(energy):
+            return None
+        silent = energy < self._threshold_db()
+        padded = np.concatenate(([False], silent, [False]))
+        edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+        starts, ends = edges[::2], edges[1::2]
+        min_frame = self.min_window // self.frame_len
+        for start, end in zip(starts, ends):
+            if end - start < self.min_silence_frames:
+                continue
+            # Cut in the middle of a pause; one still running at the buffer end is cut
+            # as soon as it is long enough, instead of waiting for speech to resume
+            cut = (start + end) // 2 if end < len(energy) else start + self.min_silence_frames // 2
+            if cut >= min_frame:
+                return cut * self.frame_len
+        if len(self._buffer) >= self.max_window:
+            max_frame = self.max_window // self.frame_len
+            return (min_frame + int(np.argmin(energy[min_frame:max_frame]))) * self.frame_len
+        return None
+
+    def _arrival_time(self, end_sample):
+        while self._arrivals and self._arrivals[0][0] < end_sample:
+            self._arrivals.popleft()
+        return self._arrivals[0][1] if self._arrivals else time.time()
+
+    def _emit(self, end, energy):
+        samples = self._buffer[:end]
+        start_sample = self._buffer_start
+        self._buffer = self._buffer[end:]
+        self._buffer_start += end
+        voiced = energy[:max(1, end // self.frame_len)] >= self._threshold_db()
+        window = {
+            "index": self._windows,
+            "start_s": round(start_sample / self.sample_rate, 3),
+            "end_s": round(self._buffer_start / self.sample_rate, 3),
+            "audio_end_at": self._arrival_time(self._buffer_start),
+        }
+        self._windows += 1
+        with self._lock:
+            self.stats["windows"] += 1
+        if not voiced.any():
+            with self._lock:
+                self.stats["silent_windows"] += 1
+            return
+        path = os.path.join(self._tmp_dir.name, f"window-{window['index']:06d}.wav")
+        with open(path, "wb") as f:
+            f.write(encode_wav(samples, self.sample_rate))
+        self._in_order.put((window, self._stt.submit(self._transcribe, path)))
+
+    # -- transcription and classification -----------------------------------
+
+    def _transcribe(self, path):
+        started = time.perf_counter()
+        try:
+            return self.transcribe(self.hathora_client, path, self.stt_model).strip()
+        finally:
+            os.remove(path)
+            with self._lock:
+                self.stats["stt_s"] += time.perf_counter() - started
+
+    def _sequence(self):
+        # Transcripts come back out of order; context has to be built in stream order
+        while True:
+            item = self._in_order.get()
+            if item is _DONE:
+                return
+            window, future = item
+            try:
+                text = future.result()
+            except Exception as e:
+                with self._lock:
+                    self.stats["stt_failures"] += 1
+                self._event({"type": "stt_error", **self._window_fields(window),
+                             "error": f"Transcription failed: {type(e).__name__}: {e}"})
+                continue
+            words = text.split()
+            if not words:
+                continue
+            with self._lock:
+                context = list(self._words)[-self.context_words:] if self.context_words else []
+                self._words.extend(words)
+                self.stats["words"] += len(words)
+            window["text"] = text
+            window["context_words"] = len(context)
+            content = " ".join(context + words)
+            self._classifying = [f for f in self._classifying if not f.done()]
+            self._classifying.append(self._classifier.submit(self._classify, window, content))
+
+    def _classify(self, window, content):
+        started = time.perf_counter()
+        with telemetry.span("live_window", window=window["index"]):
+            verdict = self.classify(self.openai_client, content, **self.classify_kwargs)
+        elapsed = time.perf_counter() - started
+        behind_live = time.time() - window["audio_end_at"]
+        escalation = None
+        with self._lock:
+            self.stats["classified"] += 1
+            self.stats["classify_s"] += elapsed
+            self.latencies.append(behind_live)
+            if verdict.get("error"):
+                # A fallback is not evidence about the stream; keep the rating where it is
+                self.stats["fallbacks"] += 1
+            else:
+                for key in REQUIRED_SCORE_KEYS:
+                    self.max_scores[key] = max(self.max_scores[key], verdict["scores"].get(key, 0))
+                if self.rating is None or VALID_RATINGS.index(verdict["rating"]) > VALID_RATINGS.index(self.rating):
+                    escalation = {"type": "escalation", "from": self.rating, "rating": verdict["rating"],
+                                  **self._window_fields(window), "reasons": verdict.get("reasons", []),
+                                  "behind_live_s": round(behind_live, 3)}
+                    self.rating = verdict["rating"]
+                    if escalation["from"] is None and escalation["rating"] == VALID_RATINGS[0]:
+                        escalation = None  # first verdict of a clean stream
+                    else:
+                        self.escalations.append(escalation)
+            rating = self.rating
+        self._event({"type": "window", **self._window_fields(window), "text": window["text"],
+                     "verdict": verdict, "rating": rating, "behind_live_s": round(behind_live, 3)})
+        if escalation is not None:
+            telemetry.count("live_escalations", 1, rating=escalation["rating"])
+            self._event(escalation)
+
+    @staticmethod
+    def _window_fields(window):
+        return {"window": window["index"], "start_s": window["start_s"], "end_s": window["end_s"]}
+
+    def _event(self, event):
+        if self.on_event is not None:
+            self.on_event(event)
+
+    # -- lifecycle ------------------------------------------------------------
+
+    def close(self):
+        """
+        Flush the audio still buffered as a final window and wait for every verdict.
+
+        Returns:
+            dict: ``summary()``
+        """
+        self._cut_windows(final=True)
+        self._in_order.put(_DONE)
+        self._sequencer.join()
+        for future in self._classifying:
+            future.result()
+        self._stt.shutdown()
+        self._classifier.shutdown()
+        self._tmp_dir.cleanup()
+        return self.summary()
+
+    def summary(self):
+        """Rolling rating, escalations and how far behind live the verdicts were"""
+        with self._lock:
+            stats = dict(self.stats)
+            latencies = list(self.latencies)
+            transcribed = stats["windows"] - stats["silent_windows"]
+            return {
+                "rating": self.rating,
+                "max_scores": dict(self.max_scores),
+                "escalations": list(self.escalations),
+                "audio_s": round(self._received / self.sample_rate, 3),
+                "windows": stats["windows"],
+                "silent_windows": stats["silent_windows"],
+                "stt_failures": stats["stt_failures"],
+                "classified": stats["classified"],
+                "fallbacks": stats["fallbacks"],
+                "words": stats["words"],
+                "avg_stt_ms": round(1000 * stats["stt_s"] / transcribed, 1) if transcribed else 0.0,
+                "avg_classify_ms": round(1000 * stats["classify_s"] / stats["classified"], 1)
+                if stats["classified"] else 0.0,
+                "behind_live_s": {"p50": _percentile(latencies, 50), "p95": _percentile(latencies, 95),
+                                  "max": round(max(latencies), 3) if latencies else None},
+            }
+
+
+# -- audio sources ------------------------------------------------------------
+
+def iter_pcm(stream, chunk_samples=CHUNK_SAMPLES):
+    """Yield int16 sample arrays from a binary stream of raw s16le PCM as data arrives"""
+    remainder = b""
+    while True:
+        data = stream.read1(chunk_samples * 2) if hasattr(stream, "read1") else stream.read(chunk_samples * 2)
+        if not data:
+            return
+        data = remainder + data
+        usable = len(data) // 2 * 2
+        remainder = data[usable:]
+        if usable:
+            yield np.frombuffer(data[:usable], dtype="<i2").astype(np.int16)
+
+
+def iter_tcp(host, port, chunk_samples=CHUNK_SAMPLES):
+    """Listen on host:port and yield the raw s16le PCM of the first client to connect"""
+    with socket.create_server((host, port)) as server:
+        print(f"Listening for s16le PCM on {host}:{port}", file=sys.stderr)
+        connection, address = server.accept()
+        print(f"✓ Stream connected from {address[0]}:{address[1]}", file=sys.stderr)
+        with connection, connection.makefile("rb") as stream:
+            yield from iter_pcm(stream, chunk_samples)
+
+
+def _wav_data_offset(f):
+    """Offset of the PCM data in a WAV file (0 for raw PCM)"""
+    header = f.read(12)
+    if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return 0
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return f.tell()
+        size = int.from_bytes(chunk[4:8], "little")
+        if chunk[:4] == b"data":
+            return f.tell()
+        f.seek(size + (size & 1), os.SEEK_CUR)
+
+
+def iter_tail(path, chunk_samples=CHUNK_SAMPLES, poll_s=0.1, idle_timeout_s=10.0):
+    """
+    Yield samples of a raw s16le or WAV file while it is being written.
+
+    Ends after the file has not grown for ``idle_timeout_s`` seconds.
+    """
+    with open(path, "rb") as f:
+        f.seek(_wav_data_offset(f))
+        remainder = b""
+        idle_since = time.monotonic()
+        while True:
+            data = f.read(chunk_samples * 2)
+            if not data:
+                if time.monotonic() - idle_since > idle_timeout_s:
+                    return
+                time.sleep(poll_s)
+                continue
+            idle_since = time.monotonic()
+            data = remainder + data
+            usable = len(data) // 2 * 2
+            remainder = data[usable:]
+            yield np.frombuffer(data[:usable], dtype="<i2").astype(np.int16)
+
+
+def iter_wav(path, chunk_samples=CHUNK_SAMPLES):
+    """Yield samples of a 16-bit mono WAV file at the stream sample rate"""
+    with wave.open(path) as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1 or wav.getframerate() != SAMPLE_RATE:
+            raise ValueError(f"{path} is not 16-bit mono {SAMPLE_RATE} Hz; decode it with ffmpeg instead")
+        while True:
+            data = wav.readframes(chunk_samples)
+            if not data:
+                return
+            yield np.frombuffer(data, dtype="<i2").astype(np.int16)
+
+
+def iter_ffmpeg(source, realtime=False, chunk_samples=CHUNK_SAMPLES):
+    """Decode any ffmpeg input (file, URL, RTMP/HLS stream) to mono 16 kHz samples"""
+    command = ["ffmpeg", "-nostdin", "-loglevel", "error"] + (["-re"] if realtime else []) + [
+        "-i", source, "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-"]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE)
+    try:
+        yield from iter_pcm(process.stdout, chunk_samples)
+    finally:
+        process.kill()
+        process.wait()
+
+
+def at_live_speed(chunks, sample_rate=SAMPLE_RATE):
+    """Pace already available samples to the wall clock, as if they were arriving live"""
+    started = time.monotonic()
+    sent = 0
+    for chunk in chunks:
+        delay = started + sent / sample_rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        yield chunk
+        sent += len(chunk)
+
+
+def open_source(source, follow=False, realtime=False):
+    """
+    Sample chunks for a source spec.
+
+    Args:
+        source: ``tcp://host:port`` (listen), ``-`` (raw s16le on stdin), a
+            16 kHz mono WAV, or anything else ffmpeg can open
+        follow: Tail a raw/WAV file that is still being written
+        realtime: Replay a finished file at live speed instead of as fast as possible
+    """
+    if source.startswith("tcp://"):
+        host, _, port = source[len("tcp://"):].rpartition(":")
+        return iter_tcp(host or "0.0.0.0", int(port))
+    if source == "-":
+        return iter_pcm(sys.stdin.buffer)
+    if follow:
+        return iter_tail(source)
+    if source.lower().endswith(".wav"):
+        try:
+            with wave.open(source) as wav:
+                native = (wav.getsampwidth(), wav.getnchannels(), wav.getframerate()) == (2, 1, SAMPLE_RATE)
+        except (wave.Error, EOFError):
+            native = False
+        if native:
+            chunks = iter_wav(source)
+            return at_live_speed(chunks) if realtime else chunks
+    return iter_ffmpeg(source, realtime=realtime)
+
+
+STUB_SCRIPT = (
+    "Welcome back to the stream everybody. Today we are building a castle in the new update. "
+    "Chat is asking about the settings so give me a second. Okay that looks much better now. "
+    "Damn that creeper came out of nowhere. What the hell just happened to my base. "
+    "We need to rebuild the whole east wall before night falls. Thanks for the follow by the way. "
+    "Oh shit oh shit it blew up again. Are you fucking kidding me right now. "
+    "Fine let's take a short break and come back in five minutes."
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Moderate a live audio stream with a rolling, escalate-only rating.")
+    parser.add_argument("source", nargs="?", default=None,
+                        help="tcp://host:port, '-' for s16le on stdin, a file, or a URL ffmpeg can open")
+    parser.add_argument("--follow", action="store_true", help="Tail a raw/WAV file that is still being written")
+    parser.add_argument("--realtime", action="store_true", help="Replay a finished file at live speed")
+    parser.add_argument("--output", default="-", help="Event JSONL file (default: stdout)")
+    parser.add_argument("--hop", type=float, default=1.0, help="Seconds of audio between window checks")
+    parser.add_argument("--min-window", type=float, default=3.0, help="Shortest window in seconds")
+    parser.add_argument("--max-window", type=float, default=10.0, help="Longest window in seconds")
+    parser.add_argument("--min-silence-ms", type=int, default=300, help="Pause that ends a window")
+    parser.add_argument("--context-words", type=int, default=20,
+                        help="Words before each window sent along as context")
+    parser.add_argument("--stt-workers", type=int, default=2)
+    parser.add_argument("--classify-workers", type=int, default=4)
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--stub", action="store_true",
+                        help="Use an in-process stub STT/model server (without a source, replay a demo script)")
+    add_cascade_arguments(parser)
+    telemetry.add_telemetry_arguments(parser)
+    args = parser.parse_args(argv)
+    telemetry.configure_from_args(args)
+
+    server = None
+    if args.stub:
+        from openai import OpenAI
+        from stub_server import StubConfig, StubHathoraClient, start_stub_server, stub_speech
+
+        server = start_stub_server(StubConfig(latency_ms=300, latency_p99_ms=900,
+                                              stt_latency_ms=300, stt_latency_p99_ms=900))
+        hathora_client = StubHathoraClient(server.base_url)
+        openai_client = OpenAI(base_url=server.base_url + "/v1", api_key="stub", max_retries=0)
+        if args.source is None:
+            samples = np.frombuffer(stub_speech(STUB_SCRIPT).tobytes(), dtype=np.int16)
+            chunks = at_live_speed(samples[i:i + CHUNK_SAMPLES] for i in range(0, len(samples), CHUNK_SAMPLES))
+    else:
+        if args.source is None:
+            parser.error("a source is required without --stub")
+        from dotenv import load_dotenv
+        from audio_converter import initialize_clients
+
+        load_dotenv()
+        hathora_client, openai_client = initialize_clients()
+    if args.source is not None:
+        chunks = open_source(args.source, follow=args.follow, realtime=args.realtime)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    out_lock = threading.Lock()
+
+    def write_event(event):
+        with out_lock:
+            out.write(json.dumps(event, ensure_ascii=False) + "\n")
+            out.flush()
+        if event["type"] == "escalation":
+            print(f"⚠ Rating escalated to {event['rating']} at {event['end_s']:.1f}s "
+                  f"({event['behind_live_s']:.1f}s behind live)", file=sys.stderr)
+
+    cascade = cascade_from_args(args)
+    moderator = LiveModerator(
+        hathora_client, openai_client,
+        hop_s=args.hop,
+        min_window_s=args.min_window,
+        max_window_s=args.max_window,
+        min_silence_ms=args.min_silence_ms,
+        context_words=args.context_words,
+        stt_workers=args.stt_workers,
+        classify_workers=args.classify_workers,
+        classify=cascade or classify_content,
+        classify_kwargs={"max_retries": args.max_retries},
+        on_event=write_event,
+    )
+    try:
+        for chunk in chunks:
+            moderator.feed(chunk)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        summary = moderator.close()
+        if cascade is not None:
+            summary["cascade"] = cascade.summary()
+        if out is not sys.stdout:
+            out.close()
+        if server is not None:
+            server.shutdown()
+        print(json.dumps(summary, indent=2), file=sys.stderr)
+        telemetry.finish_from_args(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Micro-Batching Classifier
+Packs short transcripts into a single model request. Items are collected
+until ``max_items`` are waiting or ``max_wait_ms`` has passed, sent as one
+ID-tagged JSON array, and the returned array of verdicts is validated item
+by item. Only the items that come back missing or invalid are re-sent as
+ordinary single-item requests, so the ~1.5k-token policy prompt is paid once
+per batch instead of once per clip.
+"""
+
+import asyncio
+import json
+
+import telemetry
+from async_classifier import classify_content_async, record_usage
+from openaioss import MODEL, policy
+from retry_policy import DEFAULT_RETRY_POLICY, breaker_for
+from verdict_schema import check_verdict, decode_response, record_attempt
+
+
+BATCH_POLICY = policy.rsplit("Content: [TRANSCRIPT]", 1)[0] + """### Batch mode
+
+The user message is a JSON array of items, each shaped {"id": "...", "content": "..."}.
+Rate every item independently, exactly as if it had been sent on its own.
+
+You MUST respond with ONLY a JSON array holding one verdict object per item,
+each with the item's "id" added, no markdown, no backticks, no extra text:
+
+[
+  {"id": "0", "rating": "G", "reasons": ["..."], "scores": {"violence":0,"sexual_content":0,"language":0,"drugs":0,"self_harm":0}},
+  {"id": "1", "rating": "R", "reasons": ["..."], "scores": {"violence":3,"sexual_content":0,"language":3,"drugs":0,"self_harm":0}}
+]
+"""
+
+
+def parse_batch_response(raw_content: str, ids, backend: str = None) -> tuple:
+    """
+    Parse a batch response into per-item verdicts.
+
+    Decoding and validation go through verdict_schema, so batched verdicts
+    count towards the backend's validation metrics like single ones.
+
+    Args:
+        raw_content: The message content returned by the model
+        ids: Item ids that were sent
+        backend: Backend name the validation outcomes are recorded under
+
+    Returns:
+        tuple: (verdicts, errors) dicts keyed by item id; every id lands in
+        exactly one of them
+
+    Raises:
+        json.JSONDecodeError: If the response is not valid JSON
+        ValueError: If the response is not an array of verdicts
+    """
+    items = decode_response(raw_content, backend)
+    if isinstance(items, dict) and isinstance(items.get("verdicts"), list):
+        items = items["verdicts"]
+    if not isinstance(items, list):
+        raise ValueError("Batch response is not a JSON array")
+
+    wanted = set(ids)
+    verdicts, errors = {}, {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        item_id = str(item.pop("id", ""))
+        if item_id not in wanted or item_id in verdicts:
+            continue
+        try:
+            verdicts[item_id] = check_verdict(item, backend)
+            errors.pop(item_id, None)
+        except ValueError as e:
+            errors[item_id] = str(e)
+
+    for item_id in wanted - verdicts.keys() - errors.keys():
+        errors[item_id] = "Missing from batch response"
+    return verdicts, errors
+
+
+class MicroBatcher:
+    """
+    Collects concurrent ``classify`` calls into batched model requests.
+
+    Callers simply ``await batcher.classify(text)`` from many tasks; the
+    batcher decides what travels together. Transcripts longer than
+    ``max_item_words`` skip batching, since they gain little and make a
+    malformed batch more expensive.
+
+    Args:
+        client: Initialized AsyncOpenAI client (or async BackendRouter)
+        max_items: Items per batch request
+        max_wait_ms: Longest an item waits for its batch to fill
+        max_item_words: Longer transcripts are sent on their own
+        max_retries: Retry attempts for single-item fallbacks
+        cache: Optional VerdictCache consulted before batching
+        usage: Optional dict accumulating request and token counts
+        prefilter: Optional LexicalFilter that may answer obvious cases directly
+        retry_policy: Optional RetryPolicy for single-item fallbacks
+    """
+
+    def __init__(self, client, max_items=16, max_wait_ms=50, max_item_words=200, max_retries=3,
+                 cache=None, usage=None, prefilter=None, retry_policy=None):
+        if max_items < 1:
+            raise ValueError("max_items must be at least 1")
+        self.client = client
+        self.max_items = max_items
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_item_words = max_item_words
+        self.max_retries = max_retries
+        self.cache = cache
+        self.usage = usage
+        self.prefilter = prefilter
+        self.retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+        self.stats = {"batches": 0, "batched_items": 0, "fallback_items": 0, "direct_items": 0}
+
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    async def classify(self, content: str) -> dict:
+        """
+        Classify one transcript, possibly as part of a batch.
+
+        Returns:
+            dict: Classification result with rating, reasons, and scores
+        """
+        if self.prefilter is not None:
+            verdict = self.prefilter.classify(content)
+            if verdict is not None:
+                return verdict
+
+        if self.cache is not None:
+            cached = self.cache.lookup(content, policy, MODEL)
+            if cached is not None:
+                return cached
+
+        if len(content.split()) > self.max_item_words:
+            self.stats["direct_items"] += 1
+            return await self._classify_single(content)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((content, future))
+        if len(self._pending) >= self.max_items:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._dispatch)
+        return await future
+
+    async def flush(self):
+        """Send whatever is waiting and wait for every in-flight batch"""
+        self._dispatch()
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def items_per_request(self) -> float:
+        """Average verdicts obtained per model request so far"""
+        items = self.stats["batched_items"] + self.stats["fallback_items"] + self.stats["direct_items"]
+        requests = self.stats["batches"] + self.stats["fallback_items"] + self.stats["direct_items"]
+        return items / requests if requests else 0.0
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _classify_single(self, content):
+        # The cache was already consulted; only store fresh results here
+        result = await classify_content_async(
+            self.client, content, self.max_retries, usage=self.usage, retry_policy=self.retry_policy
+        )
+        if self.cache is not None:
+            self.cache.store(content, policy, MODEL, result)
+        return result
+
+    async def _request_batch(self, batch):
+        """One batch request; returns per-item verdicts (empty on failure)"""
+        ids = [str(i) for i in range(len(batch))]
+        breaker = breaker_for(self.client)
+        if not breaker.allow():
+            return {}
+        with telemetry.span("prompt_build", kind="batch"):
+            payload = json.dumps([{"id": item_id, "content": content}
+                                  for item_id, (content, _) in zip(ids, batch)], ensure_ascii=False)
+        record_attempt(breaker.name, 0)
+        try:
+            with telemetry.span("model_call", backend=breaker.name, kind="batch"):
+                response = await self.client.chat.completions.create(
+                    model=MODEL,
+                    messages=[
+                        {"role": "system", "content": BATCH_POLICY},
+                        {"role": "user", "content": payload}
+                    ],
+                    extra_body={"reasoning": {"enabled": True}},
+                    timeout=60
+                )
+            breaker.record_success()
+            telemetry.record_tokens(response, breaker.name)
+            if self.usage is not None:
+                record_usage(self.usage, response)
+            verdicts, errors = parse_batch_response(response.choices[0].message.content, ids, breaker.name)
+        except (json.JSONDecodeError, ValueError) as e:
+            print(f"✗ Batch of {len(batch)}: invalid response: {e}")
+            return {}
+        except Exception as e:
+            print(f"✗ Batch of {len(batch)}: {type(e).__name__}: {e}")
+            if self.retry_policy.should_retry(e):
+                breaker.record_failure()
+            return {}
+        if errors:
+            print(f"⚠ Batch of {len(batch)}: {len(errors)} item(s) invalid, retrying them individually")
+        return {int(item_id): verdict for item_id, verdict in verdicts.items()}
+
+    async def _run_batch(self, batch):
+        self.stats["batches"] += 1
+        try:
+            verdicts = await self._request_batch(batch)
+            retry = []
+            for index, (content, future) in enumerate(batch):
+                verdict = verdicts.get(index)
+                if verdict is None:
+                    retry.append((content, future))
+                    continue
+                self.stats["batched_items"] += 1
+                if self.cache is not None:
+                    self.cache.store(content, policy, MODEL, verdict)
+                if not future.done():
+                    future.set_result(verdict)
+
+            self.stats["fallback_items"] += len(retry)
+            results = await asyncio.gather(*(self._classify_single(content) for content, _ in retry))
+            for (_, future), result in zip(retry, results):
+                if not future.done():
+                    future.set_result(result)
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            # Never leave a caller waiting on a batch that died
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+
+# Example usage
+if __name__ == "__main__":
+    from async_classifier import initialize_async_client
+
+    test_transcripts = [
+        "Thanks for watching, see you next week!",
+        "Let's watch a movie and kiss a bit.",
+        "I'm going to f***ing kill you tonight.",
+        "Grab some milk on the way home.",
+    ]
+
+    async def main():
+        usage = {}
+        batcher = MicroBatcher(initialize_async_client(), max_items=len(test_transcripts), usage=usage)
+        results = await asyncio.gather(*(batcher.classify(t) for t in test_transcripts))
+        for transcript, result in zip(test_transcripts, results):
+            print(f"{result['rating']:>6}  {transcript}")
+        print(f"\n{batcher.stats} — {usage}")
+
+    asyncio.run(main())
@@ -0,0 +1,322 @@
+"""
+Near-Duplicate Verdict Index
+Reuses verdicts for transcripts that are almost, but not exactly, the same
+as one classified before: reposts with an added intro, a mentioned date or a
+few words of STT noise. The exact-hash VerdictCache misses all of these.
+
+Transcripts are reduced to MinHash signatures over word 3-gram shingles and
+indexed with LSH banding, so a lookup only compares against transcripts
+sharing at least one band bucket. Matches whose estimated Jaccard
+similarity reaches the threshold return the stored verdict, with a
+``near_duplicate`` block recording where it came from.
+
+Similarity cannot tell whether the words that differ change the rating: a
+clean transcript with "and then I am going to kill you" appended is still a
+close match. Each entry therefore keeps the lexical profile of its
+transcript (lexicon terms and caution words from lexical_filter), and a
+verdict is only reused when the new transcript adds nothing to it.
+
+Signatures and verdicts are appended to SQLite as they are stored; the
+in-memory band tables are rebuilt from it on start-up.
+"""
+
+import hashlib
+import json
+import sqlite3
+import string
+import threading
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from lexical_filter import LexicalFilter
+
+
+DEFAULT_DB_PATH = ".near_duplicate.sqlite3"
+
+_SHINGLE_MULTIPLIER = np.uint64(0x100000001B3)
+# Punctuation becomes whitespace (apostrophes stay part of words); str.translate
+# and bytes.split keep tokenizing in C, several times faster than a regex
+_SEPARATORS = str.maketrans({**{c: " " for c in string.punctuation + "“”—–…" if c != "'"}, "’": "'"})
+
+
+def choose_bands(num_perm, threshold):
+    """
+    Pick (bands, rows) with bands * rows == num_perm whose LSH S-curve
+    midpoint, (1 / bands) ** (1 / rows), is closest to ``threshold`` from below
+    (slightly below so true matches are rarely missed).
+    """
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    below = [o for o in options if (1.0 / o[0]) ** (1.0 / o[1]) <= threshold] or options
+    return min(below, key=lambda o: threshold - (1.0 / o[0]) ** (1.0 / o[1]))
+
+
+class MinHasher:
+    """
+    MinHash signatures over word shingles.
+
+    Each word is hashed once; shingle hashes are polynomial combinations of
+    their word hashes and each permutation is a multiply-shift hash
+    ``(a * x + b) >> 32`` in wrapping 64-bit arithmetic, so a signature is a
+    handful of vectorized NumPy operations. Coefficients come from a fixed
+    seed, so signatures stay comparable across processes and restarts.
+    """
+
+    def __init__(self, num_perm=128, shingle_size=3, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, 1 << 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+
+    def shingle_hashes(self, text):
+        """Distinct 64-bit hashes of the word shingles of ``text``"""
+        words = text.casefold().translate(_SEPARATORS).encode("utf-8").split()
+        if not words:
+            return np.zeros(0, dtype=np.uint64)
+        word_hashes = np.fromiter(map(zlib.crc32, words), dtype=np.uint64, count=len(words))
+        size = min(self.shingle_size, len(words))
+        count = len(words) - size + 1
+        hashes = np.zeros(count, dtype=np.uint64)
+        for offset in range(size):
+            hashes = hashes * _SHINGLE_MULTIPLIER + word_hashes[offset:offset + count]
+        return np.unique(hashes)
+
+    def signature(self, text):
+        """
+        Returns:
+            np.ndarray or None: uint32 signature, None for text without words
+        """
+        hashes = self.shingle_hashes(text)
+        if len(hashes) == 0:
+            return None
+        permuted = hashes[:, None] * self._a
+        permuted += self._b
+        # The shift is monotonic, so take the minimum first and shift one row
+        return (permuted.min(axis=0) >> np.uint64(32)).astype(np.uint32)
+
+
+def lexical_profile(lexical_filter, text):
+    """Counts of lexicon terms and caution words in ``text``, as ``{"category:term": n}``"""
+    match = lexical_filter.scan(text)
+    profile = Counter(f"{category}:{term}" for category, terms in match["hits"].items() for term in terms)
+    profile.update(f"caution:{word}" for word in match["caution"])
+    return profile
+
+
+def adds_to(profile, stored):
+    """True if ``profile`` has a term, or more of one, that ``stored`` lacks"""
+    return any(count > stored.get(key, 0) for key, count in profile.items())
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH verdict index with the VerdictCache ``lookup``/``store`` API.
+
+    Anything that accepts ``cache=`` (classify_content, the async and
+    micro-batched classifiers, the batch CLI, the service) can use it
+    directly. Pass the exact VerdictCache as ``exact`` to check it first.
+
+    Args:
+        db_path: SQLite file for persistence, or None for memory only
+        threshold: Minimum estimated Jaccard similarity to reuse a verdict
+        num_perm: MinHash signature length
+        shingle_size: Words per shingle
+        exact: Optional VerdictCache consulted before the index (and stored to)
+        lexical_filter: LexicalFilter whose scan profiles the transcripts
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, threshold=0.8, num_perm=128, shingle_size=3,
+                 exact=None, lexical_filter=None):
+        self.threshold = threshold
+        self.exact = exact
+        self.lexical_filter = lexical_filter or LexicalFilter()
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+        self._lock = threading.Lock()
+        self._tables = [{} for _ in range(self.bands)]  # band bytes -> [entry id]
+        self._signatures = {}                          # entry id -> signature
+        self._verdicts = {}                            # entry id -> (namespace, created_at, verdict json)
+        self._profiles = {}                            # entry id -> lexical profile
+        self._next_id = 1
+        self.stats = {"hits": 0, "misses": 0, "inserts": 0, "candidates": 0, "vetoed": 0, "lookup_s": 0.0}
+
+        self._db = None
+        if db_path is not None:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS near_duplicates ("
+                "id INTEGER PRIMARY KEY, namespace TEXT NOT NULL, num_perm INTEGER NOT NULL, "
+                "signature BLOB NOT NULL, verdict TEXT NOT NULL, created_at REAL NOT NULL, lexical TEXT)"
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(near_duplicates)")}
+            if "lexical" not in columns:
+                # Older entries have no profile and only match transcripts without flagged words
+                self._db.execute("ALTER TABLE near_duplicates ADD COLUMN lexical TEXT")
+            self._db.commit()
+            self._load()
+
+    def _load(self):
+        rows = self._db.execute(
+            "SELECT id, namespace, signature, verdict, created_at, lexical FROM near_duplicates WHERE num_perm = ?",
+            (self.hasher.num_perm,),
+        )
+        for entry_id, namespace, blob, verdict, created_at, lexical in rows:
+            self._insert(entry_id, namespace, np.frombuffer(blob, dtype="<u4"), verdict, created_at,
+                         Counter(json.loads(lexical or "{}")))
+            self._next_id = max(self._next_id, entry_id + 1)
+
+    def _band_keys(self, namespace, signature):
+        prefix = namespace.encode("ascii")
+        rows = self.rows
+        return [prefix + signature[band * rows:(band + 1) * rows].tobytes() for band in range(self.bands)]
+
+    def _insert(self, entry_id, namespace, signature, verdict, created_at, profile):
+        self._signatures[entry_id] = signature
+        self._verdicts[entry_id] = (namespace, created_at, verdict)
+        self._profiles[entry_id] = profile
+        for table, key in zip(self._tables, self._band_keys(namespace, signature)):
+            table.setdefault(key, []).append(entry_id)
+
+    @staticmethod
+    def namespace(policy, model):
+        """Verdicts are only shared between identical policy + model pairs"""
+        return hashlib.sha256(f"{model}\0{policy}".encode("utf-8")).hexdigest()[:16]
+
+    def find(self, content, policy, model):
+        """
+        Most similar indexed transcript at or above the threshold whose
+        lexical profile covers ``content``'s.
+
+        Returns:
+            tuple: (entry_id, similarity, created_at, verdict dict) or None
+        """
+        started = time.perf_counter()
+        signature = self.hasher.signature(content)
+        if signature is None:
+            return None
+        namespace = self.namespace(policy, model)
+        profile = lexical_profile(self.lexical_filter, content)
+        best = None
+        vetoed = False
+        with self._lock:
+            candidates = set()
+            for table, key in zip(self._tables, self._band_keys(namespace, signature)):
+                candidates.update(table.get(key, ()))
+            for entry_id in candidates:
+                similarity = float(np.count_nonzero(self._signatures[entry_id] == signature)) / len(signature)
+                if similarity < self.threshold or (best is not None and similarity <= best[1]):
+                    continue
+                if adds_to(profile, self._profiles[entry_id]):
+                    # The differing words carry flagged terms the stored verdict never saw
+                    vetoed = True
+                    continue
+                best = (entry_id, similarity)
+            self.stats["candidates"] += len(candidates)
+            self.stats["vetoed"] += int(vetoed and best is None)
+            self.stats["hits" if best else "misses"] += 1
+            self.stats["lookup_s"] += time.perf_counter() - started
+            if best is None:
+                return None
+            _, created_at, verdict = self._verdicts[best[0]]
+        return best[0], best[1], created_at, json.loads(verdict)
+
+    def lookup(self, content: str, policy: str, model: str):
+        """
+        VerdictCache-compatible lookup: exact cache first, then near-duplicates.
+
+        Returns:
+            dict or None: Verdict; near-duplicate reuses carry a ``near_duplicate``
+            block with ``match_id``, ``similarity`` and ``classified_at``
+        """
+        if self.exact is not None:
+            verdict = self.exact.lookup(content, policy, model)
+            if verdict is not None:
+                return verdict
+        match = self.find(content, policy, model)
+        if match is None:
+            return None
+        entry_id, similarity, created_at, verdict = match
+        verdict["near_duplicate"] = {
+            "match_id": entry_id,
+            "similarity": round(similarity, 3),
+            "classified_at": created_at,
+        }
+        return verdict
+
+    def store(self, content: str, policy: str, model: str, verdict: dict):
+        """Index a fresh verdict (fallbacks and reused verdicts are skipped)"""
+        if self.exact is not None:
+            self.exact.store(content, policy, model, verdict)
+        if verdict.get("error") or "near_duplicate" in verdict:
+            return
+        signature = self.hasher.signature(content)
+        if signature is None:
+            return
+        namespace = self.namespace(policy, model)
+        serialized = json.dumps(verdict, separators=(",", ":"))
+        profile = lexical_profile(self.lexical_filter, content)
+        now = time.time()
+        with self._lock:
+            if self._db is not None:
+                cursor = self._db.execute(
+                    "INSERT INTO near_duplicates (namespace, num_perm, signature, verdict, created_at, lexical) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (namespace, self.hasher.num_perm, signature.astype("<u4").tobytes(), serialized, now,
+                     json.dumps(profile, separators=(",", ":"))),
+                )
+                self._db.commit()
+                entry_id = cursor.lastrowid
+            else:
+                entry_id = self._next_id
+            self._next_id = max(self._next_id, entry_id + 1)
+            self._insert(entry_id, namespace, signature, serialized, now, profile)
+            self.stats["inserts"] += 1
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def summary(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                "entries": len(self._signatures),
+                "bands": self.bands,
+                "rows": self.rows,
+                "hits": self.stats["hits"],
+                "misses": self.stats["misses"],
+                "inserts": self.stats["inserts"],
+                "vetoed": self.stats["vetoed"],
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "avg_candidates": self.stats["candidates"] / lookups if lookups else 0.0,
+                "avg_lookup_us": 1e6 * self.stats["lookup_s"] / lookups if lookups else 0.0,
+            }
+
+    def close(self):
+        if self.exact is not None:
+            self.exact.close()
+        with self._lock:
+            if self._db is not None:
+                self._db.commit()
+                self._db.close()
+                self._db = None
+
+
+# Example usage
+if __name__ == "__main__":
+    index = NearDuplicateIndex(db_path=None, threshold=0.7)
+    verdict = {"rating": "PG", "reasons": ["Mild language"],
+               "scores": {"violence": 0, "sexual_content": 0, "language": 1, "drugs": 0, "self_harm": 0}}
+    original = "honestly that round was close but the other team kept camping the spawn point damn"
+    index.store(original, "policy", "model", verdict)
+    repost = "hey guys welcome back " + original + " see you tomorrow"
+    print(json.dumps(index.lookup(repost, "policy", "model"), indent=2))
+    print(index.summary())
@@ -1,15 +1,33 @@
 from openai import OpenAI
 import json
-import re
 from dotenv import load_dotenv
 import os
 
+import telemetry
+from retry_policy import DEFAULT_RETRY_POLICY, breaker_for
+from verdict_schema import disable_structured_output, parse_verdict, record_attempt, structured_output_kwargs
+
 
 load_dotenv()  # loads .env
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENAI_API_KEY"),
-)
+_client = None
+
+
+def get_client():
+    """OpenRouter client, built on first use so importing MODEL or policy needs no API key"""
+    global _client
+    if _client is None:
+        _client = OpenAI(
+            base_url="https://openrouter.ai/api/v1",
+            api_key=os.getenv("OPENAI_API_KEY"),
+        )
+    return _client
+
+
+def __getattr__(name):
+    # Keeps "from openaioss import client" working without building it at import
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Define your policy
 policy = """
@@ -86,6 +104,9 @@ Where scores mean:
 
 Always choose the HIGHEST severity among categories when deciding the final rating.
 
+Transcripts may be condensed: a word or parenthesized phrase followed by [xN] was
+said N times in a row. "fuck [x5]" is five f-words and counts as frequent.
+
 Examples:
 
 Content: "Let's watch a movie and kiss a bit."
@@ -100,83 +121,67 @@ Content: [TRANSCRIPT]
 Answer:
 """
 
-def classify_content(content: str, max_retries: int = 3) -> dict:
+MODEL = "openai/gpt-oss-safeguard-20b"
+
+
+def classify_content(content: str, max_retries: int = 3, cache=None, prefilter=None,
+                     retry_policy=None) -> dict:
     """
     Classify content with guardrails and error handling.
     
     Args:
         content: The content to classify
         max_retries: Maximum number of retry attempts
+        cache: Optional VerdictCache consulted before calling the model
+        prefilter: Optional LexicalFilter that may answer obvious cases directly
+        retry_policy: Optional RetryPolicy (defaults to jittered exponential backoff)
         
     Returns:
         dict: Classification result with rating, reasons, and scores
     """
-    valid_ratings = ["G", "PG", "PG-13", "R"]
-    required_score_keys = ["violence", "sexual_content", "language", "drugs", "self_harm"]
+    if prefilter is not None:
+        verdict = prefilter.classify(content)
+        if verdict is not None:
+            return verdict
+    
+    if cache is not None:
+        cached = cache.lookup(content, policy, MODEL)
+        if cached is not None:
+            return cached
+    
+    retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+    client = get_client()
+    breaker = breaker_for(client)
+    
+    attempt = 0
+    while attempt < max_retries:
+        if not breaker.allow():
+            print(f"⚠ Circuit open for {breaker.name}. Returning fallback classification.")
+            return create_fallback_response(content, error=f"Circuit breaker open for {breaker.name}")
+        record_attempt(breaker.name, attempt)
+        structured = structured_output_kwargs(client)
     
-    for attempt in range(max_retries):
         try:
             # Make API call
-            response = client.chat.completions.create(
-                model="openai/gpt-oss-safeguard-20b",
-                messages=[
-                    {"role": "system", "content": policy},
-                    {"role": "user", "content": content}
-                ],
-                extra_body={"reasoning": {"enabled": True}},
-                timeout=30  # Add timeout
-            )
-            
-            raw_content = response.choices[0].message.content
-            
-            if not raw_content:
-                raise ValueError("Empty response from API")
-            
-            # Strip markdown code blocks if present
-            cleaned_content = re.sub(r'^```(?:json)?\s*|\s*```$', '', raw_content.strip(), flags=re.MULTILINE)
-            cleaned_content = cleaned_content.strip()
-            
-            # Parse JSON
-            result = json.loads(cleaned_content)
-            
-            # Validate structure
-            if not isinstance(result, dict):
-                raise ValueError("Response is not a JSON object")
-            
-            # Validate required fields
-            if "rating" not in result:
-                raise ValueError("Missing 'rating' field")
-            if "reasons" not in result:
-                raise ValueError("Missing 'reasons' field")
-            if "scores" not in result:
-                raise ValueError("Missing 'scores' field")
-            
-            # Validate rating value
-            if result["rating"] not in valid_ratings:
-                raise ValueError(f"Invalid rating: {result['rating']}. Must be one of {valid_ratings}")
-            
-            # Validate reasons
-            if not isinstance(result["reasons"], list):
-                raise ValueError("'reasons' must be a list")
-            if len(result["reasons"]) == 0:
-                raise ValueError("'reasons' cannot be empty")
-            
-            # Validate scores
-            if not isinstance(result["scores"], dict):
-                raise ValueError("'scores' must be an object")
-            
-            missing_keys = set(required_score_keys) - set(result["scores"].keys())
-            if missing_keys:
-                raise ValueError(f"Missing score keys: {missing_keys}")
-            
-            # Validate score values
-            for key, value in result["scores"].items():
-                if not isinstance(value, (int, float)):
-                    raise ValueError(f"Score '{key}' must be a number, got {type(value)}")
-                if not (0 <= value <= 3):
-                    raise ValueError(f"Score '{key}' must be between 0 and 3, got {value}")
+            with telemetry.span("model_call", backend=breaker.name):
+                response = client.chat.completions.create(
+                    model=MODEL,
+                    messages=[
+                        {"role": "system", "content": policy},
+                        {"role": "user", "content": content}
+                    ],
+                    extra_body={"reasoning": {"enabled": True}},
+                    timeout=30,  # Add timeout
+                    **structured
+                )
+            # The backend answered; malformed output is the model's fault, not the transport's
+            breaker.record_success()
+            telemetry.record_tokens(response, breaker.name)
             
             # Success! Return the validated result
+            result = parse_verdict(response.choices[0].message.content, breaker.name)
+            if cache is not None:
+                cache.store(content, policy, MODEL, result)
             return result
             
         except json.JSONDecodeError as e:
@@ -185,23 +190,32 @@ def classify_content(content: str, max_retries: int = 3) -> dict:
                 # Last attempt - return fallback
                 print("⚠ Max retries reached. Returning fallback classification.")
                 return create_fallback_response(content, error=str(e))
-            continue
+            retry_policy.sleep(attempt, e)
             
         except ValueError as e:
             print(f"✗ Attempt {attempt + 1}: Validation error: {e}")
             if attempt == max_retries - 1:
                 print("⚠ Max retries reached. Returning fallback classification.")
                 return create_fallback_response(content, error=str(e))
-            continue
+            retry_policy.sleep(attempt, e)
             
         except Exception as e:
+            if disable_structured_output(client, e, bool(structured)):
+                print(f"⚠ {breaker.name} rejected structured output. Retrying with prompt-only JSON.")
+                # The backend's fault, not the model's: resend at once without using up an attempt
+                continue
             print(f"✗ Attempt {attempt + 1}: Unexpected error: {type(e).__name__}: {e}")
+            if not retry_policy.should_retry(e):
+                print("⚠ Non-retryable error. Returning fallback classification.")
+                return create_fallback_response(content, error=str(e))
+            breaker.record_failure()
             if attempt == max_retries - 1:
                 print("⚠ Max retries reached. Returning fallback classification.")
                 return create_fallback_response(content, error=str(e))
-            continue
-    
-    # Should never reach here, but just in case
+            retry_policy.sleep(attempt, e)
+        attempt += 1
+
+    # Only reached with max_retries < 1
     return create_fallback_response(content, error="Max retries exceeded")
 
 
@@ -216,6 +230,7 @@ def create_fallback_response(content: str, error: str = None) -> dict:
     Returns:
         dict: Fallback classification (defaults to PG-13 for safety)
     """
+    telemetry.record_fallback(error)
     return {
         "rating": "PG-13",
         "reasons": [
@@ -0,0 +1,271 @@
+"""
+Shared Rate Limiter
+Token buckets for requests/min and tokens/min shared by every process that
+opens the same SQLite file, so a fleet of workers stays under one provider
+limit instead of each assuming it has the whole quota.
+
+The configured limits are ceilings. A 429 cuts the effective rates
+multiplicatively and pauses everyone for the Retry-After; successful calls
+raise them back linearly over time (AIMD), so the fleet settles just under
+whatever the provider is actually granting.
+"""
+
+import contextlib
+import sqlite3
+import threading
+import time
+import types
+
+from retry_policy import get_retry_after, get_status_code
+
+
+DEFAULT_DB_PATH = ".rate_limits.sqlite3"
+
+
+def estimate_request_tokens(kwargs, default_completion_tokens=512):
+    """Rough prompt + completion tokens for a chat request (about 4 characters per token)"""
+    chars = sum(len(m.get("content") or "") for m in kwargs.get("messages", ()))
+    return chars // 4 + (kwargs.get("max_tokens") or default_completion_tokens)
+
+
+class SharedRateLimiter:
+    """
+    Cross-process token buckets with AIMD adaptation to 429s.
+
+    Args:
+        db_path: SQLite file shared by all workers
+        name: Limit name (one per provider account)
+        requests_per_minute: Ceiling on requests/min, or None for no limit
+        tokens_per_minute: Ceiling on tokens/min, or None for no limit
+        burst_s: Bucket capacity, in seconds of the current rate (keep it at or
+            below the provider's own burst allowance)
+        decrease_factor: Rate multiplier applied on a 429
+        recovery_s: Seconds of successful calls to climb from zero back to the ceiling
+        min_fraction: Rates never drop below this share of the ceiling
+        decrease_cooldown_s: Only one cut per window, however many workers saw the 429 burst
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, name="default", requests_per_minute=None,
+                 tokens_per_minute=None, burst_s=1.0, decrease_factor=0.7, recovery_s=60.0,
+                 min_fraction=0.05, decrease_cooldown_s=2.0):
+        self.name = name
+        self.max_rpm = requests_per_minute
+        self.max_tpm = tokens_per_minute
+        self.burst_s = burst_s
+        self.decrease_factor = decrease_factor
+        self.recovery_s = recovery_s
+        self.min_fraction = min_fraction
+        self.decrease_cooldown_s = decrease_cooldown_s
+        self._lock = threading.Lock()
+        self.stats = {"acquired": 0, "waited_s": 0.0, "rate_limited": 0, "decreases": 0}
+
+        # Autocommit mode so BEGIN IMMEDIATE controls the write lock explicitly
+        self._db = sqlite3.connect(db_path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits ("
+            "name TEXT PRIMARY KEY, rpm REAL, tpm REAL, requests REAL NOT NULL, tokens REAL NOT NULL, "
+            "updated_at REAL NOT NULL, blocked_until REAL NOT NULL, last_decrease_at REAL NOT NULL, "
+            "last_increase_at REAL NOT NULL)"
+        )
+        with self._transaction() as db:
+            now = time.time()
+            db.execute(
+                "INSERT OR IGNORE INTO rate_limits VALUES (?, ?, ?, ?, ?, ?, 0, 0, ?)",
+                (name, requests_per_minute, tokens_per_minute,
+                 self._capacity(requests_per_minute), self._capacity(tokens_per_minute), now, now),
+            )
+            # A restarted fleet may come up with different ceilings; keep adapted rates within them
+            rpm, tpm = db.execute("SELECT rpm, tpm FROM rate_limits WHERE name = ?", (name,)).fetchone()
+            db.execute("UPDATE rate_limits SET rpm = ?, tpm = ? WHERE name = ?",
+                       (self._clamp(rpm, requests_per_minute), self._clamp(tpm, tokens_per_minute), name))
+
+    def _capacity(self, per_minute):
+        return per_minute * self.burst_s / 60.0 if per_minute else 0.0
+
+    @staticmethod
+    def _clamp(rate, ceiling):
+        if ceiling is None:
+            return None
+        return ceiling if rate is None else min(rate, ceiling)
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes SQLite's write lock up front, so the
+        # read-refill-write of a bucket is atomic across processes
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _refill(self, db, now):
+        row = db.execute(
+            "SELECT rpm, tpm, requests, tokens, updated_at, blocked_until FROM rate_limits WHERE name = ?",
+            (self.name,),
+        ).fetchone()
+        rpm, tpm, requests, tokens, updated_at, blocked_until = row
+        elapsed = max(0.0, now - updated_at)
+        if rpm:
+            requests = min(self._capacity(rpm), requests + elapsed * rpm / 60.0)
+        if tpm:
+            tokens = min(self._capacity(tpm), tokens + elapsed * tpm / 60.0)
+        return rpm, tpm, requests, tokens, blocked_until
+
+    def try_acquire(self, tokens=0):
+        """
+        Take one request and ``tokens`` tokens if available.
+
+        A request larger than the whole bucket is let through once the
+        bucket is full and leaves it in debt, so it cannot starve.
+
+        Returns:
+            float: 0.0 if acquired, otherwise seconds to wait before trying again
+        """
+        now = time.time()
+        with self._transaction() as db:
+            rpm, tpm, have_requests, have_tokens, blocked_until = self._refill(db, now)
+            waits = [blocked_until - now]
+            if rpm and have_requests < 1.0:
+                waits.append((1.0 - have_requests) * 60.0 / rpm)
+            if tpm:
+                needed = min(tokens, self._capacity(tpm))
+                if have_tokens < needed:
+                    waits.append((needed - have_tokens) * 60.0 / tpm)
+            wait = max(waits)
+            if wait <= 0:
+                have_requests -= 1.0 if rpm else 0.0
+                have_tokens -= tokens if tpm else 0.0
+            db.execute("UPDATE rate_limits SET requests = ?, tokens = ?, updated_at = ? WHERE name = ?",
+                       (have_requests, have_tokens, now, self.name))
+        return max(0.0, wait)
+
+    def acquire(self, tokens=0, timeout=None):
+        """
+        Block until a request slot and ``tokens`` tokens are available.
+
+        Returns:
+            float: Seconds spent waiting
+
+        Raises:
+            TimeoutError: If ``timeout`` seconds pass first
+        """
+        started = time.monotonic()
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                waited = time.monotonic() - started
+                with self._lock:
+                    self.stats["acquired"] += 1
+                    self.stats["waited_s"] += waited
+                return waited
+            if timeout is not None and time.monotonic() - started + wait > timeout:
+                raise TimeoutError(f"Rate limit '{self.name}' not available within {timeout}s")
+            # Re-check at least every second: other workers may refund or the rate may recover
+            time.sleep(min(wait, 1.0))
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """Settle the difference between the estimate taken up front and the real usage"""
+        if not self.max_tpm or actual_tokens is None:
+            return
+        with self._transaction() as db:
+            db.execute("UPDATE rate_limits SET tokens = tokens - ? WHERE name = ?",
+                       (actual_tokens - estimated_tokens, self.name))
+
+    def on_success(self):
+        """Additive increase towards the configured ceilings, proportional to the time since the last one"""
+        if not (self.max_rpm or self.max_tpm):
+            return
+        now = time.time()
+        with self._transaction() as db:
+            (last_increase_at,) = db.execute(
+                "SELECT last_increase_at FROM rate_limits WHERE name = ?", (self.name,)
+            ).fetchone()
+            # Idle gaps don't count as evidence that a higher rate would be accepted
+            step = min(max(0.0, now - last_increase_at), 1.0) / self.recovery_s
+            db.execute(
+                "UPDATE rate_limits SET rpm = MIN(?, rpm + ?), tpm = MIN(?, tpm + ?), last_increase_at = ? "
+                "WHERE name = ?",
+                (self.max_rpm, (self.max_rpm or 0) * step, self.max_tpm, (self.max_tpm or 0) * step,
+                 now, self.name),
+            )
+
+    def on_rate_limited(self, retry_after=None):
+        """Multiplicative decrease, and pause every worker for the Retry-After"""
+        now = time.time()
+        pause = retry_after if retry_after is not None else 1.0
+        with self._lock:
+            self.stats["rate_limited"] += 1
+        with self._transaction() as db:
+            (last_decrease_at,) = db.execute(
+                "SELECT last_decrease_at FROM rate_limits WHERE name = ?", (self.name,)
+            ).fetchone()
+            db.execute("UPDATE rate_limits SET blocked_until = MAX(blocked_until, ?) WHERE name = ?",
+                       (now + pause, self.name))
+            if now - last_decrease_at < self.decrease_cooldown_s:
+                return
+            db.execute(
+                "UPDATE rate_limits SET rpm = MAX(?, rpm * ?), tpm = MAX(?, tpm * ?), "
+                "requests = MIN(requests, 0), last_decrease_at = ?, last_increase_at = ? WHERE name = ?",
+                ((self.max_rpm or 0) * self.min_fraction, self.decrease_factor,
+                 (self.max_tpm or 0) * self.min_fraction, self.decrease_factor, now, now, self.name),
+            )
+        with self._lock:
+            self.stats["decreases"] += 1
+
+    def state(self):
+        """Current effective rates and bucket levels"""
+        with self._transaction() as db:
+            rpm, tpm, requests, tokens, blocked_until = self._refill(db, time.time())
+        return {"name": self.name, "rpm": rpm and round(rpm, 1), "tpm": tpm and round(tpm, 1),
+                "requests": round(requests, 2),
+                "tokens": round(tokens, 1), "blocked_for_s": round(max(0.0, blocked_until - time.time()), 2),
+                **self.stats}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class RateLimitedClient:
+    """
+    OpenAI-compatible client wrapper that takes from a SharedRateLimiter before every call.
+
+    Each attempt inside the classify loops (retries included) is metered,
+    429s feed the limiter's backoff and the real token usage is settled
+    afterwards. Keeps the wrapped client's ``base_url``, so circuit breakers
+    and metrics stay keyed the same way.
+
+    Args:
+        client: OpenAI client (or BackendRouter)
+        limiter: SharedRateLimiter
+        acquire_timeout: Longest wait for a slot before the call fails
+    """
+
+    def __init__(self, client, limiter, acquire_timeout=300.0):
+        self.client = client
+        self.limiter = limiter
+        self.acquire_timeout = acquire_timeout
+        self.base_url = client.base_url
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._create))
+
+    def __getattr__(self, name):
+        # models, stats(), backends ... pass straight through
+        return getattr(self.client, name)
+
+    def _create(self, **kwargs):
+        estimated = estimate_request_tokens(kwargs)
+        self.limiter.acquire(estimated, timeout=self.acquire_timeout)
+        try:
+            response = self.client.chat.completions.create(**kwargs)
+        except Exception as e:
+            if get_status_code(e) == 429:
+                self.limiter.on_rate_limited(get_retry_after(e))
+            raise
+        usage = getattr(response, "usage", None)
+        self.limiter.record_usage(estimated, getattr(usage, "total_tokens", None))
+        self.limiter.on_success()
+        return response
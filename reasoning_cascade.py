@@ -0,0 +1,231 @@
+"""
+Reasoning Cascade
+Classifies every transcript with a cheap pass first (reasoning disabled or
+at low effort) and only re-classifies it with full reasoning when the cheap
+verdict is borderline:
+
+- validation: the cheap pass fell back (unparseable or invalid output)
+- mismatch: the rating disagrees with the rating its own highest score implies
+- threshold: the highest score sits between two levels (e.g. 1.5)
+- rating: the rating is one of ``escalate_ratings``
+- audit: a random sample of confident verdicts, so agreement between the
+  tiers is also measured on the traffic that is not escalated
+
+Per-tier resolution counts and the agreement rate between tiers (overall,
+per escalation reason and per cheap rating) are kept in ``summary()`` to
+tune these rules.
+"""
+
+import json
+import random
+import threading
+import time
+
+import telemetry
+from audio_converter import MODEL, POLICY, classify_content
+from verdict_schema import VALID_RATINGS
+
+
+FAST_REASONING = {
+    "none": {"enabled": False},
+    "low": {"effort": "low"},
+    "medium": {"effort": "medium"},
+}
+FULL_REASONING = {"enabled": True}
+
+
+def implied_rating(scores):
+    """Rating implied by the highest category score (0 G, 1 PG, 2 PG-13, 3 R)"""
+    highest = max(scores.values(), default=0)
+    return VALID_RATINGS[min(len(VALID_RATINGS) - 1, max(0, int(round(highest))))]
+
+
+class ReasoningCascade:
+    """
+    Two-tier classifier with the ``classify_content`` call signature.
+
+    Drops in wherever a classification function is accepted (AudioPipeline
+    ``classify=``, ClassifyService ``classify=``, the work queue workers).
+    Full-reasoning verdicts are cached under the same key as
+    ``classify_content``. Verdicts resolved by the cheap tier are cached under a
+    key that includes its reasoning options and keep a ``cascade`` block, so
+    plain ``classify_content`` callers never get them and VerdictLog does not
+    learn from them.
+
+    Args:
+        fast_reasoning: Reasoning options of the cheap pass
+        full_reasoning: Reasoning options of the escalation pass
+        escalate_ratings: Cheap ratings that are always escalated
+        threshold_margin: A highest score further than this from a whole level is borderline
+        audit_rate: Fraction of confident verdicts escalated anyway to measure agreement
+        seed: Random seed for the audit sample
+    """
+
+    def __init__(self, fast_reasoning=FAST_REASONING["low"], full_reasoning=FULL_REASONING,
+                 escalate_ratings=(), threshold_margin=0.25, audit_rate=0.02, seed=None):
+        self.fast_reasoning = fast_reasoning
+        self.full_reasoning = full_reasoning
+        self.escalate_ratings = set(escalate_ratings)
+        self.threshold_margin = threshold_margin
+        self.audit_rate = audit_rate
+        self._rng = random.Random(seed)
+        # Cache "model" of cheap-tier verdicts: never mistaken for full-reasoning ones
+        self.fast_cache_model = MODEL + "|reasoning=" + json.dumps(fast_reasoning, sort_keys=True)
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "cache_hits": 0,
+            "fast": 0,
+            "full": 0,
+            "full_failed": 0,
+            "fast_s": 0.0,
+            "full_s": 0.0,
+            "escalations": {},  # reason -> count
+            "agreement": {},    # "reason:<reason>" / "rating:<fast rating>" -> [compared, agreed]
+        }
+
+    def escalation_reasons(self, verdict):
+        """
+        Why a cheap-tier verdict should be re-classified with full reasoning.
+
+        Returns:
+            list: Reasons (empty if the verdict is confident)
+        """
+        if verdict.get("error"):
+            return ["validation"]
+        reasons = []
+        scores = verdict.get("scores") or {}
+        if verdict.get("rating") != implied_rating(scores):
+            reasons.append("mismatch")
+        highest = max(scores.values(), default=0)
+        if abs(highest - round(highest)) > self.threshold_margin:
+            reasons.append("threshold")
+        if verdict.get("rating") in self.escalate_ratings:
+            reasons.append("rating")
+        if not reasons and self.audit_rate > 0:
+            with self._lock:
+                audit = self._rng.random() < self.audit_rate
+            if audit:
+                reasons.append("audit")
+        return reasons
+
+    def _tier(self, name, openai_client, content, max_retries, retry_policy, reasoning):
+        started = time.perf_counter()
+        with telemetry.span("cascade_tier", tier=name):
+            verdict = classify_content(openai_client, content, max_retries, retry_policy=retry_policy,
+                                       reasoning=reasoning)
+        with self._lock:
+            self.stats[name + "_s"] += time.perf_counter() - started
+        return verdict
+
+    def _record(self, fast, full, reasons):
+        with self._lock:
+            for reason in reasons:
+                self.stats["escalations"][reason] = self.stats["escalations"].get(reason, 0) + 1
+            if full.get("error"):
+                self.stats["full_failed"] += 1
+                return
+            self.stats["full"] += 1
+            if fast.get("error"):
+                return
+            agreed = fast["rating"] == full["rating"]
+            for key in ["reason:" + reason for reason in reasons] + ["rating:" + fast["rating"]]:
+                counts = self.stats["agreement"].setdefault(key, [0, 0])
+                counts[0] += 1
+                counts[1] += agreed
+        telemetry.count("cascade_compared", 1, agreed=str(agreed).lower())
+
+    def __call__(self, openai_client, content, max_retries=3, cache=None, retry_policy=None):
+        with self._lock:
+            self.stats["requests"] += 1
+        if cache is not None:
+            cached = cache.lookup(content, POLICY, MODEL) or cache.lookup(content, POLICY, self.fast_cache_model)
+            if cached is not None:
+                with self._lock:
+                    self.stats["cache_hits"] += 1
+                return cached
+
+        fast = self._tier("fast", openai_client, content, max_retries, retry_policy, self.fast_reasoning)
+        reasons = self.escalation_reasons(fast)
+        if not reasons:
+            with self._lock:
+                self.stats["fast"] += 1
+            telemetry.count("cascade_resolved", 1, tier="fast")
+            verdict, tier = fast, "fast"
+        else:
+            for reason in reasons:
+                telemetry.count("cascade_escalations", 1, reason=reason)
+            full = self._tier("full", openai_client, content, max_retries, retry_policy, self.full_reasoning)
+            self._record(fast, full, reasons)
+            # A valid cheap verdict beats a fallback if the full pass fails
+            verdict, tier = (fast, "fast") if full.get("error") and not fast.get("error") else (full, "full")
+            telemetry.count("cascade_resolved", 1, tier=tier)
+
+        result = {**verdict, "cascade": {"tier": tier, "escalated": reasons}}
+        if cache is not None:
+            if tier == "full":
+                cache.store(content, POLICY, MODEL, verdict)
+            else:
+                cache.store(content, POLICY, self.fast_cache_model, result)
+        return result
+
+    def summary(self):
+        """Per-tier resolution rates, latency and agreement between the tiers"""
+        with self._lock:
+            stats = dict(self.stats)
+            escalations = dict(stats["escalations"])
+            agreement = {key: list(counts) for key, counts in stats["agreement"].items()}
+        classified = stats["requests"] - stats["cache_hits"]
+        compared = sum(counts[0] for key, counts in agreement.items() if key.startswith("rating:"))
+        agreed = sum(counts[1] for key, counts in agreement.items() if key.startswith("rating:"))
+        escalated = classified - stats["fast"]
+        return {
+            "requests": stats["requests"],
+            "cache_hits": stats["cache_hits"],
+            "fast_resolved": stats["fast"],
+            "full_resolved": stats["full"],
+            "full_failed": stats["full_failed"],
+            "fast_rate": stats["fast"] / classified if classified else 0.0,
+            "escalated": escalated,
+            "escalation_rate": escalated / classified if classified else 0.0,
+            "escalations": escalations,
+            "compared": compared,
+            "agreed": agreed,
+            "agreement_rate": agreed / compared if compared else None,
+            "agreement": {key: {"compared": counts[0], "agreed": counts[1],
+                                "rate": round(counts[1] / counts[0], 3)}
+                          for key, counts in sorted(agreement.items())},
+            "avg_fast_ms": round(1000 * stats["fast_s"] / classified, 1) if classified else 0.0,
+            "avg_full_ms": round(1000 * stats["full_s"] / escalated, 1) if escalated else 0.0,
+        }
+
+
+def add_cascade_arguments(parser):
+    """Add the ``--cascade`` options to an argparse parser"""
+    parser.add_argument("--cascade", nargs="?", const="low", default=None, choices=list(FAST_REASONING),
+                        help="Classify with a cheap reasoning pass first and escalate borderline verdicts "
+                             "(cheap pass effort, default: low)")
+    parser.add_argument("--cascade-audit-rate", type=float, default=0.02,
+                        help="Share of confident cheap verdicts escalated anyway to measure agreement")
+    parser.add_argument("--cascade-escalate-rating", action="append", default=[], choices=VALID_RATINGS,
+                        help="Always escalate cheap verdicts with this rating (repeatable)")
+
+
+def cascade_from_args(args):
+    """ReasoningCascade configured by ``add_cascade_arguments``, or None without ``--cascade``"""
+    if args.cascade is None:
+        return None
+    return ReasoningCascade(fast_reasoning=FAST_REASONING[args.cascade],
+                            escalate_ratings=args.cascade_escalate_rating,
+                            audit_rate=args.cascade_audit_rate)
+
+
+# Example usage
+if __name__ == "__main__":
+    from audio_converter import initialize_clients
+
+    _, openai_client = initialize_clients()
+    cascade = ReasoningCascade()
+    for text in ["Let's go get some pizza after the game.", "Damn, that was a hell of a match."]:
+        print(json.dumps(cascade(openai_client, text), indent=2))
+    print(json.dumps(cascade.summary(), indent=2))
@@ -0,0 +1,223 @@
+"""
+Retry Policy and Circuit Breaker
+Shared retry behaviour for the classification loops. Errors are classified
+so malformed model output is retried immediately while rate limits and
+transport failures back off exponentially with full jitter (honouring
+Retry-After). A circuit breaker per backend fails fast while a provider is
+down instead of letting every request run out its retries.
+"""
+
+import asyncio
+import email.utils
+import json
+import random
+import threading
+import time
+
+
+def get_status_code(error):
+    """Best-effort HTTP status code from an OpenAI / Hathora / httpx exception"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def get_retry_after(error):
+    """Seconds requested by a Retry-After / retry-after-ms header, if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            parsed = email.utils.parsedate_to_datetime(value)
+            return max(0.0, parsed.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(error):
+    """
+    Bucket an exception for retry decisions.
+
+    Returns:
+        str: ``"validation"`` (bad model output, retry now), ``"rate_limit"``,
+        ``"server"`` (5xx / timeout / connection, back off), or ``"client"``
+        (other 4xx, not retryable)
+    """
+    if isinstance(error, (json.JSONDecodeError, ValueError)):
+        return "validation"
+    status = get_status_code(error)
+    if status == 429:
+        return "rate_limit"
+    if status is not None and 400 <= status < 500 and status not in (408, 409):
+        return "client"
+    return "server"
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter.
+
+    Args:
+        base_delay: Delay cap for the first retry, in seconds
+        max_delay: Upper bound on any single delay
+        max_retry_after: Longest Retry-After that will be honoured
+    """
+
+    def __init__(self, base_delay=0.5, max_delay=20.0, max_retry_after=60.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def should_retry(self, error):
+        return classify_error(error) != "client"
+
+    def delay(self, attempt, error):
+        """Seconds to wait before retry number ``attempt + 1``"""
+        kind = classify_error(error)
+        if kind == "validation":
+            return 0.0
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            # Small jitter on top so a fleet told the same value doesn't resync
+            return min(retry_after, self.max_retry_after) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _next_delay(self, attempt, error):
+        delay = self.delay(attempt, error)
+        record("retries_" + classify_error(error))
+        if delay > 0:
+            record("backoff_seconds", delay)
+        return delay
+
+    def sleep(self, attempt, error):
+        """Block for the backoff before the next attempt"""
+        delay = self._next_delay(attempt, error)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def sleep_async(self, attempt, error):
+        """Await the backoff before the next attempt"""
+        delay = self._next_delay(attempt, error)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+
+class CircuitBreaker:
+    """
+    Closed → open after ``failure_threshold`` consecutive transport failures;
+    open → half-open after ``recovery_timeout`` seconds, letting
+    ``half_open_max_calls`` probes through per ``recovery_timeout``; a
+    successful probe closes it and a failed one re-opens it.
+
+    Every retry loop follows one rule: any response from the backend is a
+    success, however malformed its content, and only retryable transport,
+    server and rate-limit errors (``RetryPolicy.should_retry``) are failures.
+    Bad model output is retried, but it never opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30.0, half_open_max_calls=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a request may be sent now"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    record("breaker_rejections")
+                    return False
+                self._transition(self.HALF_OPEN)
+                self.opened_at = time.monotonic()
+                self.half_open_calls = 0
+            if self.state == self.HALF_OPEN:
+                if self.half_open_calls >= self.half_open_max_calls:
+                    # A probe that never reported back must not wedge the breaker
+                    if time.monotonic() - self.opened_at < self.recovery_timeout:
+                        record("breaker_rejections")
+                        return False
+                    self.opened_at = time.monotonic()
+                    self.half_open_calls = 0
+                self.half_open_calls += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                if self.state != self.OPEN:
+                    self._transition(self.OPEN)
+
+    def _transition(self, state):
+        record(f"breaker_{state}")
+        self.state = state
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def record(name, amount=1):
+    """Increment a retry/breaker counter"""
+    with _metrics_lock:
+        _metrics[name] = _metrics.get(name, 0) + amount
+
+
+def get_breaker(name, **kwargs):
+    """Return the shared circuit breaker for a backend, creating it on first use"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, **kwargs)
+        return breaker
+
+
+def breaker_for(client):
+    """Circuit breaker keyed by an OpenAI-compatible client's base URL"""
+    return get_breaker(str(getattr(client, "base_url", "default")))
+
+
+def retry_metrics():
+    """Snapshot of retry counters and breaker states"""
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+    with _breakers_lock:
+        snapshot["breakers"] = {
+            name: {"state": breaker.state, "consecutive_failures": breaker.failures}
+            for name, breaker in _breakers.items()
+        }
+    return snapshot
@@ -0,0 +1,397 @@
+"""
+Streaming Classifier
+Consumes chat-completion tokens as they arrive and parses the verdict object
+incrementally. The rating is emitted the moment its string closes, reasons
+and scores follow as they complete, and output that cannot become a valid
+verdict is rejected as soon as it goes wrong so a retry can start before the
+full generation finishes. Before each retry a ``retry`` event tells listeners
+to drop the events the failed attempt already sent.
+"""
+
+import json
+import re
+import time
+
+import telemetry
+from openaioss import MODEL, policy, create_fallback_response
+from retry_policy import DEFAULT_RETRY_POLICY, breaker_for
+from verdict_schema import REQUIRED_SCORE_KEYS, VALID_RATINGS, backend_name, parse_verdict, record_attempt
+
+
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?")
+_NUMBER_PREFIX_RE = re.compile(r"-?\d*\.?\d*(?:[eE][+-]?\d*)?")
+_LITERALS = {"true": True, "false": False, "null": None}
+_FENCE_PREFIXES = ("```json", "```")
+
+
+class StreamingVerdictParser:
+    """
+    Incremental parser for the verdict JSON object.
+
+    Feed it text fragments in order; each call returns the events that became
+    complete. Events are dicts with a ``type`` of ``"rating"``, ``"reason"``
+    or ``"score"``. A ValueError is raised as soon as the stream can no longer
+    produce a valid verdict.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._stack = []  # frames: {"type": "obj"|"arr", "key", "expect", "index"}
+        self.started = False
+        self.done = False
+        self.rating = None
+        self.reasons = []
+        self.scores = {}
+
+    def feed(self, text: str) -> list:
+        self._buffer += text
+        events = []
+        if not self.started and not self._skip_preamble():
+            return events
+        while not self.done:
+            if not self._step(events):
+                break
+        # Drop consumed input so the buffer stays small on long streams
+        if self._pos > 4096:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        return events
+
+    def _skip_preamble(self):
+        stripped = self._buffer.lstrip()
+        for fence in _FENCE_PREFIXES:
+            if fence.startswith(stripped) and len(stripped) < len("```json"):
+                return False  # could still be a fence, wait for more
+        offset = len(self._buffer) - len(stripped)
+        for fence in _FENCE_PREFIXES:
+            if stripped.startswith(fence):
+                offset += len(fence)
+                break
+        rest = self._buffer[offset:].lstrip()
+        if not rest:
+            return False
+        if rest[0] != "{":
+            raise ValueError(f"Response does not start with a JSON object: {rest[:20]!r}")
+        self._pos = len(self._buffer) - len(rest)
+        self.started = True
+        return True
+
+    def _path(self):
+        return tuple(frame["key"] if frame["type"] == "obj" else frame["index"] for frame in self._stack)
+
+    def _step(self, events):
+        buffer, pos = self._buffer, self._pos
+        while pos < len(buffer) and buffer[pos] in " \t\r\n":
+            pos += 1
+        self._pos = pos
+        if pos >= len(buffer):
+            return False
+
+        char = buffer[pos]
+        frame = self._stack[-1] if self._stack else None
+
+        if frame is not None and frame["expect"] == "colon":
+            if char != ":":
+                raise ValueError(f"Expected ':' after key {frame['key']!r}")
+            frame["expect"] = "value"
+            self._pos = pos + 1
+            return True
+
+        if frame is not None and frame["expect"] == "comma":
+            closer = "}" if frame["type"] == "obj" else "]"
+            if char == ",":
+                frame["expect"] = "key" if frame["type"] == "obj" else "value"
+                if frame["type"] == "arr":
+                    frame["index"] += 1
+                self._pos = pos + 1
+                return True
+            if char == closer:
+                self._pos = pos + 1
+                self._close(events)
+                return True
+            raise ValueError(f"Expected ',' or {closer!r}, got {char!r}")
+
+        if frame is not None and frame["type"] == "obj" and frame["expect"] == "key":
+            if char == "}":
+                self._pos = pos + 1
+                self._close(events)
+                return True
+            if char != '"':
+                raise ValueError(f"Expected object key, got {char!r}")
+            value, end = self._read_string(pos)
+            if end is None:
+                return False
+            frame["key"] = value
+            frame["expect"] = "colon"
+            self._check_key(value)
+            self._pos = end
+            return True
+
+        if frame is not None and frame["type"] == "arr" and char == "]" and frame["index"] == 0 \
+                and frame.get("empty", True):
+            self._pos = pos + 1
+            self._close(events)
+            return True
+
+        # Otherwise a value is expected
+        if char == "{" or char == "[":
+            self._check_container(char)
+            self._stack.append({
+                "type": "obj" if char == "{" else "arr",
+                "key": None,
+                "expect": "key" if char == "{" else "value",
+                "index": 0,
+            })
+            self._pos = pos + 1
+            return True
+
+        if char == '"':
+            value, end = self._read_string(pos)
+            if end is None:
+                self._check_partial_string(buffer[pos + 1:])
+                return False
+            self._pos = end
+            self._value(value, events)
+            return True
+
+        if char == "-" or char.isdigit():
+            end = _NUMBER_PREFIX_RE.match(buffer, pos).end()
+            if end == len(buffer):
+                return False  # number may continue in the next fragment
+            if not _NUMBER_RE.fullmatch(buffer, pos, end):
+                raise ValueError(f"Invalid number {buffer[pos:end]!r} in response")
+            self._pos = end
+            self._value(json.loads(buffer[pos:end]), events)
+            return True
+
+        for literal, value in _LITERALS.items():
+            if buffer.startswith(literal, pos):
+                self._pos = pos + len(literal)
+                self._value(value, events)
+                return True
+            if literal.startswith(buffer[pos:]):
+                return False
+        raise ValueError(f"Unexpected character {char!r} in response")
+
+    def _read_string(self, pos):
+        """Return (decoded string, end position) or (None, None) if incomplete"""
+        i = pos + 1
+        buffer = self._buffer
+        while i < len(buffer):
+            if buffer[i] == "\\":
+                i += 2
+                continue
+            if buffer[i] == '"':
+                return json.loads(buffer[pos:i + 1]), i + 1
+            i += 1
+        return None, None
+
+    def _check_key(self, key):
+        path = self._path()
+        if len(path) == 2 and path[0] == "scores" and key not in REQUIRED_SCORE_KEYS:
+            raise ValueError(f"Unexpected score key: {key!r}")
+
+    def _check_container(self, char):
+        path = self._path()
+        if not self._stack and char != "{":
+            raise ValueError("Response is not a JSON object")
+        if path == ("reasons",) and char != "[":
+            raise ValueError("'reasons' must be a list")
+        if path == ("scores",) and char != "{":
+            raise ValueError("'scores' must be an object")
+        if path == ("rating",):
+            raise ValueError("'rating' must be a string")
+
+    def _check_partial_string(self, partial):
+        if self._path() == ("rating",) and "\\" not in partial:
+            if not any(rating.startswith(partial) for rating in VALID_RATINGS):
+                raise ValueError(f"Invalid rating: {partial!r}... Must be one of {VALID_RATINGS}")
+
+    def _value(self, value, events):
+        path = self._path()
+        frame = self._stack[-1]
+        frame["expect"] = "comma"
+        frame["empty"] = False
+
+        if path == ("rating",):
+            if value not in VALID_RATINGS:
+                raise ValueError(f"Invalid rating: {value}. Must be one of {VALID_RATINGS}")
+            self.rating = value
+            events.append({"type": "rating", "value": value})
+        elif path == ("reasons",) or path == ("scores",):
+            raise ValueError(f"'{path[0]}' has the wrong type")
+        elif len(path) == 2 and path[0] == "reasons":
+            self.reasons.append(value)
+            events.append({"type": "reason", "index": path[1], "value": value})
+        elif len(path) == 2 and path[0] == "scores":
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"Score '{path[1]}' must be a number, got {type(value)}")
+            if not (0 <= value <= 3):
+                raise ValueError(f"Score '{path[1]}' must be between 0 and 3, got {value}")
+            self.scores[path[1]] = value
+            events.append({"type": "score", "key": path[1], "value": value})
+
+    def _close(self, events):
+        self._stack.pop()
+        if not self._stack:
+            self.done = True
+            return
+        parent = self._stack[-1]
+        parent["expect"] = "comma"
+        parent["empty"] = False
+
+
+def stream_classification(client, content: str, model: str = MODEL, policy_text: str = policy,
+                          extra_body=None, timeout: int = 30):
+    """
+    Stream one classification attempt, yielding parser events as they complete.
+
+    The final event has ``type`` ``"verdict"`` and carries the fully validated
+    result. Malformed output raises ValueError mid-stream and the HTTP stream
+    is closed immediately.
+
+    Args:
+        client: Initialized OpenAI client
+        content: The content to classify
+        model: Model id
+        policy_text: System prompt / policy
+        extra_body: Provider-specific request fields
+        timeout: Request timeout in seconds
+
+    Yields:
+        dict: rating / reason / score events, then the verdict
+    """
+    backend = backend_name(client)
+    started = time.perf_counter()
+    status = "error"
+    stream = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": policy_text},
+            {"role": "user", "content": content}
+        ],
+        extra_body=extra_body,
+        stream=True,
+        timeout=timeout
+    )
+    parser = StreamingVerdictParser()
+    pieces = []
+    try:
+        for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                telemetry.record_tokens(chunk, backend)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            pieces.append(delta)
+            yield from parser.feed(delta)
+        status = "ok"
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+        # Spans the whole stream, including early aborts on malformed output
+        telemetry.record_stage("model_call", time.perf_counter() - started, status, backend=backend)
+
+    yield {"type": "verdict", "value": parse_verdict("".join(pieces), backend)}
+
+
+def _announce_retry(on_event, attempt, error):
+    # Events already forwarded came from an attempt that is being thrown away
+    if on_event is not None:
+        on_event({"type": "retry", "attempt": attempt + 1, "error": str(error)})
+
+
+def classify_content_streaming(client, content: str, on_event=None, max_retries: int = 3,
+                               model: str = MODEL, policy_text: str = policy,
+                               reasoning: bool = True, retry_policy=None) -> dict:
+    """
+    Classify content with a streaming request and early rating emission.
+
+    Args:
+        client: Initialized OpenAI client
+        content: The content to classify
+        on_event: Optional callback receiving rating / reason / score events
+            as soon as each is complete, and a ``retry`` event (with the failed
+            ``attempt`` number and the ``error``) before each retry; events
+            received before a ``retry`` are void
+        max_retries: Maximum number of retry attempts
+        model: Model id
+        policy_text: System prompt / policy
+        reasoning: Send the OpenRouter reasoning flag (disable for Ollama)
+        retry_policy: Optional RetryPolicy (defaults to jittered exponential backoff)
+
+    Returns:
+        dict: Classification result with rating, reasons, and scores
+    """
+    extra_body = {"reasoning": {"enabled": True}} if reasoning else None
+    retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+    breaker = breaker_for(client)
+
+    for attempt in range(max_retries):
+        if not breaker.allow():
+            print(f"⚠ Circuit open for {breaker.name}. Returning fallback classification.")
+            return create_fallback_response(content, error=f"Circuit breaker open for {breaker.name}")
+        record_attempt(breaker.name, attempt)
+
+        try:
+            for event in stream_classification(client, content, model, policy_text, extra_body):
+                if event["type"] == "verdict":
+                    breaker.record_success()
+                    return event["value"]
+                if on_event is not None:
+                    on_event(event)
+
+        except json.JSONDecodeError as e:
+            breaker.record_success()  # the backend answered, just badly
+            print(f"✗ Attempt {attempt + 1}: JSON parsing error: {e}")
+            if attempt == max_retries - 1:
+                print("⚠ Max retries reached. Returning fallback classification.")
+                return create_fallback_response(content, error=str(e))
+            _announce_retry(on_event, attempt, e)
+            retry_policy.sleep(attempt, e)
+            continue
+
+        except ValueError as e:
+            breaker.record_success()
+            print(f"✗ Attempt {attempt + 1}: Validation error: {e}")
+            if attempt == max_retries - 1:
+                print("⚠ Max retries reached. Returning fallback classification.")
+                return create_fallback_response(content, error=str(e))
+            _announce_retry(on_event, attempt, e)
+            retry_policy.sleep(attempt, e)
+            continue
+
+        except Exception as e:
+            print(f"✗ Attempt {attempt + 1}: Unexpected error: {type(e).__name__}: {e}")
+            if not retry_policy.should_retry(e):
+                print("⚠ Non-retryable error. Returning fallback classification.")
+                return create_fallback_response(content, error=str(e))
+            breaker.record_failure()
+            if attempt == max_retries - 1:
+                print("⚠ Max retries reached. Returning fallback classification.")
+                return create_fallback_response(content, error=str(e))
+            _announce_retry(on_event, attempt, e)
+            retry_policy.sleep(attempt, e)
+            continue
+
+    return create_fallback_response(content, error="Max retries exceeded")
+
+
+# Example usage
+if __name__ == "__main__":
+    from openaioss import client
+
+    def show(event):
+        if event["type"] == "rating":
+            print(f"→ Rating: {event['value']}")
+        elif event["type"] == "retry":
+            print(f"⚠ Attempt {event['attempt']} failed, discarding its events")
+        else:
+            print(f"  {event['type']}: {event.get('key', event.get('index'))} = {event['value']}")
+
+    result = classify_content_streaming(client, "I'm going to f***ing kill you tonight.", on_event=show)
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,503 @@
+"""
+Stub Model and STT Server
+A local HTTP server that speaks enough of the OpenAI chat-completions API
+(including streaming and micro-batch prompts) and a Hathora-style
+speech-to-text endpoint to exercise the classifiers offline. Latency follows
+a log-normal distribution with a configurable median and p99; errors, 429s
+and malformed model output are injected at configurable rates. Everything
+is seeded so runs are reproducible.
+
+``stub_speech`` synthesizes PCM that the STT endpoint transcribes back word
+by word, so streaming code can be tested on arbitrary windows of a stream.
+
+Usage:
+    python stub_server.py --port 8089 --latency-ms 400 --rate-limit-rate 0.05
+    # then point a client at http://127.0.0.1:8089/v1
+"""
+
+import argparse
+import array
+import io
+import json
+import math
+import random
+import sys
+import threading
+import time
+import types
+import urllib.error
+import urllib.request
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+STUB_AUDIO_MAGIC = b"STUBAUDIO\n"
+# Every stub-speech word starts with this int16 sample pair, then its block
+# length in samples, its UTF-8 length and one sample per byte
+STUB_WORD_MARKER = (12345, -12345)
+_STUB_WORD_BYTES = array.array("h", STUB_WORD_MARKER).tobytes()
+
+_Z_99 = 2.326  # standard normal quantile at p99
+
+_STRONG_WORDS = ("fuck", "shit", "kill", "cunt")
+_MILD_WORDS = ("damn", "hell", "crap", "beer", "kiss")
+
+
+class StubConfig:
+    """
+    Behaviour of the stub server.
+
+    Args:
+        latency_ms: Median model latency
+        latency_p99_ms: p99 model latency (sets the log-normal spread)
+        ms_per_1k_tokens: Extra model latency per 1k prompt tokens
+        error_rate: Fraction of model requests answered with HTTP 500
+        rate_limit_rate: Fraction answered with HTTP 429 + Retry-After
+        retry_after_s: Retry-After value sent with 429s
+        requests_per_minute: Provider-style request quota (1 s burst); requests over it
+            get HTTP 429 with the time until the next slot as Retry-After. 0 disables it
+        malformed_rate: Fraction of 200 responses whose content is not a valid verdict
+        fast_latency_factor: Latency multiplier for requests with reasoning disabled or at low effort
+        fast_noise_rate: Fraction of those requests answered one rating level off (half with
+            matching scores, half with the scores left as they were)
+        stt_latency_ms: Median STT latency
+        stt_latency_p99_ms: p99 STT latency
+        stt_ms_per_mb: Extra STT latency per MB uploaded
+        stt_error_rate: Fraction of STT requests answered with HTTP 500
+        seed: Random seed
+    """
+
+    def __init__(self, latency_ms=400.0, latency_p99_ms=1500.0, ms_per_1k_tokens=50.0,
+                 error_rate=0.0, rate_limit_rate=0.0, retry_after_s=1.0, requests_per_minute=0.0,
+                 malformed_rate=0.0, fast_latency_factor=0.3, fast_noise_rate=0.0, stt_latency_ms=600.0, stt_latency_p99_ms=2000.0, stt_ms_per_mb=200.0,
+                 stt_error_rate=0.0, seed=0):
+        self.latency_ms = latency_ms
+        self.latency_p99_ms = latency_p99_ms
+        self.ms_per_1k_tokens = ms_per_1k_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_s = retry_after_s
+        self.requests_per_minute = requests_per_minute
+        self.malformed_rate = malformed_rate
+        self.fast_latency_factor = fast_latency_factor
+        self.fast_noise_rate = fast_noise_rate
+        self.stt_latency_ms = stt_latency_ms
+        self.stt_latency_p99_ms = stt_latency_p99_ms
+        self.stt_ms_per_mb = stt_ms_per_mb
+        self.stt_error_rate = stt_error_rate
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+def sample_latency(rng, median_ms, p99_ms):
+    """Log-normal latency in seconds with the given median and p99"""
+    if median_ms <= 0:
+        return 0.0
+    sigma = math.log(max(p99_ms, median_ms) / median_ms) / _Z_99
+    return median_ms * math.exp(sigma * rng.gauss(0.0, 1.0)) / 1000.0
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token)"""
+    return max(1, len(text) // 4)
+
+
+def stub_verdict(content):
+    """A plausible, deterministic verdict for a transcript"""
+    lowered = content.lower()
+    strong = sum(lowered.count(word) for word in _STRONG_WORDS)
+    mild = sum(lowered.count(word) for word in _MILD_WORDS)
+    if strong >= 2:
+        rating, level = "R", 3
+    elif strong:
+        rating, level = "PG-13", 2
+    elif mild:
+        rating, level = "PG", 1
+    else:
+        rating, level = "G", 0
+    return {
+        "rating": rating,
+        "reasons": ["Stub verdict"],
+        "scores": {"violence": 0, "sexual_content": 0, "language": level, "drugs": 0, "self_harm": 0},
+    }
+
+
+def _is_fast_request(request):
+    """Reasoning disabled or at low effort"""
+    reasoning = request.get("reasoning") or {}
+    return reasoning.get("enabled") is False or reasoning.get("effort") in ("minimal", "low")
+
+
+def _shift_rating(verdict, rng):
+    """Move a verdict one rating level, sometimes leaving its scores behind"""
+    ratings = ["G", "PG", "PG-13", "R"]
+    index = ratings.index(verdict["rating"])
+    index = index + 1 if index == 0 or (index < 3 and rng.random() < 0.5) else index - 1
+    verdict["rating"] = ratings[index]
+    if rng.random() < 0.5:
+        verdict["scores"]["language"] = index
+    return verdict
+
+
+def _malformed(rng, content):
+    return rng.choice([
+        content[:len(content) // 2],
+        "Sure! Here is the rating: " + content,
+        content.replace('"rating"', '"ratng"'),
+        "",
+    ])
+
+
+class StubServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer holding the stub config, RNG and request counters"""
+
+    daemon_threads = True
+    request_queue_size = 256  # benchmarks open many connections at once
+
+    def __init__(self, address, config):
+        super().__init__(address, _StubHandler)
+        self.config = config
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self.counters = {}
+        self._quota = (max(1.0, config.requests_per_minute / 60.0), time.monotonic())
+
+    def draw(self):
+        """Uniform random number in [0, 1), shared seeded stream"""
+        with self._lock:
+            return self._rng.random()
+
+    def latency(self, median_ms, p99_ms):
+        with self._lock:
+            return sample_latency(self._rng, median_ms, p99_ms)
+
+    def rng_choice(self, content):
+        with self._lock:
+            return _malformed(self._rng, content)
+
+    def take_quota(self):
+        """
+        Take one request from the per-minute quota.
+
+        Returns:
+            float: 0.0 if allowed, otherwise seconds until a request would be
+        """
+        per_second = self.config.requests_per_minute / 60.0
+        if per_second <= 0:
+            return 0.0
+        with self._lock:
+            level, updated_at = self._quota
+            now = time.monotonic()
+            level = min(max(1.0, per_second), level + (now - updated_at) * per_second)
+            if level < 1.0:
+                self._quota = (level, now)
+                return (1.0 - level) / per_second
+            self._quota = (level - 1.0, now)
+            return 0.0
+
+    def shift_rating(self, verdict):
+        with self._lock:
+            return _shift_rating(verdict, self._rng)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body go out separately; avoid delayed-ACK stalls
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def do_POST(self):
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            self._chat_completions()
+        elif self.path.startswith("/stt"):
+            self._speech_to_text()
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def _fault(self, error_rate, rate_limit_rate=0.0):
+        """Send an injected error response if the dice say so"""
+        config = self.server.config
+        roll = self.server.draw()
+        if roll < rate_limit_rate:
+            self.server.count("rate_limited")
+            self._send_json(429, {"error": {"message": "Rate limit exceeded (stub)", "type": "rate_limit"}},
+                            {"Retry-After": str(config.retry_after_s)})
+            return True
+        if roll < rate_limit_rate + error_rate:
+            self.server.count("server_errors")
+            self._send_json(500, {"error": {"message": "Internal error (stub)", "type": "server_error"}})
+            return True
+        return False
+
+    def _chat_completions(self):
+        config = self.server.config
+        request = json.loads(self._read_body() or b"{}")
+        messages = request.get("messages") or [{}]
+        system = messages[0].get("content") or ""
+        user = messages[-1].get("content") or ""
+        prompt_tokens = sum(estimate_tokens(m.get("content") or "") for m in messages)
+        self.server.count("chat_requests")
+        wait = self.server.take_quota()
+        if wait > 0:
+            # Quota rejections are answered immediately, like real providers do
+            self.server.count("quota_exceeded")
+            self._send_json(429, {"error": {"message": "Requests per minute exceeded (stub)", "type": "rate_limit"}},
+                            {"Retry-After": f"{wait:.3f}"})
+            return
+
+        fast = _is_fast_request(request)
+        latency = (self.server.latency(config.latency_ms, config.latency_p99_ms)
+                   + config.ms_per_1k_tokens * prompt_tokens / 1_000_000)
+        time.sleep(latency * config.fast_latency_factor if fast else latency)
+        if self._fault(config.error_rate, config.rate_limit_rate):
+            return
+
+        if "### Batch mode" in system:
+            items = json.loads(user)
+            content = json.dumps([{"id": item["id"], **stub_verdict(item["content"])} for item in items])
+        else:
+            verdict = stub_verdict(user)
+            if fast and self.server.draw() < config.fast_noise_rate:
+                self.server.count("fast_noise")
+                verdict = self.server.shift_rating(verdict)
+            content = json.dumps(verdict)
+        if self.server.draw() < config.malformed_rate:
+            self.server.count("malformed")
+            content = self.server.rng_choice(content)
+        completion_tokens = estimate_tokens(content)
+        self.server.count("prompt_tokens", prompt_tokens)
+        self.server.count("completion_tokens", completion_tokens)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        model = request.get("model", "stub")
+        if request.get("stream"):
+            self._stream(model, content, usage)
+            return
+        self._send_json(200, {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    def _stream(self, model, content, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        pieces = [content[i:i + 8] for i in range(0, len(content), 8)]
+        for index, piece in enumerate(pieces):
+            last = index == len(pieces) - 1
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": "stop" if last else None}],
+            }
+            if last:
+                chunk["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _speech_to_text(self):
+        config = self.server.config
+        audio = self._read_body()
+        self.server.count("stt_requests")
+        time.sleep(self.server.latency(config.stt_latency_ms, config.stt_latency_p99_ms)
+                   + config.stt_ms_per_mb * len(audio) / 1_000_000_000)
+        if self._fault(config.stt_error_rate):
+            return
+        if audio.startswith(STUB_AUDIO_MAGIC):
+            text = audio[len(STUB_AUDIO_MAGIC):].split(b"\0", 1)[0].decode("utf-8", errors="replace")
+        elif audio.startswith(b"RIFF"):
+            text = decode_stub_speech(audio)
+        else:
+            text = f"Stub transcript of {len(audio)} bytes of audio."
+        self._send_json(200, {"text": text})
+
+
+def start_stub_server(config=None, host="127.0.0.1", port=0):
+    """
+    Start a stub server on a background thread.
+
+    Returns:
+        StubServer: Running server; ``base_url`` gives its address and
+        ``shutdown()`` stops it
+    """
+    server = StubServer((host, port), config or StubConfig())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class StubSTTError(Exception):
+    """HTTP error from the stub STT endpoint (carries ``status_code`` for retry classification)"""
+
+    def __init__(self, status_code, message):
+        super().__init__(f"STT request failed ({status_code}): {message}")
+        self.status_code = status_code
+
+
+class StubHathoraClient:
+    """
+    Minimal stand-in for the Hathora client, uploading to the stub STT endpoint.
+
+    Only ``speech_to_text.convert(model, path)`` is provided, returning an
+    object with a ``text`` attribute like the real SDK.
+    """
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.speech_to_text = types.SimpleNamespace(convert=self._convert)
+
+    def _convert(self, model, audio_file_path):
+        with open(audio_file_path, "rb") as f:
+            audio = f.read()
+        request = urllib.request.Request(
+            f"{self.base_url}/stt/{model}", data=audio, method="POST",
+            headers={"Content-Type": "application/octet-stream"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                payload = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise StubSTTError(e.code, e.read().decode("utf-8", errors="replace")) from None
+        return types.SimpleNamespace(text=payload["text"])
+
+
+def write_stub_audio(path, transcript, padding_bytes=0):
+    """Write a fake audio file the stub STT endpoint 'transcribes' back to ``transcript``"""
+    with open(path, "wb") as f:
+        f.write(STUB_AUDIO_MAGIC + transcript.encode("utf-8"))
+        if padding_bytes:
+            f.write(b"\0" * padding_bytes)
+    return path
+
+
+def stub_speech(text, sample_rate=16000, words_per_minute=150, pause_s=0.8):
+    """
+    Synthetic 16-bit PCM speech the stub STT endpoint transcribes back to ``text``.
+
+    Each word is a block of loud samples carrying the word itself, so any
+    window of the audio decodes to exactly the words it fully contains (a
+    word cut by the window edge is lost, as with real STT). Sentence ends
+    (., ! or ?) are followed by ``pause_s`` of silence.
+
+    Returns:
+        array.array: int16 samples
+    """
+    samples = array.array("h")
+    block = int(sample_rate * 60 / words_per_minute)
+    for word in text.split():
+        data = word.encode("utf-8")
+        if len(data) + 4 > block:
+            raise ValueError(f"'{word}' does not fit in one word block at {words_per_minute} words/min")
+        samples.extend(STUB_WORD_MARKER + (block, len(data)))
+        samples.extend(data)
+        # Square wave filler so the block has speech-level energy
+        samples.extend(8000 if i % 16 < 8 else -8000 for i in range(block - len(data) - 4))
+        if word[-1] in ".!?":
+            samples.extend([0] * int(sample_rate * pause_s))
+    return samples
+
+
+def decode_stub_speech(wav_bytes):
+    """Words of stub speech fully contained in a WAV file, or a placeholder for other audio"""
+    with wave.open(io.BytesIO(wav_bytes)) as wav:
+        pcm = wav.readframes(wav.getnframes())
+    samples = array.array("h", pcm[:len(pcm) // 2 * 2])
+    if sys.byteorder == "big":
+        samples.byteswap()
+    words = []
+    position = pcm.find(_STUB_WORD_BYTES)
+    while position != -1:
+        index = position // 2
+        if position % 2 == 0 and index + 4 <= len(samples) and index + samples[index + 2] <= len(samples):
+            length = samples[index + 3]
+            words.append(bytes(b & 0xFF for b in samples[index + 4:index + 4 + length]).decode("utf-8", "replace"))
+        position = pcm.find(_STUB_WORD_BYTES, position + 1)
+    return " ".join(words) if words else f"Stub transcript of {len(wav_bytes)} bytes of audio."
+
+
+def write_stub_speech(path, text, sample_rate=16000, **speech_kwargs):
+    """Write ``stub_speech`` as a mono 16-bit WAV file"""
+    samples = stub_speech(text, sample_rate, **speech_kwargs)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+    return path
+
+
+def add_config_arguments(parser):
+    """Add StubConfig options to an argparse parser"""
+    defaults = StubConfig()
+    for name, value in defaults.to_dict().items():
+        parser.add_argument("--" + name.replace("_", "-"), type=type(value), default=value)
+
+
+def config_from_args(args):
+    return StubConfig(**{name: getattr(args, name) for name in StubConfig().to_dict()})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the stub chat-completions / STT server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = StubServer((args.host, args.port), config_from_args(args))
+    print(f"Stub server on {server.base_url} (chat: {server.base_url}/v1, STT: {server.base_url}/stt/<model>)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.counters))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+Telemetry
+Spans, counters and token accounting for the audio and text classification
+paths, exportable as Prometheus text and as structured JSON log lines.
+
+Disabled by default: ``span()`` then returns a shared no-op object and the
+counters return immediately, so instrumented code pays one global check.
+Enable with ``enable()`` or the CLASSIFIER_TELEMETRY=1 environment variable
+(CLASSIFIER_TELEMETRY_LOG=path or "-" adds JSON logs on a file / stderr).
+
+Stages: decode, segment, encode, preprocess, transcript_cache, stt, prompt_build,
+cascade_tier, live_window, model_call, parse.
+Counters: attempts, retries, validation_failures, fallbacks, tokens, cascade_resolved,
+cascade_escalations, cascade_compared, live_escalations, transcript_tokens.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_enabled = False
+_log_file = None
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+
+
+def enable(json_log=None):
+    """
+    Turn instrumentation on.
+
+    Args:
+        json_log: Optional file object, path, or "-" (stderr) for one JSON
+            line per span and counter event
+    """
+    global _enabled, _log_file
+    if json_log == "-":
+        json_log = sys.stderr
+    elif isinstance(json_log, str):
+        json_log = open(json_log, "a", buffering=1)
+    _log_file = json_log
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    """Drop all recorded metrics"""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _log(event):
+    if _log_file is not None:
+        line = json.dumps(event, default=str)
+        with _lock:
+            _log_file.write(line + "\n")
+
+
+def count(name, amount=1, **labels):
+    """Increment a counter (``_total`` is appended in Prometheus output)"""
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def record_stage(stage, seconds, status="ok", **labels):
+    """Record a finished stage duration (for callers that time themselves)"""
+    if not _enabled:
+        return
+    key = _key("stage_seconds", {"stage": stage, "status": status, **labels})
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * len(BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[-2] += seconds
+        histogram[-1] += 1
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """Times a block; labels become metric labels, ``set`` attributes only go to the JSON log"""
+
+    __slots__ = ("stage", "labels", "attributes", "started")
+
+    def __init__(self, stage, labels):
+        self.stage = stage
+        self.labels = labels
+        self.attributes = {}
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        status = "ok" if exc_type is None else "error"
+        record_stage(self.stage, elapsed, status, **self.labels)
+        if _log_file is not None:
+            event = {"ts": time.time(), "event": "span", "stage": self.stage,
+                     "duration_ms": round(elapsed * 1000, 3), "status": status,
+                     **self.labels, **self.attributes}
+            if exc_type is not None:
+                event["error"] = f"{exc_type.__name__}: {exc}"
+            _log(event)
+        return False
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+def span(stage, **labels):
+    """
+    Context manager timing one stage.
+
+    Usage:
+        with telemetry.span("model_call", backend=name) as s:
+            response = client.chat.completions.create(...)
+            s.set(request_id=response.id)
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(stage, labels)
+
+
+def record_tokens(response, backend=None):
+    """Count prompt / completion / reasoning tokens from ``response.usage``"""
+    if not _enabled:
+        return
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    completion = getattr(usage, "completion_tokens", 0) or 0
+    details = getattr(usage, "completion_tokens_details", None)
+    reasoning = (getattr(details, "reasoning_tokens", 0) or 0) if details is not None else 0
+    count("tokens", prompt, backend=backend, kind="prompt")
+    count("tokens", completion, backend=backend, kind="completion")
+    if reasoning:
+        count("tokens", reasoning, backend=backend, kind="reasoning")
+    if _log_file is not None:
+        _log({"ts": time.time(), "event": "usage", "backend": backend, "prompt_tokens": prompt,
+              "completion_tokens": completion, "reasoning_tokens": reasoning})
+
+
+def record_fallback(error=None):
+    """Count a conservative fallback verdict"""
+    if not _enabled:
+        return
+    count("fallbacks")
+    if _log_file is not None:
+        _log({"ts": time.time(), "event": "fallback", "error": error})
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (k + '="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+               for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def prometheus_text(prefix="classifier_"):
+    """Render all metrics in the Prometheus text exposition format"""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, list(value)) for key, value in _histograms.items())
+
+    lines = []
+    seen = set()
+    for (name, labels), value in counters:
+        metric = f"{prefix}{name}_total"
+        if metric not in seen:
+            lines.append(f"# TYPE {metric} counter")
+            seen.add(metric)
+        lines.append(f"{metric}{_format_labels(labels)} {value}")
+    for (name, labels), histogram in histograms:
+        metric = f"{prefix}{name}"
+        if metric not in seen:
+            lines.append(f"# TYPE {metric} histogram")
+            seen.add(metric)
+        for bound, bucket in zip(BUCKETS, histogram):
+            lines.append(f"{metric}_bucket{_format_labels(labels, [('le', str(bound))])} {bucket}")
+        lines.append(f"{metric}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram[-1]}")
+        lines.append(f"{metric}_sum{_format_labels(labels)} {histogram[-2]}")
+        lines.append(f"{metric}_count{_format_labels(labels)} {histogram[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def snapshot():
+    """Metrics as plain JSON-friendly data, with per-stage mean durations"""
+    with _lock:
+        counters = [{"name": name, **dict(labels), "value": value}
+                    for (name, labels), value in sorted(_counters.items())]
+        stages = [{**dict(labels), "count": h[-1], "sum_s": h[-2],
+                   "mean_s": h[-2] / h[-1] if h[-1] else 0.0}
+                  for (_, labels), h in sorted(_histograms.items())]
+    return {"counters": counters, "stages": stages}
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, content_type = json.dumps(snapshot()).encode("utf-8"), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = prometheus_text().encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve_metrics(port=9464, host="0.0.0.0"):
+    """Serve /metrics (Prometheus) and /metrics.json on a background thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_telemetry_arguments(parser):
+    """Add --metrics-port / --metrics-log / --metrics-out to a CLI"""
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics on this port (/metrics, /metrics.json)")
+    parser.add_argument("--metrics-log", default=None,
+                        help="Write one JSON line per span to this file ('-' for stderr)")
+    parser.add_argument("--metrics-out", default=None,
+                        help="Write the final metrics in Prometheus text format to this file")
+
+
+def configure_from_args(args):
+    """Enable telemetry if any telemetry CLI option was given"""
+    if args.metrics_port is not None or args.metrics_log or args.metrics_out:
+        enable(args.metrics_log)
+        if args.metrics_port is not None:
+            serve_metrics(args.metrics_port)
+
+
+def finish_from_args(args):
+    """Write the --metrics-out file at the end of a run"""
+    if getattr(args, "metrics_out", None):
+        with open(args.metrics_out, "w") as f:
+            f.write(prometheus_text())
+
+
+if os.getenv("CLASSIFIER_TELEMETRY", "").lower() in ("1", "true", "yes"):
+    enable(os.getenv("CLASSIFIER_TELEMETRY_LOG") or None)
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def stub_config():
+    """Instant, error-free stub; override in a test module for latency or faults"""
+    from stub_server import StubConfig
+
+    return StubConfig(latency_ms=0, latency_p99_ms=0, stt_latency_ms=0, stt_latency_p99_ms=0, seed=0)
+
+
+@pytest.fixture
+def stub(stub_config):
+    """In-process stub STT / chat-completions server"""
+    from stub_server import start_stub_server
+
+    server = start_stub_server(stub_config)
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def openai_client(stub):
+    from openai import OpenAI
+
+    return OpenAI(base_url=stub.base_url + "/v1", api_key="stub", max_retries=0)
+
+
+@pytest.fixture
+def hathora_client(stub):
+    from stub_server import StubHathoraClient
+
+    return StubHathoraClient(stub.base_url)
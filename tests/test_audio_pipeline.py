@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+pytest.importorskip("hathora")
+
+from audio_pipeline import AudioPipeline, iter_audio_paths  # noqa: E402
+from stub_server import StubConfig, start_stub_server, write_stub_audio, write_stub_speech  # noqa: E402
+
+TRANSCRIPTS = {
+    "clean.wav": "see you at the match on sunday",
+    "mild.wav": "well that was a damn good game",
+    "strong.wav": "what the fuck, i will kill that referee",
+}
+
+
+@pytest.fixture
+def stub_config():
+    """A steady 0.2 s per stage, so overlap between the stages is measurable"""
+    return StubConfig(latency_ms=200, latency_p99_ms=200, stt_latency_ms=200, stt_latency_p99_ms=200,
+                      ms_per_1k_tokens=0, stt_ms_per_mb=0, seed=0)
+
+
+@pytest.fixture
+def recordings(tmp_path):
+    for name, text in TRANSCRIPTS.items():
+        write_stub_speech(str(tmp_path / name), text)
+    return tmp_path
+
+
+def test_pipeline_transcribes_and_classifies_every_file(hathora_client, openai_client, recordings):
+    pipeline = AudioPipeline(hathora_client, openai_client, stt_workers=2, classify_workers=2)
+    results = {r["path"].rsplit("/", 1)[-1]: r for r in pipeline.run(iter_audio_paths([str(recordings)]))}
+
+    assert set(results) == set(TRANSCRIPTS)
+    assert {name: r["classification"]["rating"] for name, r in results.items()} == {
+        "clean.wav": "G", "mild.wav": "PG", "strong.wav": "R",
+    }
+    for name, result in results.items():
+        assert "error" not in result
+        assert result["transcription"] == TRANSCRIPTS[name]
+        assert set(result["timings"]) == {"stt_s", "classify_s"}
+
+    stats = pipeline.stats()
+    assert stats["stt"]["completed"] == stats["classify"]["completed"] == 3
+    assert stats["stt"]["in_flight"] == stats["classify"]["in_flight"] == 0
+
+
+def test_stt_failures_are_reported_per_file(openai_client, tmp_path):
+    from stub_server import StubHathoraClient
+
+    failing = start_stub_server(StubConfig(stt_latency_ms=0, stt_latency_p99_ms=0, stt_error_rate=1.0))
+    try:
+        paths = [write_stub_audio(str(tmp_path / f"{i}.m4a"), "hello there") for i in range(4)]
+        pipeline = AudioPipeline(StubHathoraClient(failing.base_url), openai_client, stt_workers=2)
+        results = list(pipeline.run(paths))
+    finally:
+        failing.shutdown()
+
+    assert len(results) == 4
+    assert all(r["error"].startswith("Transcription failed") for r in results)
+    assert pipeline.stats()["stt"]["errors"] == 4
+
+
+def test_stages_overlap(hathora_client, openai_client, tmp_path):
+    # 8 files at 0.2 s per stage: 3.2 s end to end if run one after the other
+    paths = [write_stub_audio(str(tmp_path / f"{i}.m4a"), f"clip number {i}") for i in range(8)]
+    pipeline = AudioPipeline(hathora_client, openai_client, stt_workers=4, classify_workers=4)
+
+    started = time.monotonic()
+    results = list(pipeline.run(paths))
+    elapsed = time.monotonic() - started
+
+    assert len(results) == 8 and not any("error" in r for r in results)
+    assert elapsed < 1.6
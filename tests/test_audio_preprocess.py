@@ -0,0 +1,103 @@
+import os
+import shutil
+import wave
+
+import pytest
+
+pytest.importorskip("hathora")
+
+import audio_preprocess  # noqa: E402
+from audio_preprocess import AudioPreprocessor, preprocess_to_buffer  # noqa: E402
+
+RECORDING = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Recording.mp3")
+
+
+def fake_ffmpeg(monkeypatch, output):
+    """Replace the ffmpeg stream with ``output`` bytes, or raise it if it is an exception"""
+    def stream(audio_file_path, codec="opus", sample_rate=16000, chunk_bytes=4):
+        if isinstance(output, Exception):
+            raise output
+        for start in range(0, len(output), chunk_bytes):
+            yield output[start:start + chunk_bytes]
+    monkeypatch.setattr(audio_preprocess, "stream_preprocessed", stream)
+
+
+def original(tmp_path, size=1000):
+    path = tmp_path / "clip.m4a"
+    path.write_bytes(b"\0" * size)
+    return str(path)
+
+
+class Recorder:
+    def __init__(self):
+        self.uploads = []
+
+    def __call__(self, hathora_client, path, model):
+        self.uploads.append((path, os.path.getsize(path)))
+        return "hello there"
+
+
+def test_wav_buffer_gets_a_valid_header(tmp_path, monkeypatch):
+    pcm = bytes(range(200)) * 4
+    fake_ffmpeg(monkeypatch, pcm)
+
+    buffer = preprocess_to_buffer(original(tmp_path))
+
+    assert buffer.name == "audio.wav"
+    with wave.open(buffer) as f:
+        assert (f.getnchannels(), f.getsampwidth(), f.getframerate()) == (1, 2, 16000)
+        assert f.readframes(f.getnframes()) == pcm
+
+
+def test_smaller_re_encode_is_uploaded(tmp_path, monkeypatch):
+    fake_ffmpeg(monkeypatch, b"x" * 300)
+    transcribe = Recorder()
+    preprocessor = AudioPreprocessor(transcribe=transcribe)
+    path = original(tmp_path)
+
+    assert preprocessor(None, path) == "hello there"
+
+    (upload, size), = transcribe.uploads
+    assert upload != path and upload.endswith(".ogg") and size == 300
+    assert not os.path.exists(upload)
+    summary = preprocessor.stats.summary()
+    assert summary["bytes_saved"] == 700 and summary["skipped"] == 0
+
+
+def test_original_is_uploaded_when_the_re_encode_is_not_smaller(tmp_path, monkeypatch):
+    fake_ffmpeg(monkeypatch, b"x" * 1200)
+    transcribe = Recorder()
+    preprocessor = AudioPreprocessor(codec="flac", transcribe=transcribe)
+    path = original(tmp_path)
+
+    preprocessor(None, path)
+
+    assert transcribe.uploads == [(path, 1000)]
+    summary = preprocessor.stats.summary()
+    assert summary["bytes_saved"] == 0 and summary["skipped"] == 1 and summary["failed"] == 0
+
+
+def test_original_is_uploaded_when_ffmpeg_fails(tmp_path, monkeypatch, capsys):
+    fake_ffmpeg(monkeypatch, RuntimeError("ffmpeg failed"))
+    transcribe = Recorder()
+    preprocessor = AudioPreprocessor(transcribe=transcribe)
+    path = original(tmp_path)
+
+    preprocessor(None, path)
+    preprocessor(None, path)
+
+    assert transcribe.uploads == [(path, 1000), (path, 1000)]
+    assert preprocessor.stats.summary()["failed"] == 2
+    assert capsys.readouterr().out.count("⚠ Pre-processing failed") == 1
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(ValueError):
+        AudioPreprocessor(codec="mp3")
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+def test_real_recording_becomes_16k_mono():
+    with wave.open(preprocess_to_buffer(RECORDING)) as f:
+        assert (f.getnchannels(), f.getframerate()) == (1, 16000)
+        assert f.getnframes() > 16000
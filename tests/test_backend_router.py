@@ -0,0 +1,51 @@
+import time
+
+from backend_router import Backend, BackendRouter
+
+
+def _router(name, **kwargs):
+    primary = Backend("primary", f"http://{name}-primary.invalid/v1", "stub", "model-a", priority=0)
+    spare = Backend("spare", f"http://{name}-spare.invalid/v1", "stub", "model-b", priority=1)
+    return primary, spare, BackendRouter([primary, spare], **kwargs)
+
+
+def test_lower_priority_tier_is_filled_first():
+    primary, spare, router = _router("fill")
+
+    assert router.choose() is primary
+    assert router.choose(exclude=[primary]) is spare
+
+
+def test_next_tier_is_used_when_the_top_tier_breaker_refuses():
+    primary, spare, router = _router("refuse")
+    # Half-open with its probe already in flight: healthy, but allow() says no
+    breaker = primary.breaker
+    breaker.state = breaker.HALF_OPEN
+    breaker.opened_at = time.monotonic()
+    breaker.half_open_calls = breaker.half_open_max_calls
+
+    assert router.choose() is spare
+    assert spare.outstanding == 1 and primary.outstanding == 0
+
+
+def test_spills_over_when_the_top_tier_is_full():
+    primary, spare, router = _router("spill")
+    primary.max_outstanding = 1
+
+    assert router.choose() is primary
+    assert router.choose() is spare
+
+
+def test_fails_over_to_the_next_backend(stub):
+    dead = Backend("dead", "http://127.0.0.1:9/v1", "stub", "model-a", priority=0)
+    live = Backend("live", stub.base_url + "/v1", "stub", "model-b", priority=1)
+    router = BackendRouter([dead, live])
+
+    response = router.chat.completions.create(
+        model="ignored",
+        messages=[{"role": "system", "content": "policy"}, {"role": "user", "content": "see you next week"}],
+    )
+
+    assert response.choices[0].message.content
+    assert dead.errors == 1 and live.requests == 1
+    assert dead.outstanding == live.outstanding == 0
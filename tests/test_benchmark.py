@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from benchmark import generate_transcripts, main, parse_mix, percentile
+
+QUIET_STUB = ["--latency-ms", "0", "--latency-p99-ms", "0", "--stt-latency-ms", "0", "--stt-latency-p99-ms", "0",
+              "--ms-per-1k-tokens", "0", "--stt-ms-per-mb", "0"]
+
+
+def test_parse_mix():
+    assert parse_mix("short=0.7:5-40,long=0.3:300-1500") == [("short", 0.7, 5, 40), ("long", 0.3, 300, 1500)]
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([0.2], 95) == 0.2
+    assert percentile([], 50) == 0.0
+
+
+def test_transcripts_are_reproducible_and_follow_the_mix():
+    mix = parse_mix("short=1:5-10")
+    transcripts = generate_transcripts(50, mix, seed=3)
+    assert transcripts == generate_transcripts(50, mix, seed=3)
+    assert all(5 <= len(text.split()) <= 10 for text in transcripts)
+
+
+def run_benchmark(tmp_path, monkeypatch, *argv):
+    monkeypatch.setenv("OPENAI_API_KEY", "stub")
+    output = tmp_path / "bench.json"
+    main(["--items", "20", "--concurrency", "4", "--base-delay", "0.01", "--max-delay", "0.05",
+          "--output", str(output), *QUIET_STUB, *argv])
+    return json.loads(output.read_text())
+
+
+def test_report_counts_retries_and_fallbacks(tmp_path, monkeypatch):
+    pytest.importorskip("hathora")
+
+    report = run_benchmark(tmp_path, monkeypatch, "--scenario", "text-sync", "--rate-limit-rate", "0.3",
+                           "--retry-after-s", "0.01", "--max-retries", "1")
+    [result] = report["results"]
+
+    assert result["scenario"] == "text-sync" and result["items"] == 20
+    assert result["server"]["rate_limited"] > 0
+    assert result["fallbacks"] > 0 and result["failures"] == 0
+    assert set(result["latency_ms"]) == {"p50", "p95", "p99", "mean", "max"}
+    assert result["latency_ms"]["p50"] <= result["latency_ms"]["p95"] <= result["latency_ms"]["p99"]
+
+
+def test_audio_pipeline_scenario_runs_offline(tmp_path, monkeypatch):
+    pytest.importorskip("hathora")
+
+    report = run_benchmark(tmp_path, monkeypatch, "--scenario", "audio-pipeline")
+    [result] = report["results"]
+
+    assert result["items"] == 20 and result["fallbacks"] == result["failures"] == 0
+    assert result["server"]["stt_requests"] == 20
@@ -0,0 +1,28 @@
+from chunked_classifier import split_into_chunks
+
+
+def test_unpunctuated_text_keeps_its_overlap():
+    words = [f"w{i}" for i in range(100)]
+    chunks = split_into_chunks(" ".join(words), max_words=30, overlap_words=10)
+
+    assert len(chunks) > 1
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.split()[:10] == previous.split()[-10:]
+    assert all(len(chunk.split()) <= 30 for chunk in chunks)
+    assert chunks[-1].split()[-1] == "w99"
+
+
+def test_long_sentence_carries_its_trailing_words():
+    long_sentence = " ".join(f"a{i}" for i in range(25)) + "."
+    chunks = split_into_chunks(long_sentence + " Then I said " + "b " * 10,
+                               max_words=30, overlap_words=5)
+
+    assert chunks[1].split()[:5] == ["a20", "a21", "a22", "a23", "a24."]
+
+
+def test_whole_sentences_are_carried_when_they_fit():
+    text = "One two three. Four five six. Seven eight nine. Ten eleven twelve."
+    chunks = split_into_chunks(text, max_words=6, overlap_words=3)
+
+    assert chunks == ["One two three. Four five six.", "Four five six. Seven eight nine.",
+                      "Seven eight nine. Ten eleven twelve."]
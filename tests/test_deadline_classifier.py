@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+pytest.importorskip("hathora")
+
+from openai import OpenAI  # noqa: E402
+
+from deadline_classifier import DeadlineClassifier  # noqa: E402
+from stub_server import StubConfig  # noqa: E402
+from work_queue import SQLiteWorkQueue  # noqa: E402
+
+
+@pytest.fixture
+def stub_config():
+    return StubConfig(latency_ms=1500, latency_p99_ms=1600, seed=0)
+
+
+def wait_for(condition, timeout_s=10.0):
+    stop_at = time.monotonic() + timeout_s
+    while time.monotonic() < stop_at:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_slow_model_gets_fallback_then_deferred_verdict(openai_client, tmp_path):
+    finals = []
+    classify = DeadlineClassifier(deadline_s=1.0, queue=SQLiteWorkQueue(str(tmp_path / "queue.sqlite3")),
+                                  on_final=lambda key, status, verdict: finals.append(status), poll_s=0.05)
+    try:
+        started = time.monotonic()
+        verdict = classify(openai_client, "see you next week")
+        assert time.monotonic() - started < 1.3
+        assert verdict["error"] and verdict["deadline"]["hedged"]
+        key = verdict["deadline"]["deferred"]
+
+        assert wait_for(lambda: finals == ["done"])
+        assert classify.result(key)["result"]["rating"] == "G"
+        again = classify(openai_client, "see you next week")
+        assert again["deadline"]["source"] == "deferred" and not again.get("error")
+    finally:
+        classify.close()
+
+
+def test_sdk_retries_do_not_outlive_the_deadline(stub, tmp_path):
+    # Default SDK client: max_retries=2 would run each attempt up to three times over
+    client = OpenAI(base_url=stub.base_url + "/v1", api_key="stub")
+    classify = DeadlineClassifier(deadline_s=1.0, queue=None)
+    try:
+        started = time.monotonic()
+        classify(client, "see you next week")
+        assert time.monotonic() - started < 1.3
+        assert classify.hedge_delay() < 1.0
+    finally:
+        classify.close()
+
+
+def test_dead_jobs_are_requeued_on_the_next_deferral(openai_client, tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / "queue.sqlite3"))
+    classify = DeadlineClassifier(deadline_s=0.5, queue=queue, poll_s=0.05)
+    try:
+        key = classify.defer("see you next week")
+        job = queue.claim("test")[0]
+        queue.nack(job["id"], "test", "boom")
+        for _ in range(queue.max_attempts - 1):
+            job = queue.claim("test")[0]
+            queue.nack(job["id"], "test", "boom")
+        assert queue.get(key)["status"] == "dead"
+
+        classify.defer("see you next week")
+        assert queue.get(key)["status"] == "queued"
+        assert classify.stats["deferred"] == 2
+    finally:
+        classify.close()
@@ -0,0 +1,72 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from distilled_classifier import (  # noqa: E402
+    HEADS, DistilledClassifier, DistilledModel, agreement_lower_bound, choose_threshold,
+)
+from verdict_log import policy_hash  # noqa: E402
+
+POLICY = "Rate transcripts G, PG, PG-13 or R."
+MODEL = "openai/gpt-oss-safeguard-20b"
+
+
+def trained_model(policy=POLICY, model=MODEL):
+    model_file = DistilledModel(bits=10)
+    texts = ["see you next week", "great game everyone", "what the fuck", "fuck this shit"] * 10
+    labels = [[0, 0, 0, 0, 0, 0]] * 2 + [[0, 0, 3, 0, 0, 3]] * 2
+    model_file.fit(texts, np.asarray(labels * 10), epochs=30)
+    model_file.threshold = 0.0
+    model_file.meta = {"policy": [model, policy_hash(policy)]}
+    return model_file
+
+
+def predictions(agree, disagree):
+    rows = agree + disagree
+    levels = np.zeros((rows, len(HEADS)), dtype=np.int64)
+    levels[agree:, -1] = 1
+    return {"levels": levels, "confidence": np.linspace(1.0, 0.5, rows), "consistent": np.ones(rows, dtype=bool)}, \
+        np.zeros((rows, len(HEADS)), dtype=np.int64)
+
+
+def test_lower_bound_needs_evidence():
+    assert agreement_lower_bound(20, 20) < 0.98
+    assert agreement_lower_bound(300, 300) >= 0.98
+    assert agreement_lower_bound(95, 100) < 0.95
+
+
+def test_small_calibration_sets_absorb_nothing():
+    # 50 of 50 agree, but that is too few to vouch for 98%
+    assert choose_threshold(*predictions(50, 0), target_agreement=0.98) == float("inf")
+    # 400 agreeing then only misses: the threshold lets in no more misses than the bound allows
+    pred, labels = predictions(400, 100)
+    absorbed = int((pred["confidence"] >= choose_threshold(pred, labels, target_agreement=0.98)).sum())
+    assert 400 <= absorbed < 410
+    assert agreement_lower_bound(400, absorbed) >= 0.98
+
+
+def test_model_trained_for_the_current_policy_is_used(tmp_path):
+    path = str(tmp_path / "model.npz")
+    trained_model().save(path)
+    classifier = DistilledClassifier.load(path, policy=POLICY, model_name=MODEL)
+
+    assert classifier.stale is None and classifier.threshold == 0.0
+    assert classifier.classify("see you next week")["source"] == "distilled"
+
+
+@pytest.mark.parametrize("policy, model_name", [(POLICY + " Updated.", MODEL), (POLICY, "other/model")])
+def test_stale_model_forwards_everything(tmp_path, capsys, policy, model_name):
+    path = str(tmp_path / "model.npz")
+    trained_model().save(path)
+    classifier = DistilledClassifier.load(path, policy=policy, model_name=model_name)
+
+    assert classifier.stale and classifier.threshold == float("inf")
+    assert classifier.classify("see you next week") is None
+    assert classifier.stats["forwarded"] == 1
+    assert "Distilled model disabled" in capsys.readouterr().err
+
+
+def test_model_without_policy_is_stale():
+    model = trained_model()
+    model.meta = {}
+    assert DistilledClassifier(model, policy=POLICY, model_name=MODEL).stale
@@ -0,0 +1,72 @@
+import pytest
+
+from lexical_filter import LexicalFilter
+
+
+# Each of these must reach the model: a G short-circuit here is a false negative
+NEVER_AUTO_G = [
+    "I will kill you!",
+    "I want to die!",
+    "You stupid crap!",
+    "get naked!",
+    "ass!",
+    "I am going to rape you tonight",
+    "Go hang yourself",
+    "just kill yourself already",
+    "he tried to molest her",
+    "shut up, you faggot",
+    "what a retard",
+    "sh!t happens",
+    "@ss",
+    # No lexicon hit, stopped by the caution roots or the spelled-out letters
+    "kill him",
+    "I will slit your throat",
+    "I want to hurt myself",
+    "I took a bunch of pills to end it",
+    "I am going to put a bullet in your head tonight",
+    "lets do a few lines of blow",
+    "I hope you die",
+    "F U C K",
+    "k.i.l.l them all",
+]
+
+
+@pytest.mark.parametrize("text", NEVER_AUTO_G)
+def test_flagged_text_is_never_auto_g(text):
+    verdict = LexicalFilter().classify(text)
+    assert verdict is None or verdict["rating"] != "G"
+
+
+def test_edge_punctuation_is_not_leetspeak():
+    lexical_filter = LexicalFilter()
+    assert lexical_filter.tokenize("I will kill you!") == ["i", "will", "kill", "you"]
+    assert lexical_filter.tokenize("sh!t") == ["shit"]
+    assert lexical_filter.tokenize("back in 2015!") == ["back", "in", "2015"]
+
+
+def test_clean_text_short_circuits_to_g():
+    verdict = LexicalFilter().classify("Thanks for watching, see you next week!")
+    assert verdict["rating"] == "G"
+
+
+def test_frequent_strong_profanity_short_circuits_to_r():
+    verdict = LexicalFilter().classify("fuck this, what the fuck, shut the f*** up")
+    assert verdict["rating"] == "R"
+
+
+def test_masked_cache_is_per_instance():
+    first, second = LexicalFilter(), LexicalFilter(lexicon={"language": {"darn": 1}})
+    assert first.scan("f***")["hits"] == {"language": ["fuck*"]}
+    assert second.scan("f***")["hits"] == {}
+
+
+def test_spelled_out_letters_are_joined():
+    lexical_filter = LexicalFilter()
+    assert lexical_filter.tokenize("F U C K off") == ["fuck", "off"]
+    assert lexical_filter.scan("F U C K off")["hits"] == {"language": ["fuck*"]}
+
+
+def test_long_clean_text_goes_to_the_model():
+    lexical_filter = LexicalFilter()
+    assert lexical_filter.classify(" ".join(["see you at the match on sunday"] * 10)) is None
+    assert lexical_filter.stats["forwarded"] == 1
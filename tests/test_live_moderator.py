@@ -0,0 +1,74 @@
+import pytest
+
+pytest.importorskip("hathora")
+np = pytest.importorskip("numpy")
+
+from live_moderator import CHUNK_SAMPLES, LiveModerator  # noqa: E402
+from stub_server import StubConfig, StubHathoraClient, start_stub_server, stub_speech  # noqa: E402
+
+SCRIPT = ("Good evening and welcome back everyone. Tonight we review the final match. "
+          "What the fuck, I will kill that referee. Anyway the second half was quiet.")
+
+
+def stream(moderator, text):
+    samples = np.frombuffer(stub_speech(text).tobytes(), dtype=np.int16)
+    for i in range(0, len(samples), CHUNK_SAMPLES):
+        moderator.feed(samples[i:i + CHUNK_SAMPLES])
+    return moderator.close()
+
+
+def moderate(hathora_client, openai_client, text, **kwargs):
+    events = []
+    moderator = LiveModerator(hathora_client, openai_client, min_window_s=1.0, max_window_s=6.0,
+                              classify_kwargs={"max_retries": 1}, on_event=events.append, **kwargs)
+    return stream(moderator, text), events
+
+
+def test_windows_end_at_pauses_and_keep_every_word(hathora_client, openai_client):
+    summary, events = moderate(hathora_client, openai_client, SCRIPT)
+
+    windows = sorted((e for e in events if e["type"] == "window"), key=lambda e: e["window"])
+    assert [w["text"] for w in windows] == [
+        "Good evening and welcome back everyone.",
+        "Tonight we review the final match.",
+        "What the fuck, I will kill that referee.",
+        "Anyway the second half was quiet.",
+    ]
+    assert summary["words"] == len(SCRIPT.split())
+    assert summary["classified"] == 4 and summary["fallbacks"] == 0
+    assert all(w["behind_live_s"] >= 0 for w in windows)
+
+
+def test_rating_only_escalates(hathora_client, openai_client):
+    # Without context the last window is rated on its own words; one classify worker
+    # keeps the windows' rolling ratings in stream order
+    summary, events = moderate(hathora_client, openai_client, SCRIPT, context_words=0, classify_workers=1)
+
+    last = max((e for e in events if e["type"] == "window"), key=lambda e: e["window"])
+    assert last["verdict"]["rating"] == "G"
+    assert last["rating"] == summary["rating"] == "R"
+    assert [(e["from"], e["rating"]) for e in summary["escalations"]] == [("G", "R")]
+    assert summary["max_scores"]["language"] == 3
+
+
+def test_context_words_are_sent_with_each_window(hathora_client, openai_client):
+    sent = []
+
+    def classify(client, content, **kwargs):
+        sent.append(content)
+        return {"rating": "G", "reasons": [], "scores": {}}
+
+    moderate(hathora_client, openai_client, SCRIPT, context_words=3, classify_workers=1, classify=classify)
+    assert sent[1] == "welcome back everyone. Tonight we review the final match."
+
+
+def test_stt_failures_leave_the_rating_alone(openai_client):
+    failing = start_stub_server(StubConfig(stt_latency_ms=0, stt_latency_p99_ms=0, stt_error_rate=1.0))
+    try:
+        summary, events = moderate(StubHathoraClient(failing.base_url), openai_client, SCRIPT)
+    finally:
+        failing.shutdown()
+
+    assert summary["rating"] is None and summary["classified"] == 0
+    assert summary["stt_failures"] == summary["windows"] - summary["silent_windows"] > 0
+    assert {e["type"] for e in events} == {"stt_error"}
@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+import pytest
+
+from micro_batcher import MicroBatcher, parse_batch_response
+from verdict_schema import verdict_metrics
+
+VERDICT = {"rating": "G", "reasons": ["Clean"], "scores": {"violence": 0, "sexual_content": 0, "language": 0,
+                                                            "drugs": 0, "self_harm": 0}}
+
+
+def test_fenced_batch_with_bad_and_missing_items():
+    raw = "```json\n" + json.dumps([
+        {"id": "0", **VERDICT},
+        {"id": "1", **VERDICT, "rating": "X"},
+        {"id": "9", **VERDICT},
+    ]) + "\n```"
+    verdicts, errors = parse_batch_response(raw, ["0", "1", "2"], backend="batch-test")
+
+    assert set(verdicts) == {"0"} and verdicts["0"].rating == "G"
+    assert errors["1"].startswith("Invalid rating") and errors["2"] == "Missing from batch response"
+    metrics = verdict_metrics()["batch-test"]
+    assert metrics["validated"] == 1 and metrics["invalid"] == 1
+
+
+def test_wrapped_verdicts_are_accepted():
+    verdicts, errors = parse_batch_response(json.dumps({"verdicts": [{"id": "0", **VERDICT}]}), ["0"])
+    assert set(verdicts) == {"0"} and not errors
+
+
+@pytest.mark.parametrize("raw", ["", "not json", json.dumps(VERDICT)])
+def test_unusable_responses_raise_and_are_recorded(raw):
+    with pytest.raises(ValueError):
+        parse_batch_response(raw, ["0"], backend="batch-broken")
+    assert verdict_metrics()["batch-broken"]["invalid"] >= 1
+
+
+def test_one_request_per_batch_with_metrics(stub):
+    from openai import AsyncOpenAI
+
+    client = AsyncOpenAI(base_url=stub.base_url + "/v1", api_key="stub", max_retries=0)
+    texts = ["see you next week", "well damn", "what the fuck", "fuck this shit"]
+
+    async def main():
+        batcher = MicroBatcher(client, max_items=len(texts))
+        return batcher, await asyncio.gather(*(batcher.classify(text) for text in texts))
+
+    batcher, verdicts = asyncio.run(main())
+    assert [v["rating"] for v in verdicts] == ["G", "PG", "PG-13", "R"]
+    assert stub.counters["chat_requests"] == 1 and batcher.items_per_request() == 4
+    metrics = verdict_metrics()[str(client.base_url)]
+    assert metrics["attempts"] == 1 and metrics["validated"] == 4
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from near_duplicate import NearDuplicateIndex  # noqa: E402
+
+POLICY, MODEL = "policy", "model"
+G = {"rating": "G", "reasons": ["Clean"], "scores": {"violence": 0, "sexual_content": 0, "language": 0,
+                                                      "drugs": 0, "self_harm": 0}}
+PG = {**G, "rating": "PG", "scores": {**G["scores"], "language": 1}}
+_WORDS = ("the game was great we should play again tomorrow I think that round was close honestly you did "
+          "really well but the other team kept camping the spawn point let's grab some food after this and "
+          "talk about the strategy for next week").split()
+
+
+def clean_transcript(words=150, seed=0):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def test_added_threat_does_not_reuse_a_clean_verdict():
+    index = NearDuplicateIndex(db_path=None)
+    original = clean_transcript()
+    index.store(original, POLICY, MODEL, G)
+    threat = original + " and then I am going to fucking kill you and your whole family tonight"
+
+    # Similar enough that similarity alone would have reused the G verdict
+    signature = index.hasher.signature(threat)
+    similarity = float((index._signatures[1] == signature).mean())
+    assert similarity >= index.threshold
+
+    assert index.lookup(threat, POLICY, MODEL) is None
+    assert index.summary()["vetoed"] == 1
+
+
+def test_harmless_changes_still_reuse_the_verdict():
+    index = NearDuplicateIndex(db_path=None)
+    original = clean_transcript() + " damn"
+    index.store(original, POLICY, MODEL, PG)
+
+    verdict = index.lookup("hey guys welcome back " + original, POLICY, MODEL)
+    assert verdict["rating"] == "PG" and verdict["near_duplicate"]["match_id"] == 1
+    # Fewer flagged words than the stored transcript is fine too
+    assert index.lookup(original[:-len(" damn")], POLICY, MODEL)["rating"] == "PG"
+    # More of them is not
+    assert index.lookup(original + " damn", POLICY, MODEL) is None
+
+
+def test_profiles_survive_a_restart(tmp_path):
+    path = str(tmp_path / "near.sqlite3")
+    original = clean_transcript()
+    index = NearDuplicateIndex(db_path=path)
+    index.store(original, POLICY, MODEL, G)
+    index.close()
+
+    reloaded = NearDuplicateIndex(db_path=path)
+    assert reloaded.lookup(original + " see you", POLICY, MODEL)["rating"] == "G"
+    assert reloaded.lookup(original + " I hope you die", POLICY, MODEL) is None
+    assert reloaded.lookup(original, "other policy", MODEL) is None
+    reloaded.close()
@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip("hathora")
+
+from audio_converter import POLICY, classify_content  # noqa: E402
+from reasoning_cascade import MODEL, ReasoningCascade  # noqa: E402
+from verdict_cache import VerdictCache  # noqa: E402
+from verdict_log import VerdictLog  # noqa: E402
+
+
+def test_fast_tier_verdicts_stay_out_of_the_shared_key_and_the_log(openai_client, tmp_path):
+    log = VerdictLog(str(tmp_path / "log.sqlite3"), inner=VerdictCache(str(tmp_path / "cache.sqlite3")))
+    cascade = ReasoningCascade(audit_rate=0)
+    verdict = cascade(openai_client, "see you next week", cache=log)
+    assert verdict["cascade"]["tier"] == "fast"
+
+    # A plain full-reasoning caller must not be served the cheap verdict
+    assert log.lookup("see you next week", POLICY, MODEL) is None
+    assert cascade(openai_client, "see you next week", cache=log)["cascade"]["tier"] == "fast"
+    assert cascade.stats["cache_hits"] == 1
+    assert len(log) == 0
+    log.close()
+
+
+def test_full_tier_verdicts_are_shared(openai_client, tmp_path):
+    log = VerdictLog(str(tmp_path / "log.sqlite3"), inner=VerdictCache(str(tmp_path / "cache.sqlite3")))
+    cascade = ReasoningCascade(audit_rate=0, escalate_ratings=["PG"])
+    text = "damn, that was a good game"
+    assert cascade(openai_client, text, cache=log)["cascade"]["tier"] == "full"
+    assert classify_content(openai_client, text, cache=log)["rating"] == "PG"
+    assert len(log) == 1
+    log.close()
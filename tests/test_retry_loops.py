@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+from openai import AsyncOpenAI, OpenAI
+
+from async_classifier import classify_content_async
+from retry_policy import RetryPolicy, breaker_for
+from stub_server import StubConfig, start_stub_server
+from verdict_schema import RESPONSE_FORMAT
+
+NO_WAIT = RetryPolicy(base_delay=0.0, max_delay=0.0)
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+
+class RejectsStructuredOutput:
+    """Wraps a client whose backend answers response_format with a 400, like some Ollama builds"""
+
+    def __init__(self, client, delay_s=0.0):
+        self.base_url = client.base_url
+        self.requests = []
+        self.chat = self
+        self.completions = self
+        self._client = client
+        self._delay_s = delay_s
+
+    def _check(self, kwargs):
+        self.requests.append(kwargs)
+        if kwargs.get("response_format") == RESPONSE_FORMAT:
+            raise BadRequest("response_format json_schema is not supported")
+
+    def create(self, **kwargs):
+        self._check(kwargs)
+        return self._client.chat.completions.create(**kwargs)
+
+
+class AsyncRejectsStructuredOutput(RejectsStructuredOutput):
+    async def create(self, **kwargs):
+        # Long enough for every concurrent request to be in flight with response_format
+        await asyncio.sleep(self._delay_s)
+        self._check(kwargs)
+        return await self._client.chat.completions.create(**kwargs)
+
+
+def test_structured_output_downgrade_does_not_use_an_attempt(openai_client):
+    pytest.importorskip("hathora")
+    from audio_converter import classify_content
+
+    client = RejectsStructuredOutput(openai_client)
+    verdict = classify_content(client, "see you next week", max_retries=1, retry_policy=NO_WAIT)
+
+    assert not verdict.get("error") and verdict["rating"] == "G"
+    assert len(client.requests) == 2 and "response_format" not in client.requests[-1]
+
+
+def test_concurrent_requests_all_downgrade(stub):
+    async def main():
+        inner = AsyncOpenAI(base_url=stub.base_url + "/v1", api_key="stub", max_retries=0)
+        client = AsyncRejectsStructuredOutput(inner, delay_s=0.05)
+        return await asyncio.gather(*(
+            classify_content_async(client, f"see you next week {i}", max_retries=1, retry_policy=NO_WAIT)
+            for i in range(5)
+        ))
+
+    verdicts = asyncio.run(main())
+    assert [v.get("error") for v in verdicts] == [None] * 5
+
+
+def test_invalid_output_leaves_the_breaker_closed():
+    pytest.importorskip("hathora")
+    from audio_converter import classify_content
+
+    malformed = start_stub_server(StubConfig(latency_ms=0, latency_p99_ms=0, malformed_rate=1.0, seed=0))
+    try:
+        client = OpenAI(base_url=malformed.base_url + "/v1", api_key="stub", max_retries=0)
+        breaker = breaker_for(client)
+        for _ in range(breaker.failure_threshold):
+            assert classify_content(client, "see you next week", max_retries=1, retry_policy=NO_WAIT)["error"]
+    finally:
+        malformed.shutdown()
+
+    # The backend answered every time, so only the model is at fault
+    assert breaker.state == breaker.CLOSED
@@ -0,0 +1,37 @@
+import types
+
+from retry_policy import RetryPolicy
+from streaming_classifier import classify_content_streaming
+
+NO_WAIT = RetryPolicy(base_delay=0.0, max_delay=0.0)
+VALID = ('{"rating": "PG", "reasons": ["Mild language"], "scores": {"violence": 0, "sexual_content": 0, '
+         '"language": 1, "drugs": 0, "self_harm": 0}}')
+
+
+class ScriptedStream:
+    """Streams one scripted reply per request, a few characters per chunk"""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.base_url = "http://streaming-test.invalid/v1"
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        reply = self.replies.pop(0)
+        for start in range(0, len(reply), 7):
+            delta = types.SimpleNamespace(content=reply[start:start + 7])
+            yield types.SimpleNamespace(usage=None, choices=[types.SimpleNamespace(delta=delta)])
+
+
+def test_retry_event_voids_the_failed_attempt():
+    events = []
+    client = ScriptedStream(['{"rating": "R", "reasons": ["Threat"], "scores": {"violence": 9', VALID])
+
+    result = classify_content_streaming(client, "darn it", on_event=events.append, retry_policy=NO_WAIT)
+
+    assert result["rating"] == "PG"
+    types_seen = [event["type"] for event in events]
+    retry = types_seen.index("retry")
+    assert events[0] == {"type": "rating", "value": "R"} and retry > 0
+    assert events[retry]["attempt"] == 1
+    assert [e["value"] for e in events[retry + 1:] if e["type"] == "rating"] == ["PG"]
@@ -0,0 +1,85 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("hathora")
+
+import transcript_cache  # noqa: E402
+from transcript_cache import (  # noqa: E402
+    FINGERPRINT_RATE, CachingTranscriber, TranscriptCache, bit_error_rate, fingerprint_samples,
+)
+
+
+def recording(seed, seconds=3.0):
+    """Speech-like noise: white noise under a slowly varying envelope"""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * FINGERPRINT_RATE)
+    envelope = np.repeat(rng.uniform(0.2, 1.0, n // 400 + 1), 400)[:n]
+    return (rng.standard_normal(n) * envelope * 8000).astype(np.float32)
+
+
+def reencoded(samples, seed=99):
+    """Quieter, with added noise and a few samples trimmed off the start, like a lossy copy"""
+    rng = np.random.default_rng(seed)
+    return samples[40:] * 0.7 + rng.standard_normal(len(samples) - 40).astype(np.float32) * 300
+
+
+def test_copies_match_and_unrelated_audio_does_not():
+    original = fingerprint_samples(recording(1))
+    assert bit_error_rate(original, original) == 0.0
+    assert bit_error_rate(original, fingerprint_samples(reencoded(recording(1)))) < 0.25
+    assert bit_error_rate(original, fingerprint_samples(recording(2))) > 0.4
+    assert len(fingerprint_samples(np.zeros(100))) == 0
+
+
+def test_lookup_by_fingerprint_is_per_model(tmp_path):
+    cache = TranscriptCache(str(tmp_path / "cache.sqlite3"))
+    cache.store(fingerprint_samples(recording(1)), "parakeet", "see you next week", sha256="abc")
+
+    match = cache.lookup_fingerprint(fingerprint_samples(reencoded(recording(1))), "parakeet")
+    assert match is not None and match[1] == "see you next week"
+    assert cache.lookup_fingerprint(fingerprint_samples(recording(2)), "parakeet") is None
+    assert cache.lookup_fingerprint(fingerprint_samples(recording(1)), "whisper") is None
+    assert cache.lookup_exact("abc", "parakeet") == "see you next week"
+    assert cache.lookup_exact("abc", "whisper") is None
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    fingerprints = [fingerprint_samples(recording(seed)) for seed in range(3)]
+    entry_bytes = fingerprints[0].nbytes + len("clip 0")
+    cache = TranscriptCache(str(tmp_path / "cache.sqlite3"), max_bytes=int(2.5 * entry_bytes))
+    cache.store(fingerprints[0], "parakeet", "clip 0", sha256="0")
+    cache.store(fingerprints[1], "parakeet", "clip 1", sha256="1")
+    assert cache.lookup_exact("0", "parakeet") == "clip 0"  # now more recently used than clip 1
+    cache.store(fingerprints[2], "parakeet", "clip 2", sha256="2")
+
+    assert cache.stats["evictions"] == 1
+    assert cache.lookup_exact("1", "parakeet") is None
+    assert cache.lookup_exact("0", "parakeet") == "clip 0"
+    cache.close()
+
+
+def test_transcriber_skips_stt_for_copies(tmp_path, monkeypatch):
+    audio = {}
+    for name, samples in [("a.m4a", recording(1)), ("a.mp3", reencoded(recording(1))), ("b.m4a", recording(2))]:
+        path = tmp_path / name
+        path.write_bytes(name.encode())
+        audio[str(path)] = samples
+    # Decoding needs ffmpeg; the fingerprinting itself is what is under test
+    monkeypatch.setattr(transcript_cache, "fingerprint_file", lambda path: fingerprint_samples(audio[path]))
+    calls = []
+
+    def transcribe(hathora_client, path, model):
+        calls.append(path)
+        return f"transcript of {path}"
+
+    cache = TranscriptCache(str(tmp_path / "cache.sqlite3"))
+    transcriber = CachingTranscriber(cache, transcribe=transcribe)
+    first, copy, other = audio
+    assert transcriber(None, first) == transcriber(None, first) == transcriber(None, copy) == f"transcript of {first}"
+    assert transcriber(None, other) == f"transcript of {other}"
+
+    assert calls == [first, other]
+    assert cache.stats["exact_hits"] == 1 and cache.stats["fingerprint_hits"] == 1
+    assert cache.lookup_exact(transcript_cache.file_sha256(copy), "parakeet") == f"transcript of {first}"
+    cache.close()
@@ -0,0 +1,52 @@
+import pytest
+
+from lexical_filter import LexicalFilter
+from transcript_normalizer import TranscriptNormalizer
+
+
+def test_strips_filler_tags_and_timestamps():
+    normalized = TranscriptNormalizer().normalize(
+        "[00:01:23] Um, so, like, I I I think it's, you know, fine. [music]")
+    assert normalized == "I think it's fine."
+
+
+def test_keeps_meaningful_like():
+    assert TranscriptNormalizer().normalize("I like it.") == "I like it."
+
+
+def test_repeated_profanity_keeps_its_count():
+    normalized = TranscriptNormalizer().normalize("that was fuck fuck fuck fuck crazy")
+    assert normalized == "that was fuck [x4] crazy"
+    assert LexicalFilter().scan(normalized)["strong_profanity"] == 4
+
+
+def test_short_flagged_repeats_stay_verbatim():
+    assert TranscriptNormalizer().normalize("fuck fuck") == "fuck fuck"
+
+
+def test_repeated_content_words_keep_their_count():
+    normalizer = TranscriptNormalizer()
+    assert normalizer.normalize("kill kill kill kill kill them all") == "kill [x5] them all"
+    assert normalizer.normalize("go away go away go away now") == "(go away) [x3] now"
+    assert normalizer.normalize("kill kill kill them") == "kill kill kill them"
+
+
+def test_function_word_repeats_collapse():
+    assert TranscriptNormalizer().normalize("so the the the end was was fine") == "so the end was fine"
+
+
+def test_records_tokens_before_and_after():
+    normalizer = TranscriptNormalizer()
+    normalizer("Um, uh, hello hello hello there.")
+    assert normalizer.stats["tokens_after"] < normalizer.stats["tokens_before"]
+
+
+def test_regress_catches_underrating_on_stub(openai_client):
+    pytest.importorskip("hathora")
+    from transcript_normalizer import regression_report
+
+    texts = ["see you next week", "fuck fuck fuck fuck fuck that"]
+    report = regression_report(openai_client, texts, concurrency=2)
+    # The stub counts words and does not know "[xN]", so the collapsed run is under-rated
+    assert report["normalized"]["underrated"] == 0.5
+    assert report["changed_examples"][0]["reference"] == "R"
@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from verdict_store import FLAG_FALLBACK, FLAG_NEAR_DUPLICATE, FLAG_SHORT_CIRCUIT, MISSING, VerdictStore  # noqa: E402
+
+DAY = 86400
+
+
+def verdict(rating, reasons=("Clean",), **scores):
+    return {"rating": rating, "reasons": list(reasons),
+            "scores": {"violence": 0, "sexual_content": 0, "language": 0, "drugs": 0, "self_harm": 0, **scores}}
+
+
+def fill(store):
+    store.append(verdict("G"), creator="alice", clip_id=1, timestamp=0)
+    store.append(verdict("R", ["Strong language"], language=3, violence=1.5), creator="alice", clip_id="clip-2",
+                 timestamp=DAY + 5)
+    store.append({"rating": "PG-13", "reasons": ["Classification failed"], "error": True}, creator="bob",
+                 clip_id=3, timestamp=DAY + 10)
+    store.append({**verdict("PG", ["Mild language"], language=1), "source": "lexical"}, creator="bob",
+                 clip_id=4, timestamp=2 * DAY)
+    store.append({**verdict("PG", ["Mild language"], language=1), "near_duplicate": 0.97}, creator="bob",
+                 clip_id=5, timestamp=2 * DAY + 1)
+
+
+def test_round_trip_keeps_fallbacks_out_of_the_scores(tmp_path):
+    store = VerdictStore(str(tmp_path), flush_rows=2)
+    fill(store)
+    store.close()
+
+    store = VerdictStore(str(tmp_path))
+    assert len(store) == 5
+    assert store.column("rating").tolist() == [0, 3, MISSING, 1, 1]
+    assert store.column("language").tolist() == [0, 30, MISSING, 10, 10]
+    assert store.column("flags").tolist() == [0, 0, FLAG_FALLBACK, FLAG_SHORT_CIRCUIT, FLAG_NEAR_DUPLICATE]
+    assert store.column("clip")[[0, 2]].tolist() == [1, 3] and store.column("clip")[1] > 0
+    assert store.rating_counts() == {"G": 1, "PG": 2, "PG-13": 0, "R": 1, "fallback": 1}
+    assert store.mean_scores()["language"] == 1.25 and store.mean_scores()["violence"] == 0.375
+    assert store.score_histogram("language") == {0.0: 1, 1.0: 2, 3.0: 1}
+    assert store.reason_counts(top=1) == [("Mild language", 2)]
+    assert dict(store.reason_counts(store.mask(creator="alice"))) == {"Clean": 1, "Strong language": 1}
+    assert store.rating_counts(store.mask(include_fallbacks=False))["fallback"] == 0
+
+
+def test_per_creator_and_timeline_aggregations(tmp_path):
+    store = VerdictStore(str(tmp_path))
+    fill(store)
+    store.flush()
+
+    grouped = store.by_creator()
+    assert store.creator_names(grouped["creator"]) == ["alice", "bob"]
+    assert grouped["verdicts"].tolist() == [2, 3] and grouped["fallbacks"].tolist() == [0, 1]
+    assert grouped["ratings"].tolist() == [[1, 0, 0, 1], [0, 2, 0, 0]]
+    assert grouped["mean_scores"][1].tolist() == [0.0, 0.0, 1.0, 0.0, 0.0]
+    assert store.creator_names(store.by_creator(min_verdicts=3)["creator"]) == ["bob"]
+
+    timeline = store.timeline(DAY)
+    assert timeline["start"].tolist() == [0, DAY, 2 * DAY]
+    assert timeline["verdicts"].tolist() == [1, 2, 2] and timeline["fallbacks"].tolist() == [0, 1, 0]
+    assert timeline["ratings"][1].tolist() == [0, 0, 0, 1]
+
+    recent = store.timeline(DAY, store.mask(creator="bob", since=DAY, until=2 * DAY))
+    assert recent["start"].tolist() == [DAY] and recent["fallbacks"].tolist() == [1]
+    assert store.timeline(DAY, store.mask(creator="nobody"))["verdicts"].tolist() == []
+
+
+def test_crashed_flush_is_rolled_back_on_reopen(tmp_path, monkeypatch):
+    store = VerdictStore(str(tmp_path))
+    store.append(verdict("G"), creator="alice", timestamp=0)
+    store.flush()
+
+    store.append(verdict("R", ["Threat"], violence=3), creator="mallory", timestamp=DAY)
+
+    def crash(*args):
+        raise OSError("power cut")
+
+    # Dies after the column files were written but before meta.json was replaced
+    monkeypatch.setattr(os, "replace", crash)
+    with pytest.raises(OSError):
+        store.flush()
+    monkeypatch.undo()
+    assert os.path.getsize(tmp_path / "rating.u8") == 2
+
+    store = VerdictStore(str(tmp_path))
+    assert len(store) == 1 and store.creator_id("mallory") is None
+    assert store.rating_counts()["R"] == 0
+
+    store.append(verdict("PG", ["Mild language"], language=1), creator="bob", timestamp=DAY)
+    store.close()
+    store = VerdictStore(str(tmp_path))
+    assert store.column("rating").tolist() == [0, 1]
+    assert os.path.getsize(tmp_path / "rating.u8") == 2
+    assert store.creator_names(store.by_creator()["creator"]) == ["alice", "bob"]
+    assert dict(store.reason_counts()) == {"Clean": 1, "Mild language": 1}
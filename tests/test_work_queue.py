@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+pytest.importorskip("hathora")
+
+from work_queue import SQLiteWorkQueue, WorkQueue, main  # noqa: E402
+
+
+def test_interface_is_abstract():
+    class Partial(WorkQueue):
+        def put(self, payloads, keys=None):
+            return 0
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_failing_jobs_are_dead_lettered_then_requeued(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / "queue.sqlite3"), max_attempts=2)
+    assert queue.put([{"text": "a"}, {"text": "b"}], keys=["a", "b"]) == 2
+    assert queue.put([{"text": "a"}], keys=["a"]) == 0
+
+    for _ in range(2):
+        job = queue.claim("w")[0]
+        assert job["key"] == "a"
+        queue.nack(job["id"], "w", "boom")
+    assert queue.get("a")["status"] == "dead"
+
+    job = queue.claim("w")[0]
+    assert queue.ack(job["id"], "w", {"rating": "G"})
+    assert not queue.ack(job["id"], "other", {"rating": "G"})
+    assert queue.counts() == {"queued": 0, "leased": 0, "done": 1, "dead": 1}
+
+    assert queue.requeue_dead(keys=["b"]) == 0
+    assert queue.requeue_dead(keys=["a"]) == 1
+    assert queue.get("a") == {"status": "queued", "attempts": 0, "result": None, "error": "boom"}
+    queue.close()
+
+
+def write_jsonl(path, records):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+    return str(path)
+
+
+def test_enqueue_keys_jobs_on_content(tmp_path, capsys):
+    queue_path = str(tmp_path / "queue.sqlite3")
+    # Same file name in two directories, with overlapping ids but different transcripts
+    first = write_jsonl(tmp_path / "a" / "batch.jsonl", [
+        {"id": 1, "transcript": "see you next week"},
+        {"id": 2, "transcript": "great game"},
+        {"id": 3, "transcript": "see you next week"},
+    ])
+    second = write_jsonl(tmp_path / "b" / "batch.jsonl", [
+        {"id": 1, "transcript": "what a comeback"},
+        {"id": 2, "transcript": "great game"},
+    ])
+    main(["--queue", queue_path, "enqueue", first])
+    main(["--queue", queue_path, "enqueue", second])
+    out = capsys.readouterr().out
+    assert "✓ Enqueued 1 jobs for 2 records (0 repeated transcripts, 1 already queued, 1 ids merged into those)" in out
+    main(["--queue", queue_path, "enqueue", second])
+    out = capsys.readouterr().out
+    assert "✓ Enqueued 0 jobs for 2 records (0 repeated transcripts, 2 already queued, 0 ids merged into those)" in out
+
+    queue = SQLiteWorkQueue(queue_path)
+    assert queue.counts()["queued"] == 3
+    while jobs := queue.claim("w"):
+        queue.ack(jobs[0]["id"], "w", {"text": jobs[0]["payload"]["text"]})
+    queue.close()
+
+    output = tmp_path / "verdicts.jsonl"
+    main(["--queue", queue_path, "export", str(output)])
+    exported = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [(row["id"], row["classification"]["text"]) for row in exported] == [
+        (1, "see you next week"), (3, "see you next week"), (2, "great game"), (2, "great game"),
+        (1, "what a comeback"),
+    ]
+
+
+def test_add_ids_merges_into_deferred_jobs(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / "queue.sqlite3"))
+    queue.put([{"id": "k", "text": "great game"}], keys=["k"])
+
+    assert queue.add_ids({"k": [("batch.jsonl", 7), ("batch.jsonl", 8)], "missing": [("batch.jsonl", 9)]}) == 2
+    assert queue.add_ids({"k": [("batch.jsonl", 7)]}) == 0
+    payload = queue.claim("w")[0]["payload"]
+    assert payload["ids"] == ["k", 7, 8] and payload["sources"] == [None, "batch.jsonl", "batch.jsonl"]
+    queue.close()
@@ -1,6 +1,9 @@
 from openai import OpenAI
 import json
 
+import telemetry
+from verdict_schema import backend_name, parse_verdict, record_attempt, structured_output_kwargs
+
 
 # ----------------------------------------
 # 1. Connect to your local Ollama server
@@ -104,27 +107,46 @@ Answer:
 """
 
 def rate_transcript(transcript: str) -> dict:
-    completion = client.chat.completions.create(
-        model="gpt-oss-safeguard:20b",
-        messages=[
-            {"role": "system", "content": RATING_POLICY},
-            {"role": "user", "content": transcript},
-        ],
-        stream=False,
-    )
-
-    raw = completion.choices[0].message.content.strip()
+    backend = backend_name(client)
+    record_attempt(backend, 0)
+    with telemetry.span("model_call", backend=backend):
+        completion = client.chat.completions.create(
+            model="gpt-oss-safeguard:20b",
+            messages=[
+                {"role": "system", "content": RATING_POLICY},
+                {"role": "user", "content": transcript},
+            ],
+            stream=False,
+            **structured_output_kwargs(client),
+        )
+    telemetry.record_tokens(completion, backend)
+
+    raw = completion.choices[0].message.content
 
     try:
-        verdict = json.loads(raw)
-    except json.JSONDecodeError:
-        print("Model returned invalid JSON:")
+        verdict = parse_verdict(raw, backend)
+    except ValueError:  # includes json.JSONDecodeError
+        print("Model returned an invalid verdict:")
         print(raw)
         raise
 
     return verdict
 
 
+def rate_transcript_streaming(transcript: str, on_event=None) -> dict:
+    # Imported here so the plain Ollama path doesn't need OpenRouter settings
+    from streaming_classifier import classify_content_streaming
+
+    return classify_content_streaming(
+        client,
+        transcript,
+        on_event=on_event,
+        model="gpt-oss-safeguard:20b",
+        policy_text=RATING_POLICY,
+        reasoning=False,
+    )
+
+
 if __name__ == "__main__":
     sample_transcript = """
     Dude what the FUCK was that, that game was insane.
@@ -0,0 +1,348 @@
+"""
+Transcript Cache
+Persistent speech-to-text cache keyed by what the audio sounds like rather
+than by its file bytes, so re-uploads under another filename, container or
+bitrate (an M4A and an MP3 of the same recording) skip the STT round-trip.
+
+Each recording is decoded to 8 kHz mono and reduced to an acoustic
+fingerprint: one 32-bit word per 32 ms frame, each bit the sign of an
+energy difference between neighbouring frequency bands and frames (the
+Haitsma-Kalker scheme). Lossy re-encoding flips only a few percent of the
+bits, while unrelated audio differs in about half of them, so two
+recordings match when the bit error rate at the best alignment is low.
+Byte-identical files are found by SHA-256 before anything is decoded.
+
+Entries live in SQLite with the least recently used evicted once the store
+exceeds its size budget.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+import telemetry
+from audio_converter import transcribe_audio
+from audio_preprocess import stream_preprocessed
+
+
+DEFAULT_DB_PATH = ".transcript_cache.sqlite3"
+
+FINGERPRINT_RATE = 8000
+FRAME = 1024             # 128 ms analysis window
+HOP = 256                # 32 ms between fingerprint words
+BANDS = 33               # 33 bands -> 32 band differences -> 32 bits
+LOW_HZ, HIGH_HZ = 300.0, 2000.0
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _band_matrix():
+    freqs = np.fft.rfftfreq(FRAME, 1.0 / FINGERPRINT_RATE)
+    band = np.digitize(freqs, np.geomspace(LOW_HZ, HIGH_HZ, BANDS + 1)) - 1
+    matrix = np.zeros((len(freqs), BANDS), dtype=np.float32)
+    inside = (band >= 0) & (band < BANDS)
+    matrix[np.flatnonzero(inside), band[inside]] = 1.0
+    return matrix
+
+
+_BAND_MATRIX = _band_matrix()
+_WINDOW = np.hanning(FRAME).astype(np.float32)
+
+
+def fingerprint_samples(samples):
+    """
+    Fingerprint mono PCM sampled at FINGERPRINT_RATE.
+
+    Args:
+        samples: 1-D array of samples (any numeric dtype)
+
+    Returns:
+        np.ndarray: uint32 fingerprint, one word per HOP samples
+    """
+    samples = np.asarray(samples, dtype=np.float32)
+    n_frames = 1 + (len(samples) - FRAME) // HOP if len(samples) >= FRAME else 0
+    if n_frames < 2:
+        return np.zeros(0, dtype=np.uint32)
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME)[::HOP][:n_frames]
+    energy = (np.abs(np.fft.rfft(frames * _WINDOW, axis=1)) ** 2) @ _BAND_MATRIX
+    band_diff = energy[:, :-1] - energy[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    return np.packbits(bits, axis=1, bitorder="little").view("<u4").ravel().astype(np.uint32)
+
+
+def fingerprint_file(audio_file_path):
+    """Decode a file with ffmpeg (streaming, 8 kHz mono) and fingerprint it"""
+    pcm = b"".join(stream_preprocessed(audio_file_path, "wav", FINGERPRINT_RATE))
+    return fingerprint_samples(np.frombuffer(pcm, dtype="<i2"))
+
+
+def bit_error_rate(a, b, max_shift=16):
+    """
+    Lowest fraction of differing bits over alignments within ``max_shift`` words.
+
+    Returns:
+        float: 0.0 for identical fingerprints, about 0.5 for unrelated audio
+    """
+    best = 1.0
+    for shift in range(-max_shift, max_shift + 1):
+        x, y = (a[shift:], b) if shift >= 0 else (a, b[-shift:])
+        n = min(len(x), len(y))
+        if n < max(8, min(len(a), len(b)) // 2):
+            continue
+        errors = _POPCOUNT[(x[:n] ^ y[:n]).view(np.uint8)].sum()
+        best = min(best, errors / (32.0 * n))
+    return best
+
+
+def file_sha256(audio_file_path, chunk_bytes=1 << 20):
+    digest = hashlib.sha256()
+    with open(audio_file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_bytes), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """
+    SQLite-backed transcript cache with exact (file hash) and acoustic lookups.
+
+    Candidates for an acoustic match are restricted by an index on model and
+    fingerprint length, so a lookup compares against recordings of about the
+    same duration only.
+
+    Args:
+        db_path: SQLite file
+        max_bytes: Size budget for fingerprints plus transcripts (oldest accessed evicted)
+        max_bit_error_rate: Highest bit error rate still treated as the same audio
+        max_shift_s: Largest start offset (and duration difference) tolerated between copies
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_bytes=256 << 20, max_bit_error_rate=0.25,
+                 max_shift_s=0.5):
+        self.max_bytes = max_bytes
+        self.max_bit_error_rate = max_bit_error_rate
+        self.max_shift = max(1, int(max_shift_s * FINGERPRINT_RATE / HOP))
+        self._lock = threading.Lock()
+        self.stats = {
+            "exact_hits": 0,
+            "fingerprint_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "lookup_s": 0.0,
+        }
+
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS transcripts ("
+            "id INTEGER PRIMARY KEY, model TEXT NOT NULL, frames INTEGER NOT NULL, "
+            "fingerprint BLOB NOT NULL, transcript TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS transcripts_frames ON transcripts (model, frames)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS transcripts_accessed ON transcripts (accessed_at)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "sha256 TEXT NOT NULL, model TEXT NOT NULL, transcript_id INTEGER NOT NULL, "
+            "PRIMARY KEY (sha256, model))"
+        )
+        self._db.commit()
+        (self._total_bytes,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM transcripts"
+        ).fetchone()
+
+    def _touch(self, transcript_id, now):
+        self._db.execute("UPDATE transcripts SET accessed_at = ? WHERE id = ?", (now, transcript_id))
+        self._db.commit()
+
+    def lookup_exact(self, sha256, model):
+        """Transcript of a byte-identical upload, or None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT t.id, t.transcript FROM files f JOIN transcripts t ON t.id = f.transcript_id "
+                "WHERE f.sha256 = ? AND f.model = ?", (sha256, model)
+            ).fetchone()
+            if row is None:
+                return None
+            self._touch(row[0], time.time())
+            self.stats["exact_hits"] += 1
+            return row[1]
+
+    def lookup_fingerprint(self, fingerprint, model):
+        """
+        Transcript of acoustically matching audio, or None.
+
+        Returns:
+            tuple: (transcript_id, transcript) or None
+        """
+        frames = len(fingerprint)
+        if frames == 0:
+            return None
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, fingerprint, transcript FROM transcripts "
+                "WHERE model = ? AND frames BETWEEN ? AND ?",
+                (model, frames - self.max_shift, frames + self.max_shift),
+            ).fetchall()
+        best = None
+        for transcript_id, blob, transcript in rows:
+            error_rate = bit_error_rate(fingerprint, np.frombuffer(blob, dtype="<u4"), self.max_shift)
+            if error_rate <= self.max_bit_error_rate and (best is None or error_rate < best[0]):
+                best = (error_rate, transcript_id, transcript)
+        if best is None:
+            return None
+        with self._lock:
+            self._touch(best[1], time.time())
+            self.stats["fingerprint_hits"] += 1
+        return best[1], best[2]
+
+    def link_file(self, sha256, model, transcript_id):
+        """Remember that a file's bytes map to an existing entry"""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files (sha256, model, transcript_id) VALUES (?, ?, ?)",
+                (sha256, model, transcript_id),
+            )
+            self._db.commit()
+
+    def store(self, fingerprint, model, transcript, sha256=None):
+        """Add a transcript; evicts least recently used entries beyond ``max_bytes``"""
+        if len(fingerprint) == 0:
+            return
+        blob = np.asarray(fingerprint, dtype="<u4").tobytes()
+        size = len(blob) + len(transcript.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO transcripts (model, frames, fingerprint, transcript, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (model, len(fingerprint), blob, transcript, size, now, now),
+            )
+            if sha256 is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO files (sha256, model, transcript_id) VALUES (?, ?, ?)",
+                    (sha256, model, cursor.lastrowid),
+                )
+            self._total_bytes += size
+            self.stats["stores"] += 1
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        # Drop the oldest accessed tenth of the budget at a time, not one row per store
+        target = int(self.max_bytes * 0.9)
+        rows = self._db.execute(
+            "SELECT id, size FROM transcripts ORDER BY accessed_at"
+        )
+        doomed = []
+        for transcript_id, size in rows:
+            if self._total_bytes <= target:
+                break
+            doomed.append((transcript_id,))
+            self._total_bytes -= size
+        self._db.executemany("DELETE FROM transcripts WHERE id = ?", doomed)
+        self._db.executemany("DELETE FROM files WHERE transcript_id = ?", doomed)
+        self.stats["evictions"] += len(doomed)
+
+    def record_lookup(self, seconds, hit):
+        with self._lock:
+            self.stats["lookup_s"] += seconds
+            if not hit:
+                self.stats["misses"] += 1
+
+    def hit_rate(self) -> float:
+        with self._lock:
+            hits = self.stats["exact_hits"] + self.stats["fingerprint_hits"]
+            total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def summary(self):
+        """Hit counts, hit rate, mean lookup time and stored size"""
+        with self._lock:
+            lookups = self.stats["exact_hits"] + self.stats["fingerprint_hits"] + self.stats["misses"]
+            stats = {key: value for key, value in self.stats.items() if key != "lookup_s"}
+            stats["avg_lookup_ms"] = round(1000 * self.stats["lookup_s"] / lookups, 2) if lookups else 0.0
+            stats["stored_mb"] = round(self._total_bytes / 1e6, 3)
+        stats["hit_rate"] = self.hit_rate()
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+
+class CachingTranscriber:
+    """
+    Transcription function that consults a TranscriptCache first.
+
+    Has the ``transcribe_audio`` signature, so it drops into AudioPipeline
+    and ClassifyService; ``transcribe`` may itself be an AudioPreprocessor or
+    the segmented transcriber. Files ffmpeg cannot decode are transcribed
+    without caching.
+
+    Args:
+        cache: TranscriptCache
+        transcribe: Underlying transcription function (hathora_client, path, model) -> str
+    """
+
+    def __init__(self, cache, transcribe=transcribe_audio):
+        self.cache = cache
+        self.transcribe = transcribe
+        self._warned = False
+
+    def __call__(self, hathora_client, audio_file_path, model="parakeet"):
+        cache = self.cache
+        started = time.perf_counter()
+        with telemetry.span("transcript_cache") as span:
+            sha256 = file_sha256(audio_file_path)
+            transcript = cache.lookup_exact(sha256, model)
+            fingerprint = None
+            if transcript is None:
+                try:
+                    fingerprint = fingerprint_file(audio_file_path)
+                except (OSError, RuntimeError) as e:
+                    if not self._warned:
+                        print(f"⚠ Cannot fingerprint audio, transcript cache bypassed ({type(e).__name__}: {e})")
+                        self._warned = True
+                else:
+                    match = cache.lookup_fingerprint(fingerprint, model)
+                    if match is not None:
+                        cache.link_file(sha256, model, match[0])
+                        transcript = match[1]
+            span.set(hit=transcript is not None)
+        cache.record_lookup(time.perf_counter() - started, hit=transcript is not None)
+        if transcript is not None:
+            telemetry.count("transcript_cache", result="hit")
+            return transcript
+
+        telemetry.count("transcript_cache", result="miss")
+        transcript = self.transcribe(hathora_client, audio_file_path, model)
+        if fingerprint is not None and transcript is not None:
+            cache.store(fingerprint, model, transcript, sha256=sha256)
+        return transcript
+
+
+# Example usage
+if __name__ == "__main__":
+    import json
+    import sys
+
+    paths = sys.argv[1:] or ["Recording.mp3", "Recording copy.m4a"]
+    prints = {}
+    for path in paths:
+        started = time.perf_counter()
+        prints[path] = fingerprint_file(path)
+        print(f"✓ {path}: {len(prints[path])} words in {1000 * (time.perf_counter() - started):.1f} ms")
+    first = paths[0]
+    print(json.dumps({path: round(bit_error_rate(prints[first], fp), 3) for path, fp in prints.items()}, indent=2))
@@ -0,0 +1,540 @@
+"""
+Transcript Normalizer
+Token-reducing clean-up of STT transcripts before classification. The
+transcript is the user message of every model call, so filler and noise in
+it are paid for in prompt tokens and latency on every request.
+
+The pass, in order:
+
+- non-semantic tokens: subtitle cue numbers and timestamps, inline timing
+  markup, STT special tokens and non-speech tags such as ``[music]`` or
+  ``(inaudible)`` (tags that describe content, like ``[gunshots]``, stay)
+- filler words ("um", "uh", "hmm") and comma-delimited discourse markers
+  ("like,", ", you know,", "I mean,")
+- stutters ("th- that") and repeated function words or phrases
+  ("I I I think"), collapsed to one occurrence
+- repeats of a phrase with a lexicon term in it (profanity, threats), and
+  any phrase with a content word said three or more times, are collapsed
+  into a count-annotated form, ``fuck [x5]``, ``kill [x5]`` or
+  ``(shut up) [x3]``, so the policy's "frequent strong profanity" rule and
+  the model still see how often it was said. POLICY explains the notation
+  to the model and LexicalFilter reads it back as that many occurrences.
+  Repeats too short to pay for the annotation are left verbatim
+- whitespace and duplicated punctuation
+
+Every normalization records tokens before and after. ``report`` measures a
+file of transcripts; ``regress`` re-classifies a held-out set normalized
+and compares the verdicts with those of the original transcripts. Run it
+against the real model: the stub server rates by counting words and does
+not know the ``[xN]`` notation, so under ``--stub`` annotated repeats show
+up as under-rated, which is what the harness should catch.
+
+The services normalize after the pre-filter, which keeps reading raw
+transcripts.
+
+Usage:
+    python transcript_normalizer.py show "Um, so, like, I I think it's, you know, fine."
+    python transcript_normalizer.py report transcripts.jsonl --examples 5
+    python transcript_normalizer.py regress --log .verdict_log.sqlite3
+    python transcript_normalizer.py regress transcripts.jsonl --limit 200 --noise-floor
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import telemetry
+from lexical_filter import LexicalFilter
+from verdict_schema import REQUIRED_SCORE_KEYS, VALID_RATINGS
+
+
+DEFAULT_FILLERS = ("um", "umm", "uh", "uhh", "uhm", "er", "erm", "ah", "ahh", "hmm", "hm", "mm", "mmm", "mhm")
+# Only removed when set off by commas or sentence punctuation ("I like it" stays)
+DEFAULT_DISCOURSE_MARKERS = ("like", "you know", "i mean", "basically", "literally", "actually",
+                             "so", "well", "okay", "ok", "alright")
+NON_SPEECH_TAGS = ("music", "applause", "laughter", "laughs", "laughing", "silence", "blank_audio",
+                   "inaudible", "indistinct", "noise", "background noise", "crosstalk", "unk",
+                   "no speech", "pause", "cough", "coughs", "sigh", "sighs")
+# Repeats made only of these (and fillers) collapse without a count
+DEFAULT_FUNCTION_WORDS = ("i", "i'm", "me", "my", "you", "your", "he", "she", "it", "it's", "we", "they", "them",
+                          "this", "that", "these", "those", "a", "an", "the", "and", "but", "or", "so", "if",
+                          "to", "of", "in", "on", "at", "for", "with", "from", "is", "are", "was", "were", "be",
+                          "do", "did", "have", "has", "had", "can", "will", "just", "not", "no", "yes", "yeah",
+                          "oh", "hey", "okay", "ok", "well", "like", "what", "there", "here", "then", "very",
+                          "really")
+DEFAULT_MAX_PHRASE_WORDS = 6
+# Words a collapsed repeat must save before " [xN]" (about four tokens) pays for itself
+ANNOTATION_MIN_SAVED_WORDS = 3
+
+_CUE_NUMBER_RE = re.compile(r"^\s*\d+\s*$\n(?=.*-->)", re.MULTILINE)
+_CUE_TIMING_RE = re.compile(r"^.*-->.*$", re.MULTILINE)
+_HEADER_RE = re.compile(r"\AWEBVTT[^\n]*\n")
+_TIMESTAMP_RE = re.compile(
+    r"[\[(<]\d{1,2}:\d{2}(?::\d{2})?(?:[.,]\d{1,3})?[\])>]"            # [00:12] (01:02:03) <00:00:01.000>
+    r"|^[ \t]*\d{1,2}:\d{2}(?::\d{2})?(?:[.,]\d{1,3})?[ \t]*[-|]?[ \t]",  # line-leading "00:12 text"
+    re.MULTILINE,
+)
+_MARKUP_RE = re.compile(r"</?c(?:\.[\w.]+)?>|<\|[^|>]*\|>|♪+")
+_TAG_RE = re.compile(r"[\[(<]\s*(?:" + "|".join(map(re.escape, NON_SPEECH_TAGS)) + r")\s*[\])>]",
+                     re.IGNORECASE)
+_STUTTER_RE = re.compile(r"\b(\w{1,4})-\s+(?=\1)", re.IGNORECASE)
+_TRAILING_PUNCT_RE = re.compile(r"[,.!?;:\"')\]]+$")
+_KEY_STRIP = ",.!?;:\"'()[]"
+
+
+def _word_pattern(words):
+    # Longest first so "you know" wins over a shorter alternative
+    return "|".join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+
+
+_APPROX_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_ENCODING = []
+
+
+def _encoding():
+    if not _ENCODING:
+        try:
+            import tiktoken
+            _ENCODING.append(tiktoken.get_encoding("o200k_base"))
+        except ImportError:
+            _ENCODING.append(None)
+    return _ENCODING[0]
+
+
+def tokenizer_name():
+    """Name of the tokenizer behind ``count_tokens``"""
+    return "o200k_base" if _encoding() is not None else "approximate (words + punctuation)"
+
+
+def count_tokens(text):
+    """
+    Prompt tokens of ``text``.
+
+    Uses tiktoken's o200k_base encoding (the gpt-oss tokenizer family) when it
+    is installed, otherwise counts words and punctuation marks, which tracks
+    BPE tokens closely for conversational English.
+    """
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(_APPROX_TOKEN_RE.findall(text))
+
+
+class TranscriptNormalizer:
+    """
+    Normalizes transcripts and keeps before/after token counts.
+
+    Calling the normalizer returns the normalized text; ``normalize`` does the
+    same without touching the stats. Safe to share between threads.
+
+    Args:
+        fillers: Words removed wherever they stand alone
+        function_words: Words whose repeats are collapsed without a count
+        discourse_markers: Words and phrases removed when set off by punctuation
+        max_phrase_words: Longest phrase checked for immediate repetition
+        lexical_filter: LexicalFilter deciding which repeats keep a count
+            (default: the default lexicon)
+    """
+
+    def __init__(self, fillers=DEFAULT_FILLERS, discourse_markers=DEFAULT_DISCOURSE_MARKERS,
+                 max_phrase_words=DEFAULT_MAX_PHRASE_WORDS, lexical_filter=None,
+                 function_words=DEFAULT_FUNCTION_WORDS):
+        self.max_phrase_words = max_phrase_words
+        self.function_words = frozenset(function_words) | frozenset(fillers)
+        self.lexical_filter = lexical_filter or LexicalFilter()
+        self._filler_re = re.compile(
+            r",?\s*(?<![\w'*-])(?:" + _word_pattern(fillers) + r")(?![\w'*-])\s*,?", re.IGNORECASE)
+        markers = _word_pattern(discourse_markers)
+        # "Like, ..." / "..., you know, ..." at the start of a clause
+        self._marker_lead_re = re.compile(r"(^|[,.!?;:]\s*)(?:" + markers + r")\s*,\s*", re.IGNORECASE)
+        # "..., you know." at the end of a clause
+        self._marker_tail_re = re.compile(r",\s*(?:" + markers + r")\s*(?=[.!?;:]|$)", re.IGNORECASE)
+        self._lock = threading.Lock()
+        self.stats = {"texts": 0, "tokens_before": 0, "tokens_after": 0, "removed_fillers": 0,
+                      "removed_tags": 0, "collapsed_repeats": 0, "annotated_repeats": 0, "normalize_s": 0.0}
+
+    def __call__(self, text: str) -> str:
+        started = time.perf_counter()
+        counts = {}
+        normalized = self.normalize(text, counts)
+        elapsed = time.perf_counter() - started
+        before, after = count_tokens(text), count_tokens(normalized)
+        with self._lock:
+            self.stats["texts"] += 1
+            self.stats["tokens_before"] += before
+            self.stats["tokens_after"] += after
+            self.stats["normalize_s"] += elapsed
+            for name, value in counts.items():
+                self.stats[name] += value
+        telemetry.count("transcript_tokens", before, kind="before")
+        telemetry.count("transcript_tokens", after, kind="after")
+        return normalized
+
+    def normalize(self, text: str, counts=None) -> str:
+        """
+        Normalize one transcript.
+
+        Args:
+            text: Transcript as returned by speech-to-text
+            counts: Optional dict receiving ``removed_fillers``, ``removed_tags``,
+                ``collapsed_repeats`` and ``annotated_repeats``
+
+        Returns:
+            str: Normalized transcript ("" when nothing was said)
+        """
+        counts = {} if counts is None else counts
+        text = _HEADER_RE.sub("", text)
+        text = _CUE_NUMBER_RE.sub("", text)
+        text = _CUE_TIMING_RE.sub("", text)
+        text = _TIMESTAMP_RE.sub(" ", text)
+        text, tags = _TAG_RE.subn(" ", text)
+        text = _MARKUP_RE.sub(" ", text)
+        text = " ".join(text.split())
+
+        text, fillers = self._filler_re.subn(" ", text)
+        text = text.strip()
+        markers = 0
+        while True:
+            # Again until stable: removing "So," leaves "like," at the start of the clause
+            text, removed = self._marker_lead_re.subn(
+                lambda m: " " if m.group(1).strip() == "," else m.group(1), text)
+            markers += removed
+            if not removed:
+                break
+        text, tail_markers = self._marker_tail_re.subn("", text)
+        text, stutters = _STUTTER_RE.subn("", text)
+        counts["removed_tags"] = tags
+        counts["removed_fillers"] = fillers + markers + tail_markers + stutters
+
+        text = self._collapse_repeats(text.split(), counts)
+        text = re.sub(r"\s+([,.!?;:])", r"\1", text)
+        text = re.sub(r",(?:\s*,)+", ",", text)
+        text = re.sub(r",\s*([.!?;:])", r"\1", text)
+        text = re.sub(r"([!?])[!?]+", r"\1", text)
+        text = re.sub(r"\.{4,}", "...", text)
+        return text.strip(" ,;:")
+
+    def _collapse_repeats(self, words, counts):
+        keys = [word.strip(_KEY_STRIP).lower() for word in words]
+        out = []
+        collapsed = annotated = 0
+        i = 0
+        while i < len(words):
+            best_n, best_reps = 0, 1
+            for n in range(1, self.max_phrase_words + 1):
+                if i + 2 * n > len(words):
+                    break
+                unit = keys[i:i + n]
+                if not all(unit):
+                    continue
+                reps = 1
+                while keys[i + reps * n:i + (reps + 1) * n] == unit:
+                    reps += 1
+                if reps > 1 and n * (reps - 1) > best_n * (best_reps - 1):
+                    best_n, best_reps = n, reps
+            if not best_n:
+                out.append(words[i])
+                i += 1
+                continue
+
+            end = i + best_n * best_reps
+            trailing = _TRAILING_PUNCT_RE.search(words[end - 1])
+            trailing = trailing.group() if trailing else ""
+            unit = words[i:i + best_n]
+            unit[-1] = _TRAILING_PUNCT_RE.sub("", unit[-1]) or unit[-1]
+            unit_text = " ".join(unit)
+            content = best_reps >= 3 and any(key not in self.function_words
+                                             for key in keys[i:i + best_n])
+            if not content and not self.lexical_filter.scan(unit_text)["hits"]:
+                out.append(unit_text + trailing)
+                collapsed += 1
+            elif best_n * (best_reps - 1) >= ANNOTATION_MIN_SAVED_WORDS:
+                if best_n > 1:
+                    unit_text = "(" + unit_text.replace("(", "").replace(")", "") + ")"
+                out.append(f"{unit_text} [x{best_reps}]{trailing}")
+                annotated += 1
+            else:
+                out.extend(words[i:end])
+            i = end
+        counts["collapsed_repeats"] = collapsed
+        counts["annotated_repeats"] = annotated
+        return " ".join(out)
+
+    def reduction(self) -> float:
+        """Share of prompt tokens removed so far"""
+        before = self.stats["tokens_before"]
+        return 1 - self.stats["tokens_after"] / before if before else 0.0
+
+    def summary(self):
+        with self._lock:
+            stats = dict(self.stats)
+        texts = stats.pop("texts")
+        normalize_s = stats.pop("normalize_s")
+        return {"texts": texts, **stats, "token_reduction": round(self.reduction(), 4),
+                "avg_normalize_us": round(1e6 * normalize_s / texts, 1) if texts else 0.0}
+
+
+def compression_report(texts, normalizer=None, examples=0):
+    """
+    Tokens before and after normalizing ``texts``.
+
+    Returns:
+        dict: Totals, the per-transcript reduction distribution and the first
+        ``examples`` transcripts that changed, before and after
+    """
+    normalizer = normalizer or TranscriptNormalizer()
+    reductions = []
+    changed = []
+    for text in texts:
+        before = count_tokens(text)
+        normalized = normalizer(text)
+        if before:
+            reductions.append(1 - count_tokens(normalized) / before)
+        if normalized != text and len(changed) < examples:
+            changed.append({"before": text, "after": normalized})
+    reductions.sort()
+    summary = normalizer.summary()
+    return {
+        "tokenizer": tokenizer_name(),
+        **summary,
+        "reduction_p50": round(reductions[len(reductions) // 2], 4) if reductions else 0.0,
+        "reduction_p90": round(reductions[int(len(reductions) * 0.9)], 4) if reductions else 0.0,
+        "examples": changed,
+    }
+
+
+def compare_verdicts(references, candidates):
+    """
+    Agreement of candidate verdicts with reference verdicts, pair by pair.
+
+    Pairs where either side fell back are counted but not compared.
+
+    Returns:
+        dict: Rating and per-category score agreement, under/over-rated shares
+        and the changed pairs' indices
+    """
+    compared = fallbacks = agree = under = over = 0
+    score_agree = {key: 0 for key in REQUIRED_SCORE_KEYS}
+    changed = []
+    for index, (reference, candidate) in enumerate(zip(references, candidates)):
+        if reference.get("error") or candidate.get("error"):
+            fallbacks += 1
+            continue
+        compared += 1
+        expected = VALID_RATINGS.index(reference["rating"])
+        actual = VALID_RATINGS.index(candidate["rating"])
+        agree += expected == actual
+        under += actual < expected
+        over += actual > expected
+        for key in REQUIRED_SCORE_KEYS:
+            score_agree[key] += reference["scores"].get(key) == candidate["scores"].get(key)
+        if expected != actual:
+            changed.append(index)
+    return {
+        "compared": compared,
+        "fallbacks": fallbacks,
+        "rating_agreement": agree / compared if compared else None,
+        # Under-rating is the costly mistake: content shown to a younger audience than it should be
+        "underrated": under / compared if compared else None,
+        "overrated": over / compared if compared else None,
+        "score_agreement": {key: value / compared if compared else None for key, value in score_agree.items()},
+        "changed": changed,
+    }
+
+
+def regression_report(openai_client, texts, references=None, normalizer=None, classify=None,
+                      max_retries=3, concurrency=8, noise_floor=False, examples=10):
+    """
+    Classify normalized transcripts and compare them with the originals' verdicts.
+
+    Args:
+        openai_client: OpenAI-compatible client
+        texts: Held-out original transcripts
+        references: Verdicts of the originals (e.g. logged ones); classified here if None
+        normalizer: TranscriptNormalizer (default settings if None)
+        classify: Classification function with the ``classify_content`` signature
+        max_retries: Retries per classification
+        concurrency: Classifications in flight at once
+        noise_floor: Also re-classify the originals, to measure how often the
+            model disagrees with itself on unchanged input
+        examples: Changed verdicts to include in full
+
+    Returns:
+        dict: Token report plus ``normalized`` (and ``noise_floor``) agreement
+    """
+    if classify is None:
+        from audio_converter import classify_content as classify
+    normalizer = normalizer or TranscriptNormalizer()
+    normalized = [normalizer(text) for text in texts]
+
+    def run(batch):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(lambda text: classify(openai_client, text, max_retries=max_retries), batch))
+
+    # Identical normalized transcripts are classified once
+    unique = list(dict.fromkeys(normalized))
+    verdicts = dict(zip(unique, run(unique)))
+    candidates = [verdicts[text] for text in normalized]
+    if references is None:
+        references = run(texts)
+    report = {"tokenizer": tokenizer_name(), **normalizer.summary()}
+    report["normalized"] = compare_verdicts(references, candidates)
+    if noise_floor:
+        report["noise_floor"] = compare_verdicts(references, run(texts))
+        del report["noise_floor"]["changed"]
+    changed = report["normalized"].pop("changed")
+    report["changed_examples"] = [
+        {"before": texts[i], "after": normalized[i],
+         "reference": references[i]["rating"], "normalized": candidates[i]["rating"]}
+        for i in changed[:examples]
+    ]
+    return report
+
+
+def read_transcripts(path, text_field="transcript", limit=None):
+    """Transcripts from a batch_classify-style .jsonl or .csv file, skipping records without text"""
+    texts = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        records = csv.DictReader(f) if path.lower().endswith(".csv") else (json.loads(line) for line in f if line.strip())
+        for record in records:
+            text = record.get(text_field)
+            if isinstance(text, str):
+                texts.append(text)
+                if limit is not None and len(texts) >= limit:
+                    break
+    return texts
+
+
+def _build_client(args):
+    if args.stub:
+        from openai import OpenAI
+        from stub_server import StubConfig, start_stub_server
+
+        server = start_stub_server(StubConfig(latency_ms=50, latency_p99_ms=200))
+        return OpenAI(base_url=server.base_url + "/v1", api_key="stub", max_retries=0), server
+    from dotenv import load_dotenv
+    from openai import OpenAI
+
+    load_dotenv()
+    # Retries are handled by classify_content
+    return OpenAI(
+        base_url=os.getenv("OPENAI_BASE_URL", "https://openrouter.ai/api/v1"),
+        api_key=os.getenv("OPENAI_API_KEY"),
+        max_retries=0,
+    ), None
+
+
+def add_normalize_arguments(parser):
+    """Add the ``--normalize`` option to an argparse parser"""
+    parser.add_argument("--normalize", action="store_true",
+                        help="Strip filler, non-speech tags and repetition from transcripts before classifying "
+                             "(see transcript_normalizer.py)")
+
+
+def normalizer_from_args(args):
+    """TranscriptNormalizer configured by ``add_normalize_arguments``, or None without ``--normalize``"""
+    return TranscriptNormalizer() if args.normalize else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Normalize transcripts to cut prompt tokens, and check "
+                                                 "that verdicts do not change.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("show", help="Normalize one transcript")
+    command.add_argument("text")
+
+    command = commands.add_parser("report", help="Tokens before and after normalizing a file of transcripts")
+    command.add_argument("input", help="Input .jsonl or .csv file")
+    command.add_argument("--text-field", default="transcript")
+    command.add_argument("--limit", type=int, default=None)
+    command.add_argument("--examples", type=int, default=3, help="Changed transcripts to print")
+
+    command = commands.add_parser("regress", help="Compare verdicts of normalized and original transcripts")
+    command.add_argument("input", nargs="?", default=None,
+                         help="Input .jsonl or .csv file (originals are classified too)")
+    command.add_argument("--log", default=None, metavar="PATH",
+                         help="Use the held-out test split of a verdict log instead; its verdicts are the reference")
+    command.add_argument("--text-field", default="transcript")
+    command.add_argument("--limit", type=int, default=None)
+    command.add_argument("--concurrency", type=int, default=8)
+    command.add_argument("--max-retries", type=int, default=3)
+    command.add_argument("--noise-floor", action="store_true",
+                         help="Also re-classify the originals to measure the model's own disagreement")
+    command.add_argument("--min-agreement", type=float, default=0.98,
+                         help="Exit with status 1 below this rating agreement")
+    command.add_argument("--max-underrated", type=float, default=0.01,
+                         help="Exit with status 1 above this share of under-rated verdicts")
+    command.add_argument("--stub", action="store_true", help="Classify against an in-process stub server")
+    args = parser.parse_args(argv)
+
+    if args.command == "show":
+        normalizer = TranscriptNormalizer()
+        normalized = normalizer(args.text)
+        print(normalized)
+        print(f"{normalizer.stats['tokens_before']} → {normalizer.stats['tokens_after']} tokens", file=sys.stderr)
+        return
+
+    if args.command == "report":
+        texts = read_transcripts(args.input, args.text_field, args.limit)
+        report = compression_report(texts, examples=args.examples)
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        print(f"✓ {report['tokens_before']:,} → {report['tokens_after']:,} tokens over {report['texts']:,} "
+              f"transcripts ({report['token_reduction']:.1%} fewer)", file=sys.stderr)
+        return
+
+    references = None
+    if args.log:
+        from verdict_log import VerdictLog
+        # Needs NumPy, so only import when asked for
+        from distilled_classifier import split_of
+
+        log = VerdictLog(args.log)
+        try:
+            examples = [(text, verdict) for text, verdict in log.iter_examples() if split_of(text) == "test"]
+        finally:
+            log.close()
+        examples = examples[:args.limit]
+        texts = [text for text, _ in examples]
+        references = [verdict for _, verdict in examples]
+    elif args.input:
+        texts = read_transcripts(args.input, args.text_field, args.limit)
+    else:
+        parser.error("regress needs an input file or --log")
+    if not texts:
+        raise SystemExit("No transcripts to compare.")
+
+    client, server = _build_client(args)
+    try:
+        report = regression_report(client, texts, references, max_retries=args.max_retries,
+                                   concurrency=args.concurrency, noise_floor=args.noise_floor)
+    finally:
+        if server is not None:
+            server.shutdown()
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    result = report["normalized"]
+    if result["rating_agreement"] is None:
+        raise SystemExit("✗ Every comparison hit a fallback; nothing to compare.")
+    print(f"Tokens: {report['tokens_before']:,} → {report['tokens_after']:,} "
+          f"({report['token_reduction']:.1%} fewer)", file=sys.stderr)
+    print(f"Verdicts: {result['rating_agreement']:.1%} rating agreement, {result['underrated']:.1%} under-rated "
+          f"over {result['compared']:,} transcripts", file=sys.stderr)
+    if "noise_floor" in report and report["noise_floor"]["rating_agreement"] is not None:
+        print(f"Noise floor: {report['noise_floor']['rating_agreement']:.1%} agreement re-classifying the originals",
+              file=sys.stderr)
+    if result["rating_agreement"] < args.min_agreement or result["underrated"] > args.max_underrated:
+        print(f"✗ Normalization changes verdicts beyond --min-agreement {args.min_agreement:.0%} / "
+              f"--max-underrated {args.max_underrated:.0%}", file=sys.stderr)
+        sys.exit(1)
+    print("✓ Verdicts unchanged within tolerance", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Verdict Cache
+Content-addressed cache for classification results. Entries are keyed by a
+hash of the normalized transcript, the policy text and the model id, so a
+policy or model change invalidates old verdicts automatically. A bounded
+in-process LRU sits in front of a persistent SQLite store.
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_DB_PATH = ".verdict_cache.sqlite3"
+
+
+def normalize_transcript(content: str) -> str:
+    """Collapse whitespace and case so trivially different transcripts share a key"""
+    return re.sub(r"\s+", " ", content).strip().casefold()
+
+
+def cache_key(content: str, policy: str, model: str) -> str:
+    """
+    Build the content address for a classification.
+
+    Args:
+        content: The transcript being classified
+        policy: The full policy / system prompt text
+        model: The model id used for classification
+
+    Returns:
+        str: Hex SHA-256 digest covering transcript, policy and model
+    """
+    digest = hashlib.sha256()
+    for part in (model, policy, normalize_transcript(content)):
+        encoded = part.encode("utf-8")
+        # Length-prefix each part so boundaries can't be shifted between fields
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class VerdictCache:
+    """
+    Two-tier verdict cache: in-memory LRU backed by SQLite.
+
+    Args:
+        db_path: SQLite file for the persistent tier, or None for memory only
+        max_memory_entries: Capacity of the in-process LRU
+        max_disk_entries: Maximum rows kept in SQLite (oldest accessed evicted)
+        ttl_seconds: Time-to-live for entries, or None to keep forever
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_memory_entries=10_000,
+                 max_disk_entries=1_000_000, ttl_seconds=None):
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes_since_trim = 0
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "skipped_fallbacks": 0,
+            "evictions": 0,
+        }
+
+        self._db = None
+        if db_path is not None:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts ("
+                "key TEXT PRIMARY KEY, verdict TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS verdicts_accessed ON verdicts (accessed_at)"
+            )
+            self._db.commit()
+
+    def _expired(self, created_at, now):
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def get(self, key):
+        """
+        Look up a verdict by cache key.
+
+        Returns:
+            dict or None: A copy of the cached verdict, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, verdict = entry
+                if not self._expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return json.loads(verdict)
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT verdict, created_at FROM verdicts WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    verdict, created_at = row
+                    if not self._expired(created_at, now):
+                        self._db.execute(
+                            "UPDATE verdicts SET accessed_at = ? WHERE key = ?", (now, key)
+                        )
+                        self._db.commit()
+                        self._remember(key, created_at, verdict)
+                        self.stats["disk_hits"] += 1
+                        return json.loads(verdict)
+                    self._db.execute("DELETE FROM verdicts WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.stats["evictions"] += 1
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key, verdict: dict):
+        """
+        Store a verdict. Fallback responses (``"error": True``) are never cached.
+        """
+        if verdict.get("error"):
+            with self._lock:
+                self.stats["skipped_fallbacks"] += 1
+            return
+
+        now = time.time()
+        serialized = json.dumps(verdict, separators=(",", ":"))
+        with self._lock:
+            self._remember(key, now, serialized)
+            self.stats["stores"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO verdicts (key, verdict, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, serialized, now, now),
+                )
+                self._writes_since_trim += 1
+                # Trimming needs a COUNT(*), so only do it every so often
+                if self._writes_since_trim >= 1000:
+                    self._trim_disk(now)
+                self._db.commit()
+
+    def _remember(self, key, created_at, serialized):
+        self._memory[key] = (created_at, serialized)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _trim_disk(self, now):
+        self._writes_since_trim = 0
+        if self.ttl_seconds is not None:
+            cursor = self._db.execute(
+                "DELETE FROM verdicts WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+            self.stats["evictions"] += cursor.rowcount
+        (count,) = self._db.execute("SELECT COUNT(*) FROM verdicts").fetchone()
+        overflow = count - self.max_disk_entries
+        if overflow > 0:
+            cursor = self._db.execute(
+                "DELETE FROM verdicts WHERE key IN "
+                "(SELECT key FROM verdicts ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+            self.stats["evictions"] += cursor.rowcount
+
+    def lookup(self, content: str, policy: str, model: str):
+        """Convenience wrapper: get() keyed by transcript, policy and model"""
+        return self.get(cache_key(content, policy, model))
+
+    def store(self, content: str, policy: str, model: str, verdict: dict):
+        """Convenience wrapper: put() keyed by transcript, policy and model"""
+        self.put(cache_key(content, policy, model), verdict)
+
+    def hit_rate(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._trim_disk(time.time())
+                self._db.commit()
+                self._db.close()
+                self._db = None
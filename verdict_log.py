@@ -0,0 +1,129 @@
+"""
+Verdict Log
+Keeps every fresh model verdict together with its transcript, building a
+labeled dataset for our own policy (used to train the distilled classifier).
+
+VerdictLog has the VerdictCache ``lookup``/``store`` API and wraps an
+optional real cache, so anything that accepts ``cache=`` logs through it.
+Only model verdicts are logged: fallbacks, lexical / distilled
+short-circuits and near-duplicate reuses are skipped, and a transcript is
+logged once per policy and model.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from verdict_cache import cache_key
+
+
+DEFAULT_DB_PATH = ".verdict_log.sqlite3"
+
+
+def policy_hash(policy):
+    return hashlib.sha256(policy.encode("utf-8")).hexdigest()[:16]
+
+
+class VerdictLog:
+    """
+    Append-only (transcript, verdict) log in SQLite.
+
+    Args:
+        db_path: SQLite file
+        inner: Optional VerdictCache (or NearDuplicateIndex) to pass lookups and stores to
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, inner=None):
+        self.inner = inner
+        self._lock = threading.Lock()
+        self.stats = {"logged": 0, "skipped": 0}
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS verdict_log ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, policy_hash TEXT NOT NULL, "
+            "transcript TEXT NOT NULL, verdict TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS verdict_log_policy ON verdict_log (policy_hash, created_at)")
+        self._db.commit()
+
+    def lookup(self, content: str, policy: str, model: str):
+        if self.inner is None:
+            return None
+        return self.inner.lookup(content, policy, model)
+
+    def store(self, content: str, policy: str, model: str, verdict: dict):
+        if self.inner is not None:
+            self.inner.store(content, policy, model, verdict)
+        self.log(content, policy, model, verdict)
+
+    def log(self, content, policy, model, verdict):
+        """Record a model verdict; returns False if it is not one worth learning from"""
+        # Pre-filter answers, near-duplicate reuse and cheap cascade tiers are not model ground truth
+        cheap_tier = (verdict.get("cascade") or {}).get("tier") == "fast"
+        if (verdict.get("error") or "source" in verdict or "near_duplicate" in verdict or cheap_tier
+                or not content.strip()):
+            with self._lock:
+                self.stats["skipped"] += 1
+            return False
+        label = {"rating": verdict["rating"], "scores": verdict["scores"]}
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO verdict_log (key, model, policy_hash, transcript, verdict, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_key(content, policy, model), model, policy_hash(policy), content,
+                 json.dumps(label, separators=(",", ":")), time.time()),
+            )
+            self._db.commit()
+            self.stats["logged"] += 1
+        return True
+
+    def latest_policy(self):
+        """(model, policy_hash) of the most recently logged verdict, or None for an empty log"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT model, policy_hash FROM verdict_log ORDER BY created_at DESC LIMIT 1"
+            ).fetchone()
+
+    def iter_examples(self, model=None, policy=None):
+        """
+        Yield (transcript, verdict) pairs in log order.
+
+        Args:
+            model: Only this model's verdicts (default: the latest logged model)
+            policy: Only verdicts under this policy hash (default: the latest logged policy)
+        """
+        latest = self.latest_policy()
+        if latest is None:
+            return
+        model = model or latest[0]
+        policy = policy or latest[1]
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT rowid, transcript, verdict FROM verdict_log "
+                    "WHERE model = ? AND policy_hash = ? AND rowid > ? ORDER BY rowid LIMIT 1000",
+                    (model, policy, last_rowid),
+                ).fetchall()
+            if not rows:
+                return
+            for last_rowid, transcript, verdict in rows:
+                yield transcript, json.loads(verdict)
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM verdict_log").fetchone()[0]
+
+    def hit_rate(self) -> float:
+        return self.inner.hit_rate() if self.inner is not None else 0.0
+
+    def close(self):
+        if self.inner is not None:
+            self.inner.close()
+        with self._lock:
+            self._db.commit()
+            self._db.close()
@@ -0,0 +1,274 @@
+"""
+Verdict Schema
+Single definition of the classification verdict. The schema is sent as a
+``response_format`` to backends that support structured output, and compiled
+into the single-pass validator every entry point shares, so a verdict is
+valid by the same rules whether it came from OpenRouter, Ollama, a stream or
+a batch. Per-backend retry rate and validation time are tracked here too.
+"""
+
+import json
+import re
+import threading
+import time
+
+import telemetry
+from retry_policy import get_status_code
+
+
+VALID_RATINGS = ["G", "PG", "PG-13", "R"]
+REQUIRED_SCORE_KEYS = ["violence", "sexual_content", "language", "drugs", "self_harm"]
+
+VERDICT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "rating": {"type": "string", "enum": VALID_RATINGS},
+        "reasons": {"type": "array", "items": {"type": "string"}, "minItems": 1},
+        "scores": {
+            "type": "object",
+            "properties": {key: {"type": "number", "minimum": 0, "maximum": 3} for key in REQUIRED_SCORE_KEYS},
+            "required": REQUIRED_SCORE_KEYS,
+            "additionalProperties": False,
+        },
+    },
+    "required": ["rating", "reasons", "scores"],
+    "additionalProperties": False,
+}
+
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "verdict", "strict": True, "schema": VERDICT_SCHEMA},
+}
+
+_FENCE_RE = re.compile(r'^```(?:json)?\s*|\s*```$', flags=re.MULTILINE)
+
+
+class Verdict(dict):
+    """
+    A validated verdict.
+
+    Still a plain dict underneath (JSON, the cache and aggregation keep
+    working unchanged) with typed accessors for the validated fields.
+    """
+
+    @property
+    def rating(self) -> str:
+        return self["rating"]
+
+    @property
+    def reasons(self) -> list:
+        return self["reasons"]
+
+    @property
+    def scores(self) -> dict:
+        return self["scores"]
+
+
+def compile_validator(schema=VERDICT_SCHEMA):
+    """
+    Build a validator for decoded verdicts from the schema.
+
+    Everything the checks need (rating set, required keys, score bounds) is
+    resolved once here, so validating a verdict is a single pass with no
+    schema interpretation. Unknown top-level fields are ignored, matching the
+    original hand-written checks.
+
+    Returns:
+        callable: ``validate(obj) -> Verdict``, raising ValueError
+    """
+    properties = schema["properties"]
+    required = tuple(schema["required"])
+    rating_list = list(properties["rating"]["enum"])
+    ratings = frozenset(rating_list)
+    min_reasons = properties["reasons"].get("minItems", 0)
+    score_properties = properties["scores"]["properties"].values()
+    score_keys = frozenset(properties["scores"]["required"])
+    low = min(p["minimum"] for p in score_properties)
+    high = max(p["maximum"] for p in score_properties)
+    number_types = (int, float)
+
+    def validate(result) -> Verdict:
+        if type(result) is not dict:
+            raise ValueError("Response is not a JSON object")
+        for field in required:
+            if field not in result:
+                raise ValueError(f"Missing '{field}' field")
+
+        rating = result["rating"]
+        if type(rating) is not str or rating not in ratings:
+            raise ValueError(f"Invalid rating: {rating}. Must be one of {rating_list}")
+
+        reasons = result["reasons"]
+        if type(reasons) is not list:
+            raise ValueError("'reasons' must be a list")
+        if len(reasons) < min_reasons:
+            raise ValueError("'reasons' cannot be empty")
+        for reason in reasons:
+            if type(reason) is not str:
+                raise ValueError(f"'reasons' must contain strings, got {type(reason)}")
+
+        scores = result["scores"]
+        if type(scores) is not dict:
+            raise ValueError("'scores' must be an object")
+        missing_keys = score_keys.difference(scores)
+        if missing_keys:
+            raise ValueError(f"Missing score keys: {set(missing_keys)}")
+        for key, value in scores.items():
+            if type(value) not in number_types:
+                raise ValueError(f"Score '{key}' must be a number, got {type(value)}")
+            if not (low <= value <= high):
+                raise ValueError(f"Score '{key}' must be between {low} and {high}, got {value}")
+
+        return Verdict(result)
+
+    return validate
+
+
+validate_verdict = compile_validator()
+
+
+def decode_response(raw_content: str, backend: str = None):
+    """
+    Decode a raw model response to JSON, dropping any markdown fences.
+
+    A response that cannot be decoded is recorded as invalid under ``backend``.
+
+    Raises:
+        json.JSONDecodeError: If the response is not valid JSON
+        ValueError: If the response is empty
+    """
+    started = time.perf_counter()
+    try:
+        if not raw_content:
+            raise ValueError("Empty response from API")
+        text = raw_content.strip()
+        # Structured output never has fences; only pay for the regex when needed
+        if text[:1] == "`" or text[-1:] == "`":
+            text = _FENCE_RE.sub("", text).strip()
+        return json.loads(text)
+    except ValueError:
+        _record_validation(backend, started, valid=False)
+        raise
+
+
+def check_verdict(result, backend: str = None, started: float = None) -> Verdict:
+    """
+    Validate a decoded verdict, recording the outcome and time under ``backend``.
+
+    Raises:
+        ValueError: If the verdict does not match the schema
+    """
+    started = time.perf_counter() if started is None else started
+    try:
+        verdict = validate_verdict(result)
+    except ValueError:
+        _record_validation(backend, started, valid=False)
+        raise
+    _record_validation(backend, started, valid=True)
+    return verdict
+
+
+def parse_verdict(raw_content: str, backend: str = None) -> Verdict:
+    """
+    Parse and validate a raw model response.
+
+    Args:
+        raw_content: The message content returned by the model
+        backend: Backend name the timing and failure are recorded under
+
+    Returns:
+        Verdict: Validated classification result
+
+    Raises:
+        json.JSONDecodeError: If the response is not valid JSON
+        ValueError: If the response does not match the schema
+    """
+    started = time.perf_counter()
+    return check_verdict(decode_response(raw_content, backend), backend, started)
+
+
+def backend_name(client) -> str:
+    """Name a client is tracked under (its base URL, as for circuit breakers)"""
+    return str(getattr(client, "base_url", "default"))
+
+
+_unsupported = set()
+_metrics = {}
+_lock = threading.Lock()
+
+
+def structured_output_kwargs(client) -> dict:
+    """Request arguments asking ``client`` for schema-constrained output"""
+    if backend_name(client) in _unsupported:
+        return {}
+    return {"response_format": RESPONSE_FORMAT}
+
+
+def disable_structured_output(client, error, sent) -> bool:
+    """
+    Stop sending ``response_format`` to a backend that rejected it.
+
+    Every request that sent it and got the rejection is told to retry, not
+    just the first: concurrent requests were already in flight with it.
+
+    Args:
+        client: Client the request went to
+        error: Exception the request raised
+        sent: Whether that request carried ``response_format``
+
+    Returns:
+        bool: True if ``error`` was such a rejection (retry without it)
+    """
+    if not sent or get_status_code(error) not in (400, 422):
+        return False
+    message = str(error).lower()
+    if not any(word in message for word in ("response_format", "json_schema", "structured")):
+        return False
+    with _lock:
+        _unsupported.add(backend_name(client))
+    return True
+
+
+def _backend_metrics(backend):
+    return _metrics.setdefault(backend or "default", {
+        "attempts": 0, "retries": 0, "validated": 0, "invalid": 0, "validation_s": 0.0,
+    })
+
+
+def record_attempt(backend: str, attempt: int):
+    """Count a classification attempt (``attempt`` > 0 means it is a retry)"""
+    with _lock:
+        metrics = _backend_metrics(backend)
+        metrics["attempts"] += 1
+        if attempt:
+            metrics["retries"] += 1
+    telemetry.count("attempts", backend=backend)
+    if attempt:
+        telemetry.count("retries", backend=backend)
+
+
+def _record_validation(backend, started, valid):
+    elapsed = time.perf_counter() - started
+    with _lock:
+        metrics = _backend_metrics(backend)
+        metrics["validated" if valid else "invalid"] += 1
+        metrics["validation_s"] += elapsed
+    telemetry.record_stage("parse", elapsed, "ok" if valid else "error", backend=backend)
+    if not valid:
+        telemetry.count("validation_failures", backend=backend)
+
+
+def verdict_metrics() -> dict:
+    """Per-backend retry rate, invalid-output rate and mean validation time"""
+    with _lock:
+        snapshot = {}
+        for backend, metrics in _metrics.items():
+            parsed = metrics["validated"] + metrics["invalid"]
+            snapshot[backend] = {
+                **{key: value for key, value in metrics.items() if key != "validation_s"},
+                "retry_rate": metrics["retries"] / metrics["attempts"] if metrics["attempts"] else 0.0,
+                "invalid_rate": metrics["invalid"] / parsed if parsed else 0.0,
+                "avg_validation_us": 1e6 * metrics["validation_s"] / parsed if parsed else 0.0,
+                "structured_output": backend not in _unsupported,
+            }
+        return snapshot
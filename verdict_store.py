@@ -0,0 +1,519 @@
+"""
+Columnar Verdict Store
+Append-only, memory-mapped storage for tens of millions of verdicts, with
+vectorized aggregations (per-creator rating distributions, score histograms,
+time windows, reason counts) that answer in milliseconds instead of
+re-scanning JSON.
+
+A store is a directory of flat column files, one value per row:
+
+- ``rating.u8``: index into VALID_RATINGS, 255 for a fallback verdict
+- ``violence.u8``, ``language.u8`` ...: one file per category score, times
+  SCORE_SCALE, 255 for a fallback verdict
+- ``flags.u8``: FLAG_FALLBACK, FLAG_SHORT_CIRCUIT, FLAG_NEAR_DUPLICATE bits
+- ``creator.u32``: dictionary-encoded creator (``creators.txt``, one name per line)
+- ``clip.i64``: the clip ID itself when it is an integer, otherwise a 63-bit hash of it
+- ``time.u32``: Unix seconds the verdict was produced (or ingested)
+- ``reason_end.u64`` / ``reason.u32``: dictionary-encoded reasons (``reasons.txt``),
+  row i owns ``reason[reason_end[i - 1]:reason_end[i]]``
+
+``meta.json`` records the committed byte size of every file and is replaced
+atomically after each flush, so readers never see a half-written row and a
+writer that crashed is rolled back to the last flush when the store is
+reopened. One writer per store; any number of readers.
+
+Usage:
+    python verdict_store.py verdicts/ ingest output.jsonl --input transcripts.jsonl --creator-field handle
+    python verdict_store.py verdicts/ creators --top 20 --sort r_share
+    python verdict_store.py verdicts/ timeline --bucket day --creator somehandle
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from verdict_schema import REQUIRED_SCORE_KEYS, VALID_RATINGS
+
+
+SCORE_SCALE = 10  # scores are kept to one decimal (0-3 becomes 0-30)
+MISSING = 255
+FLAG_FALLBACK = 1
+FLAG_SHORT_CIRCUIT = 2
+FLAG_NEAR_DUPLICATE = 4
+
+COLUMNS = {
+    "rating": ("rating.u8", np.uint8),
+    "flags": ("flags.u8", np.uint8),
+    "creator": ("creator.u32", np.uint32),
+    "clip": ("clip.i64", np.int64),
+    "time": ("time.u32", np.uint32),
+    "reason_end": ("reason_end.u64", np.uint64),
+    # Separate contiguous files: strided uint8 reductions are many times slower
+    **{key: (key + ".u8", np.uint8) for key in REQUIRED_SCORE_KEYS},
+}
+REASON_FILE = "reason.u32"
+DICTIONARIES = {"creators": "creators.txt", "reasons": "reasons.txt"}
+BUCKETS = {"minute": 60, "hour": 3600, "day": 86400, "week": 7 * 86400}
+
+
+def clip_key(clip_id):
+    """Integer key of a clip ID: the ID itself if it is an integer, otherwise a stable 63-bit hash"""
+    if isinstance(clip_id, int) and not isinstance(clip_id, bool) and -(1 << 63) <= clip_id < (1 << 63):
+        return clip_id
+    text = str(clip_id)
+    if text.lstrip("-").isdigit() and -(1 << 63) <= int(text) < (1 << 63):
+        return int(text)
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big") >> 1
+
+
+def parse_time(value):
+    """Unix seconds from a number or an ISO 8601 string (naive times are UTC)"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    parsed = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
+
+class VerdictStore:
+    """
+    Columnar verdict store in a directory.
+
+    Appends are buffered and written on ``flush()`` (automatically every
+    ``flush_rows`` rows and on ``close()``). Column accessors and queries see
+    the rows committed at the last flush and memory-map the files, so
+    opening a store costs nothing until a column is touched.
+
+    Args:
+        path: Store directory (created if missing)
+        flush_rows: Buffered rows that trigger a flush
+    """
+
+    def __init__(self, path, flush_rows=65536):
+        self.path = path
+        self.flush_rows = flush_rows
+        os.makedirs(path, exist_ok=True)
+        self._buffer = []
+        self._dictionaries = {name: None for name in DICTIONARIES}  # loaded on first use
+        self._columns = {}
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {"version": 1, "rows": 0, "score_scale": SCORE_SCALE, "sizes": {}}
+
+    # -- writing ----------------------------------------------------------
+
+    def _dictionary(self, name):
+        if self._dictionaries[name] is None:
+            path = os.path.join(self.path, DICTIONARIES[name])
+            size = self.meta["sizes"].get(DICTIONARIES[name], 0)
+            entries = []
+            if size:
+                with open(path, "rb") as f:
+                    entries = f.read(size).decode("utf-8").split("\n")[:-1]
+            self._dictionaries[name] = {"entries": entries, "ids": {e: i for i, e in enumerate(entries)},
+                                        "pending": []}
+        return self._dictionaries[name]
+
+    def _encode(self, name, value):
+        dictionary = self._dictionary(name)
+        # Newlines would break the one-entry-per-line file
+        value = " ".join(str(value).splitlines())
+        code = dictionary["ids"].get(value)
+        if code is None:
+            code = dictionary["ids"][value] = len(dictionary["entries"])
+            dictionary["entries"].append(value)
+            dictionary["pending"].append(value)
+        return code
+
+    def append(self, verdict, creator="", clip_id=0, timestamp=None):
+        """
+        Add one verdict.
+
+        Args:
+            verdict: Verdict dict (fallbacks and short-circuited verdicts included)
+            creator: Creator handle or ID
+            clip_id: Clip ID (integer or string)
+            timestamp: Unix seconds, default now
+        """
+        scores = verdict.get("scores") or {}
+        flags = 0
+        if verdict.get("error") or verdict.get("rating") not in VALID_RATINGS \
+                or any(key not in scores for key in REQUIRED_SCORE_KEYS):
+            flags |= FLAG_FALLBACK
+        if "source" in verdict:
+            flags |= FLAG_SHORT_CIRCUIT
+        if "near_duplicate" in verdict:
+            flags |= FLAG_NEAR_DUPLICATE
+        # A fallback keeps MISSING in the rating and every score, which the aggregations rely on
+        fallback = flags & FLAG_FALLBACK
+        self._buffer.append((
+            MISSING if fallback else VALID_RATINGS.index(verdict["rating"]),
+            [MISSING if fallback else min(MISSING - 1, max(0, int(round(scores[key] * SCORE_SCALE))))
+             for key in REQUIRED_SCORE_KEYS],
+            flags,
+            self._encode("creators", creator if creator is not None else ""),
+            clip_key(clip_id),
+            int(time.time() if timestamp is None else timestamp),
+            [self._encode("reasons", reason) for reason in verdict.get("reasons") or ()],
+        ))
+        if len(self._buffer) >= self.flush_rows:
+            self.flush()
+
+    def _append_file(self, name, data):
+        path = os.path.join(self.path, name)
+        with open(path, "ab") as f:
+            # Drop anything a crashed writer left past the last commit
+            f.truncate(self.meta["sizes"].get(name, 0))
+            f.seek(0, os.SEEK_END)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            self.meta["sizes"][name] = f.tell()
+
+    def flush(self):
+        """Write buffered rows and new dictionary entries, then commit them in meta.json"""
+        pending = {name: d for name, d in self._dictionaries.items() if d is not None and d["pending"]}
+        if not self._buffer and not pending:
+            return
+        rows = self._buffer
+        self._buffer = []
+        for name, dictionary in pending.items():
+            self._append_file(DICTIONARIES[name],
+                              "".join(entry + "\n" for entry in dictionary["pending"]).encode("utf-8"))
+            dictionary["pending"] = []
+        if rows:
+            ratings, scores, flags, creators, clips, times, reasons = zip(*rows)
+            lengths = np.fromiter(map(len, reasons), dtype=np.uint64, count=len(rows))
+            previous_end = self.column("reason_end")[-1] if self.meta["rows"] else 0
+            scores = np.asarray(scores, dtype=np.uint8).reshape(len(rows), len(REQUIRED_SCORE_KEYS))
+            columns = {
+                "rating": np.asarray(ratings, dtype=np.uint8),
+                **{key: np.ascontiguousarray(scores[:, i]) for i, key in enumerate(REQUIRED_SCORE_KEYS)},
+                "flags": np.asarray(flags, dtype=np.uint8),
+                "creator": np.asarray(creators, dtype=np.uint32),
+                "clip": np.asarray(clips, dtype=np.int64),
+                "time": np.asarray(times, dtype=np.uint32),
+                "reason_end": np.uint64(previous_end) + np.cumsum(lengths, dtype=np.uint64),
+            }
+            self._append_file(REASON_FILE, np.fromiter(
+                (code for codes in reasons for code in codes), dtype=np.uint32).tobytes())
+            for name, (filename, _) in COLUMNS.items():
+                self._append_file(filename, columns[name].tobytes())
+            self.meta["rows"] += len(rows)
+        meta_path = os.path.join(self.path, "meta.json")
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(self.meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(meta_path + ".tmp", meta_path)
+        self._columns = {}
+
+    def close(self):
+        self.flush()
+        self._columns = {}
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    # -- reading ----------------------------------------------------------
+
+    def _map(self, filename, dtype, count):
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, filename), dtype=dtype, mode="r", shape=(count,))
+
+    def column(self, name):
+        """
+        Zero-copy, read-only NumPy view of a committed column.
+
+        Names are the COLUMNS keys (a category name for its scores), plus
+        ``reason``: the flat reason-code array indexed by ``reason_end``.
+        """
+        if name not in self._columns:
+            if name == "reason":
+                total = int(self.column("reason_end")[-1]) if self.meta["rows"] else 0
+                self._columns[name] = self._map(REASON_FILE, np.uint32, total)
+            else:
+                filename, dtype = COLUMNS[name]
+                self._columns[name] = self._map(filename, dtype, self.meta["rows"])
+        return self._columns[name]
+
+    def creator_id(self, creator):
+        """Integer key of a creator, or None if the store has never seen it"""
+        return self._dictionary("creators")["ids"].get(str(creator))
+
+    def creator_names(self, ids):
+        entries = self._dictionary("creators")["entries"]
+        return [entries[i] for i in ids]
+
+    def reason_names(self, ids):
+        entries = self._dictionary("reasons")["entries"]
+        return [entries[i] for i in ids]
+
+    def mask(self, creator=None, since=None, until=None, include_fallbacks=True):
+        """
+        Boolean row mask for a creator and/or a time window (``since`` inclusive, ``until`` exclusive).
+
+        Returns:
+            numpy.ndarray or None: None when nothing is filtered out
+        """
+        conditions = []
+        if creator is not None:
+            creator_id = self.creator_id(creator)
+            if creator_id is None:
+                return np.zeros(len(self), dtype=bool)
+            conditions.append(self.column("creator") == creator_id)
+        if since is not None:
+            conditions.append(self.column("time") >= since)
+        if until is not None:
+            conditions.append(self.column("time") < until)
+        if not include_fallbacks:
+            conditions.append((self.column("flags") & FLAG_FALLBACK) == 0)
+        if not conditions:
+            return None
+        return np.logical_and.reduce(conditions)
+
+    def _select(self, name, mask):
+        column = self.column(name)
+        return column if mask is None else column[mask]
+
+    def rating_counts(self, mask=None):
+        """Verdicts per rating, plus ``fallback`` for verdicts without one"""
+        counts = np.bincount(self._select("rating", mask), minlength=MISSING + 1)
+        return {**{rating: int(counts[i]) for i, rating in enumerate(VALID_RATINGS)},
+                "fallback": int(counts[MISSING])}
+
+    def score_histogram(self, category, mask=None):
+        """
+        Verdicts per score value of one category (fallbacks excluded).
+
+        Returns:
+            dict: score -> count, for every score value that occurs
+        """
+        counts = np.bincount(self._select(category, mask), minlength=MISSING + 1)[:MISSING]
+        return {round(value / SCORE_SCALE, 1): int(count) for value, count in enumerate(counts) if count}
+
+    def mean_scores(self, mask=None):
+        """Mean of each category score over the non-fallback verdicts"""
+        ratings = self._select("rating", mask)
+        fallbacks = int(np.count_nonzero(ratings == MISSING))
+        rated = len(ratings) - fallbacks
+        if not rated:
+            return {key: None for key in REQUIRED_SCORE_KEYS}
+        return {key: round((int(self._select(key, mask).sum(dtype=np.uint64)) - MISSING * fallbacks)
+                           / rated / SCORE_SCALE, 3)
+                for key in REQUIRED_SCORE_KEYS}
+
+    def _grouped(self, keys, size, mask):
+        """
+        Rating counts, fallbacks and mean scores per integer key in ``range(size)``.
+
+        Each row of ``keys`` is the group of the matching (masked) row.
+        """
+        ratings = self._select("rating", mask)
+        # key * 256 + rating buckets every (key, rating) pair in one bincount
+        pairs = np.bincount(keys * (MISSING + 1) + ratings, minlength=size * (MISSING + 1))
+        pairs = pairs.reshape(size, MISSING + 1)
+        fallbacks = pairs[:, MISSING]
+        # Fallback rows hold MISSING in every score: summing them in and taking
+        # them back out is cheaper than masking every score column
+        score_sums = np.stack([np.bincount(keys, weights=self._select(key, mask), minlength=size)
+                               for key in REQUIRED_SCORE_KEYS], axis=1) - MISSING * fallbacks[:, None]
+        rated = pairs[:, :len(VALID_RATINGS)].sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_scores = score_sums / rated[:, None] / SCORE_SCALE
+        return {
+            "verdicts": rated + fallbacks,
+            "ratings": pairs[:, :len(VALID_RATINGS)],
+            "fallbacks": fallbacks,
+            "mean_scores": mean_scores,
+        }
+
+    def by_creator(self, mask=None, min_verdicts=1):
+        """
+        Per-creator rating distribution, fallback rate and mean scores, in one pass per column.
+
+        Returns:
+            dict: NumPy arrays aligned on ``creator`` (integer keys):
+                ``verdicts``, ``ratings`` (creators x 4 counts), ``fallbacks``,
+                ``mean_scores`` (creators x 5, NaN without a valid verdict)
+        """
+        size = len(self._dictionary("creators")["entries"])
+        grouped = self._grouped(self._select("creator", mask).astype(np.intp), size, mask)
+        keep = np.flatnonzero(grouped["verdicts"] >= max(min_verdicts, 1))
+        return {"creator": keep, **{name: values[keep] for name, values in grouped.items()}}
+
+    def timeline(self, bucket_s=86400, mask=None):
+        """
+        Rating counts, fallbacks and mean scores per time bucket.
+
+        Returns:
+            dict: NumPy arrays aligned on ``start`` (bucket start, Unix seconds),
+                with the same fields as ``by_creator``
+        """
+        times = self._select("time", mask)
+        if not len(times):
+            return {"start": np.zeros(0, dtype=np.int64), "verdicts": np.zeros(0, dtype=np.int64),
+                    "ratings": np.zeros((0, len(VALID_RATINGS)), dtype=np.int64),
+                    "fallbacks": np.zeros(0, dtype=np.int64),
+                    "mean_scores": np.zeros((0, len(REQUIRED_SCORE_KEYS)))}
+        buckets = times // np.uint32(bucket_s)
+        first = int(buckets.min())
+        size = int(buckets.max()) - first + 1
+        grouped = self._grouped((buckets - np.uint32(first)).astype(np.intp), size, mask)
+        keep = np.flatnonzero(grouped["verdicts"])
+        return {"start": (keep + first) * bucket_s, **{name: values[keep] for name, values in grouped.items()}}
+
+    def reason_counts(self, mask=None, top=20):
+        """
+        Most frequent reasons.
+
+        Returns:
+            list: (reason, count) pairs, most frequent first
+        """
+        codes = self.column("reason")
+        if mask is not None:
+            ends = self.column("reason_end").astype(np.int64)
+            lengths = np.diff(ends, prepend=0)
+            codes = codes[np.repeat(mask, lengths)]
+        counts = np.bincount(codes, minlength=len(self._dictionary("reasons")["entries"]))
+        order = np.argsort(counts, kind="stable")[::-1][:top]
+        order = order[counts[order] > 0]
+        return list(zip(self.reason_names(order), counts[order].tolist()))
+
+
+def iter_batch_output(output_path, input_path=None, creator_field=None, time_field=None, id_field="id"):
+    """
+    Yield (verdict, creator, clip_id, timestamp) from a batch_classify or work_queue output file.
+
+    Output rows carry ``line`` (the input record index), so with ``input_path``
+    the creator and time fields are read from the matching input record in a
+    single forward pass over both files; otherwise they come from the output row.
+    """
+    records = None
+    if input_path is not None:
+        def iter_input():
+            with open(input_path, "r", encoding="utf-8") as f:
+                index = 0
+                for line in f:
+                    if line.strip():
+                        yield index, line
+                        index += 1
+        records = iter_input()
+    current = (-1, None)
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            source = result
+            if records is not None and result.get("line") is not None:
+                while current[0] < result["line"]:
+                    current = next(records, (float("inf"), None))
+                source = json.loads(current[1]) if current[0] == result["line"] else {}
+            verdict = result.get("classification") or {"error": True, "reasons": [result.get("error") or "failed"]}
+            creator = source.get(creator_field, "") if creator_field else ""
+            timestamp = parse_time(source[time_field]) if time_field and source.get(time_field) is not None \
+                else None
+            yield verdict, creator, result.get(id_field), timestamp
+
+
+def _table(store, grouped, labels):
+    """JSON-friendly rows from a ``by_creator`` / ``timeline`` result"""
+    rows = []
+    for i, label in enumerate(labels):
+        verdicts = int(grouped["verdicts"][i])
+        rated = int(grouped["ratings"][i].sum())
+        rows.append({
+            **label,
+            "verdicts": verdicts,
+            "ratings": {rating: int(count) for rating, count in zip(VALID_RATINGS, grouped["ratings"][i])},
+            "r_share": round(int(grouped["ratings"][i][-1]) / rated, 4) if rated else None,
+            "fallback_rate": round(int(grouped["fallbacks"][i]) / verdicts, 4),
+            "mean_scores": {key: None if np.isnan(value) else round(float(value), 3)
+                            for key, value in zip(REQUIRED_SCORE_KEYS, grouped["mean_scores"][i])},
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Store verdicts in columns and aggregate them.")
+    parser.add_argument("store", help="Store directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("ingest", help="Append the verdicts of a batch_classify or work_queue output file")
+    command.add_argument("output")
+    command.add_argument("--input", default=None, help="batch_classify input file to read creator/time fields from")
+    command.add_argument("--id-field", default="id", help="Clip ID field of the output rows")
+    command.add_argument("--creator-field", default=None)
+    command.add_argument("--time-field", default=None, help="Unix seconds or ISO 8601 (default: now)")
+
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument("--creator", default=None)
+    filters.add_argument("--since", default=None, help="Unix seconds or ISO 8601")
+    filters.add_argument("--until", default=None, help="Unix seconds or ISO 8601")
+
+    commands.add_parser("summary", parents=[filters], help="Rating counts, fallback rate, mean scores, top reasons")
+    command = commands.add_parser("creators", parents=[filters], help="Per-creator rating distributions")
+    command.add_argument("--top", type=int, default=20)
+    command.add_argument("--sort", choices=["verdicts", "r_share", "fallback_rate"], default="verdicts")
+    command.add_argument("--min-verdicts", type=int, default=1)
+    command = commands.add_parser("timeline", parents=[filters], help="Rating trend per time bucket")
+    command.add_argument("--bucket", choices=list(BUCKETS), default="day")
+    command = commands.add_parser("histogram", parents=[filters], help="Score distribution of one category")
+    command.add_argument("category", choices=REQUIRED_SCORE_KEYS)
+    args = parser.parse_args(argv)
+
+    store = VerdictStore(args.store)
+    if args.command == "ingest":
+        started = time.perf_counter()
+        before = len(store)
+        for verdict, creator, clip_id, timestamp in iter_batch_output(
+                args.output, args.input, args.creator_field, args.time_field, args.id_field):
+            store.append(verdict, creator=creator, clip_id=clip_id, timestamp=timestamp)
+        store.close()
+        print(f"✓ Stored {len(store) - before:,} verdicts in {time.perf_counter() - started:.1f}s "
+              f"({len(store):,} in {args.store})")
+        return
+
+    started = time.perf_counter()
+    mask = store.mask(creator=args.creator,
+                      since=parse_time(args.since) if args.since else None,
+                      until=parse_time(args.until) if args.until else None)
+    if args.command == "summary":
+        counts = store.rating_counts(mask)
+        total = sum(counts.values())
+        report = {
+            "verdicts": total,
+            "ratings": counts,
+            "fallback_rate": round(counts["fallback"] / total, 4) if total else None,
+            "mean_scores": store.mean_scores(mask),
+            "top_reasons": store.reason_counts(mask, top=10),
+        }
+    elif args.command == "creators":
+        grouped = store.by_creator(mask, min_verdicts=args.min_verdicts)
+        rows = _table(store, grouped, [{"creator": name} for name in store.creator_names(grouped["creator"])])
+        rows.sort(key=lambda row: row[args.sort] or 0, reverse=True)
+        report = {"creators": len(rows), "top": rows[:args.top]}
+    elif args.command == "timeline":
+        grouped = store.timeline(BUCKETS[args.bucket], mask)
+        report = {"buckets": _table(store, grouped, [
+            {"start": datetime.datetime.fromtimestamp(int(start), datetime.timezone.utc).isoformat()}
+            for start in grouped["start"]])}
+    else:
+        report = {"category": args.category, "histogram": store.score_histogram(args.category, mask)}
+    report["query_ms"] = round(1000 * (time.perf_counter() - started), 2)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
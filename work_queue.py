@@ -0,0 +1,595 @@
+"""
+Work Queue Workers
+Classifies transcripts from a shared job queue with many worker processes.
+Each process runs a few worker threads that claim jobs, pre-filter and
+classify them, and ack the verdict. Failed jobs are retried with backoff and
+moved to a dead-letter state after ``max_attempts``. Every worker draws from
+one SharedRateLimiter, so adding processes raises throughput until the
+provider's request/token limits are reached instead of multiplying 429s.
+
+WorkQueue is the interface workers depend on; SQLiteWorkQueue implements it
+for any number of processes on one machine. Spreading workers over several
+machines needs a WorkQueue (and a limiter store) on a networked database or
+broker, which plugs in behind the same methods.
+
+Usage:
+    python work_queue.py enqueue transcripts.jsonl
+    python work_queue.py work --processes 4 --threads 8 --rpm 600 --tpm 400000
+    python work_queue.py stats
+    python work_queue.py export verdicts.jsonl [--dead dead_letters.jsonl]
+    python work_queue.py requeue-dead
+"""
+
+import abc
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from rate_limiter import DEFAULT_DB_PATH as DEFAULT_LIMITER_PATH
+from reasoning_cascade import add_cascade_arguments, cascade_from_args
+
+
+DEFAULT_QUEUE_PATH = ".work_queue.sqlite3"
+STATUSES = ("queued", "leased", "done", "dead")
+
+
+class WorkQueue(abc.ABC):
+    """
+    Interface of a job queue with leases, ack/nack and dead-lettering.
+
+    Jobs are dicts with ``id``, ``key``, ``payload`` (any JSON value) and
+    ``attempts`` (claims so far, including the current one). A claimed job
+    is leased to one worker; if it is neither acked nor nacked before the
+    lease expires (the worker died) it is handed out again.
+    """
+
+    @abc.abstractmethod
+    def put(self, payloads, keys=None):
+        """Enqueue payloads; a key already in the queue is skipped. Returns the number added."""
+
+    @abc.abstractmethod
+    def add_ids(self, refs_by_key):
+        """
+        Merge record ids into queued jobs' dict payloads.
+
+        ``refs_by_key`` maps a job key to ``(source, id)`` pairs; pairs the
+        job's ``ids`` and ``sources`` lists do not hold yet are appended, and
+        keys not in the queue are ignored. Returns the number of ids added.
+        """
+
+    @abc.abstractmethod
+    def claim(self, worker_id, limit=1):
+        """Lease up to ``limit`` ready jobs to ``worker_id``"""
+
+    @abc.abstractmethod
+    def ack(self, job_id, worker_id, result):
+        """Mark a leased job done with its result. Returns False if the lease was lost."""
+
+    @abc.abstractmethod
+    def nack(self, job_id, worker_id, error, delay_s=0.0):
+        """Return a leased job for a retry after ``delay_s``, or dead-letter it when out of attempts"""
+
+    @abc.abstractmethod
+    def get(self, key):
+        """``status``, ``attempts``, ``result`` and ``error`` of the job with ``key``, or None"""
+
+    @abc.abstractmethod
+    def counts(self):
+        """Jobs per status"""
+
+    @abc.abstractmethod
+    def pending(self):
+        """Jobs that may still be claimed: queued (possibly delayed) or leased"""
+
+    @abc.abstractmethod
+    def iter_jobs(self, status, page_size=1000):
+        """Yield (key, payload, attempts, result, error) of jobs with ``status`` in queue order"""
+
+    @abc.abstractmethod
+    def requeue_dead(self, keys=None):
+        """Give dead-lettered jobs (all, or those with ``keys``) a fresh set of attempts. Returns the number requeued."""
+
+    def close(self):
+        pass
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """
+    WorkQueue in a SQLite file, shared by any number of local processes.
+
+    Args:
+        db_path: SQLite file
+        max_attempts: Claims before a failing job is dead-lettered
+        lease_s: Seconds a claimed job stays with its worker before it is handed out again
+    """
+
+    def __init__(self, db_path=DEFAULT_QUEUE_PATH, max_attempts=5, lease_s=120.0):
+        self.max_attempts = max_attempts
+        self.lease_s = lease_s
+        self._lock = threading.Lock()
+        # Autocommit mode so claims can take the write lock with BEGIN IMMEDIATE
+        self._db = sqlite3.connect(db_path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY, key TEXT UNIQUE, payload TEXT NOT NULL, "
+            "status TEXT NOT NULL DEFAULT 'queued', attempts INTEGER NOT NULL DEFAULT 0, "
+            "available_at REAL NOT NULL, lease_expires_at REAL, worker TEXT, "
+            "result TEXT, error TEXT, updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at)")
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params)
+
+    def put(self, payloads, keys=None):
+        now = time.time()
+        rows = [(None if keys is None else keys[i], json.dumps(payload, ensure_ascii=False), now, now)
+                for i, payload in enumerate(payloads)]
+        with self._lock:
+            before = self._db.total_changes
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO jobs (key, payload, available_at, updated_at) VALUES (?, ?, ?, ?)", rows
+                )
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return self._db.total_changes - before
+
+    def add_ids(self, refs_by_key):
+        added = 0
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for key, refs in refs_by_key.items():
+                    row = self._db.execute("SELECT id, payload FROM jobs WHERE key = ?", (key,)).fetchone()
+                    if row is None:
+                        continue
+                    job_id, payload = row[0], json.loads(row[1])
+                    # Deferred jobs carry a single "id" and no sources
+                    ids = payload.get("ids") or ([payload["id"]] if "id" in payload else [])
+                    sources = payload.get("sources") or [None] * len(ids)
+                    seen = {(source, json.dumps(record_id)) for source, record_id in zip(sources, ids)}
+                    new = [(source, record_id) for source, record_id in refs
+                           if (source, json.dumps(record_id)) not in seen]
+                    if not new:
+                        continue
+                    payload["ids"] = ids + [record_id for _, record_id in new]
+                    payload["sources"] = sources + [source for source, _ in new]
+                    self._db.execute("UPDATE jobs SET payload = ?, updated_at = ? WHERE id = ?",
+                                     (json.dumps(payload, ensure_ascii=False), time.time(), job_id))
+                    added += len(new)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+        return added
+
+    def claim(self, worker_id, limit=1):
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # Expired leases belong to workers that died mid-job
+                self._db.execute(
+                    "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'dead' ELSE 'queued' END, "
+                    "error = COALESCE(error, 'Lease expired'), worker = NULL, updated_at = ? "
+                    "WHERE status = 'leased' AND lease_expires_at < ?",
+                    (self.max_attempts, now, now),
+                )
+                rows = self._db.execute(
+                    "UPDATE jobs SET status = 'leased', attempts = attempts + 1, lease_expires_at = ?, "
+                    "worker = ?, updated_at = ? WHERE id IN ("
+                    "SELECT id FROM jobs WHERE status = 'queued' AND available_at <= ? ORDER BY id LIMIT ?) "
+                    "RETURNING id, key, payload, attempts",
+                    (now + self.lease_s, worker_id, now, now, limit),
+                ).fetchall()
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+        return [{"id": job_id, "key": key, "payload": json.loads(payload), "attempts": attempts}
+                for job_id, key, payload, attempts in sorted(rows)]
+
+    def ack(self, job_id, worker_id, result):
+        cursor = self._execute(
+            "UPDATE jobs SET status = 'done', result = ?, error = NULL, worker = NULL, updated_at = ? "
+            "WHERE id = ? AND status = 'leased' AND worker = ?",
+            (json.dumps(result, ensure_ascii=False), time.time(), job_id, worker_id),
+        )
+        return cursor.rowcount == 1
+
+    def nack(self, job_id, worker_id, error, delay_s=0.0):
+        now = time.time()
+        cursor = self._execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'dead' ELSE 'queued' END, "
+            "available_at = ?, error = ?, worker = NULL, updated_at = ? "
+            "WHERE id = ? AND status = 'leased' AND worker = ?",
+            (self.max_attempts, now + delay_s, str(error), now, job_id, worker_id),
+        )
+        return cursor.rowcount == 1
+
+    def get(self, key):
+        row = self._execute("SELECT status, attempts, result, error FROM jobs WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        status, attempts, result, error = row
+        return {"status": status, "attempts": attempts, "result": json.loads(result) if result else None,
+                "error": error}
+
+    def counts(self):
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(self._execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return counts
+
+    def pending(self):
+        """Jobs that may still be claimed: queued (possibly delayed) or leased"""
+        (count,) = self._execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'leased')").fetchone()
+        return count
+
+    def iter_jobs(self, status, page_size=1000):
+        """Yield (key, payload, attempts, result, error) of jobs with ``status`` in queue order"""
+        last_id = 0
+        while True:
+            rows = self._execute(
+                "SELECT id, key, payload, attempts, result, error FROM jobs "
+                "WHERE status = ? AND id > ? ORDER BY id LIMIT ?", (status, last_id, page_size),
+            ).fetchall()
+            if not rows:
+                return
+            for last_id, key, payload, attempts, result, error in rows:
+                yield key, json.loads(payload), attempts, json.loads(result) if result else None, error
+
+    def requeue_dead(self, keys=None):
+        now = time.time()
+        sql = "UPDATE jobs SET status = 'queued', attempts = 0, available_at = ?, updated_at = ? WHERE status = 'dead'"
+        if keys is None:
+            return self._execute(sql, (now, now)).rowcount
+        requeued = 0
+        for key in keys:
+            requeued += self._execute(sql + " AND key = ?", (now, now, key)).rowcount
+        return requeued
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def retry_delay(attempts, base_delay=2.0, max_delay=300.0):
+    """Backoff before a failed job becomes claimable again"""
+    return min(max_delay, base_delay * 2 ** (attempts - 1))
+
+
+def _build_client(args):
+    from openai import OpenAI
+
+    if args.router:
+        from backend_router import BackendRouter, default_backends
+        client = BackendRouter(default_backends())
+    else:
+        # Retries happen in classify_content, where the limiter sees each one
+        client = OpenAI(
+            base_url=os.getenv("OPENAI_BASE_URL", "https://openrouter.ai/api/v1"),
+            api_key=os.getenv("OPENAI_API_KEY"),
+            max_retries=0,
+        )
+    if args.rpm or args.tpm:
+        from rate_limiter import RateLimitedClient, SharedRateLimiter
+        limiter = SharedRateLimiter(args.limiter, name=args.limit_name,
+                                    requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+        client = RateLimitedClient(client, limiter)
+    return client
+
+
+def run_worker(args):
+    """
+    Worker process: ``args.threads`` threads claiming and classifying until the queue drains.
+
+    Returns:
+        dict: Jobs acked, nacked and prefiltered by this process
+    """
+    from audio_converter import classify_content
+
+    load_dotenv()
+    queue = SQLiteWorkQueue(args.queue, max_attempts=args.max_attempts, lease_s=args.lease)
+    client = _build_client(args)
+    cache = None
+    if args.cache:
+        from verdict_cache import VerdictCache
+        cache = VerdictCache(args.cache)
+    if args.log_verdicts:
+        from verdict_log import VerdictLog
+        cache = VerdictLog(args.log_verdicts, inner=cache)
+    prefilter = None
+    if args.prefilter:
+        from lexical_filter import LexicalFilter
+        prefilter = LexicalFilter()
+    if args.distilled:
+        # Needs NumPy, so only import when asked for
+        from distilled_classifier import DistilledClassifier
+        prefilter = DistilledClassifier.load(args.distilled, prefilter=prefilter)
+    cascade = cascade_from_args(args)
+    classify = cascade or classify_content
+
+    stats = {"acked": 0, "nacked": 0, "prefiltered": 0, "lost_leases": 0}
+    stats_lock = threading.Lock()
+
+    def count(name):
+        with stats_lock:
+            stats[name] += 1
+
+    def work(thread_index):
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:{thread_index}"
+        while True:
+            jobs = queue.claim(worker_id)
+            if not jobs:
+                if args.follow or queue.pending():
+                    # Delayed retries or other workers' leases may still come back
+                    time.sleep(args.poll_interval)
+                    continue
+                return
+            job = jobs[0]
+            text = job["payload"].get("text") or ""
+            try:
+                verdict = prefilter.classify(text) if prefilter is not None else None
+                if verdict is not None:
+                    count("prefiltered")
+                else:
+                    verdict = classify(client, text, args.max_retries, cache)
+            except Exception as e:
+                verdict = {"error": True, "reasons": [f"Error: {type(e).__name__}: {e}"]}
+            if verdict.get("error"):
+                # A fallback is not an answer; retry later, dead-letter when out of attempts
+                queue.nack(job["id"], worker_id, verdict["reasons"][-1], retry_delay(job["attempts"]))
+                count("nacked")
+            elif queue.ack(job["id"], worker_id, verdict):
+                count("acked")
+            else:
+                count("lost_leases")
+
+    threads = [threading.Thread(target=work, args=(i,), daemon=True) for i in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    limiter = getattr(client, "limiter", None)
+    if limiter is not None:
+        stats["rate_limited"] = limiter.stats["rate_limited"]
+        stats["limiter_wait_s"] = round(limiter.stats["waited_s"], 1)
+        limiter.close()
+    if cascade is not None:
+        summary = cascade.summary()
+        for name in ("fast_resolved", "escalated", "compared", "agreed"):
+            stats["cascade_" + name] = summary[name]
+    if cache is not None:
+        cache.close()
+    queue.close()
+    return stats
+
+
+def _worker_entry(args, results):
+    try:
+        results.put(run_worker(args))
+    except KeyboardInterrupt:
+        pass
+
+
+def work(args):
+    queue = SQLiteWorkQueue(args.queue, max_attempts=args.max_attempts, lease_s=args.lease)
+    initial = queue.counts()
+    started = time.monotonic()
+    # spawn, not fork: workers must not inherit SQLite connections or threads
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [context.Process(target=_worker_entry, args=(args, results)) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    print(f"✓ Started {args.processes} worker processes x {args.threads} threads "
+          f"({initial['queued']:,} jobs queued)", file=sys.stderr)
+
+    totals = {}
+
+    def collect(stats):
+        for name, value in stats.items():
+            totals[name] = round(totals.get(name, 0) + value, 1)
+
+    try:
+        last_report = started
+        while any(process.is_alive() for process in processes):
+            time.sleep(0.2)
+            if time.monotonic() - last_report >= args.progress_interval:
+                last_report = time.monotonic()
+                counts = queue.counts()
+                finished = counts["done"] - initial["done"]
+                rate = finished / (last_report - started)
+                print(f"{counts['done']:,} done | {counts['queued']:,} queued | {counts['leased']:,} leased | "
+                      f"{counts['dead']:,} dead | {rate:.1f} jobs/s", file=sys.stderr, flush=True)
+        for process in processes:
+            process.join()
+        for _ in range(sum(process.exitcode == 0 for process in processes)):
+            collect(results.get(timeout=10))
+    except KeyboardInterrupt:
+        print("\n⚠ Interrupted. Leased jobs return to the queue when their leases expire.", file=sys.stderr)
+        for process in processes:
+            process.terminate()
+        sys.exit(130)
+    finally:
+        for process in processes:
+            process.join()
+
+    elapsed = time.monotonic() - started
+    counts = queue.counts()
+    finished = counts["done"] - initial["done"]
+    print(f"Workers: {json.dumps(totals)}", file=sys.stderr)
+    if args.rpm or args.tpm:
+        from rate_limiter import SharedRateLimiter
+        limiter = SharedRateLimiter(args.limiter, name=args.limit_name,
+                                    requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+        state = limiter.state()
+        print(f"Rate limit: {state['rpm'] or '-'} requests/min, {state['tpm'] or '-'} tokens/min effective",
+              file=sys.stderr)
+        limiter.close()
+    print(f"✓ {finished:,} jobs done in {elapsed:.1f}s ({finished / elapsed:.1f} jobs/s), "
+          f"{counts['dead']:,} dead-lettered, {counts['queued'] + counts['leased']:,} pending", file=sys.stderr)
+    queue.close()
+
+
+def _read_records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f):
+            line = line.strip()
+            if line:
+                yield line_number, json.loads(line)
+
+
+def enqueue(args):
+    from audio_converter import MODEL, POLICY
+    from verdict_cache import cache_key
+
+    def key_of(record):
+        return cache_key(record.get(args.text_field) or "", POLICY, MODEL)
+
+    # Jobs are keyed by content, like the verdict cache, and every record with that content is exported
+    # under its own id. A transcript already queued (from another file, or deferred by the service) is
+    # not queued again; its new ids are merged into the existing job. Ids are tracked per input file so
+    # enqueueing the same file twice adds nothing
+    source = os.path.abspath(args.input)
+    ids = {}
+    records = 0
+    for line_number, record in _read_records(args.input):
+        record_id = record.get(args.id_field)
+        ids.setdefault(key_of(record), []).append(record_id if record_id is not None else line_number)
+        records += 1
+    unique = len(ids)
+
+    queue = SQLiteWorkQueue(args.queue)
+    added = merged = 0
+    batch, keys = [], []
+
+    def flush():
+        nonlocal added, merged
+        added += queue.put(batch, keys)
+        # A no-op for the jobs just inserted; fills in the ids of those that were already queued
+        merged += queue.add_ids({key: [(source, record_id) for record_id in payload["ids"]]
+                                 for key, payload in zip(keys, batch)})
+
+    for _, record in _read_records(args.input):
+        key = key_of(record)
+        if key not in ids:
+            continue  # a repeat of a transcript earlier in the file
+        record_ids = ids.pop(key)
+        batch.append({"ids": record_ids, "sources": [source] * len(record_ids),
+                      "text": record.get(args.text_field) or ""})
+        keys.append(key)
+        if len(batch) >= 1000:
+            flush()
+            batch, keys = [], []
+    if batch:
+        flush()
+    print(f"✓ Enqueued {added:,} jobs for {records:,} records "
+          f"({records - unique:,} repeated transcripts, {unique - added:,} already queued, "
+          f"{merged:,} ids merged into those)")
+    queue.close()
+
+
+def export(args):
+    queue = SQLiteWorkQueue(args.queue)
+    written = 0
+    with open(args.output, "w", encoding="utf-8") as out:
+        for key, payload, attempts, result, _ in queue.iter_jobs("done"):
+            for record_id in payload.get("ids") or [payload.get("id")]:
+                out.write(json.dumps({"id": record_id, "classification": result}, ensure_ascii=False) + "\n")
+                written += 1
+    print(f"✓ Wrote {written:,} verdicts to {args.output}")
+    if args.dead:
+        dead = 0
+        with open(args.dead, "w", encoding="utf-8") as out:
+            for key, payload, attempts, _, error in queue.iter_jobs("dead"):
+                out.write(json.dumps({"ids": payload.get("ids") or [payload.get("id")], "key": key,
+                                      "attempts": attempts, "error": error, "text": payload.get("text")},
+                                     ensure_ascii=False) + "\n")
+                dead += 1
+        print(f"✓ Wrote {dead:,} dead letters to {args.dead}")
+    queue.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Classify transcripts from a shared work queue.")
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH, help="SQLite queue file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("enqueue", help="Add a JSONL file of transcripts to the queue")
+    command.add_argument("input")
+    command.add_argument("--text-field", default="transcript")
+    command.add_argument("--id-field", default="id")
+
+    command = commands.add_parser("work", help="Run worker processes until the queue drains")
+    command.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    command.add_argument("--threads", type=int, default=8, help="Worker threads per process")
+    command.add_argument("--rpm", type=float, default=None, help="Shared requests/min limit across all workers")
+    command.add_argument("--tpm", type=float, default=None, help="Shared tokens/min limit across all workers")
+    command.add_argument("--limiter", default=DEFAULT_LIMITER_PATH, help="SQLite file holding the shared limits")
+    command.add_argument("--limit-name", default="default", help="Limit to draw from (one per provider account)")
+    command.add_argument("--max-retries", type=int, default=3, help="Model attempts per claim")
+    command.add_argument("--max-attempts", type=int, default=5, help="Claims before a job is dead-lettered")
+    command.add_argument("--lease", type=float, default=120.0, help="Seconds before an unfinished claim is re-issued")
+    command.add_argument("--cache", nargs="?", const=".verdict_cache.sqlite3", default=None,
+                         help="Reuse verdicts from a SQLite cache (default path if no value given)")
+    command.add_argument("--prefilter", action="store_true",
+                         help="Answer obvious G / R transcripts with the lexical pre-filter")
+    command.add_argument("--distilled", nargs="?", const=".distilled_model.npz", default=None, metavar="MODEL",
+                         help="Answer confident transcripts with the distilled classifier (after --prefilter)")
+    command.add_argument("--log-verdicts", nargs="?", const=".verdict_log.sqlite3", default=None, metavar="PATH",
+                         help="Log model verdicts with their transcripts for training the distilled classifier")
+    command.add_argument("--router", action="store_true",
+                         help="Route across Ollama and OpenRouter (see backend_router.py)")
+    add_cascade_arguments(command)
+    command.add_argument("--follow", action="store_true", help="Keep polling for new jobs instead of exiting")
+    command.add_argument("--poll-interval", type=float, default=0.5)
+    command.add_argument("--progress-interval", type=float, default=5.0)
+
+    commands.add_parser("stats", help="Print job counts per status")
+
+    command = commands.add_parser("export", help="Write verdicts (and optionally dead letters) to JSONL")
+    command.add_argument("output")
+    command.add_argument("--dead", default=None, metavar="PATH", help="Also write dead-lettered jobs here")
+
+    commands.add_parser("requeue-dead", help="Give dead-lettered jobs another round of attempts")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "enqueue":
+        enqueue(args)
+    elif args.command == "work":
+        if args.processes < 1 or args.threads < 1:
+            raise SystemExit("--processes and --threads must be at least 1")
+        work(args)
+    elif args.command == "stats":
+        queue = SQLiteWorkQueue(args.queue)
+        print(json.dumps(queue.counts()))
+        queue.close()
+    elif args.command == "export":
+        export(args)
+    elif args.command == "requeue-dead":
+        queue = SQLiteWorkQueue(args.queue)
+        print(f"✓ Requeued {queue.requeue_dead():,} dead-lettered jobs")
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()